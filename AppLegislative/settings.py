@@ -10,11 +10,16 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Fichiers d'exécution : cache, instantané de la matrice des résultats, journal d'audit,
+# certificats. Les tests les déplacent dans un dossier temporaire (myApplication.tests).
+VAR_DIR = BASE_DIR / 'var'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -156,4 +161,95 @@ AUTH_USER_MODEL = 'myApplication.User'
 # Login redirect
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
-LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'home'
+
+# Cache (myApplication.cache_resultats)
+# CACHE_BACKEND : 'memoire' (propre à chaque processus), 'fichier' (un fichier par entrée)
+# ou 'sqlite' (un seul fichier partagé par tous les workers, sans service externe).
+CACHE_BACKEND = 'sqlite'
+CACHE_TIMEOUT = 3600
+# Durée maximale d'un recalcul unique (en_cache_partage) avant qu'un autre worker ne le reprenne.
+CACHE_VERROU_TIMEOUT = 120
+_CACHE_BACKENDS = {
+    'memoire': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'app-legislative',
+    },
+    'fichier': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': VAR_DIR / 'cache',
+    },
+    'sqlite': {
+        'BACKEND': 'myApplication.cache_sqlite.SQLiteCache',
+        'LOCATION': VAR_DIR / 'cache.sqlite3',
+    },
+}
+CACHES = {
+    'default': {
+        **_CACHE_BACKENDS[CACHE_BACKEND],
+        'TIMEOUT': CACHE_TIMEOUT,
+        'KEY_PREFIX': 'legislatives',
+    }
+}
+
+# Journal d'audit asynchrone (myApplication.audit)
+# Les entrées sont insérées par lots toutes les AUDIT_BATCH_SIZE entrées
+# ou toutes les AUDIT_FLUSH_INTERVAL_MS millisecondes.
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL_MS = 500
+AUDIT_SPOOL_DIR = VAR_DIR / 'audit_spool'
+AUDIT_SPOOL_FSYNC = False
+# False : insertion immédiate, sans thread d'arrière-plan (tests)
+AUDIT_ASYNC = True
+
+# Segments d'archives du journal d'audit (commande archiver_audit)
+AUDIT_ARCHIVE_DIR = VAR_DIR / 'audit_archive'
+
+# File de vérification des PV (myApplication.verification)
+# Un lot réservé par un vérificateur redevient disponible après VERIFICATION_LEASE_SECONDS.
+VERIFICATION_BATCH_SIZE = 20
+VERIFICATION_LEASE_SECONDS = 600
+
+# Matrice des résultats en mémoire (myApplication.matrice_resultats)
+# Intervalle minimal, en secondes, entre deux comparaisons avec l'état de la base.
+MATRICE_RESULTATS_VERIFICATION = 5
+# Instantané binaire partagé par tous les workers (myApplication.instantane_resultats),
+# projeté en mémoire en lecture seule. None : une matrice par processus (d'office sous Windows,
+# où un fichier projeté en mémoire ne peut pas être remplacé).
+MATRICE_RESULTATS_INSTANTANE = VAR_DIR / 'matrice_resultats.bin' if os.name != 'nt' else None
+
+# Compteurs de la page d'accueil (myApplication.compteurs) : recomptage complet en base
+# au plus toutes les COMPTEURS_ACCUEIL_RECONCILIATION secondes.
+COMPTEURS_ACCUEIL_RECONCILIATION = 300
+
+# Projection du résultat final (myApplication.projections) : réplications bootstrap
+# des intervalles de confiance.
+PROJECTION_REPLICATIONS = 2000
+
+# Tableau de bord général : intervalle, en secondes, entre deux vérifications des sections
+# par le navigateur (seules les sections modifiées sont rechargées).
+DASHBOARD_RAFRAICHISSEMENT = 30
+
+# Rapports PDF (myApplication.rapports_pdf) : 'weasyprint' (gabarit export_pdf.html, rapports par
+# département, sous-préfecture ou centre) ou 'reportlab'. ReportLab est utilisé d'office si
+# WeasyPrint ou ses bibliothèques système sont absents.
+PDF_MOTEUR = 'weasyprint'
+
+# Certificats de résultats par bureau (myApplication.certificats, commande generer_certificats) :
+# un PDF par bureau dans CERTIFICATS_DIR, rendus par CERTIFICATS_PROCESSUS processus
+# (None : un par CPU). Seuls les bureaux dont les données ont changé sont refaits.
+CERTIFICATS_DIR = VAR_DIR / 'certificats'
+CERTIFICATS_PROCESSUS = None
+
+# Flux des changements de PV (myApplication.changements) : les changements plus récents que
+# CHANGEMENTS_MARGE secondes ne sont pas encore servis (transactions en cours de validation).
+CHANGEMENTS_MARGE = 5
+
+# Boîte d'envoi des changements de résultats (myApplication.outbox, commande consommer_evenements) :
+# nombre d'événements traités par transaction de consommateur.
+OUTBOX_TAILLE_LOT = 500
+
+# Historique des résultats (myApplication.historique, commande historiser_resultats) : un instantané
+# de base (tous les bureaux) tous les HISTORIQUE_BASE instantanés, les autres ne gardant que les
+# bureaux modifiés.
+HISTORIQUE_BASE = 24
@@ -1,76 +1,209 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.html import format_html
-from django.db.models import Sum
-from django.http import HttpResponse
-import csv
-from datetime import datetime
+import copy
+import json
+from django.db.models import Sum, Count, Exists, OuterRef, F, Case, When, Value, FloatField, ExpressionWrapper
 
 # IMPORT CORRIGÉ : RelevéHoraire avec accent
 from .models import (
     Departement, SousPrefecture, CentreVote,
-    BureauVote, User, ProcesVerbal, ResultatCandidat, RelevéHoraire
+    BureauVote, User, ProcesVerbal, ResultatCandidat, RelevéHoraire,
+    OperationSynchronisation, AuditLog, ReservationVerification, AnomaliePV,
+    RapprochementReleves, HistoriqueResultats
 )
+from .audit import journaliser, journaliser_modification
+from .archive_photos import flux_archive
+from .certificats import flux_zip, preparer
+from .exports import Colonne, ExportStreamingMixin
+from .historique import historiser
+
+
+def _nom_complet(prenom, nom):
+    return f"{prenom or ''} {nom or ''}".strip()
+
+
+def _pourcentage(valeur, total):
+    return round(valeur / total * 100, 2) if total else 0
+
+
+# Relations utilisées par __str__ de chaque modèle : à charger avec select_related
+# pour afficher une liste sans requête par ligne
+RELATIONS_STR = {
+    SousPrefecture: ['departement'],
+    CentreVote: ['sous_prefecture'],
+    BureauVote: ['centre_vote'],
+    User: ['bureau_vote__centre_vote'],
+}
+
+
+class ChoixHierarchieFilter(admin.RelatedFieldListFilter):
+    """Filtre sur une clé étrangère dont les choix sont chargés en une seule requête"""
+
+    def field_choices(self, field, request, model_admin):
+        queryset = field.related_model._default_manager.select_related(
+            *RELATIONS_STR.get(field.related_model, [])
+        ).complex_filter(field.get_limit_choices_to())
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return [(obj.pk, str(obj)) for obj in queryset]
+
+
+class AuditAdminMixin:
+    """Journalise les ajouts, modifications et suppressions faits depuis l'admin"""
+
+    def save_model(self, request, obj, form, change):
+        ancien = type(obj).objects.filter(pk=obj.pk).first() if change else None
+        super().save_model(request, obj, form, change)
+        journaliser_modification(request.user, ancien, obj, request)
+
+    def delete_model(self, request, obj):
+        journaliser(request.user, 'DELETE', obj, request=request)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            journaliser(request.user, 'DELETE', obj, request=request)
+        super().delete_queryset(request, queryset)
+
+    def save_formset(self, request, form, formset, change):
+        # Lignes des inlines (résultats des candidats d'un PV)
+        anciens = {
+            obj.pk: obj
+            for obj in formset.model.objects.filter(
+                pk__in=[f.instance.pk for f in formset.forms if f.instance.pk]
+            )
+        }
+        supprimes = [f.instance for f in formset.deleted_forms if f.instance.pk]
+        for obj in supprimes:
+            journaliser(request.user, 'DELETE', obj, request=request)
+
+        super().save_formset(request, form, formset, change)
+
+        for obj in formset.new_objects:
+            journaliser_modification(request.user, None, obj, request)
+        for obj, _ in formset.changed_objects:
+            journaliser_modification(request.user, anciens.get(obj.pk), obj, request)
 
 
 @admin.register(Departement)
-class DepartementAdmin(admin.ModelAdmin):
+class DepartementAdmin(AuditAdminMixin, admin.ModelAdmin):
     list_display = ['nom', 'code', 'nombre_sous_prefectures']
     search_fields = ['nom', 'code']
+    actions = ['historiser_resultats']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(nb_sous_prefectures=Count('sous_prefectures'))
 
     def nombre_sous_prefectures(self, obj):
-        return obj.sous_prefectures.count()
+        return obj.nb_sous_prefectures
     nombre_sous_prefectures.short_description = "Sous-préfectures"
+    nombre_sous_prefectures.admin_order_field = 'nb_sous_prefectures'
+
+    def historiser_resultats(self, request, queryset):
+        crees = sum(historiser(departement, forcer=True)[1] for departement in queryset)
+        self.message_user(request, f"{crees} instantané(s) des résultats enregistré(s).")
+    historiser_resultats.short_description = "📸 Enregistrer un instantané des résultats"
 
 
 @admin.register(SousPrefecture)
-class SousPrefectureAdmin(admin.ModelAdmin):
+class SousPrefectureAdmin(AuditAdminMixin, admin.ModelAdmin):
     list_display = ['nom', 'departement', 'nombre_centres']
     list_filter = ['departement']
+    list_select_related = ['departement']
     search_fields = ['nom', 'departement__nom']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(nb_centres=Count('centres_vote'))
+
     def nombre_centres(self, obj):
-        return obj.centres_vote.count()
+        return obj.nb_centres
     nombre_centres.short_description = "Centres de vote"
+    nombre_centres.admin_order_field = 'nb_centres'
 
 
 @admin.register(CentreVote)
-class CentreVoteAdmin(admin.ModelAdmin):
+class CentreVoteAdmin(AuditAdminMixin, admin.ModelAdmin):
     list_display = ['nom', 'sous_prefecture', 'departement', 'nombre_bureaux']
-    list_filter = ['sous_prefecture__departement', 'sous_prefecture']
+    list_filter = ['sous_prefecture__departement', ('sous_prefecture', ChoixHierarchieFilter)]
+    list_select_related = ['sous_prefecture__departement']
     search_fields = ['nom', 'sous_prefecture__nom']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(nb_bureaux=Count('bureaux'))
+
     def departement(self, obj):
         return obj.sous_prefecture.departement.nom
     departement.short_description = "Département"
+    departement.admin_order_field = 'sous_prefecture__departement__nom'
 
     def nombre_bureaux(self, obj):
-        return obj.bureaux.count()
+        return obj.nb_bureaux
     nombre_bureaux.short_description = "Bureaux"
+    nombre_bureaux.admin_order_field = 'nb_bureaux'
 
 
 @admin.register(BureauVote)
-class BureauVoteAdmin(admin.ModelAdmin):
+class BureauVoteAdmin(AuditAdminMixin, ExportStreamingMixin, admin.ModelAdmin):
     list_display = ['numero', 'centre_vote', 'sous_prefecture', 'nombre_inscrits', 'pv_saisi']
-    list_filter = ['centre_vote__sous_prefecture__departement', 'centre_vote__sous_prefecture']
+    list_filter = [
+        'centre_vote__sous_prefecture__departement',
+        ('centre_vote__sous_prefecture', ChoixHierarchieFilter),
+    ]
+    list_select_related = ['centre_vote__sous_prefecture']
     search_fields = ['numero', 'centre_vote__nom']
 
+    export_nom = 'bureaux_vote'
+    export_colonnes = [
+        Colonne('Département', 'centre_vote__sous_prefecture__departement__nom'),
+        Colonne('Sous-préfecture', 'centre_vote__sous_prefecture__nom'),
+        Colonne('Centre de vote', 'centre_vote__nom'),
+        Colonne('Bureau', 'numero'),
+        Colonne("Nombre d'inscrits", 'nombre_inscrits'),
+        Colonne('PV saisi', 'proces_verbal__id', lambda pv_id: pv_id is not None),
+        Colonne('PV vérifié', 'proces_verbal__verifie'),
+    ]
+    actions = ExportStreamingMixin.actions + ['telecharger_certificats']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            a_pv=Exists(ProcesVerbal.objects.filter(bureau_vote=OuterRef('pk')))
+        )
+
+    def telecharger_certificats(self, request, queryset):
+        donnees = preparer(queryset)
+        if not donnees:
+            self.message_user(request, "Aucun des bureaux sélectionnés n'a de PV saisi.", messages.WARNING)
+            return None
+        # Les certificats sont ajoutés à l'archive dès qu'un processus du pool les a rendus
+        response = StreamingHttpResponse(flux_zip(donnees), content_type='application/zip')
+        response['Content-Disposition'] = (
+            f'attachment; filename="certificats_{timezone.now().strftime("%Y%m%d_%H%M%S")}.zip"'
+        )
+        return response
+    telecharger_certificats.short_description = "📄 Télécharger les certificats de résultats (ZIP)"
+
     def sous_prefecture(self, obj):
         return obj.centre_vote.sous_prefecture.nom
     sous_prefecture.short_description = "Sous-préfecture"
+    sous_prefecture.admin_order_field = 'centre_vote__sous_prefecture__nom'
 
     def pv_saisi(self, obj):
-        pv = obj.get_proces_verbal()
-        if pv:
+        if obj.a_pv:
             return format_html('<span style="color: green;">✓ PV saisi</span>')
         return format_html('<span style="color: red;">✗ Aucun PV</span>')
     pv_saisi.short_description = "Statut"
+    pv_saisi.admin_order_field = 'a_pv'
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(AuditAdminMixin, BaseUserAdmin):
     list_display = ['username', 'email', 'first_name', 'last_name', 'role', 'numero_candidat', 'parti_politique', 'bureau_affecte', 'is_active']
     list_filter = ['role', 'is_active', 'is_staff']
+    list_select_related = ['bureau_vote__centre_vote']
     search_fields = ['username', 'first_name', 'last_name', 'email', 'telephone', 'parti_politique']
     ordering = ['numero_candidat', 'first_name']
 
@@ -93,6 +226,7 @@ class UserAdmin(BaseUserAdmin):
             return format_html('<span style="color: orange;">⚠ Non affecté</span>')
         return '-'
     bureau_affecte.short_description = "Bureau affecté"
+    bureau_affecte.admin_order_field = 'bureau_vote__centre_vote__nom'
 
 
 class ResultatCandidatInline(admin.TabularInline):
@@ -108,23 +242,74 @@ class ResultatCandidatInline(admin.TabularInline):
     pourcentage.short_description = "% des voix"
 
 
+class AnomaliePVInline(admin.TabularInline):
+    model = AnomaliePV
+    extra = 0
+    fields = ['type_anomalie', 'message', 'date_detection', 'resolue']
+    readonly_fields = ['type_anomalie', 'message', 'date_detection']
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class AnomaliesOuvertesFilter(admin.SimpleListFilter):
+    title = 'anomalies'
+    parameter_name = 'anomalies'
+
+    def lookups(self, request, model_admin):
+        return [('ouvertes', 'Anomalies à examiner'), ('aucune', 'Aucune anomalie ouverte')]
+
+    def queryset(self, request, queryset):
+        ouvertes = Exists(AnomaliePV.objects.filter(proces_verbal=OuterRef('pk'), resolue=False))
+        if self.value() == 'ouvertes':
+            return queryset.filter(ouvertes)
+        if self.value() == 'aucune':
+            return queryset.exclude(ouvertes)
+        return queryset
+
+
 @admin.register(ProcesVerbal)
-class ProcesVerbalAdmin(admin.ModelAdmin):
+class ProcesVerbalAdmin(AuditAdminMixin, ExportStreamingMixin, admin.ModelAdmin):
     list_display = [
         'bureau_vote', 'nombre_votants', 'bulletins_nuls', 'bulletins_blancs',
         'suffrages_exprimes', 'representant', 'verifie', 'apercu_photo', 'date_saisie'
     ]
     list_filter = [
-        'verifie', 'date_saisie',
-        'bureau_vote__centre_vote__sous_prefecture__departement',
-        'bureau_vote__centre_vote__sous_prefecture'
+        'verifie', 'rejete', AnomaliesOuvertesFilter, 'date_saisie',
+        'departement',
+        ('sous_prefecture', ChoixHierarchieFilter)
     ]
+    list_select_related = ['bureau_vote__centre_vote', 'representant__bureau_vote__centre_vote']
     search_fields = [
         'bureau_vote__numero', 'bureau_vote__centre_vote__nom',
         'representant__first_name', 'representant__last_name'
     ]
-    readonly_fields = ['date_saisie', 'date_modification', 'apercu_photo_large', 'taux_participation', 'taux_nuls']
-    inlines = [ResultatCandidatInline]
+    readonly_fields = [
+        'date_saisie', 'date_modification', 'apercu_photo_large', 'taux_participation', 'taux_nuls',
+        'verifie_par', 'date_verification'
+    ]
+    inlines = [ResultatCandidatInline, AnomaliePVInline]
+
+    export_nom = 'proces_verbaux'
+    export_colonnes = [
+        Colonne('Département', 'bureau_vote__centre_vote__sous_prefecture__departement__nom'),
+        Colonne('Sous-préfecture', 'bureau_vote__centre_vote__sous_prefecture__nom'),
+        Colonne('Centre de vote', 'bureau_vote__centre_vote__nom'),
+        Colonne('Bureau', 'bureau_vote__numero'),
+        Colonne('Inscrits', 'bureau_vote__nombre_inscrits'),
+        Colonne('Votants', 'nombre_votants'),
+        Colonne('Nuls', 'bulletins_nuls'),
+        Colonne('Blancs', 'bulletins_blancs'),
+        Colonne('Exprimés', 'suffrages_exprimes'),
+        Colonne('Taux de participation (%)', ('nombre_votants', 'bureau_vote__nombre_inscrits'), _pourcentage),
+        Colonne('Vérifié', 'verifie'),
+        Colonne('Représentant', ('representant__first_name', 'representant__last_name'), _nom_complet),
+        Colonne('Date de saisie', 'date_saisie'),
+        Colonne('Dernière modification', 'date_modification'),
+        Colonne('Observations', 'observations'),
+    ]
+    actions = ExportStreamingMixin.actions + ['telecharger_photos']
 
     fieldsets = (
         ('Bureau de vote', {
@@ -141,7 +326,7 @@ class ProcesVerbalAdmin(admin.ModelAdmin):
             'fields': ('photo_pv', 'apercu_photo_large')
         }),
         ('Validation', {
-            'fields': ('verifie', 'observations')
+            'fields': ('verifie', 'rejete', 'motif_rejet', 'verifie_par', 'date_verification', 'observations')
         }),
         ('Métadonnées', {
             'fields': ('date_saisie', 'date_modification'),
@@ -167,6 +352,17 @@ class ProcesVerbalAdmin(admin.ModelAdmin):
         return 'Aucune photo'
     apercu_photo_large.short_description = "Aperçu du procès-verbal"
 
+    def telecharger_photos(self, request, queryset):
+        # Photos lues par morceaux et manifeste ajouté en fin d'archive
+        response = StreamingHttpResponse(
+            flux_archive(ProcesVerbal.objects.filter(pk__in=queryset.values('pk'))), content_type='application/zip'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="photos_pv_{timezone.now().strftime("%Y%m%d_%H%M%S")}.zip"'
+        )
+        return response
+    telecharger_photos.short_description = "🖼️ Télécharger les photos avec manifeste (ZIP)"
+
     def taux_participation(self, obj):
         return f"{obj.get_taux_participation()}%"
     taux_participation.short_description = "Taux de participation"
@@ -177,14 +373,15 @@ class ProcesVerbalAdmin(admin.ModelAdmin):
 
 
 @admin.register(ResultatCandidat)
-class ResultatCandidatAdmin(admin.ModelAdmin):
+class ResultatCandidatAdmin(AuditAdminMixin, ExportStreamingMixin, admin.ModelAdmin):
     list_display = ['candidat', 'bureau', 'nombre_voix', 'pourcentage', 'verifie', 'date_saisie']
     list_filter = [
         'proces_verbal__verifie',
-        'candidat',
+        ('candidat', ChoixHierarchieFilter),
         'proces_verbal__date_saisie',
-        'proces_verbal__bureau_vote__centre_vote__sous_prefecture__departement'
+        'departement'
     ]
+    list_select_related = ['candidat', 'proces_verbal__bureau_vote__centre_vote']
     search_fields = [
         'candidat__first_name', 'candidat__last_name',
         'proces_verbal__bureau_vote__numero',
@@ -192,23 +389,54 @@ class ResultatCandidatAdmin(admin.ModelAdmin):
     ]
     readonly_fields = ['pourcentage', 'date_saisie']
 
+    export_nom = 'resultats_candidats'
+    export_colonnes = [
+        Colonne('Sous-préfecture', 'proces_verbal__bureau_vote__centre_vote__sous_prefecture__nom'),
+        Colonne('Centre de vote', 'proces_verbal__bureau_vote__centre_vote__nom'),
+        Colonne('Bureau', 'proces_verbal__bureau_vote__numero'),
+        Colonne('N° candidat', 'candidat__numero_candidat'),
+        Colonne('Candidat', ('candidat__first_name', 'candidat__last_name'), _nom_complet),
+        Colonne('Parti politique', 'candidat__parti_politique'),
+        Colonne('Voix', 'nombre_voix'),
+        Colonne('Suffrages exprimés', 'proces_verbal__suffrages_exprimes'),
+        Colonne('% des suffrages exprimés', ('nombre_voix', 'proces_verbal__suffrages_exprimes'), _pourcentage),
+        Colonne('PV vérifié', 'proces_verbal__verifie'),
+    ]
+
+    def get_queryset(self, request):
+        # Pourcentage calculé en SQL pour permettre le tri sur la colonne
+        return super().get_queryset(request).annotate(
+            pourcentage_voix=Case(
+                When(proces_verbal__suffrages_exprimes=0, then=Value(0.0)),
+                default=ExpressionWrapper(
+                    F('nombre_voix') * 100.0 / F('proces_verbal__suffrages_exprimes'),
+                    output_field=FloatField()
+                ),
+                output_field=FloatField()
+            )
+        )
+
     def bureau(self, obj):
         return obj.proces_verbal.bureau_vote
     bureau.short_description = "Bureau de vote"
+    bureau.admin_order_field = 'proces_verbal__bureau_vote__centre_vote__nom'
 
     def pourcentage(self, obj):
         return f"{obj.get_pourcentage()}%"
     pourcentage.short_description = "% des suffrages exprimés"
+    pourcentage.admin_order_field = 'pourcentage_voix'
 
     def verifie(self, obj):
         if obj.proces_verbal.verifie:
             return format_html('<span style="color: green;">✓ Vérifié</span>')
         return format_html('<span style="color: orange;">⏳ En attente</span>')
     verifie.short_description = "Statut"
+    verifie.admin_order_field = 'proces_verbal__verifie'
 
     def date_saisie(self, obj):
         return obj.proces_verbal.date_saisie
     date_saisie.short_description = "Date de saisie"
+    date_saisie.admin_order_field = 'proces_verbal__date_saisie'
 
 
 # ========================================
@@ -216,7 +444,7 @@ class ResultatCandidatAdmin(admin.ModelAdmin):
 # ========================================
 
 @admin.register(RelevéHoraire)
-class ReleveHoraireAdmin(admin.ModelAdmin):
+class ReleveHoraireAdmin(AuditAdminMixin, ExportStreamingMixin, admin.ModelAdmin):
     """Administration des relevés horaires de participation"""
 
     list_display = [
@@ -232,11 +460,13 @@ class ReleveHoraireAdmin(admin.ModelAdmin):
 
     list_filter = [
         'heure_releve',
-        'bureau_vote__centre_vote__sous_prefecture__departement',
-        'bureau_vote__centre_vote__sous_prefecture',
-        'bureau_vote__centre_vote',
+        'departement',
+        ('sous_prefecture', ChoixHierarchieFilter),
+        ('centre_vote', ChoixHierarchieFilter),
     ]
 
+    list_select_related = ['bureau_vote__centre_vote__sous_prefecture', 'representant']
+
     search_fields = [
         'bureau_vote__numero',
         'bureau_vote__centre_vote__nom',
@@ -269,6 +499,25 @@ class ReleveHoraireAdmin(admin.ModelAdmin):
     ordering = ['-heure_releve']
     list_per_page = 50
 
+    export_nom = 'releves_horaires'
+    export_colonnes = [
+        Colonne('Date', 'heure_releve', lambda heure: timezone.localtime(heure).strftime('%d/%m/%Y')),
+        Colonne('Heure', 'heure_releve', lambda heure: timezone.localtime(heure).strftime('%H:%M')),
+        Colonne('Bureau', 'bureau_vote__numero', lambda numero: f"Bureau {numero}"),
+        Colonne('Centre de vote', 'bureau_vote__centre_vote__nom'),
+        Colonne('Sous-préfecture', 'bureau_vote__centre_vote__sous_prefecture__nom'),
+        Colonne('Département', 'bureau_vote__centre_vote__sous_prefecture__departement__nom'),
+        Colonne('Nombre de votants', 'nombre_votants'),
+        Colonne("Nombre d'inscrits", 'bureau_vote__nombre_inscrits'),
+        Colonne(
+            'Taux de participation (%)',
+            ('nombre_votants', 'bureau_vote__nombre_inscrits'),
+            lambda votants, inscrits: f"{_pourcentage(votants, inscrits):.2f}"
+        ),
+        Colonne('Représentant', ('representant__first_name', 'representant__last_name'), _nom_complet),
+        Colonne('Observations', 'observations'),
+    ]
+
     # ========================================
     # MÉTHODES D'AFFICHAGE PERSONNALISÉES
     # ========================================
@@ -339,62 +588,145 @@ class ReleveHoraireAdmin(admin.ModelAdmin):
         return "-"
     observations_courtes.short_description = "Observations"
 
-    # ========================================
-    # ACTION PERSONNALISÉE : EXPORT CSV
-    # ========================================
 
-    actions = ['exporter_releves_csv']
+@admin.register(OperationSynchronisation)
+class OperationSynchronisationAdmin(admin.ModelAdmin):
+    """Journal des opérations reçues des clients hors ligne"""
+    list_display = ['op_id', 'utilisateur', 'type_operation', 'statut', 'date_reception']
+    list_filter = ['type_operation', 'statut', 'date_reception']
+    search_fields = ['op_id', 'utilisateur__username', 'utilisateur__first_name', 'utilisateur__last_name']
+    list_select_related = ['utilisateur__bureau_vote__centre_vote']
+    readonly_fields = ['op_id', 'utilisateur', 'type_operation', 'statut', 'reponse', 'date_reception']
+    date_hierarchy = 'date_reception'
 
-    def exporter_releves_csv(self, request, queryset):
-        """Exporte les relevés sélectionnés en CSV"""
+    def has_add_permission(self, request):
+        return False
 
-        # Créer la réponse HTTP
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = f'attachment; filename="releves_horaires_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+    def has_change_permission(self, request, obj=None):
+        return False
 
-        # Ajouter le BOM UTF-8 pour Excel
-        response.write('\ufeff')
 
-        writer = csv.writer(response, delimiter=';')
+@admin.register(ReservationVerification)
+class ReservationVerificationAdmin(admin.ModelAdmin):
+    """PV actuellement réservés dans la file de vérification"""
+    list_display = ['proces_verbal', 'verificateur', 'date_reservation', 'expiration']
+    list_filter = [('verificateur', ChoixHierarchieFilter)]
+    list_select_related = ['proces_verbal__bureau_vote__centre_vote', 'verificateur']
+    readonly_fields = ['proces_verbal', 'verificateur', 'date_reservation', 'expiration']
 
-        # En-têtes
-        writer.writerow([
-            'Date',
-            'Heure',
-            'Bureau',
-            'Centre de vote',
-            'Sous-préfecture',
-            'Département',
-            'Nombre de votants',
-            'Nombre d\'inscrits',
-            'Taux de participation (%)',
-            'Représentant',
-            'Observations'
-        ])
-
-        # Données
-        for releve in queryset.select_related(
-                'bureau_vote__centre_vote__sous_prefecture__departement',
-                'representant'
-        ).order_by('-heure_releve'):
-
-            writer.writerow([
-                releve.heure_releve.strftime('%d/%m/%Y'),
-                releve.heure_releve.strftime('%H:%M'),
-                f"Bureau {releve.bureau_vote.numero}",
-                releve.bureau_vote.centre_vote.nom,
-                releve.bureau_vote.centre_vote.sous_prefecture.nom,
-                releve.bureau_vote.centre_vote.sous_prefecture.departement.nom,
-                releve.nombre_votants,
-                releve.bureau_vote.nombre_inscrits,
-                f"{releve.get_taux_participation():.2f}",
-                releve.representant.get_full_name() if releve.representant else "",
-                releve.observations or ""
-            ])
+    def has_add_permission(self, request):
+        return False
 
-        return response
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AnomaliePV)
+class AnomaliePVAdmin(AuditAdminMixin, admin.ModelAdmin):
+    """Anomalies détectées par l'analyse statistique des PV (commande analyser_anomalies)"""
+    list_display = ['proces_verbal', 'type_anomalie', 'message', 'resolue', 'resolue_par', 'date_detection']
+    list_filter = [
+        'resolue', 'type_anomalie',
+        ('proces_verbal__sous_prefecture', ChoixHierarchieFilter)
+    ]
+    list_select_related = ['proces_verbal__bureau_vote__centre_vote', 'resolue_par']
+    search_fields = ['proces_verbal__bureau_vote__numero', 'proces_verbal__bureau_vote__centre_vote__nom']
+    readonly_fields = [
+        'proces_verbal', 'type_anomalie', 'valeur', 'reference', 'message', 'date_detection', 'resolue_par'
+    ]
+    actions = ['marquer_resolues']
+
+    def has_add_permission(self, request):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        obj.resolue_par = request.user if obj.resolue else None
+        super().save_model(request, obj, form, change)
+
+    def marquer_resolues(self, request, queryset):
+        anomalies = list(queryset.filter(resolue=False))
+        for anomalie in anomalies:
+            ancienne = copy.copy(anomalie)
+            anomalie.resolue = True
+            anomalie.resolue_par = request.user
+            journaliser_modification(request.user, ancienne, anomalie, request)
+        AnomaliePV.objects.bulk_update(anomalies, ['resolue', 'resolue_par'])
+        self.message_user(request, f"{len(anomalies)} anomalie(s) marquée(s) comme résolue(s).")
+    marquer_resolues.short_description = "✓ Marquer comme résolues"
+
+
+@admin.register(RapprochementReleves)
+class RapprochementRelevesAdmin(admin.ModelAdmin):
+    """Rapprochement des relevés horaires avec les PV (commande rapprocher_releves)"""
+    list_display = [
+        'bureau_vote', 'nombre_releves', 'votants_dernier_releve', 'votants_pv', 'ecart_pv',
+        'nombre_baisses', 'nombre_sauts', 'saut_max', 'anomalie', 'date_calcul'
+    ]
+    list_filter = [
+        'anomalie', 'ecart_pv_anormal',
+        ('bureau_vote__centre_vote__sous_prefecture', ChoixHierarchieFilter)
+    ]
+    list_select_related = ['bureau_vote__centre_vote']
+    search_fields = ['bureau_vote__numero', 'bureau_vote__centre_vote__nom']
+    readonly_fields = [field.name for field in RapprochementReleves._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(HistoriqueResultats)
+class HistoriqueResultatsAdmin(admin.ModelAdmin):
+    """Instantanés immuables des résultats (commande historiser_resultats)"""
+    list_display = ['departement', 'date', 'complet', 'nombre_bureaux', 'identifiant']
+    list_filter = ['departement', 'complet']
+    list_select_related = ['departement']
+    date_hierarchy = 'date'
+    readonly_fields = ['identifiant', 'departement', 'date', 'precedent', 'complet', 'nombre_bureaux', 'empreinte', 'totaux']
+    exclude = ['bureaux', 'candidats']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AuditLog)
+class AuditLogAdmin(ExportStreamingMixin, admin.ModelAdmin):
+    """Consultation du journal d'audit (lecture seule)"""
+    list_display = ['timestamp', 'user', 'action', 'model_name', 'object_id', 'ip_address']
+    list_filter = ['action', 'model_name', 'timestamp']
+    search_fields = ['user__username', 'user__first_name', 'user__last_name', 'object_repr', 'ip_address']
+    list_select_related = ['user__bureau_vote__centre_vote']
+    readonly_fields = ['timestamp', 'user', 'action', 'model_name', 'object_id', 'object_repr', 'changes', 'ip_address', 'user_agent']
+    date_hierarchy = 'timestamp'
+
+    export_nom = 'journal_audit'
+    export_colonnes = [
+        Colonne('Date', 'timestamp'),
+        Colonne('Utilisateur', 'user__username'),
+        Colonne('Action', 'action'),
+        Colonne('Modèle', 'model_name'),
+        Colonne('Objet', 'object_id'),
+        Colonne('Description', 'object_repr'),
+        Colonne('Changements', 'changes', lambda changes: json.dumps(changes, ensure_ascii=False) if changes else ''),
+        Colonne('Adresse IP', 'ip_address'),
+    ]
+
+    def has_add_permission(self, request):
+        return False  # Les logs ne peuvent pas être créés manuellement
+
+    def has_change_permission(self, request, obj=None):
+        return False  # Les logs ne peuvent pas être modifiés
 
-    exporter_releves_csv.short_description = "📥 Exporter en CSV (Excel)"
+    def has_delete_permission(self, request, obj=None):
+        return False  # Les logs ne peuvent pas être supprimés
 
 
 # Personnalisation du site admin
@@ -0,0 +1,282 @@
+"""
+Détection statistique d'anomalies sur les procès-verbaux, par lots
+
+Les contrôles portent sur tous les bureaux à la fois, à partir de la matrice
+des résultats (tableaux NumPy) :
+
+- participation atypique : écart robuste (médiane / MAD) au centre de vote,
+  ou à la sous-préfecture si le centre compte trop peu de PV ;
+- participation de 100 % ;
+- voix concentrées sur un seul candidat ;
+- taux de bulletins nuls atypique dans la sous-préfecture ;
+- derniers chiffres des voix non uniformes dans un centre (test du χ²) ;
+- relevés horaires qui dépassent le nombre de votants du PV.
+
+L'analyse est incrémentale : seuls les PV modifiés depuis leur dernière analyse
+(date_analyse_anomalies), et les autres PV de leurs centres dont les références
+ont changé, sont réévalués. Les anomalies sont écrites dans AnomaliePV, une
+ligne par PV et par type.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .matrice_resultats import get_matrice
+from .models import AnomaliePV, ProcesVerbal, RelevéHoraire
+
+# Écart robuste (en MAD normalisés) au-delà duquel un taux est atypique
+SEUIL_ECART_ROBUSTE = 3.5
+# Écarts absolus minimaux, pour ne pas signaler des groupes très homogènes
+ECART_PARTICIPATION_MIN = 0.10
+ECART_NULS_MIN = 0.05
+# Nombre de PV d'un centre à partir duquel le centre sert de référence
+PV_MIN_CENTRE = 4
+
+# Part des suffrages exprimés d'un seul candidat, et suffrages minimaux pour la mesurer
+PART_UNANIME = 0.95
+EXPRIMES_MIN_UNANIME = 50
+
+# Derniers chiffres : voix prises en compte, nombre de voix par centre, χ² à 9 ddl (p = 0,001)
+VOIX_MIN_CHIFFRE = 10
+VOIX_MIN_TEST_CHIFFRES = 50
+KHI2_CRITIQUE_CHIFFRES = 27.877
+
+# Taille des lots d'identifiants dans les requêtes d'écriture
+LOT_ECRITURE = 2000
+
+
+def _medianes(groupes, valeurs, nb_groupes):
+    """Médiane des valeurs de chaque groupe (NaN pour un groupe vide)"""
+    ordre = np.lexsort((valeurs, groupes))
+    valeurs_triees = valeurs[ordre]
+    comptes = np.bincount(groupes, minlength=nb_groupes)
+    debuts = np.cumsum(comptes) - comptes
+    medianes = np.full(nb_groupes, np.nan)
+    non_vides = comptes > 0
+    bas = debuts[non_vides] + (comptes[non_vides] - 1) // 2
+    haut = debuts[non_vides] + comptes[non_vides] // 2
+    medianes[non_vides] = (valeurs_triees[bas] + valeurs_triees[haut]) / 2
+    return medianes
+
+
+def _ecarts_robustes(taux, groupes, nb_groupes, references):
+    """
+    Écart de chaque taux à sa référence, en MAD normalisés du groupe
+
+    Returns:
+        np.ndarray: Écarts (0 là où la dispersion du groupe est nulle)
+    """
+    medianes = _medianes(groupes, taux, nb_groupes)
+    mad = _medianes(groupes, np.abs(taux - medianes[groupes]), nb_groupes) * 1.4826
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ecarts = (taux - references) / mad[groupes]
+    return np.nan_to_num(ecarts, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def detecter(matrice, lignes, maxima_releves):
+    """
+    Anomalies des bureaux donnés, mesurées par rapport à tous les PV de la matrice
+
+    Chaque contrôle est un masque calculé sur tous les PV à la fois ; seules les
+    lignes signalées sont ensuite converties en tuples.
+
+    Args:
+        matrice: MatriceResultats
+        lignes: Positions des bureaux à évaluer (bureaux avec PV)
+        maxima_releves: dict {bureau_id: plus grand nombre de votants relevé}
+
+    Returns:
+        list: Tuples (position du bureau, type, valeur, référence, message)
+    """
+    avec_pv = np.flatnonzero(matrice.a_pv)
+    centre = matrice.indices['centre'][avec_pv]
+    sous_prefecture = matrice.indices['sous_prefecture'][avec_pv]
+    nb_centres = len(matrice.libelles['centre']['ids'])
+    nb_sp = len(matrice.libelles['sous_prefecture']['ids'])
+
+    inscrits = matrice.inscrits[avec_pv].astype(np.float64)
+    votants = matrice.votants[avec_pv].astype(np.float64)
+    exprimes = matrice.exprimes[avec_pv].astype(np.float64)
+    # Participation mesurée seulement là où le bureau a des inscrits
+    mesurable = inscrits > 0
+    participation = np.divide(votants, inscrits, out=np.zeros_like(votants), where=mesurable)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nuls = np.nan_to_num(matrice.nuls[avec_pv] / votants)
+        # Part du premier candidat dans la somme des voix (indépendante d'une erreur sur les exprimés)
+        part_max = np.nan_to_num(matrice.voix[avec_pv].max(axis=1, initial=0) / matrice.voix[avec_pv].sum(axis=1))
+
+    # Participation : référence du centre s'il a assez de PV, sinon de la sous-préfecture.
+    # Les bureaux sans inscrits n'entrent ni dans les références ni dans les écarts.
+    pv_par_centre = np.bincount(centre[mesurable], minlength=nb_centres)
+    references = np.where(
+        pv_par_centre[centre] >= PV_MIN_CENTRE,
+        _medianes(centre[mesurable], participation[mesurable], nb_centres)[centre],
+        _medianes(sous_prefecture[mesurable], participation[mesurable], nb_sp)[sous_prefecture]
+    )
+    ecarts_participation = np.zeros(len(avec_pv))
+    ecarts_participation[mesurable] = _ecarts_robustes(
+        participation[mesurable], sous_prefecture[mesurable], nb_sp, references[mesurable]
+    )
+
+    reference_nuls = _medianes(sous_prefecture, nuls, nb_sp)[sous_prefecture]
+    ecarts_nuls = _ecarts_robustes(nuls, sous_prefecture, nb_sp, reference_nuls)
+
+    # Derniers chiffres des voix, par centre
+    voix = matrice.voix[avec_pv]
+    comptees = voix >= VOIX_MIN_CHIFFRE
+    chiffres = np.bincount(
+        (np.repeat(centre, voix.shape[1]) * 10 + (voix % 10).ravel())[comptees.ravel()],
+        minlength=nb_centres * 10
+    ).reshape(nb_centres, 10)
+    voix_testees = chiffres.sum(axis=1)
+    attendus = np.maximum(voix_testees, 1)[:, None] / 10
+    khi2 = ((chiffres - attendus) ** 2 / attendus).sum(axis=1)
+    centres_suspects = (voix_testees >= VOIX_MIN_TEST_CHIFFRES) & (khi2 > KHI2_CRITIQUE_CHIFFRES)
+
+    selection = np.isin(avec_pv, lignes)
+    bureau_ids = matrice.libelles['bureau']['ids'][avec_pv]
+    maximum_releve = np.array([maxima_releves.get(int(b), -1) for b in bureau_ids], dtype=np.float64)
+
+    controles = [
+        (
+            'participation_atypique',
+            mesurable
+            & (np.abs(ecarts_participation) > SEUIL_ECART_ROBUSTE)
+            & (np.abs(participation - references) > ECART_PARTICIPATION_MIN),
+            participation * 100, references * 100,
+            lambda i: f"Participation {participation[i]:.1%} pour {references[i]:.1%} attendus",
+        ),
+        (
+            'participation_totale',
+            (inscrits > 0) & (votants >= inscrits),
+            participation * 100, np.full(len(avec_pv), 100.0),
+            lambda i: f"{int(votants[i])} votants pour {int(inscrits[i])} inscrits",
+        ),
+        (
+            'vote_unanime',
+            (exprimes >= EXPRIMES_MIN_UNANIME) & (part_max >= PART_UNANIME),
+            part_max * 100, np.full(len(avec_pv), PART_UNANIME * 100),
+            lambda i: f"Un candidat obtient {part_max[i]:.1%} des suffrages exprimés",
+        ),
+        (
+            'nuls_atypiques',
+            (ecarts_nuls > SEUIL_ECART_ROBUSTE) & (nuls - reference_nuls > ECART_NULS_MIN),
+            nuls * 100, reference_nuls * 100,
+            lambda i: f"Bulletins nuls {nuls[i]:.1%} pour {reference_nuls[i]:.1%} dans la sous-préfecture",
+        ),
+        (
+            'derniers_chiffres',
+            centres_suspects[centre],
+            khi2[centre], np.full(len(avec_pv), KHI2_CRITIQUE_CHIFFRES),
+            lambda i: f"Derniers chiffres des voix du centre non uniformes (χ² = {khi2[centre[i]]:.1f})",
+        ),
+        (
+            'releve_incoherent',
+            maximum_releve > votants,
+            maximum_releve, votants,
+            lambda i: f"Un relevé horaire indique {int(maximum_releve[i])} votants, le PV {int(votants[i])}",
+        ),
+    ]
+
+    anomalies = []
+    for type_anomalie, signales, valeurs, valeurs_reference, message in controles:
+        for i in np.flatnonzero(signales & selection):
+            anomalies.append((avec_pv[i], type_anomalie, float(valeurs[i]), float(valeurs_reference[i]), message(i)))
+    return anomalies
+
+
+def _par_lots(valeurs):
+    valeurs = list(valeurs)
+    for debut in range(0, len(valeurs), LOT_ECRITURE):
+        yield valeurs[debut:debut + LOT_ECRITURE]
+
+
+def analyser(complet=False):
+    """
+    Analyse les PV modifiés depuis leur dernière analyse (tous si complet=True)
+
+    Seuls les PV déjà présents dans la matrice des résultats sont analysés ; un
+    PV plus récent le sera au passage suivant.
+
+    Returns:
+        dict: Nombre de PV analysés et d'anomalies détectées par type
+    """
+    matrice = get_matrice()
+    derniere_modification = matrice.signature.derniere_pv if matrice.signature else None
+    if derniere_modification is None:
+        return {'pv_analyses': 0, 'anomalies': {}}
+
+    pvs = ProcesVerbal.objects.filter(date_modification__lte=derniere_modification)
+    a_analyser = pvs if complet else pvs.filter(
+        Q(date_analyse_anomalies__isnull=True) | Q(date_analyse_anomalies__lt=F('date_modification'))
+    )
+    bureaux_modifies = list(a_analyser.values_list('bureau_vote_id', flat=True))
+    if not bureaux_modifies:
+        return {'pv_analyses': 0, 'anomalies': {}}
+
+    # Les références des centres concernés ont changé : tous leurs PV sont réévalués
+    positions = np.array([matrice._position_bureau[b] for b in bureaux_modifies if b in matrice._position_bureau],
+                         dtype=np.int64)
+    centres = np.unique(matrice.indices['centre'][positions])
+    lignes = np.flatnonzero(np.isin(matrice.indices['centre'], centres) & matrice.a_pv)
+    bureau_ids = [int(b) for b in matrice.libelles['bureau']['ids'][lignes]]
+
+    pv_par_bureau = {}
+    maxima_releves = {}
+    for lot in _par_lots(bureau_ids):
+        pv_par_bureau.update(pvs.filter(bureau_vote_id__in=lot).values_list('bureau_vote_id', 'id'))
+        maxima_releves.update(
+            RelevéHoraire.objects.filter(bureau_vote_id__in=lot)
+            .values('bureau_vote_id').annotate(maximum=Max('nombre_votants'))
+            .values_list('bureau_vote_id', 'maximum')
+        )
+
+    maintenant = timezone.now()
+    detectees = []
+    for position, type_anomalie, valeur, reference, message in detecter(matrice, lignes, maxima_releves):
+        pv_id = pv_par_bureau.get(int(matrice.libelles['bureau']['ids'][position]))
+        if pv_id is not None:
+            detectees.append(AnomaliePV(
+                proces_verbal_id=pv_id, type_anomalie=type_anomalie, valeur=float(valeur),
+                reference=float(reference), message=message, date_detection=maintenant
+            ))
+
+    pv_ids = list(pv_par_bureau.values())
+    detectees_par_pv = {(anomalie.proces_verbal_id, anomalie.type_anomalie) for anomalie in detectees}
+
+    with transaction.atomic():
+        for lot in _par_lots(pv_ids):
+            # Anomalies disparues (PV corrigé, références qui ont changé)
+            disparues = [
+                anomalie_id
+                for anomalie_id, pv_id, type_anomalie in AnomaliePV.objects.filter(proces_verbal_id__in=lot)
+                .values_list('id', 'proces_verbal_id', 'type_anomalie')
+                if (pv_id, type_anomalie) not in detectees_par_pv
+            ]
+            AnomaliePV.objects.filter(id__in=disparues).delete()
+            ProcesVerbal.objects.filter(id__in=lot).update(date_analyse_anomalies=maintenant)
+
+        # Une anomalie déjà connue garde sa date de détection et son traitement
+        AnomaliePV.objects.bulk_create(
+            detectees, batch_size=LOT_ECRITURE, update_conflicts=True,
+            unique_fields=['proces_verbal', 'type_anomalie'], update_fields=['valeur', 'reference', 'message']
+        )
+
+    compte = {}
+    for anomalie in detectees:
+        compte[anomalie.type_anomalie] = compte.get(anomalie.type_anomalie, 0) + 1
+    return {'pv_analyses': len(pv_ids), 'anomalies': compte}
+
+
+def anomalies_ouvertes(departement_id=None):
+    """Nombre d'anomalies non résolues par type, libellés compris"""
+    anomalies = AnomaliePV.objects.filter(resolue=False)
+    if departement_id is not None:
+        anomalies = anomalies.filter(proces_verbal__departement_id=departement_id)
+    comptes = dict(anomalies.values('type_anomalie').annotate(n=Count('id')).values_list('type_anomalie', 'n'))
+    libelles = dict(AnomaliePV.TYPE_CHOICES)
+    return [
+        {'type': type_anomalie, 'libelle': libelles[type_anomalie], 'nombre': comptes[type_anomalie]}
+        for type_anomalie, _ in AnomaliePV.TYPE_CHOICES if type_anomalie in comptes
+    ]
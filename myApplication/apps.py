@@ -6,3 +6,13 @@ class MyapplicationConfig(AppConfig):
     name = 'myApplication'
 
 
+
+    def ready(self):
+        from . import arbre, cache_resultats, changements, compteurs, hierarchie, matrice_resultats, outbox
+        compteurs.connecter_signaux()
+        cache_resultats.connecter_signaux()
+        changements.connecter_signaux()
+        outbox.connecter_signaux()
+        hierarchie.connecter_signaux()
+        arbre.connecter_signaux()
+        matrice_resultats.connecter_signaux()
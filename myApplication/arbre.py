@@ -0,0 +1,241 @@
+"""
+Arbre générique de la hiérarchie électorale et agrégation à tout niveau
+
+NoeudHierarchie reproduit la hiérarchie décrite par NIVEAUX, de haut en bas
+(département → sous-préfecture → centre → bureau). Chaque nœud porte un
+chemin matérialisé : l'identifiant de chacun de ses ancêtres puis le sien,
+sur LARGEUR_SEGMENT caractères chacun. Les descendants d'un nœud forment donc
+un intervalle de chemins (parcours d'index), et l'ancêtre d'un nœud à une
+profondeur donnée est le préfixe de son chemin de longueur connue.
+
+agreger() renvoie les totaux regroupés à n'importe quelle profondeur sous
+n'importe quel nœud, sans chemin de jointure propre à chaque niveau : ajouter
+un niveau (région, circonscription) revient à ajouter une entrée à NIVEAUX.
+
+L'arbre suit les enregistrements et suppressions des modèles de NIVEAUX
+(signaux) ; un changement de parent réécrit les chemins du sous-arbre en un
+UPDATE. reconstruire() rebâtit tout l'arbre après un chargement qui ne
+déclenche pas de signal (loaddata, bulk_create).
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, Concat, Substr
+from django.db.models.signals import post_delete, post_save
+
+from .models import BureauVote, CentreVote, Departement, NoeudHierarchie, SousPrefecture
+
+Niveau = namedtuple('Niveau', 'nom modele parent champ_nom')
+
+# Hiérarchie de haut en bas : nom du niveau, modèle, champ du parent, champ du libellé.
+# Le dernier niveau porte les PV (NoeudHierarchie.bureau_vote).
+NIVEAUX = [
+    Niveau('departement', Departement, None, 'nom'),
+    Niveau('sous_prefecture', SousPrefecture, 'departement_id', 'nom'),
+    Niveau('centre', CentreVote, 'sous_prefecture_id', 'nom'),
+    Niveau('bureau', BureauVote, 'centre_vote_id', 'numero'),
+]
+PROFONDEUR_BUREAU = len(NIVEAUX) - 1
+
+# Modèle → (profondeur, niveau)
+PAR_MODELE = {niveau.modele: (profondeur, niveau) for profondeur, niveau in enumerate(NIVEAUX)}
+
+# Un segment de chemin : identifiant sur 10 chiffres suivi de '/'
+LARGEUR_SEGMENT = 11
+
+CHAMPS_TOTAUX = ['bureaux', 'bureaux_saisis', 'inscrits', 'votants', 'nuls', 'blancs', 'exprimes']
+
+
+def segment(objet_id):
+    return f'{objet_id:010d}/'
+
+
+def intervalle(chemin):
+    """Bornes (incluse, exclue) des chemins d'un nœud et de ses descendants"""
+    # '/' précède '0' : tout chemin qui prolonge celui du nœud est inférieur à la borne
+    return chemin, chemin[:-1] + '0'
+
+
+# ========================================
+# SYNCHRONISATION
+# ========================================
+
+def synchroniser(instance):
+    """
+    Crée ou met à jour le nœud d'un objet de la hiérarchie
+
+    Returns:
+        NoeudHierarchie: Le nœud, ou None si le parent n'est pas encore dans l'arbre
+    """
+    profondeur, niveau = PAR_MODELE[type(instance)]
+    parent = None
+    chemin = segment(instance.pk)
+    if niveau.parent:
+        parent = NoeudHierarchie.objects.filter(
+            niveau=NIVEAUX[profondeur - 1].nom, objet_id=getattr(instance, niveau.parent)
+        ).only('id', 'chemin').first()
+        if parent is None:
+            return None
+        chemin = parent.chemin + chemin
+
+    valeurs = {
+        'nom': getattr(instance, niveau.champ_nom),
+        'parent': parent,
+        'profondeur': profondeur,
+        'chemin': chemin,
+        'bureau_vote_id': instance.pk if profondeur == PROFONDEUR_BUREAU else None,
+    }
+    noeud, cree = NoeudHierarchie.objects.get_or_create(niveau=niveau.nom, objet_id=instance.pk, defaults=valeurs)
+    if cree or (noeud.chemin, noeud.nom) == (chemin, valeurs['nom']):
+        return noeud
+
+    with transaction.atomic():
+        if noeud.chemin != chemin:
+            # Sous-arbre déplacé : nouveau préfixe pour tous les descendants, en un UPDATE
+            debut, fin = intervalle(noeud.chemin)
+            NoeudHierarchie.objects.filter(chemin__gt=debut, chemin__lt=fin).update(
+                chemin=Concat(Value(chemin), Substr('chemin', len(noeud.chemin) + 1))
+            )
+        for champ, valeur in valeurs.items():
+            setattr(noeud, champ, valeur)
+        noeud.save()
+    return noeud
+
+
+def _enregistrement(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    _profondeur, niveau = PAR_MODELE[sender]
+    if update_fields is not None:
+        # Ni parent ni libellé modifiés (ex. nombre d'inscrits d'un bureau) : rien à faire
+        champs = {niveau.champ_nom}
+        if niveau.parent:
+            champs |= {niveau.parent, niveau.parent[:-3]}
+        if not champs & set(update_fields):
+            return
+    synchroniser(instance)
+
+
+def _suppression(sender, instance, **kwargs):
+    # Les nœuds descendants suivent (parent en cascade)
+    NoeudHierarchie.objects.filter(niveau=PAR_MODELE[sender][1].nom, objet_id=instance.pk).delete()
+
+
+def connecter_signaux():
+    """Tient l'arbre à jour (appelé depuis AppConfig.ready)"""
+    for modele in PAR_MODELE:
+        post_save.connect(_enregistrement, sender=modele, dispatch_uid=f'arbre_save_{modele.__name__}')
+        post_delete.connect(_suppression, sender=modele, dispatch_uid=f'arbre_delete_{modele.__name__}')
+
+
+def reconstruire():
+    """
+    Rebâtit tout l'arbre depuis les modèles, niveau par niveau
+
+    Returns:
+        dict: Nom du niveau → nombre de nœuds
+    """
+    comptes = {}
+    with transaction.atomic():
+        for profondeur in reversed(range(len(NIVEAUX))):
+            NoeudHierarchie.objects.filter(profondeur=profondeur).delete()
+
+        parents = {None: (None, '')}
+        for profondeur, niveau in enumerate(NIVEAUX):
+            champs = ['pk', niveau.champ_nom] + ([niveau.parent] if niveau.parent else [])
+            noeuds = []
+            for objet_id, nom, *parent_id in niveau.modele.objects.values_list(*champs).iterator():
+                parent = parents.get(parent_id[0] if parent_id else None)
+                if parent is None:
+                    continue
+                noeuds.append(NoeudHierarchie(
+                    niveau=niveau.nom, objet_id=objet_id, nom=nom, parent_id=parent[0], profondeur=profondeur,
+                    chemin=parent[1] + segment(objet_id),
+                    bureau_vote_id=objet_id if profondeur == PROFONDEUR_BUREAU else None,
+                ))
+            NoeudHierarchie.objects.bulk_create(noeuds, batch_size=1000)
+            comptes[niveau.nom] = len(noeuds)
+            parents = {
+                objet_id: (pk, chemin)
+                for pk, objet_id, chemin in NoeudHierarchie.objects.filter(
+                    profondeur=profondeur
+                ).values_list('pk', 'objet_id', 'chemin').iterator()
+            }
+    return comptes
+
+
+# ========================================
+# AGRÉGATION
+# ========================================
+
+def _descendants(noeud, profondeur):
+    """Nœuds d'une profondeur donnée sous un nœud (tout l'arbre si noeud est None)"""
+    noeuds = NoeudHierarchie.objects.filter(profondeur=profondeur)
+    if noeud is not None:
+        debut, fin = intervalle(noeud.chemin)
+        noeuds = noeuds.filter(chemin__gte=debut, chemin__lt=fin)
+    return noeuds
+
+
+def agreger(noeud=None, profondeur=1):
+    """
+    Totaux des nœuds situés `profondeur` niveaux sous un nœud
+
+    Trois requêtes quels que soient le nœud et la profondeur, chacune un
+    parcours de l'index (profondeur, chemin) : les nœuds du niveau demandé,
+    les totaux des bureaux et les voix par candidat, regroupés par préfixe de
+    chemin.
+
+    Args:
+        noeud: NoeudHierarchie de départ, None pour la racine (au-dessus des départements)
+        profondeur: 1 pour les enfants du nœud, 2 pour ses petits-enfants, etc.
+
+    Returns:
+        list: Un dict par nœud dans l'ordre des chemins (noeud, niveau, objet_id,
+        nom, totaux de CHAMPS_TOTAUX et voix par identifiant de candidat)
+
+    Raises:
+        ValueError: Profondeur hors de l'arbre
+    """
+    depart = noeud.profondeur if noeud is not None else -1
+    if not 1 <= profondeur <= PROFONDEUR_BUREAU - depart:
+        raise ValueError(f"Profondeur invalide : entre 1 et {PROFONDEUR_BUREAU - depart} sous ce nœud")
+    cible = depart + profondeur
+
+    feuilles = _descendants(noeud, PROFONDEUR_BUREAU).annotate(
+        groupe=Substr('chemin', 1, (cible + 1) * LARGEUR_SEGMENT)
+    )
+    pv = 'bureau_vote__proces_verbal'
+    totaux = {
+        ligne['groupe']: ligne
+        for ligne in feuilles.values('groupe').annotate(
+            bureaux=Count('id'),
+            bureaux_saisis=Count(pv),
+            inscrits=Coalesce(Sum('bureau_vote__nombre_inscrits'), 0),
+            votants=Coalesce(Sum(f'{pv}__nombre_votants'), 0),
+            nuls=Coalesce(Sum(f'{pv}__bulletins_nuls'), 0),
+            blancs=Coalesce(Sum(f'{pv}__bulletins_blancs'), 0),
+            exprimes=Coalesce(Sum(f'{pv}__suffrages_exprimes'), 0),
+        ).order_by()
+    }
+    voix = {}
+    for groupe, candidat_id, nombre in feuilles.filter(**{f'{pv}__resultats__isnull': False}).values(
+        'groupe', candidat_id=F(f'{pv}__resultats__candidat_id')
+    ).annotate(voix=Sum(f'{pv}__resultats__nombre_voix')).order_by().values_list('groupe', 'candidat_id', 'voix'):
+        voix.setdefault(groupe, {})[candidat_id] = nombre
+
+    resultat = []
+    for pk, niveau, objet_id, nom, chemin in _descendants(noeud, cible).values_list(
+        'pk', 'niveau', 'objet_id', 'nom', 'chemin'
+    ):
+        ligne = totaux.get(chemin, {})
+        resultat.append({
+            'noeud': pk,
+            'niveau': niveau,
+            'objet_id': objet_id,
+            'nom': nom,
+            **{champ: ligne.get(champ, 0) for champ in CHAMPS_TOTAUX},
+            'voix': voix.get(chemin, {}),
+        })
+    return resultat
@@ -0,0 +1,122 @@
+"""
+Archive ZIP des photos de PV avec manifeste
+
+L'archive est produite au fil de l'eau (FluxZip) : ni fichier temporaire ni
+archive complète en mémoire. Chaque photo est lue par morceaux de
+TAILLE_MORCEAU octets, stockée sans recompression (JPEG/PNG déjà compressés)
+et son SHA-256 est calculé pendant la lecture. Le manifeste (manifeste.csv :
+bureau, centre, sous-préfecture, chiffres du PV, fichier d'origine, taille,
+SHA-256) est ajouté en dernier, une fois toutes les empreintes connues.
+
+Les lignes du manifeste viennent d'une seule requête, lue entièrement avant
+l'envoi des photos : la base n'est pas tenue ouverte pendant un téléchargement
+de plusieurs gigaoctets, et seules ces lignes (quelques centaines d'octets par
+PV) restent en mémoire, quelle que soit la taille des photos.
+"""
+import hashlib
+import posixpath
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.utils.text import slugify
+
+from .exports import FluxZip, flux_csv
+from .models import ProcesVerbal
+
+# Taille des lectures dans les fichiers photo (octets)
+TAILLE_MORCEAU = 1024 * 1024
+
+CHAMPS_MANIFESTE = [
+    ('Département', 'departement__nom'),
+    ('Sous-préfecture', 'sous_prefecture__nom'),
+    ('Centre de vote', 'centre_vote__nom'),
+    ('Bureau', 'bureau_vote__numero'),
+    ('Inscrits', 'bureau_vote__nombre_inscrits'),
+    ('Votants', 'nombre_votants'),
+    ('Nuls', 'bulletins_nuls'),
+    ('Blancs', 'bulletins_blancs'),
+    ('Exprimés', 'suffrages_exprimes'),
+    ('Vérifié', 'verifie'),
+    ('Fichier d\'origine', 'photo_pv'),
+]
+ENTETES_MANIFESTE = [entete for entete, _champ in CHAMPS_MANIFESTE] + [
+    'Fichier dans l\'archive', 'Taille (octets)', 'SHA-256'
+]
+
+
+def selection(departement=None, sous_prefecture=None, verifie=None):
+    """PV ayant une photo, filtrés par département, sous-préfecture et statut de vérification"""
+    pvs = ProcesVerbal.objects.exclude(photo_pv='')
+    if departement:
+        pvs = pvs.filter(departement_id=departement)
+    if sous_prefecture:
+        pvs = pvs.filter(sous_prefecture_id=sous_prefecture)
+    if verifie is not None:
+        pvs = pvs.filter(verifie=verifie)
+    return pvs
+
+
+def _lignes_manifeste(pvs):
+    """Lignes du manifeste en une requête, avec l'identifiant du centre pour nommer les fichiers"""
+    champs = [champ for _entete, champ in CHAMPS_MANIFESTE] + ['centre_vote_id']
+    return list(
+        pvs.exclude(photo_pv='').order_by(
+            'departement__nom',
+            'sous_prefecture__nom',
+            'centre_vote__nom',
+            'bureau_vote__numero',
+        ).values_list(*champs)
+    )
+
+
+def _nom_archive(sous_prefecture, centre, centre_id, numero, photo):
+    extension = posixpath.splitext(photo)[1].lower()
+    return (
+        f"photos/{slugify(sous_prefecture) or 'sous-prefecture'}/{slugify(centre) or 'centre'}-{centre_id}/"
+        f"bureau_{slugify(numero) or 'sans-numero'}{extension}"
+    )
+
+
+def _morceaux(fichier, empreinte, taille):
+    """Lit le fichier par morceaux en mettant à jour l'empreinte et la taille"""
+    with fichier:
+        while True:
+            morceau = fichier.read(TAILLE_MORCEAU)
+            if not morceau:
+                return
+            empreinte.update(morceau)
+            taille[0] += len(morceau)
+            yield morceau
+
+
+def flux_archive(pvs):
+    """
+    Génère les octets de l'archive des photos des PV donnés
+
+    Une photo introuvable dans le stockage figure au manifeste avec une
+    empreinte vide, sans entrée dans l'archive.
+    """
+    lignes = _lignes_manifeste(pvs)
+    archive = FluxZip()
+    manifeste = []
+    for ligne in lignes:
+        *valeurs, centre_id = ligne
+        _departement, sous_prefecture, centre, numero = valeurs[:4]
+        photo = valeurs[-1]
+        try:
+            fichier = default_storage.open(photo, 'rb')
+        except OSError:
+            manifeste.append(valeurs + ['', '', ''])
+            continue
+        nom = _nom_archive(sous_prefecture, centre, centre_id, numero, photo)
+        empreinte = hashlib.sha256()
+        taille = [0]
+        yield from archive.ecrire_morceaux(
+            nom, _morceaux(fichier, empreinte, taille), compression=zipfile.ZIP_STORED
+        )
+        manifeste.append(valeurs + [nom, taille[0], empreinte.hexdigest()])
+
+    yield from archive.ecrire_morceaux(
+        'manifeste.csv', (texte.encode('utf-8') for texte in flux_csv(ENTETES_MANIFESTE, manifeste))
+    )
+    yield from archive.fermer()
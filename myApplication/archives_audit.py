@@ -0,0 +1,218 @@
+"""
+Archivage du journal d'audit en segments compressés
+
+Les périodes closes (jours entiers antérieurs à une date limite) sont déplacées
+de la table AuditLog vers des segments JSONL compressés (gzip), jamais modifiés
+après écriture. Un index léger (index.json) décrit chaque segment : intervalle
+de temps, nombre d'entrées et identifiants d'objets par modèle. Les recherches
+interrogent la table vivante puis uniquement les segments dont l'index peut
+contenir des résultats.
+"""
+import gzip
+import json
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .fichiers import ecrire_atomique
+from .models import AuditLog
+
+CHAMPS_ENTREE = [
+    'id', 'identifiant', 'timestamp', 'user_id', 'action', 'model_name', 'object_id',
+    'object_repr', 'changes', 'ip_address', 'user_agent',
+]
+
+
+def dossier_archives():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', settings.BASE_DIR / 'var' / 'audit_archive'))
+
+
+def charger_index(dossier=None):
+    """Index des segments : liste de dicts {fichier, debut, fin, nombre, objets}"""
+    chemin = Path(dossier or dossier_archives()) / 'index.json'
+    if not chemin.exists():
+        return []
+    with open(chemin, encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+
+def _serialiser(entree):
+    entree = dict(entree)
+    entree['timestamp'] = entree['timestamp'].isoformat()
+    if entree['identifiant'] is not None:
+        entree['identifiant'] = str(entree['identifiant'])
+    return entree
+
+
+def _ecrire_segment(dossier, jour, entrees, index):
+    """Écrit le segment d'un jour et ajoute sa description à l'index (en mémoire)"""
+    numero = sum(1 for segment in index if segment['fichier'].startswith(f'audit-{jour:%Y%m%d}'))
+    nom = f'audit-{jour:%Y%m%d}-{numero:03d}.jsonl.gz'
+
+    lignes = ''.join(json.dumps(entree, ensure_ascii=False) + '\n' for entree in entrees)
+    ecrire_atomique(dossier / nom, gzip.compress(lignes.encode('utf-8')), mode='wb')
+
+    objets = {}
+    for entree in entrees:
+        objets.setdefault(entree['model_name'], set()).add(entree['object_id'])
+
+    index.append({
+        'fichier': nom,
+        'debut': entrees[0]['timestamp'],
+        'fin': entrees[-1]['timestamp'],
+        'nombre': len(entrees),
+        'objets': {model: sorted(ids) for model, ids in objets.items()},
+    })
+
+
+def _debut_jour(jour):
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def archiver(avant, dossier=None, taille_lot=2000):
+    """
+    Archive les entrées antérieures au début du jour de `avant`
+
+    Chaque jour archivé devient un segment, dans sa propre transaction : les
+    lignes du jour sont supprimées de la table dans la même transaction que
+    la mise à jour de l'index, et le verrou d'écriture de SQLite est rendu
+    entre deux jours. Les lignes sont lues par lots (pagination par clé
+    timestamp, id), chaque lot étant supprimé dès qu'il est lu : seules les
+    entrées du jour en cours restent en mémoire.
+
+    Returns:
+        int: Nombre d'entrées archivées
+    """
+    dossier = Path(dossier or dossier_archives())
+    dossier.mkdir(parents=True, exist_ok=True)
+
+    # Seules les journées entièrement écoulées sont archivées
+    limite = _debut_jour(timezone.localtime(avant).date())
+
+    total = 0
+    index = charger_index(dossier)
+    while True:
+        premiere = AuditLog.objects.filter(timestamp__lt=limite).order_by('timestamp', 'id').first()
+        if premiere is None:
+            break
+        jour = timezone.localtime(premiere.timestamp).date()
+        fin_jour = min(_debut_jour(jour + timedelta(days=1)), limite)
+
+        with transaction.atomic():
+            entrees = []
+            dernier = None
+            while True:
+                lignes = AuditLog.objects.filter(timestamp__lt=fin_jour)
+                if dernier is not None:
+                    lignes = lignes.filter(Q(timestamp__gt=dernier[0]) | Q(timestamp=dernier[0], id__gt=dernier[1]))
+                lot = list(lignes.order_by('timestamp', 'id').values(*CHAMPS_ENTREE)[:taille_lot])
+                if not lot:
+                    break
+                entrees += [_serialiser(ligne) for ligne in lot]
+                AuditLog.objects.filter(id__in=[ligne['id'] for ligne in lot]).delete()
+                dernier = (lot[-1]['timestamp'], lot[-1]['id'])
+
+            _ecrire_segment(dossier, jour, entrees, index)
+            ecrire_atomique(dossier / 'index.json', json.dumps(index, ensure_ascii=False, indent=1))
+        total += len(entrees)
+
+    return total
+
+
+def _segment_pertinent(segment, model_name, object_id, debut, fin):
+    if debut and parse_datetime(segment['fin']) < debut:
+        return False
+    if fin and parse_datetime(segment['debut']) > fin:
+        return False
+    if model_name:
+        ids = segment['objets'].get(model_name)
+        if ids is None:
+            return False
+        if object_id is not None and int(object_id) not in ids:
+            return False
+    elif object_id is not None:
+        return any(int(object_id) in ids for ids in segment['objets'].values())
+    return True
+
+
+def _lire_segment(chemin):
+    with gzip.open(chemin, 'rt', encoding='utf-8') as fichier:
+        for ligne in fichier:
+            yield json.loads(ligne)
+
+
+def rechercher_audit(model_name=None, object_id=None, debut=None, fin=None, action=None, user_id=None,
+                     limite=None, dossier=None):
+    """
+    Recherche dans tout l'historique d'audit : table vivante et segments archivés
+
+    Les segments sont sélectionnés par l'index (intervalle de temps, identifiants
+    d'objets) avant toute lecture. Les résultats sont des dicts triés du plus
+    récent au plus ancien, avec les mêmes clés pour les deux sources.
+
+    Avec une limite, la table n'en renvoie pas plus (tri et limite en base) et
+    les segments sont lus du plus récent au plus ancien, jusqu'au premier dont
+    la fin précède la plus ancienne des `limite` entrées déjà retenues.
+    """
+    dossier = Path(dossier or dossier_archives())
+
+    filtres = {}
+    if model_name:
+        filtres['model_name'] = model_name
+    if object_id is not None:
+        filtres['object_id'] = object_id
+    if debut:
+        filtres['timestamp__gte'] = debut
+    if fin:
+        filtres['timestamp__lte'] = fin
+    if action:
+        filtres['action'] = action
+    if user_id is not None:
+        filtres['user_id'] = user_id
+
+    vivantes = AuditLog.objects.filter(**filtres).order_by('-timestamp', '-id').values(*CHAMPS_ENTREE)
+    if limite:
+        vivantes = vivantes[:limite]
+    resultats = {ligne['id']: _serialiser(ligne) for ligne in vivantes}
+
+    def plus_recentes():
+        return sorted(resultats.values(), key=lambda e: (parse_datetime(e['timestamp']), e['id']), reverse=True)
+
+    segments = sorted(charger_index(dossier), key=lambda segment: parse_datetime(segment['fin']), reverse=True)
+    for segment in segments:
+        if limite and len(resultats) >= limite:
+            retenues = plus_recentes()[:limite]
+            resultats = {entree['id']: entree for entree in retenues}
+            # Segments plus anciens que la dernière entrée retenue : rien à y trouver
+            if parse_datetime(segment['fin']) < parse_datetime(retenues[-1]['timestamp']):
+                break
+        if not _segment_pertinent(segment, model_name, object_id, debut, fin):
+            continue
+        for entree in _lire_segment(dossier / segment['fichier']):
+            if model_name and entree['model_name'] != model_name:
+                continue
+            if object_id is not None and entree['object_id'] != int(object_id):
+                continue
+            if action and entree['action'] != action:
+                continue
+            if user_id is not None and entree['user_id'] != user_id:
+                continue
+            if debut or fin:
+                horodatage = parse_datetime(entree['timestamp'])
+                if (debut and horodatage < debut) or (fin and horodatage > fin):
+                    continue
+            # Une entrée présente dans la table et dans un segment n'est comptée qu'une fois
+            resultats.setdefault(entree['id'], entree)
+
+    tries = plus_recentes()
+    return tries[:limite] if limite else tries
+
+
+def jours_avant(jours):
+    """Date limite d'archivage : maintenant moins `jours` jours"""
+    return timezone.now() - timedelta(days=jours)
@@ -0,0 +1,333 @@
+"""
+Journal d'audit asynchrone
+
+Les entrées sont ajoutées à un tampon en mémoire et à un fichier spool local,
+puis insérées par lots (bulk_create) par un thread d'arrière-plan toutes les
+AUDIT_BATCH_SIZE entrées ou toutes les AUDIT_FLUSH_INTERVAL_MS millisecondes.
+Le temps de réponse des requêtes ne dépend donc pas du volume d'audit.
+
+Le spool garantit qu'une entrée n'est pas perdue si le processus s'arrête avant
+l'insertion : les fichiers laissés par un processus terminé sont rejoués au
+démarrage suivant (ou par la commande audit_flush). Chaque spool reste
+verrouillé par son processus tant que ses entrées ne sont pas insérées ; le
+verrou disparaît avec le processus, et seuls les spools dont le verrou peut
+être pris sont rejoués. Chaque entrée porte un identifiant unique, ce qui rend
+la reprise idempotente.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .fichiers import verrouiller
+from .models import AuditLog, get_model_changes
+
+logger = logging.getLogger(__name__)
+
+# Champs suivis par modèle pour le calcul des changements
+CHAMPS_AUDIT = {
+    'ProcesVerbal': [
+        'nombre_votants', 'bulletins_nuls', 'bulletins_blancs', 'suffrages_exprimes',
+        'verifie', 'observations', 'photo_pv', 'rejete', 'motif_rejet', 'verifie_par_id',
+    ],
+    'ResultatCandidat': ['candidat_id', 'nombre_voix'],
+    'RelevéHoraire': ['bureau_vote_id', 'heure_releve', 'nombre_votants', 'observations'],
+    'BureauVote': ['numero', 'centre_vote_id', 'nombre_inscrits'],
+    'CentreVote': ['nom', 'sous_prefecture_id', 'adresse'],
+    'SousPrefecture': ['nom', 'departement_id'],
+    'Departement': ['nom', 'code'],
+    'User': ['username', 'role', 'numero_candidat', 'parti_politique', 'bureau_vote_id', 'is_active', 'is_staff'],
+    'AnomaliePV': ['resolue', 'resolue_par_id'],
+}
+
+
+def champs_suivis(instance):
+    """Liste des champs suivis pour le modèle de l'instance"""
+    nom = instance.__class__.__name__
+    if nom in CHAMPS_AUDIT:
+        return CHAMPS_AUDIT[nom]
+    return [field.attname for field in instance._meta.concrete_fields if not field.primary_key]
+
+
+class TamponAudit:
+    """Tampon d'entrées d'audit vidé par lots dans un thread d'arrière-plan"""
+
+    def __init__(self, taille_lot, intervalle_ms, dossier_spool, fsync=False, asynchrone=True):
+        self.taille_lot = taille_lot
+        self.intervalle = intervalle_ms / 1000
+        self.dossier_spool = Path(dossier_spool)
+        self.fsync = fsync
+        self.asynchrone = asynchrone
+
+        self._verrou = threading.Lock()
+        self._verrou_vidage = threading.Lock()
+        self._evenement = threading.Event()
+        self._entrees = []
+        self._spools_en_attente = []
+        self._spool = None
+        self._pid = None
+        self._thread = None
+
+    # ---------- Spool local ----------
+
+    def _chemin_spool(self):
+        return self.dossier_spool / f'audit-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl'
+
+    def _ouvrir_spool(self):
+        """Nouveau spool, verrouillé jusqu'à l'insertion de ses entrées"""
+        while True:
+            spool = open(self._chemin_spool(), 'a', encoding='utf-8')
+            verrouiller(spool)
+            # Supprimé par une reprise entre l'ouverture et le verrou : nouveau fichier
+            if os.path.exists(spool.name):
+                return spool
+            spool.close()
+
+    def _demarrer(self):
+        """Initialise le spool et le thread pour le processus courant (y compris après un fork)"""
+        # Après un fork : copies des spools du parent fermées (son verrou est conservé), sans suppression
+        for spool in [self._spool] + self._spools_en_attente:
+            if spool is not None:
+                spool.close()
+
+        self.dossier_spool.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._entrees = []
+        self._spools_en_attente = []
+        self._spool = self._ouvrir_spool()
+
+        if self.asynchrone:
+            self._thread = threading.Thread(target=self._boucle, name='audit-flush', daemon=True)
+            self._thread.start()
+
+    def _rotation_spool(self):
+        """Met le spool courant (appelé sous verrou) en attente d'insertion et en ouvre un nouveau"""
+        self._spools_en_attente.append(self._spool)
+        self._spool = self._ouvrir_spool()
+
+    # ---------- API ----------
+
+    def ajouter(self, entree):
+        """Ajoute une entrée : écriture dans le spool puis dans le tampon, sans accès à la base"""
+        with self._verrou:
+            if self._pid != os.getpid():
+                self._demarrer()
+
+            self._spool.write(json.dumps(entree, ensure_ascii=False) + '\n')
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+
+            self._entrees.append(entree)
+            plein = len(self._entrees) >= self.taille_lot
+
+        if not self.asynchrone:
+            self.vider()
+        elif plein:
+            self._evenement.set()
+
+    def vider(self):
+        """Insère toutes les entrées en attente ; en cas d'échec elles restent pour le prochain essai"""
+        with self._verrou_vidage:
+            with self._verrou:
+                if self._pid != os.getpid() or not self._entrees:
+                    return 0
+                lot = self._entrees
+                self._entrees = []
+                self._rotation_spool()
+                spools = list(self._spools_en_attente)
+
+            try:
+                inserer_entrees(lot)
+            except Exception:
+                logger.exception("Échec de l'écriture du journal d'audit, nouvel essai au prochain vidage")
+                with self._verrou:
+                    self._entrees = lot + self._entrees
+                return 0
+            finally:
+                if self.asynchrone and threading.current_thread() is self._thread:
+                    connections.close_all()
+
+            with self._verrou:
+                for spool in spools:
+                    supprimer_spool(spool)
+                    self._spools_en_attente.remove(spool)
+
+            return len(lot)
+
+    def _boucle(self):
+        try:
+            recuperer_spools(self.dossier_spool)
+        except Exception:
+            logger.exception("Échec de la reprise des spools d'audit")
+        finally:
+            connections.close_all()
+
+        while True:
+            self._evenement.wait(self.intervalle)
+            self._evenement.clear()
+            self.vider()
+
+    def fermer(self):
+        """Vide le tampon et supprime le spool courant s'il est vide (arrêt du processus)"""
+        if self._pid != os.getpid():
+            return
+        self.vider()
+        with self._verrou:
+            if not self._entrees and self._spool and not self._spool.closed:
+                supprimer_spool(self._spool)
+
+
+def supprimer_fichier(chemin):
+    try:
+        os.remove(chemin)
+    except FileNotFoundError:
+        pass
+
+
+def supprimer_spool(spool):
+    """Supprime un spool ouvert et verrouillé, puis le ferme"""
+    try:
+        supprimer_fichier(spool.name)
+    except PermissionError:
+        # Windows : un fichier ouvert ne peut pas être supprimé
+        spool.close()
+        supprimer_fichier(spool.name)
+    spool.close()
+
+
+def inserer_entrees(entrees):
+    """Insère un lot d'entrées ; les identifiants déjà présents sont ignorés"""
+    AuditLog.objects.bulk_create(
+        [
+            AuditLog(
+                identifiant=entree['identifiant'],
+                user_id=entree['user_id'],
+                action=entree['action'],
+                model_name=entree['model_name'],
+                object_id=entree['object_id'],
+                object_repr=entree['object_repr'],
+                changes=entree['changes'],
+                timestamp=parse_datetime(entree['timestamp']),
+                ip_address=entree['ip_address'],
+                user_agent=entree['user_agent'],
+            )
+            for entree in entrees
+        ],
+        batch_size=500,
+        ignore_conflicts=True
+    )
+
+
+def _lire_spool(spool):
+    entrees = []
+    for ligne in spool:
+        try:
+            entrees.append(json.loads(ligne))
+        except ValueError:
+            # Dernière ligne tronquée par un arrêt brutal
+            continue
+    return entrees
+
+
+def recuperer_spools(dossier_spool=None):
+    """
+    Rejoue les spools laissés par des processus terminés
+
+    Un spool dont le verrou est tenu appartient à un processus actif (ou à
+    ce processus) : il est laissé à son écrivain.
+
+    Returns:
+        int: Nombre d'entrées rejouées
+    """
+    dossier_spool = Path(dossier_spool or settings.AUDIT_SPOOL_DIR)
+    total = 0
+
+    for chemin in sorted(glob.glob(str(dossier_spool / 'audit-*.jsonl'))):
+        try:
+            spool = open(chemin, encoding='utf-8')
+        except FileNotFoundError:
+            # Rejoué entre-temps par un autre processus
+            continue
+        try:
+            if not verrouiller(spool, bloquant=False):
+                continue
+            entrees = _lire_spool(spool)
+            if entrees:
+                inserer_entrees(entrees)
+            supprimer_spool(spool)
+        except PermissionError:
+            # Windows : rouvert par un écrivain entre-temps, repris au prochain passage
+            continue
+        finally:
+            spool.close()
+        total += len(entrees)
+
+    return total
+
+
+_tampon = None
+_verrou_tampon = threading.Lock()
+
+
+def get_tampon():
+    """Tampon d'audit du processus, créé à la première utilisation"""
+    global _tampon
+    if _tampon is None:
+        with _verrou_tampon:
+            if _tampon is None:
+                _tampon = TamponAudit(
+                    taille_lot=getattr(settings, 'AUDIT_BATCH_SIZE', 100),
+                    intervalle_ms=getattr(settings, 'AUDIT_FLUSH_INTERVAL_MS', 500),
+                    dossier_spool=getattr(settings, 'AUDIT_SPOOL_DIR', settings.BASE_DIR / 'var' / 'audit_spool'),
+                    fsync=getattr(settings, 'AUDIT_SPOOL_FSYNC', False),
+                    asynchrone=getattr(settings, 'AUDIT_ASYNC', True),
+                )
+                atexit.register(_tampon.fermer)
+    return _tampon
+
+
+def journaliser(user, action, instance, changes=None, request=None):
+    """
+    Ajoute une entrée au journal d'audit sans bloquer la requête
+
+    Dans une transaction, l'entrée n'est mise en tampon qu'après le commit :
+    une écriture annulée n'apparaît pas dans le journal.
+
+    Usage:
+        journaliser(request.user, 'UPDATE', pv, changes=get_model_changes(ancien, pv, champs_suivis(pv)), request=request)
+    """
+    ip_address, user_agent = AuditLog.infos_requete(request)
+    user_id = user.pk if user is not None and getattr(user, 'is_authenticated', False) else None
+
+    entree = {
+        'identifiant': str(uuid.uuid4()),
+        'user_id': user_id,
+        'action': action,
+        'model_name': instance.__class__.__name__,
+        'object_id': instance.pk,
+        'object_repr': str(instance)[:200],
+        'changes': changes,
+        'timestamp': timezone.now().isoformat(),
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+    }
+    transaction.on_commit(lambda: get_tampon().ajouter(entree))
+
+
+def journaliser_modification(user, ancien, instance, request=None):
+    """Journalise une création (ancien=None) ou une modification si des champs suivis ont changé"""
+    changes = get_model_changes(ancien, instance, champs_suivis(instance))
+    if ancien is None:
+        journaliser(user, 'CREATE', instance, changes, request)
+    elif changes:
+        journaliser(user, 'UPDATE', instance, changes, request)
@@ -0,0 +1,273 @@
+"""
+Clés de cache versionnées selon la hiérarchie électorale
+
+Chaque nœud de la hiérarchie (bureau, centre, sous-préfecture, département,
+plus un nœud global) possède un numéro de version conservé dans le cache. Une
+entrée mise en cache porte dans sa clé la version des nœuds dont elle dépend :
+quand une donnée change, on incrémente la version du bureau et de ses
+ancêtres, et les anciennes entrées ne sont plus jamais lues (elles expirent
+d'elles-mêmes). Un PV saisi à Danané ne touche donc pas le cache d'un autre
+département, ni celui des autres centres de la même sous-préfecture.
+
+La clé est calculée avant le calcul de la valeur : si une invalidation survient
+pendant le calcul, la valeur est rangée sous l'ancienne version et ne sera pas
+servie.
+
+en_cache_partage() ajoute un calcul unique (single-flight) : quand la version
+change, un seul worker recalcule, sous un verrou pris dans le cache (partagé
+entre processus avec le backend SQLite), pendant que les autres servent la
+valeur précédente marquée périmée. Le recalcul se fait dans un thread, sans
+jamais bloquer les lecteurs ; seul un premier calcul, sans valeur à servir,
+fait attendre les requêtes concurrentes.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import (
+    BureauVote, CentreVote, Departement, ProcesVerbal, RelevéHoraire, ResultatCandidat,
+    SousPrefecture, User,
+)
+
+PREFIXE = 'version'
+GLOBAL = ('global', 0)
+
+# Champs d'un utilisateur repris dans les résultats (candidats)
+CHAMPS_CANDIDAT = {'role', 'first_name', 'last_name', 'numero_candidat'}
+
+# Attente entre deux lectures du cache pendant le premier calcul d'une valeur (secondes)
+INTERVALLE_ATTENTE = 0.05
+
+_ABSENT = object()
+_local = threading.local()
+logger = logging.getLogger(__name__)
+
+
+def _cle_version(noeud):
+    niveau, identifiant = noeud
+    return f'{PREFIXE}:{niveau}:{identifiant}'
+
+
+def versions(noeuds):
+    """
+    Versions courantes des nœuds, initialisées si absentes du cache
+
+    Args:
+        noeuds: Liste de tuples (niveau, id), ex. [('sous_prefecture', 4)]
+
+    Returns:
+        list: Versions, dans l'ordre des nœuds
+    """
+    cles = [_cle_version(noeud) for noeud in noeuds]
+    en_cache = cache.get_many(cles)
+    for cle in cles:
+        if cle not in en_cache:
+            # Valeur initiale unique : une version évincée ne ressert pas d'anciennes entrées
+            cache.add(cle, time.time_ns(), timeout=None)
+            en_cache[cle] = cache.get(cle)
+    return [en_cache[cle] for cle in cles]
+
+
+def cle(nom, noeuds, **params):
+    """Clé d'une entrée dépendant des nœuds donnés (et de paramètres éventuels)"""
+    parties = [nom]
+    parties += [f'{niveau}{identifiant}v{version}'
+                for (niveau, identifiant), version in zip(noeuds, versions(noeuds))]
+    parties += [f'{nom_param}={valeur}' for nom_param, valeur in sorted(params.items())]
+    return ':'.join(parties)
+
+
+def en_cache(nom, noeuds, calcul, timeout=DEFAULT_TIMEOUT, **params):
+    """
+    Valeur en cache pour les versions courantes des nœuds, calculée si absente
+
+    Args:
+        nom: Nom de l'entrée (vue, export...)
+        noeuds: Nœuds dont dépend la valeur
+        calcul: Fonction sans argument produisant la valeur
+        timeout: Durée de vie (CACHE_TIMEOUT par défaut)
+        **params: Paramètres complémentaires de la clé (candidat, page...)
+    """
+    cle_entree = cle(nom, noeuds, **params)
+    valeur = cache.get(cle_entree, _ABSENT)
+    if valeur is _ABSENT:
+        valeur = calcul()
+        cache.set(cle_entree, valeur, timeout)
+    return valeur
+
+
+def _rafraichir(cle_derniere, cle_entree, cle_verrou, calcul, timeout):
+    """Calcule la valeur, la range comme dernière valeur connue puis libère le verrou"""
+    try:
+        valeur = calcul()
+        cache.set(cle_derniere, (cle_entree, valeur), timeout)
+        return valeur
+    finally:
+        cache.delete(cle_verrou)
+
+
+def _rafraichir_en_arriere_plan(*args):
+    try:
+        _rafraichir(*args)
+    except Exception:
+        logger.exception("Échec du recalcul en arrière-plan de %s", args[0])
+    finally:
+        connections.close_all()
+
+
+def en_cache_partage(nom, noeuds, calcul, timeout=DEFAULT_TIMEOUT, **params):
+    """
+    Comme en_cache(), avec un seul recalcul à la fois et service de la valeur périmée
+
+    La dernière valeur calculée est rangée sous une clé sans version, avec la
+    clé versionnée pour laquelle elle a été calculée. Si les versions ont
+    changé, le worker qui obtient le verrou lance le recalcul en arrière-plan ;
+    tous renvoient la valeur précédente en attendant.
+
+    Returns:
+        tuple: (valeur, perimee) — perimee est vrai si la valeur ne reflète pas
+        encore les dernières modifications
+    """
+    cle_entree = cle(nom, noeuds, **params)
+    # Clé de la dernière valeur : les nœuds sans leurs versions
+    suffixe = ':'.join(
+        [nom] + [f'{niveau}{identifiant}' for niveau, identifiant in noeuds]
+        + [f'{nom_param}={valeur}' for nom_param, valeur in sorted(params.items())]
+    )
+    cle_derniere = f'derniere:{suffixe}'
+    cle_verrou = f'verrou:{suffixe}'
+    duree_verrou = getattr(settings, 'CACHE_VERROU_TIMEOUT', 120)
+    arguments = (cle_derniere, cle_entree, cle_verrou, calcul, timeout)
+
+    derniere = cache.get(cle_derniere)
+    if derniere is not None:
+        cle_calculee, valeur = derniere
+        if cle_calculee == cle_entree:
+            return valeur, False
+        if cache.add(cle_verrou, cle_entree, timeout=duree_verrou):
+            threading.Thread(target=_rafraichir_en_arriere_plan, args=arguments, daemon=True).start()
+        return valeur, True
+
+    # Aucune valeur à servir : un seul calcul, les autres requêtes attendent son résultat
+    if cache.add(cle_verrou, cle_entree, timeout=duree_verrou):
+        return _rafraichir(*arguments), False
+    limite = time.monotonic() + duree_verrou
+    while True:
+        derniere = cache.get(cle_derniere)
+        if derniere is not None:
+            return derniere[1], derniere[0] != cle_entree
+        if time.monotonic() >= limite or not cache.has_key(cle_verrou):
+            # Verrou expiré ou libéré sans valeur (échec du calcul) : calcul local
+            return calcul(), False
+        time.sleep(INTERVALLE_ATTENTE)
+
+
+# ---------- Invalidation ----------
+
+def ancetres_centre(centre_id):
+    """Nœuds du centre et de ses ancêtres, jusqu'au nœud global"""
+    ligne = CentreVote.objects.filter(pk=centre_id).values_list(
+        'sous_prefecture_id', 'sous_prefecture__departement_id'
+    ).first()
+    if ligne is None:
+        return [('centre', centre_id), GLOBAL]
+    sous_prefecture_id, departement_id = ligne
+    return [('centre', centre_id), ('sous_prefecture', sous_prefecture_id), ('departement', departement_id), GLOBAL]
+
+
+def ancetres_bureau(bureau_id):
+    """Nœuds du bureau et de ses ancêtres, jusqu'au nœud global"""
+    centre_id = BureauVote.objects.filter(pk=bureau_id).values_list('centre_vote_id', flat=True).first()
+    return [('bureau', bureau_id)] + (ancetres_centre(centre_id) if centre_id else [GLOBAL])
+
+
+def _incrementer():
+    noeuds, _local.noeuds = getattr(_local, 'noeuds', set()), set()
+    for noeud in noeuds:
+        try:
+            cache.incr(_cle_version(noeud))
+        except ValueError:
+            # Version absente : la prochaine lecture en crée une nouvelle
+            pass
+
+
+def invalider(noeuds):
+    """
+    Incrémente la version des nœuds après le commit
+
+    Les nœuds d'une même transaction sont regroupés : le premier rappel
+    incrémente chaque version une seule fois, les suivants trouvent l'ensemble vide.
+    """
+    if not hasattr(_local, 'noeuds'):
+        _local.noeuds = set()
+    _local.noeuds.update(noeuds)
+    transaction.on_commit(_incrementer)
+
+
+def invalider_bureau(bureau_id):
+    invalider(ancetres_bureau(bureau_id))
+
+
+def _bureau(sender, instance, **kwargs):
+    if sender is BureauVote:
+        invalider([('bureau', instance.pk)] + ancetres_centre(instance.centre_vote_id))
+    else:
+        invalider_bureau(instance.bureau_vote_id)
+
+
+def _resultat(sender, instance, **kwargs):
+    bureau_id = ProcesVerbal.objects.filter(pk=instance.proces_verbal_id).values_list(
+        'bureau_vote_id', flat=True
+    ).first()
+    if bureau_id:
+        invalider_bureau(bureau_id)
+
+
+def _centre(sender, instance, **kwargs):
+    invalider([('centre', instance.pk), ('sous_prefecture', instance.sous_prefecture_id), GLOBAL])
+
+
+def _sous_prefecture(sender, instance, **kwargs):
+    invalider([('sous_prefecture', instance.pk), ('departement', instance.departement_id), GLOBAL])
+
+
+def _departement(sender, instance, **kwargs):
+    invalider([('departement', instance.pk), GLOBAL])
+
+
+def _utilisateur(sender, instance, update_fields=None, **kwargs):
+    # Un candidat renommé ou un rôle modifié change les colonnes de tous les résultats
+    if update_fields is None:
+        concerne = instance.role == 'candidat'
+    else:
+        concerne = 'role' in update_fields or (instance.role == 'candidat' and CHAMPS_CANDIDAT & set(update_fields))
+    if concerne:
+        invalider([GLOBAL] + [('departement', pk) for pk in Departement.objects.values_list('pk', flat=True)])
+
+
+RECEPTEURS = {
+    BureauVote: _bureau,
+    ProcesVerbal: _bureau,
+    RelevéHoraire: _bureau,
+    ResultatCandidat: _resultat,
+    CentreVote: _centre,
+    SousPrefecture: _sous_prefecture,
+    Departement: _departement,
+}
+
+
+def connecter_signaux():
+    """Branche l'invalidation hiérarchique (appelé depuis AppConfig.ready)"""
+    for modele, recepteur in RECEPTEURS.items():
+        post_save.connect(recepteur, sender=modele, dispatch_uid=f'{PREFIXE}_save_{modele.__name__}')
+        # Pas de post_delete sur ResultatCandidat : la suppression d'un PV invalide déjà son
+        # bureau, celle d'un résultat seul est invalidée par matrice_resultats (une fois par PV)
+        if modele is not ResultatCandidat:
+            post_delete.connect(recepteur, sender=modele, dispatch_uid=f'{PREFIXE}_delete_{modele.__name__}')
+    post_save.connect(_utilisateur, sender=User, dispatch_uid=f'{PREFIXE}_save_User')
@@ -0,0 +1,173 @@
+"""
+Backend de cache Django dans un fichier SQLite, partagé par tous les workers
+
+Aucun service externe : chaque processus ouvre le même fichier (mode WAL, une
+connexion par thread). Les valeurs sont sérialisées avec pickle, comme dans les
+backends fournis par Django. Le fichier est distinct de la base de
+l'application pour ne pas concurrencer ses écritures.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'myApplication.cache_sqlite.SQLiteCache',
+            'LOCATION': BASE_DIR / 'var' / 'cache.sqlite3',
+        }
+    }
+"""
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Attente maximale d'un verrou d'écriture tenu par un autre processus (secondes)
+ATTENTE_VERROU = 5
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._chemin = Path(location)
+        self._local = threading.local()
+
+    # ---------- Connexion ----------
+
+    def _connexion(self):
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None:
+            self._chemin.parent.mkdir(parents=True, exist_ok=True)
+            connexion = sqlite3.connect(self._chemin, timeout=ATTENTE_VERROU, isolation_level=None)
+            connexion.execute('PRAGMA journal_mode=WAL')
+            connexion.execute('PRAGMA synchronous=NORMAL')
+            connexion.execute(
+                'CREATE TABLE IF NOT EXISTS cache (cle TEXT PRIMARY KEY, valeur BLOB NOT NULL, expiration REAL)'
+            )
+            self._local.connexion = connexion
+        return connexion
+
+    def _ecrire(self, cle, valeur, timeout, remplacer=True):
+        expiration = self.get_backend_timeout(timeout)
+        donnees = pickle.dumps(valeur, self.pickle_protocol)
+        connexion = self._connexion()
+        if remplacer:
+            connexion.execute(
+                'INSERT OR REPLACE INTO cache (cle, valeur, expiration) VALUES (?, ?, ?)',
+                (cle, donnees, expiration)
+            )
+            return True
+        # add() : n'écrase qu'une entrée expirée
+        connexion.execute('BEGIN IMMEDIATE')
+        try:
+            connexion.execute('DELETE FROM cache WHERE cle = ? AND expiration <= ?', (cle, time.time()))
+            curseur = connexion.execute(
+                'INSERT OR IGNORE INTO cache (cle, valeur, expiration) VALUES (?, ?, ?)',
+                (cle, donnees, expiration)
+            )
+            connexion.execute('COMMIT')
+        except BaseException:
+            connexion.execute('ROLLBACK')
+            raise
+        return curseur.rowcount == 1
+
+    def _lire(self, cle):
+        ligne = self._connexion().execute(
+            'SELECT valeur FROM cache WHERE cle = ? AND (expiration IS NULL OR expiration > ?)',
+            (cle, time.time())
+        ).fetchone()
+        return None if ligne is None else ligne[0]
+
+    # ---------- API du cache ----------
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._ecrire(key, value, timeout, remplacer=False)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        donnees = self._lire(key)
+        return default if donnees is None else pickle.loads(donnees)
+
+    def get_many(self, keys, version=None):
+        cles = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not cles:
+            return {}
+        marques = ','.join('?' * len(cles))
+        lignes = self._connexion().execute(
+            f'SELECT cle, valeur FROM cache WHERE cle IN ({marques}) AND (expiration IS NULL OR expiration > ?)',
+            (*cles, time.time())
+        ).fetchall()
+        return {cles[cle]: pickle.loads(valeur) for cle, valeur in lignes}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._ecrire(key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expiration = self.get_backend_timeout(timeout)
+        lignes = [
+            (self.make_and_validate_key(key, version=version), pickle.dumps(value, self.pickle_protocol), expiration)
+            for key, value in data.items()
+        ]
+        connexion = self._connexion()
+        connexion.execute('BEGIN IMMEDIATE')
+        try:
+            connexion.executemany('INSERT OR REPLACE INTO cache (cle, valeur, expiration) VALUES (?, ?, ?)', lignes)
+            connexion.execute('COMMIT')
+        except BaseException:
+            connexion.execute('ROLLBACK')
+            raise
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        curseur = self._connexion().execute(
+            'UPDATE cache SET expiration = ? WHERE cle = ? AND (expiration IS NULL OR expiration > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        )
+        return curseur.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connexion().execute('DELETE FROM cache WHERE cle = ?', (key,)).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._lire(key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Incrément atomique entre processus (transaction IMMEDIATE)"""
+        key = self.make_and_validate_key(key, version=version)
+        connexion = self._connexion()
+        connexion.execute('BEGIN IMMEDIATE')
+        try:
+            ligne = connexion.execute(
+                'SELECT valeur FROM cache WHERE cle = ? AND (expiration IS NULL OR expiration > ?)',
+                (key, time.time())
+            ).fetchone()
+            if ligne is None:
+                raise ValueError(f"Key '{key}' not found")
+            valeur = pickle.loads(ligne[0]) + delta
+            connexion.execute(
+                'UPDATE cache SET valeur = ? WHERE cle = ?', (pickle.dumps(valeur, self.pickle_protocol), key)
+            )
+            connexion.execute('COMMIT')
+        except BaseException:
+            connexion.execute('ROLLBACK')
+            raise
+        return valeur
+
+    def clear(self):
+        self._connexion().execute('DELETE FROM cache')
+
+    def purger(self):
+        """Supprime les entrées expirées (appelée par la commande purger_cache)"""
+        return self._connexion().execute(
+            'DELETE FROM cache WHERE expiration IS NOT NULL AND expiration <= ?', (time.time(),)
+        ).rowcount
+
+    def close(self, **kwargs):
+        # Connexion conservée par thread : rien à fermer à la fin de chaque requête
+        pass
@@ -0,0 +1,370 @@
+"""
+Certificats de résultats par bureau de vote
+
+Un certificat tient sur une page : chiffres du PV, voix de chaque candidat,
+statut de vérification et vignette de la photo du PV. Les données de tous les
+bureaux demandés sont chargées en trois requêtes (bureaux avec leur PV,
+résultats, candidats), puis les PDF sont rendus avec ReportLab dans un pool de
+processus : chaque tâche reçoit un dictionnaire déjà complet et ne touche pas
+à la base.
+
+Les fichiers sont conservés dans CERTIFICATS_DIR (bureau_<id>.pdf). Le
+manifeste (manifeste.json) associe à chaque bureau l'empreinte des données
+ayant servi au rendu : un bureau dont le fichier existe avec la même empreinte
+n'est pas rendu à nouveau, ce qui permet de reprendre une génération
+interrompue. La commande generer_certificats et l'action d'admin des bureaux
+s'appuient sur ce module.
+"""
+import hashlib
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.text import slugify
+
+from .exports import FluxZip
+from .fichiers import ecrire_atomique
+from .models import BureauVote, ResultatCandidat, User
+
+# À incrémenter quand la mise en page change : tous les certificats sont alors refaits
+VERSION_GABARIT = 1
+
+# Le manifeste est réécrit toutes les SAUVEGARDE_MANIFESTE tâches terminées
+SAUVEGARDE_MANIFESTE = 25
+
+# Taille maximale de la vignette de la photo du PV (pixels)
+TAILLE_VIGNETTE = (360, 360)
+
+GENERE = 'genere'
+A_JOUR = 'a_jour'
+
+
+def dossier_certificats():
+    return Path(getattr(settings, 'CERTIFICATS_DIR', settings.BASE_DIR / 'var' / 'certificats'))
+
+
+def nombre_processus():
+    return getattr(settings, 'CERTIFICATS_PROCESSUS', None) or os.cpu_count() or 1
+
+
+# ========================================
+# CHARGEMENT DES DONNÉES
+# ========================================
+
+def preparer(bureaux):
+    """
+    Données de rendu des bureaux ayant un PV, chargées en bloc
+
+    Args:
+        bureaux: QuerySet de BureauVote (les bureaux sans PV sont ignorés)
+
+    Returns:
+        list: Un dictionnaire sérialisable par bureau, avec son empreinte
+    """
+    bureaux = BureauVote.objects.filter(pk__in=bureaux.values('pk'), proces_verbal__isnull=False)
+    lignes = list(bureaux.order_by(
+        'centre_vote__sous_prefecture__departement__nom', 'centre_vote__sous_prefecture__nom',
+        'centre_vote__nom', 'numero'
+    ).values(
+        'id', 'numero', 'nombre_inscrits',
+        'centre_vote_id', 'centre_vote__nom',
+        'centre_vote__sous_prefecture__nom', 'centre_vote__sous_prefecture__departement__nom',
+        'proces_verbal__nombre_votants', 'proces_verbal__bulletins_nuls', 'proces_verbal__bulletins_blancs',
+        'proces_verbal__suffrages_exprimes', 'proces_verbal__photo_pv', 'proces_verbal__verifie',
+        'proces_verbal__rejete', 'proces_verbal__date_verification', 'proces_verbal__date_modification',
+        'proces_verbal__verifie_par__first_name', 'proces_verbal__verifie_par__last_name',
+    ))
+
+    candidats = list(
+        User.objects.filter(role='candidat').order_by('numero_candidat', 'first_name', 'id')
+        .values_list('id', 'numero_candidat', 'first_name', 'last_name', 'parti_politique')
+    )
+    voix = {}
+    for bureau_id, candidat_id, nombre in ResultatCandidat.objects.filter(
+        proces_verbal__bureau_vote__in=bureaux
+    ).values_list('proces_verbal__bureau_vote_id', 'candidat_id', 'nombre_voix'):
+        voix.setdefault(bureau_id, {})[candidat_id] = nombre
+
+    donnees = []
+    for ligne in lignes:
+        voix_bureau = voix.get(ligne['id'], {})
+        date_verification = ligne['proces_verbal__date_verification']
+        verificateur = f"{ligne['proces_verbal__verifie_par__first_name'] or ''} " \
+                       f"{ligne['proces_verbal__verifie_par__last_name'] or ''}".strip()
+        photo = ligne['proces_verbal__photo_pv'] or ''
+        chemin_photo = Path(settings.MEDIA_ROOT) / photo if photo else None
+        bureau = {
+            'id': ligne['id'],
+            'numero': ligne['numero'],
+            'centre_id': ligne['centre_vote_id'],
+            'centre': ligne['centre_vote__nom'],
+            'sous_prefecture': ligne['centre_vote__sous_prefecture__nom'],
+            'departement': ligne['centre_vote__sous_prefecture__departement__nom'],
+            'inscrits': ligne['nombre_inscrits'],
+            'votants': ligne['proces_verbal__nombre_votants'],
+            'nuls': ligne['proces_verbal__bulletins_nuls'],
+            'blancs': ligne['proces_verbal__bulletins_blancs'],
+            'exprimes': ligne['proces_verbal__suffrages_exprimes'],
+            'verifie': ligne['proces_verbal__verifie'],
+            'rejete': ligne['proces_verbal__rejete'],
+            'verificateur': verificateur,
+            'date_verification': (
+                timezone.localtime(date_verification).strftime('%d/%m/%Y %H:%M') if date_verification else ''
+            ),
+            'modification': ligne['proces_verbal__date_modification'].isoformat(),
+            'photo': str(chemin_photo) if chemin_photo else '',
+            # Une photo remplacée sous le même nom change de date de modification
+            'photo_modifiee': chemin_photo.stat().st_mtime if chemin_photo and chemin_photo.exists() else None,
+            'candidats': sorted(
+                [
+                    (f"{prenom} {nom}".strip(), numero, parti or '', voix_bureau.get(candidat_id, 0))
+                    for candidat_id, numero, prenom, nom, parti in candidats
+                ],
+                key=lambda candidat: -candidat[3]
+            ),
+        }
+        bureau['empreinte'] = empreinte(bureau)
+        donnees.append(bureau)
+    return donnees
+
+
+def empreinte(bureau):
+    """Empreinte des données d'un certificat, version de la mise en page comprise"""
+    contenu = json.dumps([VERSION_GABARIT, bureau], sort_keys=True, default=str)
+    return hashlib.sha1(contenu.encode('utf-8')).hexdigest()
+
+
+def nom_archive(bureau):
+    """Chemin du certificat dans l'archive ZIP : un dossier par centre de vote"""
+    centre = slugify(bureau['centre']) or 'centre'
+    return f"{centre}-{bureau['centre_id']}/bureau_{slugify(bureau['numero']) or bureau['id']}.pdf"
+
+
+# ========================================
+# RENDU (processus du pool)
+# ========================================
+
+def _vignette(chemin):
+    """Vignette JPEG de la photo du PV, ou None si la photo est absente ou illisible"""
+    if not chemin:
+        return None
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(chemin) as image:
+            image.thumbnail(TAILLE_VIGNETTE)
+            tampon = BytesIO()
+            image.convert('RGB').save(tampon, format='JPEG', quality=80)
+    except (OSError, UnidentifiedImageError):
+        return None
+    tampon.seek(0)
+    return tampon
+
+
+def rendre_certificat(bureau):
+    """Certificat PDF d'un bureau (une page A4), en octets"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    tampon = BytesIO()
+    doc = SimpleDocTemplate(
+        tampon,
+        pagesize=A4,
+        rightMargin=1.8*cm,
+        leftMargin=1.8*cm,
+        topMargin=1.5*cm,
+        bottomMargin=1.5*cm,
+        title=f"Certificat de résultats - Bureau {bureau['numero']} - {bureau['centre']}",
+        author="Système de Gestion Électorale"
+    )
+    styles = getSampleStyleSheet()
+    titre = ParagraphStyle(
+        'CertificatTitre', parent=styles['Heading1'], fontSize=18, alignment=TA_CENTER,
+        textColor=colors.HexColor('#FF8C00'), fontName='Helvetica-Bold', spaceAfter=4
+    )
+    sous_titre = ParagraphStyle(
+        'CertificatSousTitre', parent=styles['Normal'], fontSize=11, alignment=TA_CENTER,
+        textColor=colors.HexColor('#666666'), spaceAfter=12
+    )
+    section = ParagraphStyle(
+        'CertificatSection', parent=styles['Heading3'], fontSize=11,
+        textColor=colors.HexColor('#333333'), spaceBefore=8, spaceAfter=4
+    )
+    style_grille = [
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#FF8C00')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F7F7F7')]),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]
+
+    elements = [
+        Paragraph("Certificat de résultats", titre),
+        Paragraph(
+            f"Bureau {escape(bureau['numero'])} — {escape(bureau['centre'])}<br/>"
+            f"{escape(bureau['sous_prefecture'])}, département de {escape(bureau['departement'])}",
+            sous_titre
+        ),
+    ]
+
+    # Chiffres du PV et vignette de la photo côte à côte
+    def taux(valeur, total):
+        return f"{valeur / total * 100:.2f} %" if total else "—"
+
+    chiffres = Table([
+        ['Procès-verbal', ''],
+        ['Inscrits', f"{bureau['inscrits']:,}".replace(',', ' ')],
+        ['Votants', f"{bureau['votants']:,}".replace(',', ' ')],
+        ['Participation', taux(bureau['votants'], bureau['inscrits'])],
+        ['Bulletins nuls', bureau['nuls']],
+        ['Bulletins blancs', bureau['blancs']],
+        ['Suffrages exprimés', f"{bureau['exprimes']:,}".replace(',', ' ')],
+    ], colWidths=[4.2*cm, 3*cm])
+    chiffres.setStyle(TableStyle(style_grille + [('SPAN', (0, 0), (-1, 0))]))
+
+    vignette = _vignette(bureau['photo'])
+    if vignette is not None:
+        largeur, hauteur = ImageReader(vignette).getSize()
+        vignette.seek(0)
+        echelle = min(7*cm / largeur, 6*cm / hauteur)
+        photo = Image(vignette, width=largeur * echelle, height=hauteur * echelle)
+    else:
+        photo = Paragraph("<i>Photo du PV indisponible</i>", styles['Normal'])
+    entete = Table([[chiffres, photo]], colWidths=[8*cm, 9.4*cm])
+    entete.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'), ('ALIGN', (1, 0), (1, 0), 'CENTER')]))
+    elements += [entete, Spacer(1, 0.3*cm)]
+
+    # Voix par candidat
+    elements.append(Paragraph("Voix par candidat", section))
+    lignes = [['Candidat', 'N°', 'Parti', 'Voix', '%']]
+    for nom, numero, parti, voix in bureau['candidats']:
+        lignes.append([nom, numero or '', parti, f"{voix:,}".replace(',', ' '), taux(voix, bureau['exprimes'])])
+    candidats = Table(lignes, colWidths=[6.4*cm, 1.2*cm, 4.6*cm, 2.6*cm, 2.6*cm], repeatRows=1)
+    candidats.setStyle(TableStyle(style_grille + [('ALIGN', (2, 1), (2, -1), 'LEFT')]))
+    elements.append(candidats)
+
+    # Statut de vérification
+    elements.append(Paragraph("Vérification", section))
+    if bureau['verifie']:
+        par = f" par {escape(bureau['verificateur'])}" if bureau['verificateur'] else ""
+        le = f" le {bureau['date_verification']}" if bureau['date_verification'] else ""
+        statut, couleur = f"PV vérifié{par}{le}", '#2E7D32'
+    elif bureau['rejete']:
+        statut, couleur = "PV rejeté, en attente de correction", '#C62828'
+    else:
+        statut, couleur = "PV en attente de vérification", '#EF6C00'
+    elements.append(Paragraph(f'<font color="{couleur}"><b>{statut}</b></font>', styles['Normal']))
+    elements.append(Spacer(1, 0.4*cm))
+    elements.append(Paragraph(
+        f'<font size="8" color="#999999">Généré le {timezone.localtime().strftime("%d/%m/%Y à %H:%M")}'
+        f' — empreinte {bureau["empreinte"][:12]}</font>',
+        styles['Normal']
+    ))
+
+    doc.build(elements)
+    return tampon.getvalue()
+
+
+def _tache(bureau, chemin):
+    """Rend le certificat d'un bureau et l'écrit sur disque (exécutée dans un processus du pool)"""
+    ecrire_atomique(chemin, rendre_certificat(bureau), mode='wb')
+    return bureau['id']
+
+
+# ========================================
+# GÉNÉRATION PAR LOT
+# ========================================
+
+def _charger_manifeste(dossier):
+    chemin = dossier / 'manifeste.json'
+    if not chemin.exists():
+        return {}
+    with open(chemin, encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+
+def generer(donnees, processus=None, forcer=False, dossier=None):
+    """
+    Génère les certificats manquants ou périmés, au fil de leur achèvement
+
+    Les certificats à jour (fichier présent, empreinte inchangée dans le
+    manifeste) sont renvoyés sans nouveau rendu, sauf avec forcer=True.
+
+    Args:
+        donnees: Résultat de preparer()
+        processus: Taille du pool (CERTIFICATS_PROCESSUS ou nombre de CPU par défaut) ;
+            1 rend dans le processus courant
+
+    Yields:
+        tuple: (bureau, chemin du PDF, GENERE ou A_JOUR)
+    """
+    dossier = Path(dossier or dossier_certificats())
+    dossier.mkdir(parents=True, exist_ok=True)
+    processus = processus or nombre_processus()
+    manifeste = _charger_manifeste(dossier)
+
+    a_rendre = []
+    for bureau in donnees:
+        chemin = dossier / f"bureau_{bureau['id']}.pdf"
+        if not forcer and chemin.exists() and manifeste.get(str(bureau['id'])) == bureau['empreinte']:
+            yield bureau, chemin, A_JOUR
+        else:
+            a_rendre.append((bureau, chemin))
+
+    termines = 0
+
+    def terminer(bureau, chemin):
+        nonlocal termines
+        manifeste[str(bureau['id'])] = bureau['empreinte']
+        termines += 1
+        if termines % SAUVEGARDE_MANIFESTE == 0:
+            ecrire_atomique(dossier / 'manifeste.json', json.dumps(manifeste))
+        return bureau, chemin, GENERE
+
+    try:
+        if processus <= 1 or len(a_rendre) <= 1:
+            for bureau, chemin in a_rendre:
+                _tache(bureau, chemin)
+                yield terminer(bureau, chemin)
+            return
+
+        # Les connexions ouvertes ne doivent pas être partagées avec les processus fils
+        connections.close_all()
+        # django.setup : nécessaire quand les processus sont lancés par « spawn »
+        with ProcessPoolExecutor(max_workers=processus, initializer=django.setup) as pool:
+            taches = {pool.submit(_tache, bureau, chemin): (bureau, chemin) for bureau, chemin in a_rendre}
+            try:
+                for tache in as_completed(taches):
+                    tache.result()
+                    yield terminer(*taches[tache])
+            finally:
+                for tache in taches:
+                    tache.cancel()
+    finally:
+        if termines:
+            ecrire_atomique(dossier / 'manifeste.json', json.dumps(manifeste))
+
+
+def flux_zip(donnees, processus=None, forcer=False, dossier=None):
+    """Archive ZIP des certificats, chaque PDF étant ajouté dès qu'il est prêt"""
+    archive = FluxZip()
+    for bureau, chemin, _statut in generer(donnees, processus, forcer, dossier):
+        # PDF déjà compressé : stocké tel quel
+        yield from archive.ecrire(nom_archive(bureau), chemin.read_bytes(), compression=zipfile.ZIP_STORED)
+    yield from archive.fermer()
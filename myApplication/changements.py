@@ -0,0 +1,159 @@
+"""
+Flux incrémental des changements de PV
+
+Un client demande ce qui a changé depuis son dernier passage : PV créés ou
+modifiés (ordre de date_modification, id) et PV supprimés (traces
+SuppressionPV, ordre de date_suppression, id). Les deux suites sont lues par
+pagination par clé sur leurs index composites, puis fusionnées : un PV passe
+avant une suppression à date égale.
+
+Le jeton de reprise est opaque (signé) : il contient la position du dernier
+changement renvoyé. Les changements plus récents que CHANGEMENTS_MARGE
+secondes ne sont pas encore servis, pour qu'une transaction validée après
+coup avec une date antérieure ne soit pas sautée.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ProcesVerbal, ResultatCandidat, SuppressionPV
+
+SEL_JETON = 'changements_pv'
+
+# Ordre des deux suites à date égale
+PV = 0
+SUPPRESSION = 1
+
+LIMITE_DEFAUT = 500
+LIMITE_MAX = 5000
+
+CHAMPS_PV = [
+    ('pv_id', 'id'),
+    ('bureau_id', 'bureau_vote_id'),
+    ('departement', 'departement__nom'),
+    ('sous_prefecture', 'sous_prefecture__nom'),
+    ('centre', 'centre_vote__nom'),
+    ('bureau', 'bureau_vote__numero'),
+    ('inscrits', 'bureau_vote__nombre_inscrits'),
+    ('votants', 'nombre_votants'),
+    ('nuls', 'bulletins_nuls'),
+    ('blancs', 'bulletins_blancs'),
+    ('exprimes', 'suffrages_exprimes'),
+    ('verifie', 'verifie'),
+    ('rejete', 'rejete'),
+    ('date_modification', 'date_modification'),
+]
+
+
+class JetonInvalide(ValueError):
+    pass
+
+
+def marge():
+    return timedelta(seconds=getattr(settings, 'CHANGEMENTS_MARGE', 5))
+
+
+# ---------- Jeton de reprise ----------
+
+def jeton(position):
+    """Jeton opaque d'une position (date, ordre, id)"""
+    date, ordre, identifiant = position
+    return signing.dumps([date.isoformat(), ordre, identifiant], salt=SEL_JETON)
+
+
+def lire_jeton(valeur):
+    """Position encodée dans un jeton ; None pour un jeton vide (début du flux)"""
+    if not valeur:
+        return None
+    try:
+        date, ordre, identifiant = signing.loads(valeur, salt=SEL_JETON)
+        date = parse_datetime(date)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise JetonInvalide("Jeton de reprise invalide")
+    if date is None or ordre not in (PV, SUPPRESSION):
+        raise JetonInvalide("Jeton de reprise invalide")
+    return date, ordre, int(identifiant)
+
+
+def _apres(champ_date, ordre, position):
+    """Condition « après la position » pour une suite d'ordre donné (borne inférieure sur l'index)"""
+    if position is None:
+        return Q()
+    date, ordre_position, identifiant = position
+    if ordre > ordre_position:
+        return Q(**{f'{champ_date}__gte': date})
+    if ordre == ordre_position:
+        return Q(**{f'{champ_date}__gte': date}) & ~Q(**{champ_date: date, 'id__lte': identifiant})
+    return Q(**{f'{champ_date}__gt': date})
+
+
+# ---------- Lecture ----------
+
+def changements(position=None, limite=LIMITE_DEFAUT):
+    """
+    Changements postérieurs à une position
+
+    Args:
+        position: Résultat de lire_jeton(), None pour tout l'historique
+        limite: Nombre maximal de changements renvoyés
+
+    Returns:
+        tuple: (liste de dicts, position du dernier changement, termine) — termine
+        est vrai si le client a rattrapé le flux
+    """
+    horizon = timezone.now() - marge()
+    pvs = list(
+        ProcesVerbal.objects.filter(_apres('date_modification', PV, position), date_modification__lte=horizon)
+        .order_by('date_modification', 'id')
+        .values_list(*[chemin for _nom, chemin in CHAMPS_PV])[:limite + 1]
+    )
+    suppressions = list(
+        SuppressionPV.objects.filter(
+            _apres('date_suppression', SUPPRESSION, position), date_suppression__lte=horizon
+        ).order_by('date_suppression', 'id')
+        .values_list('id', 'proces_verbal_id', 'bureau_vote_id', 'date_suppression')[:limite + 1]
+    )
+
+    suite = sorted(
+        [(ligne[-1], PV, ligne[0], ligne) for ligne in pvs]
+        + [(ligne[3], SUPPRESSION, ligne[0], ligne) for ligne in suppressions]
+    )
+    termine = len(suite) <= limite
+    suite = suite[:limite]
+
+    pv_ids = [identifiant for _date, ordre, identifiant, _ligne in suite if ordre == PV]
+    voix = {}
+    for pv_id, candidat_id, nombre in ResultatCandidat.objects.filter(
+        proces_verbal_id__in=pv_ids, candidat__role='candidat'
+    ).values_list('proces_verbal_id', 'candidat_id', 'nombre_voix'):
+        voix.setdefault(pv_id, {})[candidat_id] = nombre
+
+    resultat = []
+    for date, ordre, identifiant, ligne in suite:
+        if ordre == PV:
+            changement = {'type': 'pv', **dict(zip([nom for nom, _chemin in CHAMPS_PV], ligne))}
+            changement['date_modification'] = date.isoformat()
+            changement['voix'] = voix.get(identifiant, {})
+        else:
+            _id, pv_id, bureau_id, _date = ligne
+            changement = {'type': 'suppression', 'pv_id': pv_id, 'bureau_id': bureau_id, 'date': date.isoformat()}
+        resultat.append(changement)
+
+    dernier = (suite[-1][0], suite[-1][1], suite[-1][2]) if suite else position
+    return resultat, dernier, termine
+
+
+# ---------- Traces de suppression ----------
+
+def _pv_supprime(sender, instance, **kwargs):
+    SuppressionPV.objects.create(proces_verbal_id=instance.pk, bureau_vote_id=instance.bureau_vote_id)
+
+
+def connecter_signaux():
+    """Enregistre une trace à chaque suppression de PV (appelé depuis AppConfig.ready)"""
+    post_delete.connect(_pv_supprime, sender=ProcesVerbal, dispatch_uid='changements_pv_supprime')
@@ -0,0 +1,113 @@
+"""
+Compteurs de la page d'accueil conservés dans le cache
+
+Les compteurs sont incrémentés ou décrémentés par les signaux post_save
+(création) et post_delete des modèles comptés, après le commit. Les écritures
+qui n'envoient pas de signaux (bulk_create, update de rôle en masse) ainsi que
+les caches propres à chaque processus sont rattrapés par un recomptage complet
+au plus toutes les COMPTEURS_ACCUEIL_RECONCILIATION secondes.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import BureauVote, CentreVote, ProcesVerbal, SousPrefecture, User
+
+PREFIXE = 'compteurs_accueil'
+CLE_RECONCILIATION = f'{PREFIXE}:reconcilie_le'
+
+# Nom du compteur (variable du gabarit home.html) → modèle et filtre éventuel
+COMPTEURS = {
+    'total_bureaux': (BureauVote, None),
+    'total_centres': (CentreVote, None),
+    'total_sous_prefectures': (SousPrefecture, None),
+    'resultats_saisis': (ProcesVerbal, None),
+    'total_candidats': (User, {'role': 'candidat'}),
+}
+
+
+def _cle(nom):
+    return f'{PREFIXE}:{nom}'
+
+
+def _compter(nom):
+    modele, filtre = COMPTEURS[nom]
+    queryset = modele.objects.all()
+    if filtre:
+        queryset = queryset.filter(**filtre)
+    return queryset.count()
+
+
+def reconcilier(noms=None):
+    """Recompte en base les compteurs donnés (tous par défaut) et les écrit dans le cache"""
+    noms = list(noms or COMPTEURS)
+    valeurs = {nom: _compter(nom) for nom in noms}
+    a_ecrire = {_cle(nom): valeur for nom, valeur in valeurs.items()}
+    if len(noms) == len(COMPTEURS):
+        a_ecrire[CLE_RECONCILIATION] = time.time()
+    cache.set_many(a_ecrire, timeout=None)
+    return valeurs
+
+
+def get_compteurs():
+    """
+    Compteurs de la page d'accueil, sans requête tant que le cache est à jour
+
+    Returns:
+        dict: {nom du compteur: valeur}
+    """
+    cles = [_cle(nom) for nom in COMPTEURS] + [CLE_RECONCILIATION]
+    en_cache = cache.get_many(cles)
+
+    intervalle = getattr(settings, 'COMPTEURS_ACCUEIL_RECONCILIATION', 300)
+    if time.time() - en_cache.get(CLE_RECONCILIATION, 0) >= intervalle:
+        return reconcilier()
+
+    compteurs = {nom: en_cache.get(_cle(nom)) for nom in COMPTEURS}
+    manquants = [nom for nom, valeur in compteurs.items() if valeur is None]
+    if manquants:
+        compteurs.update(reconcilier(manquants))
+    return compteurs
+
+
+# ---------- Mise à jour par les signaux ----------
+
+def _ajuster(nom, delta):
+    def appliquer():
+        try:
+            cache.incr(_cle(nom), delta)
+        except ValueError:
+            # Compteur absent du cache : il sera recompté à la prochaine lecture
+            pass
+    transaction.on_commit(appliquer)
+
+
+def _compteurs_concernes(instance):
+    for nom, (modele, filtre) in COMPTEURS.items():
+        if isinstance(instance, modele) and all(getattr(instance, champ) == valeur
+                                                 for champ, valeur in (filtre or {}).items()):
+            yield nom
+
+
+def _apres_enregistrement(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        for nom in _compteurs_concernes(instance):
+            _ajuster(nom, 1)
+    elif sender is User and (update_fields is None or 'role' in update_fields):
+        # Le rôle a pu changer : le nombre de candidats est recompté à la prochaine lecture
+        transaction.on_commit(lambda: cache.delete(_cle('total_candidats')))
+
+
+def _apres_suppression(sender, instance, **kwargs):
+    for nom in _compteurs_concernes(instance):
+        _ajuster(nom, -1)
+
+
+def connecter_signaux():
+    """Branche la mise à jour des compteurs (appelé depuis AppConfig.ready)"""
+    for modele in {modele for modele, _ in COMPTEURS.values()}:
+        post_save.connect(_apres_enregistrement, sender=modele, dispatch_uid=f'{PREFIXE}_save_{modele.__name__}')
+        post_delete.connect(_apres_suppression, sender=modele, dispatch_uid=f'{PREFIXE}_delete_{modele.__name__}')
@@ -0,0 +1,291 @@
+"""
+Exports en flux (CSV et XLSX) pour l'admin
+
+Les lignes sont lues avec values_list(...).iterator(chunk_size=...) : une seule
+requête avec jointures, sans instancier de modèles, et chaque paquet de lignes
+est envoyé au client dès qu'il est produit. La mémoire utilisée ne dépend pas
+de la taille de la sélection et les premiers octets partent immédiatement.
+"""
+import csv
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# Nombre de lignes lues par requête côté base et regroupées par envoi
+TAILLE_PAQUET = 2000
+
+
+class Colonne:
+    """Colonne d'export : un ou plusieurs champs (chemins values_list) et un formatage optionnel"""
+
+    def __init__(self, entete, champs, formater=None):
+        self.entete = entete
+        self.champs = (champs,) if isinstance(champs, str) else tuple(champs)
+        self.formater = formater
+
+    def valeur(self, valeurs):
+        if self.formater:
+            return self.formater(*valeurs)
+        return valeurs[0]
+
+
+def lignes_export(queryset, colonnes, taille_paquet=TAILLE_PAQUET):
+    """Génère les lignes formatées d'un queryset, sans charger la sélection en mémoire"""
+    champs = [champ for colonne in colonnes for champ in colonne.champs]
+    positions = []
+    debut = 0
+    for colonne in colonnes:
+        positions.append((colonne, debut, debut + len(colonne.champs)))
+        debut += len(colonne.champs)
+
+    for ligne in queryset.values_list(*champs).iterator(chunk_size=taille_paquet):
+        yield [colonne.valeur(ligne[a:b]) for colonne, a, b in positions]
+
+
+def _texte(valeur):
+    if valeur is None:
+        return ''
+    if isinstance(valeur, datetime):
+        if timezone.is_aware(valeur):
+            valeur = timezone.localtime(valeur)
+        return valeur.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valeur, date):
+        return valeur.strftime('%d/%m/%Y')
+    if isinstance(valeur, bool):
+        return 'Oui' if valeur else 'Non'
+    return valeur
+
+
+class _Echo:
+    """Pseudo-fichier : write() renvoie la ligne au lieu de la stocker"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def flux_csv(entetes, lignes, taille_paquet=TAILLE_PAQUET, delimiter=';', bom=True):
+    """
+    CSV envoyé par paquets ; par défaut séparé par « ; » avec BOM UTF-8
+    (ouverture directe dans Excel)
+    """
+    writer = csv.writer(_Echo(), delimiter=delimiter)
+    paquet = ['\ufeff' if bom else '', writer.writerow(entetes)]
+    yield ''.join(paquet)
+
+    paquet = []
+    for ligne in lignes:
+        paquet.append(writer.writerow([_texte(valeur) for valeur in ligne]))
+        if len(paquet) >= taille_paquet:
+            yield ''.join(paquet)
+            paquet = []
+    if paquet:
+        yield ''.join(paquet)
+
+
+class _Tampon:
+    """Destination non positionnable d'un ZipFile : les octets écrits sont récupérés par vider()"""
+
+    def __init__(self):
+        self._morceaux = []
+        self._position = 0
+
+    def write(self, donnees):
+        self._morceaux.append(bytes(donnees))
+        self._position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees = b''.join(self._morceaux)
+        self._morceaux = []
+        return donnees
+
+
+class FluxZip:
+    """
+    Archive ZIP produite au fil de l'eau
+
+    Les entrées sont écrites dans un ZipFile dont la destination n'est pas
+    positionnable (descripteurs de données en fin d'entrée), ce qui permet
+    d'envoyer chaque morceau dès qu'il est compressé, sans fichier temporaire.
+    """
+
+    def __init__(self, compression=zipfile.ZIP_DEFLATED):
+        self._tampon = _Tampon()
+        self._zip = zipfile.ZipFile(self._tampon, mode='w', compression=compression, allowZip64=True)
+
+    def ecrire_morceaux(self, nom, morceaux, compression=None):
+        """Ajoute une entrée à partir d'un itérable d'octets ; génère les octets compressés disponibles"""
+        info = zipfile.ZipInfo(nom, date_time=timezone.localtime().timetuple()[:6])
+        info.compress_type = self._zip.compression if compression is None else compression
+        with self._zip.open(info, mode='w', force_zip64=True) as entree:
+            for morceau in morceaux:
+                entree.write(morceau)
+                donnees = self._tampon.vider()
+                if donnees:
+                    yield donnees
+        yield self._tampon.vider()
+
+    def ecrire(self, nom, contenu, compression=None):
+        yield from self.ecrire_morceaux(nom, [contenu], compression)
+
+    def fermer(self):
+        self._zip.close()
+        yield self._tampon.vider()
+
+
+# ---------- XLSX minimal écrit en flux ----------
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Style 1 : en-tête en gras
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def _xlsx_workbook(nom_feuille):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(nom_feuille[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_cellule(valeur, style=''):
+    valeur = _texte(valeur)
+    if isinstance(valeur, (int, float)) and not isinstance(valeur, bool):
+        return f'<c{style}><v>{valeur}</v></c>'
+    return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{escape(str(valeur))}</t></is></c>'
+
+
+def _xlsx_ligne(valeurs, style=''):
+    return '<row>' + ''.join(_xlsx_cellule(valeur, style) for valeur in valeurs) + '</row>'
+
+
+def _xlsx_feuille(entetes, lignes, taille_paquet):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<sheetData>' + _xlsx_ligne(entetes, ' s="1"')
+    ).encode('utf-8')
+
+    paquet = []
+    for ligne in lignes:
+        paquet.append(_xlsx_ligne(ligne))
+        if len(paquet) >= taille_paquet:
+            yield ''.join(paquet).encode('utf-8')
+            paquet = []
+    if paquet:
+        yield ''.join(paquet).encode('utf-8')
+
+    yield b'</sheetData></worksheet>'
+
+
+def flux_xlsx(entetes, lignes, nom_feuille='Export', taille_paquet=TAILLE_PAQUET):
+    """Classeur XLSX d'une feuille, écrit et compressé au fil des lignes"""
+    archive = FluxZip()
+    yield from archive.ecrire('[Content_Types].xml', _XLSX_CONTENT_TYPES.encode('utf-8'))
+    yield from archive.ecrire('_rels/.rels', _XLSX_RELS.encode('utf-8'))
+    yield from archive.ecrire('xl/workbook.xml', _xlsx_workbook(nom_feuille).encode('utf-8'))
+    yield from archive.ecrire('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS.encode('utf-8'))
+    yield from archive.ecrire('xl/styles.xml', _XLSX_STYLES.encode('utf-8'))
+    yield from archive.ecrire_morceaux('xl/worksheets/sheet1.xml', _xlsx_feuille(entetes, lignes, taille_paquet))
+    yield from archive.fermer()
+
+
+def reponse_csv(nom_fichier, entetes, lignes):
+    response = StreamingHttpResponse(flux_csv(entetes, lignes), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}.csv"'
+    return response
+
+
+def reponse_xlsx(nom_fichier, entetes, lignes, nom_feuille='Export'):
+    response = StreamingHttpResponse(
+        flux_xlsx(entetes, lignes, nom_feuille),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}.xlsx"'
+    return response
+
+
+class ExportStreamingMixin:
+    """
+    Actions d'admin « Exporter en CSV » et « Exporter en Excel » en flux
+
+    La classe d'admin déclare export_colonnes (liste de Colonne) et export_nom.
+    """
+
+    actions = ['exporter_csv', 'exporter_xlsx']
+    export_colonnes = []
+    export_nom = 'export'
+
+    def _export(self, queryset):
+        nom_fichier = f'{self.export_nom}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+        entetes = [colonne.entete for colonne in self.export_colonnes]
+        # Les annotations de la liste ne sont pas nécessaires à l'export
+        queryset = self.model._default_manager.filter(pk__in=queryset.values('pk'))
+        return nom_fichier, entetes, lignes_export(queryset, self.export_colonnes)
+
+    def exporter_csv(self, request, queryset):
+        return reponse_csv(*self._export(queryset))
+    exporter_csv.short_description = "📥 Exporter en CSV (Excel)"
+
+    def exporter_xlsx(self, request, queryset):
+        nom_fichier, entetes, lignes = self._export(queryset)
+        return reponse_xlsx(nom_fichier, entetes, lignes, str(self.model._meta.verbose_name_plural))
+    exporter_xlsx.short_description = "📊 Exporter en Excel (.xlsx)"
@@ -0,0 +1,89 @@
+"""
+Écriture de fichiers sans état intermédiaire visible, verrous entre processus
+
+Utilisé par les archives du journal d'audit (segments, index), les
+certificats de résultats (PDF, manifeste), les spools d'audit et l'instantané
+de la matrice des résultats.
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# Attente entre deux essais d'un verrou bloquant sous Windows (secondes)
+INTERVALLE_VERROU = 0.05
+
+
+def ecrire_atomique(chemin, contenu, mode='w', encoding='utf-8'):
+    """
+    Écrit un fichier via un fichier temporaire renommé, sans état intermédiaire visible
+
+    En mode texte, le contenu est encodé en `encoding` (UTF-8 par défaut, quel
+    que soit l'encodage local, cp1252 sous Windows).
+    """
+    chemin = Path(chemin)
+    fd, temporaire = tempfile.mkstemp(dir=chemin.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as fichier:
+            fichier.write(contenu)
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        os.replace(temporaire, chemin)
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        raise
+
+
+def _verrou_windows(fichier, mode):
+    # msvcrt verrouille à partir de la position courante : premier octet, position rétablie
+    fd = fichier.fileno()
+    position = os.lseek(fd, 0, os.SEEK_CUR)
+    os.lseek(fd, 0, os.SEEK_SET)
+    try:
+        msvcrt.locking(fd, mode, 1)
+    finally:
+        os.lseek(fd, position, os.SEEK_SET)
+
+
+def verrouiller(fichier, bloquant=True):
+    """
+    Pose un verrou exclusif entre processus sur un fichier ouvert
+
+    Le verrou tient jusqu'à deverrouiller() ou la fermeture du fichier, y
+    compris si le processus s'arrête brutalement (flock sous Unix, premier
+    octet verrouillé par msvcrt sous Windows). Il est propre au fichier ouvert :
+    une autre ouverture du même fichier, même dans ce processus, ne l'obtient pas.
+
+    Returns:
+        bool: False si le verrou est tenu ailleurs (seulement si bloquant est faux)
+    """
+    if fcntl is not None:
+        try:
+            fcntl.flock(fichier.fileno(), fcntl.LOCK_EX | (0 if bloquant else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+
+    while True:
+        try:
+            _verrou_windows(fichier, msvcrt.LK_NBLCK)
+            return True
+        except OSError:
+            if not bloquant:
+                return False
+            time.sleep(INTERVALLE_VERROU)
+
+
+def deverrouiller(fichier):
+    if fcntl is not None:
+        fcntl.flock(fichier.fileno(), fcntl.LOCK_UN)
+    else:
+        _verrou_windows(fichier, msvcrt.LK_UNLCK)
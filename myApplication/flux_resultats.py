@@ -0,0 +1,197 @@
+"""
+Flux des résultats par bureau, lisible par machine
+
+Un enregistrement par bureau de vote : noms de la hiérarchie, inscrits,
+chiffres du PV, voix par candidat, statut de vérification et date de dernière
+modification. Trois requêtes quelle que soit la sélection : candidats, bureaux
+avec leur PV, résultats. Bureaux et résultats sont lus par paquets
+(iterator(chunk_size=...)), tous deux triés par bureau, et fusionnés au fil de
+la lecture : aucune des deux sélections n'est chargée entièrement.
+
+Formats :
+- ndjson : un objet JSON par ligne, voix indexées par identifiant de candidat ;
+- csv : séparateur virgule, sans BOM, une colonne voix_<id> par candidat ;
+- npz : archive de colonnes numpy (np.load), une par champ, plus la matrice
+  des voix (bureaux × candidats) et les identifiants et noms des candidats.
+"""
+import io
+import json
+import zipfile
+
+import numpy as np
+
+from .exports import TAILLE_PAQUET, FluxZip, flux_csv
+from .models import BureauVote, ResultatCandidat, User
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'npz': 'application/octet-stream',
+}
+
+CHAMPS_BUREAU = [
+    ('bureau_id', 'id'),
+    ('departement', 'centre_vote__sous_prefecture__departement__nom'),
+    ('sous_prefecture', 'centre_vote__sous_prefecture__nom'),
+    ('centre', 'centre_vote__nom'),
+    ('bureau', 'numero'),
+    ('inscrits', 'nombre_inscrits'),
+    ('votants', 'proces_verbal__nombre_votants'),
+    ('nuls', 'proces_verbal__bulletins_nuls'),
+    ('blancs', 'proces_verbal__bulletins_blancs'),
+    ('exprimes', 'proces_verbal__suffrages_exprimes'),
+    ('verifie', 'proces_verbal__verifie'),
+    ('date_modification', 'proces_verbal__date_modification'),
+]
+NOMS_CHAMPS = [nom for nom, _chemin in CHAMPS_BUREAU]
+COLONNES_ENTIERES = ('inscrits', 'votants', 'nuls', 'blancs', 'exprimes')
+
+
+def selection(departement=None, sous_prefecture=None):
+    """Bureaux de vote d'un département ou d'une sous-préfecture"""
+    bureaux = BureauVote.objects.all()
+    if departement:
+        bureaux = bureaux.filter(centre_vote__sous_prefecture__departement_id=departement)
+    if sous_prefecture:
+        bureaux = bureaux.filter(centre_vote__sous_prefecture_id=sous_prefecture)
+    return bureaux
+
+
+def candidats():
+    """Candidats dans l'ordre des colonnes : liste de (id, nom complet)"""
+    return [
+        (pk, f"{prenom} {nom}".strip())
+        for pk, prenom, nom in User.objects.filter(role='candidat').order_by(
+            'numero_candidat', 'first_name', 'id'
+        ).values_list('id', 'first_name', 'last_name')
+    ]
+
+
+def enregistrements(bureaux, taille_paquet=TAILLE_PAQUET):
+    """
+    Génère un dictionnaire par bureau, trié par identifiant
+
+    Les bureaux sans PV ont des chiffres à None et des voix vides.
+    """
+    lignes = bureaux.order_by('id').values_list(
+        *[chemin for _nom, chemin in CHAMPS_BUREAU]
+    ).iterator(chunk_size=taille_paquet)
+    resultats = ResultatCandidat.objects.filter(
+        proces_verbal__bureau_vote__in=bureaux, candidat__role='candidat'
+    ).order_by('proces_verbal__bureau_vote_id').values_list(
+        'proces_verbal__bureau_vote_id', 'candidat_id', 'nombre_voix'
+    ).iterator(chunk_size=taille_paquet)
+
+    # Fusion des deux lectures triées par bureau
+    courant = next(resultats, None)
+    for ligne in lignes:
+        bureau_id = ligne[0]
+        voix = {}
+        while courant is not None and courant[0] <= bureau_id:
+            if courant[0] == bureau_id:
+                voix[courant[1]] = courant[2]
+            courant = next(resultats, None)
+        enregistrement = dict(zip(NOMS_CHAMPS, ligne))
+        enregistrement['voix'] = voix
+        yield enregistrement
+
+
+def _iso(date_modification):
+    return date_modification.isoformat() if date_modification else None
+
+
+# ---------- NDJSON ----------
+
+def flux_ndjson(bureaux, taille_paquet=TAILLE_PAQUET):
+    paquet = []
+    for enregistrement in enregistrements(bureaux, taille_paquet):
+        enregistrement['date_modification'] = _iso(enregistrement['date_modification'])
+        paquet.append(json.dumps(enregistrement, ensure_ascii=False))
+        if len(paquet) >= taille_paquet:
+            yield '\n'.join(paquet) + '\n'
+            paquet = []
+    if paquet:
+        yield '\n'.join(paquet) + '\n'
+
+
+# ---------- CSV ----------
+
+def flux_csv_resultats(bureaux, taille_paquet=TAILLE_PAQUET):
+    identifiants = [pk for pk, _nom in candidats()]
+    entetes = NOMS_CHAMPS + [f'voix_{pk}' for pk in identifiants]
+
+    def lignes():
+        for enregistrement in enregistrements(bureaux, taille_paquet):
+            a_pv = enregistrement['date_modification'] is not None
+            valeurs = [enregistrement[nom] for nom in NOMS_CHAMPS]
+            valeurs[NOMS_CHAMPS.index('verifie')] = (
+                ('true' if enregistrement['verifie'] else 'false') if a_pv else ''
+            )
+            valeurs[NOMS_CHAMPS.index('date_modification')] = _iso(enregistrement['date_modification'])
+            voix = enregistrement['voix']
+            yield valeurs + [voix.get(pk, 0) if a_pv else None for pk in identifiants]
+
+    return flux_csv(entetes, lignes(), taille_paquet, delimiter=',', bom=False)
+
+
+# ---------- Colonnes numpy (.npz) ----------
+
+def _npy(tableau):
+    tampon = io.BytesIO()
+    np.lib.format.write_array(tampon, tableau, allow_pickle=False)
+    return tampon.getvalue()
+
+
+def flux_npz(bureaux, taille_paquet=TAILLE_PAQUET):
+    """
+    Archive .npz des colonnes : les valeurs manquantes (bureau sans PV) valent
+    -1 pour les entiers et NaT pour les dates ; la colonne a_pv les distingue
+    """
+    liste_candidats = candidats()
+    position = {pk: i for i, (pk, _nom) in enumerate(liste_candidats)}
+    colonnes = {nom: [] for nom in NOMS_CHAMPS}
+    lignes_voix = []
+    for enregistrement in enregistrements(bureaux, taille_paquet):
+        for nom in NOMS_CHAMPS:
+            colonnes[nom].append(enregistrement[nom])
+        ligne = np.zeros(len(liste_candidats), dtype=np.int64)
+        for candidat_id, voix in enregistrement['voix'].items():
+            ligne[position[candidat_id]] = voix
+        lignes_voix.append(ligne)
+
+    a_pv = np.array([date is not None for date in colonnes['date_modification']], dtype=bool)
+    tableaux = {
+        'bureau_id': np.array(colonnes['bureau_id'], dtype=np.int64),
+        'a_pv': a_pv,
+        'verifie': np.array([bool(valeur) for valeur in colonnes['verifie']], dtype=bool),
+        'date_modification': np.array(
+            [np.datetime64(date.replace(tzinfo=None), 'us') if date else np.datetime64('NaT', 'us')
+             for date in colonnes['date_modification']],
+            dtype='datetime64[us]'
+        ),
+        'voix': (np.vstack(lignes_voix) if lignes_voix
+                 else np.zeros((0, len(liste_candidats)), dtype=np.int64)),
+        'candidat_id': np.array([pk for pk, _nom in liste_candidats], dtype=np.int64),
+        'candidat_nom': np.array([nom for _pk, nom in liste_candidats], dtype=str),
+    }
+    for nom in ('departement', 'sous_prefecture', 'centre', 'bureau'):
+        tableaux[nom] = np.array(colonnes[nom], dtype=str)
+    for nom in COLONNES_ENTIERES:
+        tableaux[nom] = np.array([-1 if valeur is None else valeur for valeur in colonnes[nom]], dtype=np.int64)
+
+    archive = FluxZip(compression=zipfile.ZIP_DEFLATED)
+    for nom, tableau in tableaux.items():
+        yield from archive.ecrire(f'{nom}.npy', _npy(tableau))
+    yield from archive.fermer()
+
+
+GENERATEURS = {
+    'ndjson': flux_ndjson,
+    'csv': flux_csv_resultats,
+    'npz': flux_npz,
+}
+
+
+def flux(format_sortie, bureaux):
+    """Génère le flux du format demandé (clé de FORMATS)"""
+    return GENERATEURS[format_sortie](bureaux)
@@ -0,0 +1,130 @@
+"""
+Clés de hiérarchie dénormalisées des tables de faits
+
+ProcesVerbal, ResultatCandidat et RelevéHoraire portent centre_vote,
+sous_prefecture et departement (models.RattachementHierarchie). Ce module
+les tient à jour quand la hiérarchie elle-même change : un bureau qui change
+de centre, un centre de sous-préfecture ou une sous-préfecture de département
+fait réécrire, par des UPDATE sur index, les clés des lignes qui en dépendent.
+Les enregistrements qui ne touchent pas au parent (update_fields sans lui) ne
+coûtent aucune requête.
+
+verifier() compare les clés à la hiérarchie réelle et peut corriger les
+écarts (écritures hors ORM, mises à jour en masse du parent).
+"""
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.signals import post_save, pre_save
+
+from .models import (
+    CHEMINS_HIERARCHIE, BureauVote, CentreVote, ProcesVerbal, RelevéHoraire, ResultatCandidat, SousPrefecture,
+)
+
+# Lignes recalculées par UPDATE lors d'une correction
+TAILLE_PAQUET = 500
+
+FAITS = [ProcesVerbal, ResultatCandidat, RelevéHoraire]
+
+# Niveau de la hiérarchie → champ du parent
+PARENTS = {
+    BureauVote: 'centre_vote_id',
+    CentreVote: 'sous_prefecture_id',
+    SousPrefecture: 'departement_id',
+}
+
+
+# ========================================
+# PROPAGATION DES CHANGEMENTS DE PARENT
+# ========================================
+
+def _cles(instance):
+    """Nouvelles clés des lignes rattachées à un bureau, un centre ou une sous-préfecture"""
+    if isinstance(instance, SousPrefecture):
+        return {'departement_id': instance.departement_id}
+    if isinstance(instance, CentreVote):
+        departement_id = SousPrefecture.objects.filter(
+            pk=instance.sous_prefecture_id
+        ).values_list('departement_id', flat=True).first()
+        return {'sous_prefecture_id': instance.sous_prefecture_id, 'departement_id': departement_id}
+    sous_prefecture_id, departement_id = CentreVote.objects.filter(pk=instance.centre_vote_id).values_list(
+        'sous_prefecture_id', 'sous_prefecture__departement_id'
+    ).first() or (None, None)
+    return {
+        'centre_vote_id': instance.centre_vote_id,
+        'sous_prefecture_id': sous_prefecture_id,
+        'departement_id': departement_id,
+    }
+
+
+def _lignes_rattachees(modele, instance):
+    """Lignes d'une table de faits rattachées à un bureau, un centre ou une sous-préfecture"""
+    if isinstance(instance, BureauVote):
+        return modele.objects.filter(**{f'{modele.CHEMIN_BUREAU}_id': instance.pk})
+    # Centre et sous-préfecture : la clé dénormalisée elle-même
+    champ = 'centre_vote_id' if isinstance(instance, CentreVote) else 'sous_prefecture_id'
+    return modele.objects.filter(**{champ: instance.pk})
+
+
+def _avant_enregistrement(sender, instance, raw=False, update_fields=None, **kwargs):
+    champ = PARENTS[sender]
+    instance._parent_hierarchie = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and champ not in update_fields and champ[:-3] not in update_fields:
+        return
+    instance._parent_hierarchie = sender.objects.filter(pk=instance.pk).values_list(champ, flat=True).first()
+
+
+def _apres_enregistrement(sender, instance, created, raw=False, **kwargs):
+    ancien = getattr(instance, '_parent_hierarchie', None)
+    if created or raw or ancien is None or ancien == getattr(instance, PARENTS[sender]):
+        return
+    cles = _cles(instance)
+    for modele in FAITS:
+        _lignes_rattachees(modele, instance).exclude(**cles).update(**cles)
+
+
+def connecter_signaux():
+    """Propage les changements de parent de la hiérarchie (appelé depuis AppConfig.ready)"""
+    for modele in PARENTS:
+        pre_save.connect(_avant_enregistrement, sender=modele, dispatch_uid=f'hierarchie_pre_{modele.__name__}')
+        post_save.connect(_apres_enregistrement, sender=modele, dispatch_uid=f'hierarchie_post_{modele.__name__}')
+
+
+# ========================================
+# CONTRÔLE DE COHÉRENCE
+# ========================================
+
+def ecarts(modele):
+    """Lignes d'une table de faits dont une clé est vide ou diffère de la hiérarchie réelle"""
+    condition = Q()
+    for champ, chemin in CHEMINS_HIERARCHIE.items():
+        condition |= ~Q(**{champ: F(f'{modele.CHEMIN_BUREAU}__{chemin}')})
+    return modele.objects.filter(condition)
+
+
+def _corriger(modele, identifiants):
+    """Recalcule les clés des lignes données depuis leur bureau (un UPDATE par paquet)"""
+    valeurs = {
+        champ: Subquery(modele.bureau_source(OuterRef(modele.CHAMP_SOURCE)).values(chemin)[:1])
+        for champ, chemin in CHEMINS_HIERARCHIE.items()
+    }
+    for debut in range(0, len(identifiants), TAILLE_PAQUET):
+        modele.objects.filter(pk__in=identifiants[debut:debut + TAILLE_PAQUET]).update(**valeurs)
+
+
+def verifier(corriger=False):
+    """
+    Contrôle les clés dénormalisées de chaque table de faits
+
+    Returns:
+        dict: Nom du modèle → nombre de lignes en écart (corrigées si corriger)
+    """
+    resultat = {}
+    for modele in FAITS:
+        identifiants = list(ecarts(modele).values_list('pk', flat=True))
+        if corriger and identifiants:
+            with transaction.atomic():
+                _corriger(modele, identifiants)
+        resultat[modele._meta.verbose_name_plural] = len(identifiants)
+    return resultat
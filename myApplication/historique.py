@@ -0,0 +1,241 @@
+"""
+Historique immuable des résultats, interrogeable « au » moment donné
+
+Un instantané (HistoriqueResultats) fige les résultats d'un département : les
+totaux du département, de chaque sous-préfecture et de chaque centre, et
+l'état des bureaux sous forme de différence avec l'instantané précédent
+(seuls les bureaux modifiés sont enregistrés). Tous les HISTORIQUE_BASE
+instantanés, ou quand la liste des candidats change, un instantané de base
+enregistre tous les bureaux : l'état d'un bureau se reconstruit à partir de la
+dernière base et des différences suivantes, sans relire PV ni résultats.
+
+L'état d'un bureau est une liste [a_pv, inscrits, votants, nuls, blancs,
+exprimes, voix...] dans l'ordre des candidats de l'instantané.
+"""
+import hashlib
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+
+from .matrice_resultats import pourcentages
+from .models import BureauVote, Departement, HistoriqueResultats, ResultatCandidat, User
+
+CHAMPS_BUREAU = ['a_pv', 'inscrits', 'votants', 'nuls', 'blancs', 'exprimes']
+CHAMPS_TOTAUX = ['bureaux', 'bureaux_saisis', 'inscrits', 'votants', 'nuls', 'blancs', 'exprimes']
+
+
+def intervalle_base():
+    return getattr(settings, 'HISTORIQUE_BASE', 24)
+
+
+def _compresser(bureaux):
+    return zlib.compress(json.dumps(bureaux, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def _decompresser(donnees):
+    # Les clés JSON sont des chaînes : identifiants de bureaux rétablis en entiers
+    return {int(bureau_id): etat for bureau_id, etat in json.loads(zlib.decompress(bytes(donnees))).items()}
+
+
+def _empreinte(candidats, etats):
+    contenu = json.dumps([candidats, sorted(etats.items())], separators=(',', ':'))
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+# ========================================
+# ÉTAT COURANT
+# ========================================
+
+def _totaux_vides(nb_candidats, **libelle):
+    return {**libelle, **dict.fromkeys(CHAMPS_TOTAUX, 0), 'voix': [0] * nb_candidats}
+
+
+def _cumuler(totaux, etat):
+    """Ajoute l'état d'un bureau aux totaux d'un groupe"""
+    totaux['bureaux'] += 1
+    totaux['bureaux_saisis'] += etat[0]
+    for champ, valeur in zip(CHAMPS_BUREAU[1:], etat[1:]):
+        totaux[champ] += valeur
+    totaux['voix'] = [total + voix for total, voix in zip(totaux['voix'], etat[len(CHAMPS_BUREAU):])]
+
+
+def etat_courant(departement):
+    """
+    Résultats actuels du département, lus dans la base
+
+    Deux requêtes (bureaux avec leur PV, voix des PV du département) en plus de
+    la liste des candidats : l'instantané ne dépend pas de la fraîcheur de la
+    matrice des résultats du processus.
+
+    Returns:
+        tuple: (identifiants des candidats, totaux par niveau, {bureau_id: état})
+    """
+    candidats = list(
+        User.objects.filter(role='candidat').order_by('numero_candidat', 'first_name', 'id')
+        .values_list('id', flat=True)
+    )
+    colonnes = {candidat_id: i for i, candidat_id in enumerate(candidats)}
+
+    # Bureaux dans l'ordre de la hiérarchie : les groupes de totaux suivent cet ordre
+    bureaux = BureauVote.objects.filter(centre_vote__sous_prefecture__departement=departement).order_by(
+        'centre_vote__sous_prefecture_id', 'centre_vote_id', 'id'
+    ).values_list(
+        'id', 'nombre_inscrits', 'proces_verbal__id', 'proces_verbal__nombre_votants',
+        'proces_verbal__bulletins_nuls', 'proces_verbal__bulletins_blancs', 'proces_verbal__suffrages_exprimes',
+        'centre_vote_id', 'centre_vote__nom', 'centre_vote__sous_prefecture_id', 'centre_vote__sous_prefecture__nom',
+    )
+    voix = ResultatCandidat.objects.filter(
+        departement=departement, candidat__role='candidat'
+    ).values_list('proces_verbal__bureau_vote_id', 'candidat_id', 'nombre_voix')
+
+    etats = {}
+    groupes = {}
+    for bureau_id, inscrits, pv_id, votants, nuls, blancs, exprimes, *libelles in bureaux:
+        a_pv = pv_id is not None
+        etats[bureau_id] = [int(a_pv), inscrits, votants or 0, nuls or 0, blancs or 0, exprimes or 0] + (
+            [0] * len(candidats)
+        )
+        groupes[bureau_id] = libelles
+
+    bureaux_par_candidat = [0] * len(candidats)
+    for bureau_id, candidat_id, nombre in voix:
+        if bureau_id in etats:
+            etats[bureau_id][len(CHAMPS_BUREAU) + colonnes[candidat_id]] = nombre
+            bureaux_par_candidat[colonnes[candidat_id]] += 1
+
+    totaux_departement = _totaux_vides(len(candidats))
+    sous_prefectures = {}
+    centres = {}
+    for bureau_id, etat in etats.items():
+        centre_id, centre_nom, sous_prefecture_id, sous_prefecture_nom = groupes[bureau_id]
+        _cumuler(totaux_departement, etat)
+        _cumuler(sous_prefectures.setdefault(
+            sous_prefecture_id, _totaux_vides(len(candidats), id=sous_prefecture_id, nom=sous_prefecture_nom)
+        ), etat)
+        _cumuler(centres.setdefault(centre_id, _totaux_vides(len(candidats), id=centre_id, nom=centre_nom)), etat)
+    totaux_departement['taux_participation'] = float(
+        pourcentages(totaux_departement['votants'], totaux_departement['inscrits'])
+    )
+    totaux_departement['bureaux_par_candidat'] = bureaux_par_candidat
+
+    return candidats, {
+        'departement': totaux_departement,
+        'sous_prefecture': list(sous_prefectures.values()),
+        'centre': list(centres.values()),
+    }, etats
+
+
+# ========================================
+# ÉCRITURE
+# ========================================
+
+def historiser(departement, forcer=False):
+    """
+    Enregistre un instantané du département
+
+    Sans forcer, rien n'est créé si l'état des bureaux n'a pas changé depuis
+    le dernier instantané : celui-ci reste la réponse pour toute date ultérieure.
+
+    Returns:
+        tuple: (instantané, cree)
+    """
+    candidats, totaux, etats = etat_courant(departement)
+    empreinte = _empreinte(candidats, etats)
+
+    with transaction.atomic():
+        # Un seul instantané par précédent (OneToOne) : la chaîne reste linéaire
+        # même si deux historisations du département se croisent
+        Departement.objects.select_for_update().get(pk=departement.pk)
+        dernier = HistoriqueResultats.objects.filter(departement=departement).order_by('-id').first()
+        if dernier is not None and dernier.empreinte == empreinte and not forcer:
+            return dernier, False
+
+        base = _derniere_base(departement.id, dernier.id if dernier else 0)
+        depuis_base = (
+            HistoriqueResultats.objects.filter(departement=departement, id__gt=base.id).count() if base else 0
+        )
+        complet = dernier is None or dernier.candidats != candidats or depuis_base + 1 >= intervalle_base()
+
+        if complet:
+            modifies = etats
+        else:
+            anciens = etats_bureaux(dernier)
+            modifies = {bureau_id: etat for bureau_id, etat in etats.items() if anciens.get(bureau_id) != etat}
+            # Bureau supprimé depuis l'instantané précédent
+            modifies.update({bureau_id: None for bureau_id in anciens if bureau_id not in etats})
+
+        instantane = HistoriqueResultats.objects.create(
+            departement=departement,
+            precedent=dernier,
+            complet=complet,
+            candidats=candidats,
+            totaux=totaux,
+            bureaux=_compresser(modifies),
+            nombre_bureaux=len(modifies),
+            empreinte=empreinte,
+        )
+    return instantane, True
+
+
+# ========================================
+# LECTURE
+# ========================================
+
+def _derniere_base(departement_id, jusqu_a):
+    """Dernier instantané de base du département d'identifiant inférieur ou égal à jusqu_a"""
+    return HistoriqueResultats.objects.filter(
+        departement_id=departement_id, complet=True, id__lte=jusqu_a
+    ).order_by('-id').only('id').first()
+
+
+def au(departement, date):
+    """Instantané en vigueur à la date donnée (le dernier antérieur), ou None"""
+    return HistoriqueResultats.objects.filter(
+        departement=departement, date__lte=date
+    ).order_by('-date', '-id').first()
+
+
+def etats_bureaux(instantane):
+    """
+    État de chaque bureau à la date de l'instantané
+
+    Deux requêtes : la dernière base, puis les instantanés qui la suivent
+    jusqu'à celui demandé (au plus HISTORIQUE_BASE), dont les différences sont
+    appliquées dans l'ordre.
+    """
+    if instantane.complet:
+        return _decompresser(instantane.bureaux)
+    base = _derniere_base(instantane.departement_id, instantane.id)
+    chaine = HistoriqueResultats.objects.filter(
+        departement_id=instantane.departement_id, id__gte=base.id, id__lte=instantane.id
+    ).order_by('id').values_list('bureaux', flat=True)
+
+    etats = {}
+    for bureaux in chaine:
+        for bureau_id, etat in _decompresser(bureaux).items():
+            if etat is None:
+                etats.pop(bureau_id, None)
+            else:
+                etats[bureau_id] = etat
+    return etats
+
+
+def serialiser(instantane, avec_bureaux=False):
+    """Représentation JSON d'un instantané (totaux, et état des bureaux si demandé)"""
+    donnees = {
+        'identifiant': str(instantane.identifiant),
+        'departement': instantane.departement_id,
+        'date': instantane.date.isoformat(),
+        'precedent': str(instantane.precedent.identifiant) if instantane.precedent_id else None,
+        'candidats': instantane.candidats,
+        'totaux': instantane.totaux,
+    }
+    if avec_bureaux:
+        donnees['champs_bureau'] = CHAMPS_BUREAU + ['voix']
+        donnees['bureaux'] = {
+            bureau_id: {**dict(zip(CHAMPS_BUREAU, etat)), 'voix': etat[len(CHAMPS_BUREAU):]}
+            for bureau_id, etat in sorted(etats_bureaux(instantane).items())
+        }
+    return donnees
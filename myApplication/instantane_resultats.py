@@ -0,0 +1,248 @@
+"""
+Instantané binaire de la matrice des résultats, partagé entre les processus
+
+Le fichier contient tous les tableaux de MatriceResultats, alignés sur 64
+octets, suivis d'un bloc JSON (noms, candidats, signature de la base, position
+et type de chaque tableau). L'en-tête porte un numéro de version et l'empreinte
+de la base dont l'instantané est une copie :
+
+    magic (8 octets) | version (uint64) | position du JSON (uint64) | taille du JSON (uint64)
+    | SHA-256 de l'identité de la base (32 octets)
+
+Un instantané écrit pour une autre base (autre serveur, autre copie du projet,
+base de test) est traité comme absent et reconstruit.
+
+Chaque processus projette le fichier en mémoire en lecture seule (mmap) :
+les tableaux NumPy pointent directement dans les pages du fichier, partagées
+par tous les processus. Le fichier est remplacé atomiquement
+(fichiers.ecrire_atomique) ; un processus qui voit le fichier changer
+projette la nouvelle version, l'ancienne reste valide pour les lectures en cours.
+Sous Windows, un fichier projeté ne peut pas être remplacé : l'instantané y
+est désactivé par défaut (MATRICE_RESULTATS_INSTANTANE).
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from .fichiers import deverrouiller, ecrire_atomique, verrouiller
+from .matrice_resultats import MatriceResultats, signature_base
+
+MAGIC = b'RESMAT03'
+EN_TETE = struct.Struct('<8sQQQ32s')
+ALIGNEMENT = 64
+
+
+def chemin_instantane():
+    return Path(settings.MATRICE_RESULTATS_INSTANTANE)
+
+
+def _aligner(position):
+    return -(-position // ALIGNEMENT) * ALIGNEMENT
+
+
+def identite_base():
+    """Empreinte de la base par défaut (moteur, hôte, port et nom)"""
+    reglages = connection.settings_dict
+    identite = f"{connection.vendor}:{reglages.get('HOST') or ''}:{reglages.get('PORT') or ''}:{reglages['NAME']}"
+    return hashlib.sha256(identite.encode('utf-8')).digest()
+
+
+def _lire_en_tete(chemin):
+    """(magic, version, position du JSON, taille du JSON, base), ou None si le fichier est absent ou tronqué"""
+    try:
+        with open(chemin, 'rb') as fichier:
+            return EN_TETE.unpack(fichier.read(EN_TETE.size))
+    except (FileNotFoundError, struct.error):
+        return None
+
+
+def lire_version(chemin=None):
+    """
+    Version de l'instantané, en lisant seulement l'en-tête
+
+    None si le fichier est absent, invalide ou écrit pour une autre base.
+    """
+    en_tete = _lire_en_tete(chemin or chemin_instantane())
+    if en_tete is None or en_tete[0] != MAGIC or en_tete[4] != identite_base():
+        return None
+    return en_tete[1]
+
+
+def ecrire_instantane(matrice, chemin=None):
+    """
+    Écrit l'instantané de la matrice et remplace atomiquement le fichier existant
+
+    Returns:
+        int: Version écrite
+    """
+    chemin = Path(chemin or chemin_instantane())
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    # La numérotation continue même si l'instantané précédent était celui d'une autre base
+    en_tete = _lire_en_tete(chemin)
+    version = (en_tete[1] if en_tete is not None and en_tete[0] == MAGIC else 0) + 1
+
+    descriptions = {}
+    position = _aligner(EN_TETE.size)
+    tableaux = {nom: np.ascontiguousarray(tableau) for nom, tableau in matrice.tableaux().items()}
+    for nom, tableau in tableaux.items():
+        descriptions[nom] = {'type': tableau.dtype.str, 'forme': list(tableau.shape), 'position': position}
+        position = _aligner(position + tableau.nbytes)
+
+    metadonnees = json.dumps({**matrice.metadonnees(), 'tableaux': descriptions}, ensure_ascii=False).encode('utf-8')
+
+    contenu = bytearray(position + len(metadonnees))
+    contenu[:EN_TETE.size] = EN_TETE.pack(MAGIC, version, position, len(metadonnees), identite_base())
+    for nom, tableau in tableaux.items():
+        debut = descriptions[nom]['position']
+        contenu[debut:debut + tableau.nbytes] = tableau.tobytes()
+    contenu[position:] = metadonnees
+    ecrire_atomique(chemin, contenu, 'wb')
+
+    return version
+
+
+def projeter_instantane(chemin=None):
+    """
+    Projette l'instantané en mémoire et construit une matrice sur ses pages, sans copie
+
+    Returns:
+        tuple: (MatriceResultats en lecture seule, version)
+    """
+    with open(chemin or chemin_instantane(), 'rb') as fichier:
+        projection = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, position, taille, base = EN_TETE.unpack_from(projection, 0)
+    if magic != MAGIC or base != identite_base():
+        projection.close()
+        raise ValueError("Fichier d'instantané invalide ou écrit pour une autre base")
+
+    metadonnees = json.loads(projection[position:position + taille].decode('utf-8'))
+    tableaux = {}
+    for nom, description in metadonnees['tableaux'].items():
+        forme = tuple(description['forme'])
+        tableaux[nom] = np.frombuffer(
+            projection, dtype=np.dtype(description['type']),
+            count=int(np.prod(forme)), offset=description['position']
+        ).reshape(forme)
+
+    matrice = MatriceResultats.depuis_tableaux(tableaux, metadonnees)
+    # La projection reste ouverte tant que la matrice (et ses tableaux) sont utilisés
+    matrice.projection = projection
+    return matrice, version
+
+
+class _Verrou:
+    """Verrou exclusif entre processus (fichier .lock à côté de l'instantané)"""
+
+    def __init__(self, chemin):
+        self.chemin = Path(f'{chemin}.lock')
+
+    def __enter__(self):
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        self.fichier = open(self.chemin, 'w')
+        verrouiller(self.fichier)
+        return self
+
+    def __exit__(self, *exc):
+        deverrouiller(self.fichier)
+        self.fichier.close()
+
+
+def reconstruire(chemin=None, complet=False):
+    """
+    Met l'instantané en phase avec la base et l'écrit, sous verrou entre processus
+
+    Si un instantané existe, seuls les PV modifiés depuis sont relus ; sinon (ou
+    si complet=True, ou si la structure a changé) la matrice est rechargée.
+
+    Returns:
+        int: Version de l'instantané à jour
+    """
+    chemin = Path(chemin or chemin_instantane())
+    with _Verrou(chemin):
+        matrice = None
+        if not complet and lire_version(chemin) is not None:
+            existante, version = projeter_instantane(chemin)
+            if existante.signature == signature_base():
+                # Déjà reconstruit par un autre processus
+                return version
+            matrice = existante.copie()
+            if not matrice.actualiser():
+                matrice = None
+        if matrice is None:
+            matrice = MatriceResultats.charger()
+        return ecrire_instantane(matrice, chemin)
+
+
+# ---------- Matrice partagée du processus ----------
+
+_etat = {'matrice': None, 'version': None, 'fichier': None, 'verifiee_le': 0.0}
+_verrou_etat = threading.Lock()
+
+
+def _identite_fichier(chemin):
+    try:
+        stat = os.stat(chemin)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _projeter(chemin, maintenant):
+    """Projette l'instantané si le fichier a changé depuis la dernière projection (appelé sous verrou)"""
+    identite = _identite_fichier(chemin)
+    if identite != _etat['fichier']:
+        version = lire_version(chemin)
+        if version != _etat['version']:
+            _etat['matrice'], _etat['version'] = projeter_instantane(chemin)
+            if _etat['verifiee_le'] == 0.0:
+                _etat['verifiee_le'] = maintenant
+        _etat['fichier'] = identite
+
+
+def get_matrice_partagee():
+    """
+    Matrice projetée depuis l'instantané partagé
+
+    À chaque appel, un simple stat() détecte un nouveau fichier ; la version de
+    l'en-tête décide alors de la reprojection (un en-tête invalide entraîne la
+    reconstruction). La base n'est comparée à la
+    signature de l'instantané qu'au plus toutes les MATRICE_RESULTATS_VERIFICATION
+    secondes (un nouveau processus sert donc d'abord l'instantané tel quel,
+    sauf après invalider()).
+    """
+    chemin = chemin_instantane()
+    intervalle = getattr(settings, 'MATRICE_RESULTATS_VERIFICATION', 5)
+
+    with _verrou_etat:
+        maintenant = time.monotonic()
+        identite = _identite_fichier(chemin)
+        if identite is None or (identite != _etat['fichier'] and lire_version(chemin) is None):
+            # Absent, écrit dans un format antérieur (MAGIC) ou pour une autre base : rechargement complet
+            reconstruire(chemin, complet=True)
+        _projeter(chemin, maintenant)
+
+        # Comparaison avec la base après la projection : un processus qui n'a encore
+        # rien projeté compare aussi l'instantané lu quand la vérification est due
+        if maintenant - _etat['verifiee_le'] >= intervalle:
+            _etat['verifiee_le'] = maintenant
+            if _etat['matrice'].signature != signature_base():
+                reconstruire(chemin)
+                _projeter(chemin, maintenant)
+
+        return _etat['matrice']
+
+
+def invalider():
+    """Force la comparaison avec la base au prochain accès (après une saisie dans ce processus)"""
+    with _verrou_etat:
+        _etat['verifiee_le'] = float('-inf')
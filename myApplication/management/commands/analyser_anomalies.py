@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from myApplication.anomalies import analyser
+
+
+class Command(BaseCommand):
+    help = "Analyse les PV modifiés depuis le dernier passage et enregistre les anomalies (à lancer périodiquement)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complet', action='store_true', help="Réanalyse tous les PV")
+
+    def handle(self, *args, **options):
+        resultat = analyser(complet=options['complet'])
+        self.stdout.write(self.style.SUCCESS(f"✓ {resultat['pv_analyses']} PV analysé(s)"))
+        for type_anomalie, nombre in sorted(resultat['anomalies'].items()):
+            self.stdout.write(f"  {type_anomalie} : {nombre}")
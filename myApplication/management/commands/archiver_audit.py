@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from myApplication.archives_audit import archiver, jours_avant
+
+
+class Command(BaseCommand):
+    help = "Déplace les journées d'audit closes vers des segments JSONL compressés"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jours', type=int, default=30,
+            help="Archiver les journées antérieures à maintenant moins N jours (défaut : 30)"
+        )
+        parser.add_argument('--dossier', help="Dossier des segments (défaut : AUDIT_ARCHIVE_DIR)")
+
+    def handle(self, *args, **options):
+        total = archiver(jours_avant(options['jours']), dossier=options['dossier'])
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} entrée(s) d'audit archivée(s)"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from myApplication.audit import get_tampon, recuperer_spools
+
+
+class Command(BaseCommand):
+    help = "Insère les entrées d'audit restées dans les spools locaux (processus arrêtés)"
+
+    def handle(self, *args, **options):
+        total = recuperer_spools()
+        total += get_tampon().vider()
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} entrée(s) d'audit insérée(s)"))
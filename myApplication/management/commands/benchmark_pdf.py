@@ -0,0 +1,78 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myApplication import rapports_pdf
+from myApplication.matrice_resultats import get_matrice
+
+
+class Command(BaseCommand):
+    help = "Compare les temps de rendu des rapports PDF avec WeasyPrint (ressources partagées ou non) et ReportLab"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repetitions', type=int, default=5, help="Rendus mesurés par moteur")
+        parser.add_argument('--niveau', choices=sorted(rapports_pdf.NIVEAUX_RAPPORT), default='departement')
+        parser.add_argument('--id', type=int, help="Identifiant du niveau (premier élément par défaut)")
+        parser.add_argument('--sortie', help="Fichier JSON où enregistrer les mesures")
+
+    def _mesurer(self, nom, rendu, repetitions, avant=None):
+        durees = []
+        taille = 0
+        for _ in range(repetitions):
+            if avant:
+                avant()
+            debut = time.perf_counter()
+            taille = len(rendu())
+            durees.append((time.perf_counter() - debut) * 1000)
+        mesure = {
+            'moteur': nom,
+            'premier_ms': round(durees[0], 1),
+            'moyenne_ms': round(statistics.mean(durees[1:] or durees), 1),
+            'min_ms': round(min(durees), 1),
+            'taille_ko': round(taille / 1024, 1),
+        }
+        self.stdout.write(
+            f"  {nom:<28} premier {mesure['premier_ms']:>8} ms   suivants {mesure['moyenne_ms']:>8} ms"
+            f"   min {mesure['min_ms']:>8} ms   {mesure['taille_ko']} Ko"
+        )
+        return mesure
+
+    def handle(self, *args, **options):
+        niveau = options['niveau']
+        modele = rapports_pdf.NIVEAUX_RAPPORT[niveau][0]
+        identifiant = options['id'] or modele.objects.order_by('pk').values_list('pk', flat=True).first()
+        objet = rapports_pdf.objet_rapport(niveau, identifiant) if identifiant else None
+        if objet is None:
+            raise CommandError(f"Aucun élément « {niveau} » à mettre en rapport")
+
+        repetitions = max(options['repetitions'], 2)
+        matrice = get_matrice()
+        self.stdout.write(f"Rapport {niveau} « {objet.nom} », {repetitions} rendus par moteur :")
+        mesures = []
+
+        if rapports_pdf.weasyprint_disponible():
+            def rendu_weasyprint():
+                return rapports_pdf.pdf_weasyprint(rapports_pdf.contexte_rapport(niveau, objet, matrice))
+
+            def oublier_ressources():
+                for cle in ('feuille_style', 'polices'):
+                    rapports_pdf._ressources.pop(cle, None)
+
+            mesures.append(self._mesurer('weasyprint sans partage', rendu_weasyprint, repetitions, oublier_ressources))
+            oublier_ressources()
+            mesures.append(self._mesurer('weasyprint', rendu_weasyprint, repetitions))
+        else:
+            self.stdout.write(self.style.WARNING("  WeasyPrint indisponible (paquet ou bibliothèques système absents)"))
+
+        if niveau == 'departement':
+            mesures.append(self._mesurer('reportlab', lambda: rapports_pdf.pdf_reportlab(objet), repetitions))
+        else:
+            self.stdout.write("  ReportLab ne produit que le rapport départemental")
+
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                json.dump({'niveau': niveau, 'id': objet.pk, 'repetitions': repetitions, 'mesures': mesures},
+                          fichier, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✓ Mesures enregistrées dans {options['sortie']}"))
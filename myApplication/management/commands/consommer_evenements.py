@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myApplication import outbox
+
+
+class Command(BaseCommand):
+    help = "Traite par lots les événements de la boîte d'envoi pour chaque consommateur (position enregistrée)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('consommateurs', nargs='*', help="Consommateurs à faire avancer (tous par défaut)")
+        parser.add_argument('--lot', type=int, help="Événements par lot (OUTBOX_TAILLE_LOT par défaut)")
+        parser.add_argument('--continu', action='store_true', help="Reprend toutes les --intervalle secondes")
+        parser.add_argument('--intervalle', type=float, default=2.0)
+        parser.add_argument('--purger', action='store_true',
+                            help="Supprime ensuite les événements traités par tous les consommateurs")
+
+    def handle(self, *args, **options):
+        noms = options['consommateurs'] or sorted(outbox.CONSOMMATEURS)
+        inconnus = [nom for nom in noms if nom not in outbox.CONSOMMATEURS]
+        if inconnus:
+            raise CommandError(
+                f"Consommateur(s) inconnu(s) : {', '.join(inconnus)} "
+                f"(disponibles : {', '.join(sorted(outbox.CONSOMMATEURS))})"
+            )
+
+        while True:
+            for nom in noms:
+                resultat = outbox.consommer(nom, options['lot'])
+                if resultat['evenements'] or not options['continu']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"✓ {nom} : {resultat['evenements']} événement(s) en {resultat['lots']} lot(s), "
+                        f"position {resultat['position']}"
+                    ))
+            if options['purger']:
+                supprimes = outbox.purger()
+                if supprimes or not options['continu']:
+                    self.stdout.write(f"  {supprimes} événement(s) purgé(s)")
+            if not options['continu']:
+                break
+            time.sleep(options['intervalle'])
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myApplication.archive_photos import flux_archive, selection
+
+
+class Command(BaseCommand):
+    help = "Écrit l'archive ZIP des photos de PV avec son manifeste (bureau, chiffres, SHA-256), en flux"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help="Fichier ZIP à écrire")
+        parser.add_argument('--departement', type=int, help="Identifiant du département")
+        parser.add_argument('--sous-prefecture', type=int, help="Identifiant de la sous-préfecture")
+        statut = parser.add_mutually_exclusive_group()
+        statut.add_argument('--verifies', action='store_true', help="Seulement les PV vérifiés")
+        statut.add_argument('--non-verifies', action='store_true', help="Seulement les PV non vérifiés")
+
+    def handle(self, *args, **options):
+        verifie = True if options['verifies'] else False if options['non_verifies'] else None
+        pvs = selection(options['departement'], options['sous_prefecture'], verifie)
+        nombre = pvs.count()
+        if not nombre:
+            raise CommandError("Aucun PV avec photo dans cette sélection")
+
+        taille = 0
+        with open(options['sortie'], 'wb') as fichier:
+            for morceau in flux_archive(pvs):
+                fichier.write(morceau)
+                taille += len(morceau)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {nombre} photo(s) de PV archivée(s) dans {options['sortie']} ({taille / 1024 / 1024:.1f} Mo)"
+        ))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myApplication import certificats
+from myApplication.models import BureauVote
+
+
+class Command(BaseCommand):
+    help = ("Génère le certificat de résultats PDF de chaque bureau ayant un PV, dans un pool de processus ; "
+            "les certificats déjà à jour ne sont pas refaits")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departement', type=int, help="Identifiant du département (tous par défaut)")
+        parser.add_argument('--centre', type=int, help="Identifiant du centre de vote")
+        parser.add_argument('--processus', type=int, help="Taille du pool (CERTIFICATS_PROCESSUS ou nombre de CPU)")
+        parser.add_argument('--force', action='store_true', help="Refait aussi les certificats à jour")
+        parser.add_argument('--zip', help="Fichier ZIP où rassembler les certificats")
+
+    def handle(self, *args, **options):
+        bureaux = BureauVote.objects.all()
+        if options['departement']:
+            bureaux = bureaux.filter(centre_vote__sous_prefecture__departement_id=options['departement'])
+        if options['centre']:
+            bureaux = bureaux.filter(centre_vote_id=options['centre'])
+
+        debut = time.perf_counter()
+        donnees = certificats.preparer(bureaux)
+        total = len(donnees)
+        if not total:
+            raise CommandError("Aucun bureau avec un PV saisi dans cette sélection")
+        self.stdout.write(f"{total} bureau(x) avec PV, données chargées en {time.perf_counter() - debut:.1f} s")
+
+        if options['zip']:
+            with open(options['zip'], 'wb') as fichier:
+                for morceau in certificats.flux_zip(donnees, options['processus'], options['force']):
+                    fichier.write(morceau)
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {total} certificat(s) rassemblés dans {options['zip']} en {time.perf_counter() - debut:.1f} s"
+            ))
+            return
+
+        compte = {certificats.GENERE: 0, certificats.A_JOUR: 0}
+        palier = max(total // 20, 1)
+        for fait, (_bureau, _chemin, statut) in enumerate(
+            certificats.generer(donnees, options['processus'], options['force']), start=1
+        ):
+            compte[statut] += 1
+            if fait % palier == 0 or fait == total:
+                self.stdout.write(
+                    f"  {fait}/{total} ({fait * 100 // total} %) — {compte[certificats.GENERE]} généré(s), "
+                    f"{compte[certificats.A_JOUR]} à jour"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {compte[certificats.GENERE]} certificat(s) généré(s), {compte[certificats.A_JOUR]} déjà à jour, "
+            f"dans {certificats.dossier_certificats()} en {time.perf_counter() - debut:.1f} s"
+        ))
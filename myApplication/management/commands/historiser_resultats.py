@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myApplication.historique import historiser
+from myApplication.models import Departement
+
+
+class Command(BaseCommand):
+    help = ("Enregistre un instantané immuable des résultats de chaque département "
+            "(à lancer périodiquement ; rien n'est créé si les résultats n'ont pas changé)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departement', type=int, help="Identifiant du département (tous par défaut)")
+        parser.add_argument('--forcer', action='store_true', help="Crée un instantané même sans changement")
+
+    def handle(self, *args, **options):
+        departements = Departement.objects.order_by('nom')
+        if options['departement']:
+            departements = departements.filter(pk=options['departement'])
+            if not departements.exists():
+                raise CommandError(f"Département {options['departement']} introuvable")
+
+        for departement in departements:
+            instantane, cree = historiser(departement, forcer=options['forcer'])
+            if cree:
+                nature = "base" if instantane.complet else "différence"
+                self.stdout.write(self.style.SUCCESS(
+                    f"✓ {departement.nom} : instantané {instantane.identifiant} ({nature}, "
+                    f"{instantane.nombre_bureaux} bureau(x), {len(instantane.bureaux)} octets)"
+                ))
+            else:
+                self.stdout.write(f"  {departement.nom} : inchangé depuis l'instantané {instantane.identifiant}")
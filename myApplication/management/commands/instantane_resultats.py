@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from myApplication.instantane_resultats import chemin_instantane, reconstruire
+
+
+class Command(BaseCommand):
+    help = "Écrit l'instantané partagé de la matrice des résultats (à lancer avant de démarrer les workers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complet', action='store_true', help="Recharge toute la matrice depuis la base")
+
+    def handle(self, *args, **options):
+        version = reconstruire(complet=options['complet'])
+        self.stdout.write(self.style.SUCCESS(f"✓ Instantané version {version} écrit dans {chemin_instantane()}"))
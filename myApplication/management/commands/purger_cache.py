@@ -0,0 +1,22 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from myApplication.cache_sqlite import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = "Supprime les entrées expirées du cache SQLite partagé (à lancer périodiquement)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tout', action='store_true', help="Vide entièrement le cache")
+
+    def handle(self, *args, **options):
+        cache = caches['default']
+        if options['tout']:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS("✓ Cache vidé"))
+            return
+        if not isinstance(cache, SQLiteCache):
+            self.stdout.write("Le backend configuré gère lui-même l'expiration des entrées")
+            return
+        self.stdout.write(self.style.SUCCESS(f"✓ {cache.purger()} entrée(s) expirée(s) supprimée(s)"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from myApplication.rapprochement import rapprocher
+
+
+class Command(BaseCommand):
+    help = "Rapproche les relevés horaires des PV pour les bureaux ayant reçu de nouveaux relevés (à lancer périodiquement)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complet', action='store_true', help="Recalcule tous les bureaux")
+
+    def handle(self, *args, **options):
+        resultat = rapprocher(complet=options['complet'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {resultat['bureaux']} bureau(x) rapproché(s), {resultat['anomalies']} en anomalie"
+        ))
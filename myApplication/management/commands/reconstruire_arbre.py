@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from myApplication.arbre import reconstruire
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'arbre de la hiérarchie (après un chargement de données sans signaux : loaddata, bulk_create)"
+
+    def handle(self, *args, **options):
+        comptes = reconstruire()
+        self.stdout.write(self.style.SUCCESS(
+            "✓ Arbre reconstruit : " + ", ".join(f"{nombre} {niveau}" for niveau, nombre in comptes.items())
+        ))
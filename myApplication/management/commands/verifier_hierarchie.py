@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from myApplication.hierarchie import verifier
+
+
+class Command(BaseCommand):
+    help = "Vérifie les clés de hiérarchie dénormalisées des PV, résultats et relevés horaires"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corriger', action='store_true', help="Recalcule les clés en écart")
+
+    def handle(self, *args, **options):
+        resultat = verifier(corriger=options['corriger'])
+        for table, nombre in resultat.items():
+            if not nombre:
+                self.stdout.write(self.style.SUCCESS(f"✓ {table} : clés cohérentes"))
+            elif options['corriger']:
+                self.stdout.write(self.style.SUCCESS(f"✓ {table} : {nombre} ligne(s) corrigée(s)"))
+            else:
+                self.stdout.write(self.style.WARNING(f"⚠ {table} : {nombre} ligne(s) en écart"))
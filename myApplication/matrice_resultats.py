@@ -0,0 +1,561 @@
+"""
+Moteur d'analyse des résultats en mémoire (NumPy)
+
+Les résultats sont chargés une fois dans une matrice dense bureaux × candidats,
+accompagnée de tableaux parallèles (inscrits, votants, nuls, blancs, exprimés)
+et des indices hiérarchiques de chaque bureau (centre, sous-préfecture,
+département). Classements, parts de voix, cumuls par niveau, bastions et
+écarts entre deux candidats sont calculés par opérations vectorisées, sans
+requête d'agrégation.
+
+Les bureaux sont triés par (département, sous-préfecture, centre, bureau) :
+les bureaux d'un même groupe sont contigus, ce qui permet les cumuls de la
+matrice avec np.add.reduceat. Quand un PV change, seule sa ligne est relue.
+Un résultat modifié ou supprimé seul (admin) date son PV après le commit :
+la signature de la base change et la ligne est relue de la même façon.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache_resultats
+from .models import BureauVote, CentreVote, Departement, ProcesVerbal, ResultatCandidat, SousPrefecture, User
+
+NIVEAUX = ('bureau', 'centre', 'sous_prefecture', 'departement')
+
+# État de la base dont la matrice est une copie (voir signature_base)
+Signature = namedtuple('Signature', [
+    'bureaux', 'candidats', 'pv', 'derniere_pv', 'derniere_bureau',
+    'departements', 'sous_prefectures', 'centres', 'derniere_structure',
+])
+DATES_SIGNATURE = ('derniere_pv', 'derniere_bureau', 'derniere_structure')
+
+
+def pourcentages(valeurs, totaux):
+    """valeurs / totaux × 100, 0 là où le total est nul (diffusion sur les colonnes si besoin)"""
+    valeurs = np.asarray(valeurs, dtype=np.float64)
+    totaux = np.asarray(totaux, dtype=np.float64)
+    if valeurs.ndim == 2 and totaux.ndim == 1:
+        totaux = totaux[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totaux > 0, valeurs * 100.0 / totaux, 0.0)
+
+
+class MatriceResultats:
+    """Résultats de tous les bureaux sous forme de tableaux NumPy"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.signature = None
+        # Incrémentée à chaque relecture en place (la signature n'est pas modifiée)
+        self.revision = 0
+
+    # ---------- Chargement ----------
+
+    @classmethod
+    def charger(cls):
+        matrice = cls()
+        matrice._charger()
+        return matrice
+
+    def _charger(self):
+        departements = list(Departement.objects.order_by('id').values_list('id', 'nom'))
+        sous_prefectures = list(
+            SousPrefecture.objects.order_by('departement_id', 'id').values_list('id', 'nom', 'departement_id')
+        )
+        centres = list(
+            CentreVote.objects.order_by('sous_prefecture__departement_id', 'sous_prefecture_id', 'id')
+            .values_list('id', 'nom', 'sous_prefecture_id')
+        )
+        bureaux = list(
+            BureauVote.objects.order_by(
+                'centre_vote__sous_prefecture__departement_id', 'centre_vote__sous_prefecture_id',
+                'centre_vote_id', 'id'
+            ).values_list('id', 'numero', 'centre_vote_id', 'nombre_inscrits')
+        )
+        candidats = list(
+            User.objects.filter(role='candidat').order_by('numero_candidat', 'first_name', 'id')
+            .values('id', 'numero_candidat', 'first_name', 'last_name', 'parti_politique')
+        )
+
+        # Libellés et positions de chaque niveau
+        self.libelles = {
+            'departement': {'ids': np.array([d[0] for d in departements], dtype=np.int64),
+                            'noms': [d[1] for d in departements]},
+            'sous_prefecture': {'ids': np.array([s[0] for s in sous_prefectures], dtype=np.int64),
+                                'noms': [s[1] for s in sous_prefectures]},
+            'centre': {'ids': np.array([c[0] for c in centres], dtype=np.int64),
+                       'noms': [c[1] for c in centres]},
+            'bureau': {'ids': np.array([b[0] for b in bureaux], dtype=np.int64),
+                       'noms': [f"Bureau {b[1]}" for b in bureaux]},
+        }
+        position_departement = {d[0]: i for i, d in enumerate(departements)}
+        position_sp = {s[0]: i for i, s in enumerate(sous_prefectures)}
+        position_centre = {c[0]: i for i, c in enumerate(centres)}
+        sp_departement = np.array([position_departement[s[2]] for s in sous_prefectures], dtype=np.int64)
+        centre_sp = np.array([position_sp[c[2]] for c in centres], dtype=np.int64)
+
+        nb_bureaux = len(bureaux)
+        self.candidats = candidats
+        self.candidat_ids = np.array([c['id'] for c in candidats], dtype=np.int64)
+        self._position_candidat = {c['id']: i for i, c in enumerate(candidats)}
+        self._position_bureau = {b[0]: i for i, b in enumerate(bureaux)}
+
+        self.indices = {'bureau': np.arange(nb_bureaux, dtype=np.int64)}
+        self.indices['centre'] = np.array([position_centre[b[2]] for b in bureaux], dtype=np.int64)
+        self.indices['sous_prefecture'] = centre_sp[self.indices['centre']] if nb_bureaux else np.zeros(0, np.int64)
+        self.indices['departement'] = (
+            sp_departement[self.indices['sous_prefecture']] if nb_bureaux else np.zeros(0, np.int64)
+        )
+
+        self.inscrits = np.array([b[3] for b in bureaux], dtype=np.int64)
+        self.votants = np.zeros(nb_bureaux, dtype=np.int64)
+        self.nuls = np.zeros(nb_bureaux, dtype=np.int64)
+        self.blancs = np.zeros(nb_bureaux, dtype=np.int64)
+        self.exprimes = np.zeros(nb_bureaux, dtype=np.int64)
+        self.a_pv = np.zeros(nb_bureaux, dtype=bool)
+        self.voix = np.zeros((nb_bureaux, len(candidats)), dtype=np.int64)
+        self.a_resultat = np.zeros((nb_bureaux, len(candidats)), dtype=bool)
+
+        signature = signature_base()
+        self._remplir(ProcesVerbal.objects.all(), ResultatCandidat.objects.all())
+        self.signature = signature
+
+    # ---------- Export / import des tableaux (instantanés partagés) ----------
+
+    def tableaux(self):
+        """Tableaux NumPy de la matrice, par nom"""
+        tableaux = {f'ids_{niveau}': self.libelles[niveau]['ids'] for niveau in NIVEAUX}
+        tableaux.update({f'indices_{niveau}': self.indices[niveau] for niveau in NIVEAUX if niveau != 'bureau'})
+        tableaux.update({
+            'candidat_ids': self.candidat_ids,
+            'inscrits': self.inscrits,
+            'votants': self.votants,
+            'nuls': self.nuls,
+            'blancs': self.blancs,
+            'exprimes': self.exprimes,
+            'a_pv': self.a_pv,
+            'voix': self.voix,
+            'a_resultat': self.a_resultat,
+        })
+        return tableaux
+
+    def metadonnees(self):
+        """Données non numériques : noms des groupes, candidats et signature de la base"""
+        return {
+            'noms': {niveau: self.libelles[niveau]['noms'] for niveau in NIVEAUX},
+            'candidats': self.candidats,
+            'signature': {
+                champ: (valeur.isoformat() if champ in DATES_SIGNATURE and valeur else valeur)
+                for champ, valeur in self.signature._asdict().items()
+            },
+        }
+
+    @classmethod
+    def depuis_tableaux(cls, tableaux, metadonnees):
+        """Matrice construite sur des tableaux existants (par exemple projetés en mémoire, sans copie)"""
+        matrice = cls()
+        matrice.libelles = {
+            niveau: {'ids': tableaux[f'ids_{niveau}'], 'noms': metadonnees['noms'][niveau]}
+            for niveau in NIVEAUX
+        }
+        matrice.indices = {niveau: tableaux[f'indices_{niveau}'] for niveau in NIVEAUX if niveau != 'bureau'}
+        matrice.indices['bureau'] = np.arange(len(tableaux['inscrits']), dtype=np.int64)
+        for nom in ('candidat_ids', 'inscrits', 'votants', 'nuls', 'blancs', 'exprimes', 'a_pv', 'voix', 'a_resultat'):
+            setattr(matrice, nom, tableaux[nom])
+
+        matrice.candidats = metadonnees['candidats']
+        matrice._position_candidat = {c['id']: i for i, c in enumerate(matrice.candidats)}
+        matrice._position_bureau = {int(b): i for i, b in enumerate(matrice.libelles['bureau']['ids'])}
+
+        matrice.signature = Signature(**{
+            champ: (parse_datetime(valeur) if champ in DATES_SIGNATURE and valeur else valeur)
+            for champ, valeur in metadonnees['signature'].items()
+        })
+        return matrice
+
+    def copie(self):
+        """Copie modifiable (les tableaux d'un instantané projeté sont en lecture seule)"""
+        return MatriceResultats.depuis_tableaux(
+            {nom: np.array(tableau) for nom, tableau in self.tableaux().items()},
+            self.metadonnees()
+        )
+
+    def _remplir(self, pvs, resultats):
+        """Copie dans les tableaux les PV et résultats donnés (lignes des bureaux concernés)"""
+        lignes_pv = np.array(
+            list(pvs.values_list('bureau_vote_id', 'nombre_votants', 'bulletins_nuls',
+                                 'bulletins_blancs', 'suffrages_exprimes')),
+            dtype=np.int64
+        ).reshape(-1, 5)
+        if len(lignes_pv):
+            rangs = np.array([self._position_bureau[b] for b in lignes_pv[:, 0]], dtype=np.int64)
+            self.votants[rangs] = lignes_pv[:, 1]
+            self.nuls[rangs] = lignes_pv[:, 2]
+            self.blancs[rangs] = lignes_pv[:, 3]
+            self.exprimes[rangs] = lignes_pv[:, 4]
+            self.a_pv[rangs] = True
+
+        lignes = np.array(
+            list(resultats.filter(candidat__role='candidat').values_list(
+                'proces_verbal__bureau_vote_id', 'candidat_id', 'nombre_voix'
+            )),
+            dtype=np.int64
+        ).reshape(-1, 3)
+        if len(lignes):
+            rangs = np.array([self._position_bureau[b] for b in lignes[:, 0]], dtype=np.int64)
+            colonnes = np.array([self._position_candidat[c] for c in lignes[:, 1]], dtype=np.int64)
+            self.voix[rangs, colonnes] = lignes[:, 2]
+            self.a_resultat[rangs, colonnes] = True
+
+    # ---------- Mises à jour ----------
+
+    def mettre_a_jour_bureaux(self, bureau_ids):
+        """
+        Relit en place les lignes des bureaux donnés : inscrits, numéro, PV et résultats
+
+        Returns:
+            bool: False si un bureau est nouveau ou a changé de centre (sa ligne
+            change de place : rechargement complet nécessaire)
+        """
+        bureaux = list(BureauVote.objects.filter(pk__in=set(bureau_ids)).values_list(
+            'id', 'numero', 'centre_vote_id', 'nombre_inscrits'
+        ))
+        ids_centres = self.libelles['centre']['ids']
+        for bureau_id, _numero, centre_id, _inscrits in bureaux:
+            rang = self._position_bureau.get(bureau_id)
+            if rang is None or ids_centres[self.indices['centre'][rang]] != centre_id:
+                return False
+        if not bureaux:
+            return True
+
+        bureau_ids = [bureau[0] for bureau in bureaux]
+        rangs = np.array([self._position_bureau[b] for b in bureau_ids], dtype=np.int64)
+        with self._verrou:
+            self.inscrits[rangs] = [bureau[3] for bureau in bureaux]
+            for rang, bureau in zip(rangs, bureaux):
+                self.libelles['bureau']['noms'][rang] = f"Bureau {bureau[1]}"
+            for tableau in (self.votants, self.nuls, self.blancs, self.exprimes, self.a_pv):
+                tableau[rangs] = 0
+            self.voix[rangs] = 0
+            self.a_resultat[rangs] = False
+            self._remplir(
+                ProcesVerbal.objects.filter(bureau_vote_id__in=bureau_ids),
+                ResultatCandidat.objects.filter(proces_verbal__bureau_vote_id__in=bureau_ids)
+            )
+            self.revision += 1
+        return True
+
+    def actualiser(self):
+        """
+        Met la matrice en phase avec la base
+
+        Les bureaux dont le PV ou le bureau lui-même (inscrits, numéro) ont été
+        modifiés depuis le chargement sont relus ligne par ligne ; un changement
+        de structure (bureaux, candidats, centres, sous-préfectures,
+        départements, PV supprimés) entraîne un rechargement complet.
+
+        Returns:
+            bool: False si un rechargement complet est nécessaire
+        """
+        signature = signature_base()
+        if signature == self.signature:
+            return True
+        ancienne = self.signature
+        structure = ('bureaux', 'candidats', 'departements', 'sous_prefectures', 'centres', 'derniere_structure')
+        if any(getattr(signature, champ) != getattr(ancienne, champ) for champ in structure):
+            return False
+        if signature.pv < ancienne.pv:
+            return False
+
+        pvs = ProcesVerbal.objects.all()
+        if ancienne.derniere_pv is not None:
+            pvs = pvs.filter(date_modification__gt=ancienne.derniere_pv)
+        bureaux = BureauVote.objects.all()
+        if ancienne.derniere_bureau is not None:
+            bureaux = bureaux.filter(date_modification__gt=ancienne.derniere_bureau)
+        modifies = set(pvs.values_list('bureau_vote_id', flat=True)) | set(bureaux.values_list('id', flat=True))
+        if not self.mettre_a_jour_bureaux(modifies):
+            return False
+
+        if int(self.a_pv.sum()) != signature.pv:
+            return False
+        self.signature = signature
+        return True
+
+    # ---------- Sélections ----------
+
+    def masque(self, departement_id=None, sous_prefecture_id=None, centre_id=None):
+        """Masque booléen des bureaux d'une partie de la hiérarchie (tous les bureaux par défaut)"""
+        masque = np.ones(len(self.inscrits), dtype=bool)
+        for niveau, identifiant in (('departement', departement_id), ('sous_prefecture', sous_prefecture_id),
+                                    ('centre', centre_id)):
+            if identifiant is not None:
+                positions = np.flatnonzero(self.libelles[niveau]['ids'] == identifiant)
+                position = positions[0] if len(positions) else -1
+                masque &= self.indices[niveau] == position
+        return masque
+
+    def position_candidat(self, candidat_id):
+        return self._position_candidat[candidat_id]
+
+    # ---------- Calculs ----------
+
+    def totaux(self, masque=None):
+        """Totaux d'une sélection de bureaux : participation, voix par candidat et nombre de bureaux"""
+        masque = self.masque() if masque is None else masque
+        inscrits = int(self.inscrits[masque].sum())
+        votants = int(self.votants[masque].sum())
+        return {
+            'bureaux': int(masque.sum()),
+            'bureaux_saisis': int(self.a_pv[masque].sum()),
+            'inscrits': inscrits,
+            'votants': votants,
+            'nuls': int(self.nuls[masque].sum()),
+            'blancs': int(self.blancs[masque].sum()),
+            'exprimes': int(self.exprimes[masque].sum()),
+            'taux_participation': float(pourcentages(votants, inscrits)),
+            'voix': self.voix[masque].sum(axis=0),
+            'bureaux_par_candidat': self.a_resultat[masque].sum(axis=0),
+        }
+
+    def classement(self, masque=None):
+        """Candidats du plus grand au plus petit nombre de voix, avec leur part des suffrages exprimés"""
+        totaux = self.totaux(masque)
+        parts = pourcentages(totaux['voix'], totaux['exprimes'])
+        ordre = np.lexsort((np.arange(len(self.candidats)), -totaux['voix']))
+        return [
+            {
+                **self.candidats[i],
+                'total_voix': int(totaux['voix'][i]),
+                'nombre_bureaux': int(totaux['bureaux_par_candidat'][i]),
+                'pourcentage': float(parts[i]),
+            }
+            for i in ordre
+        ]
+
+    def _cumul(self, tableau, niveau, masque):
+        """Somme de `tableau` (1D ou 2D) par groupe du niveau ; un groupe sans bureau vaut 0"""
+        nb_groupes = len(self.libelles[niveau]['ids'])
+        indices = self.indices[niveau][masque]
+        valeurs = tableau[masque]
+        if valeurs.ndim == 1:
+            return np.bincount(indices, weights=valeurs, minlength=nb_groupes).astype(np.int64)
+
+        resultat = np.zeros((nb_groupes, valeurs.shape[1]), dtype=np.int64)
+        if len(indices):
+            # Bureaux triés par hiérarchie : chaque groupe est un segment contigu
+            debuts = np.flatnonzero(np.r_[True, indices[1:] != indices[:-1]])
+            resultat[indices[debuts]] = np.add.reduceat(valeurs, debuts, axis=0)
+        return resultat
+
+    def cumul(self, niveau, masque=None):
+        """
+        Cumuls par centre, sous-préfecture ou département
+
+        Returns:
+            dict: ids, noms et tableaux alignés (inscrits, votants, nuls, blancs,
+            exprimes, bureaux, bureaux_saisis, voix [groupes × candidats], parts)
+        """
+        masque = self.masque() if masque is None else masque
+        present = np.bincount(self.indices[niveau][masque], minlength=len(self.libelles[niveau]['ids'])) > 0
+        cumul = {
+            'ids': self.libelles[niveau]['ids'],
+            'noms': self.libelles[niveau]['noms'],
+            'present': present,
+            'bureaux': self._cumul(np.ones(len(self.inscrits), dtype=np.int64), niveau, masque),
+            'bureaux_saisis': self._cumul(self.a_pv.astype(np.int64), niveau, masque),
+            'inscrits': self._cumul(self.inscrits, niveau, masque),
+            'votants': self._cumul(self.votants, niveau, masque),
+            'nuls': self._cumul(self.nuls, niveau, masque),
+            'blancs': self._cumul(self.blancs, niveau, masque),
+            'exprimes': self._cumul(self.exprimes, niveau, masque),
+            'voix': self._cumul(self.voix, niveau, masque),
+        }
+        cumul['parts'] = pourcentages(cumul['voix'], cumul['exprimes'])
+        cumul['taux_participation'] = pourcentages(cumul['votants'], cumul['inscrits'])
+        return cumul
+
+    def parts(self, niveau='bureau', masque=None):
+        """Parts des suffrages exprimés (%) par groupe et par candidat"""
+        return self.cumul(niveau, masque)['parts']
+
+    def bastions(self, candidat_id, niveau='bureau', limite=10, masque=None):
+        """Groupes où le candidat obtient sa plus forte part des suffrages exprimés"""
+        cumul = self.cumul(niveau, masque)
+        colonne = self.position_candidat(candidat_id)
+        candidats = np.flatnonzero(cumul['present'] & (cumul['exprimes'] > 0))
+        parts = cumul['parts'][candidats, colonne]
+        meilleurs = candidats[np.argsort(-parts, kind='stable')[:limite]]
+        return [
+            {
+                'id': int(cumul['ids'][i]),
+                'nom': cumul['noms'][i],
+                'voix': int(cumul['voix'][i, colonne]),
+                'exprimes': int(cumul['exprimes'][i]),
+                'pourcentage': float(cumul['parts'][i, colonne]),
+            }
+            for i in meilleurs
+        ]
+
+    def duel(self, candidat_a, candidat_b, niveau='bureau', masque=None):
+        """
+        Écart de voix entre deux candidats, au total et par groupe
+
+        Returns:
+            dict: marge totale (voix A - voix B), marges et marges en points de
+            pourcentage par groupe, nombre de groupes gagnés par chacun
+        """
+        cumul = self.cumul(niveau, masque)
+        a, b = self.position_candidat(candidat_a), self.position_candidat(candidat_b)
+        present = cumul['present']
+        marges = cumul['voix'][:, a] - cumul['voix'][:, b]
+        return {
+            'ids': cumul['ids'],
+            'noms': cumul['noms'],
+            'present': present,
+            'marges': marges,
+            'marges_points': cumul['parts'][:, a] - cumul['parts'][:, b],
+            'marge_totale': int(marges[present].sum()),
+            'groupes_gagnes_a': int(((marges > 0) & present).sum()),
+            'groupes_gagnes_b': int(((marges < 0) & present).sum()),
+        }
+
+
+def _empreinte_candidats():
+    """Empreinte des colonnes de candidats (ajout, retrait, renommage, renumérotation)"""
+    candidats = list(User.objects.filter(role='candidat').order_by('id').values_list(
+        'id', 'numero_candidat', 'first_name', 'last_name', 'parti_politique'
+    ))
+    return hashlib.sha256(json.dumps(candidats, default=str).encode('utf-8')).hexdigest()
+
+
+def signature_base():
+    """
+    État de la base qui invalide la matrice (Signature)
+
+    Nombre et dernière modification des PV et des bureaux, empreinte des
+    candidats, nombre et dernière modification des centres, sous-préfectures
+    et départements.
+    """
+    pvs = ProcesVerbal.objects.aggregate(nombre=Count('id'), derniere=Max('date_modification'))
+    bureaux = BureauVote.objects.aggregate(nombre=Count('id'), derniere=Max('date_modification'))
+    structure = [
+        modele.objects.aggregate(nombre=Count('id'), derniere=Max('date_modification'))
+        for modele in (Departement, SousPrefecture, CentreVote)
+    ]
+    dates = [niveau['derniere'] for niveau in structure if niveau['derniere'] is not None]
+    return Signature(
+        bureaux=bureaux['nombre'],
+        candidats=_empreinte_candidats(),
+        pv=pvs['nombre'],
+        derniere_pv=pvs['derniere'],
+        derniere_bureau=bureaux['derniere'],
+        departements=structure[0]['nombre'],
+        sous_prefectures=structure[1]['nombre'],
+        centres=structure[2]['nombre'],
+        derniere_structure=max(dates) if dates else None,
+    )
+
+
+_matrice = None
+_verifiee_le = 0.0
+_verrou_matrice = threading.Lock()
+_local = threading.local()
+
+
+def get_matrice(a_jour=False):
+    """
+    Matrice des résultats du processus, chargée à la première utilisation
+
+    L'état de la base est comparé au plus toutes les MATRICE_RESULTATS_VERIFICATION
+    secondes, pour prendre en compte les saisies faites par d'autres processus.
+    Si MATRICE_RESULTATS_INSTANTANE est défini, la matrice est un instantané
+    partagé entre les processus (voir instantane_resultats).
+
+    Args:
+        a_jour: Compare immédiatement avec la base (calcul d'une valeur mise en
+            cache sous les versions courantes, voir cache_resultats)
+    """
+    global _matrice, _verifiee_le
+    if getattr(settings, 'MATRICE_RESULTATS_INSTANTANE', None):
+        from .instantane_resultats import get_matrice_partagee, invalider
+        if a_jour:
+            invalider()
+        return get_matrice_partagee()
+
+    intervalle = getattr(settings, 'MATRICE_RESULTATS_VERIFICATION', 5)
+
+    with _verrou_matrice:
+        maintenant = time.monotonic()
+        if _matrice is None:
+            _matrice = MatriceResultats.charger()
+            _verifiee_le = maintenant
+        elif a_jour or maintenant - _verifiee_le >= intervalle:
+            if not _matrice.actualiser():
+                _matrice = MatriceResultats.charger()
+            _verifiee_le = maintenant
+        return _matrice
+
+
+def _invalider_locale():
+    global _verifiee_le
+    with _verrou_matrice:
+        _verifiee_le = float('-inf')
+
+
+def notifier_bureau_modifie(bureau_id):
+    """Après le commit, relit la ligne du bureau si la matrice est chargée dans ce processus"""
+    def mettre_a_jour():
+        if getattr(settings, 'MATRICE_RESULTATS_INSTANTANE', None):
+            from .instantane_resultats import invalider
+            invalider()
+        elif _matrice is not None and not _matrice.mettre_a_jour_bureaux([bureau_id]):
+            # Bureau nouveau ou déplacé : rechargement à la prochaine lecture
+            _invalider_locale()
+    transaction.on_commit(mettre_a_jour)
+
+
+# ---------- Résultats modifiés hors saisie d'un PV ----------
+
+def _dater_pv():
+    """Date les PV dont un résultat a changé, une fois par PV et par transaction"""
+    resultats, _local.resultats = getattr(_local, 'resultats', {}), {}
+    if not resultats:
+        return
+    pvs = ProcesVerbal.objects.filter(pk__in=resultats)
+    bureaux = dict(pvs.values_list('id', 'bureau_vote_id'))
+    # UPDATE sans signal : date_modification suffit à la signature et au flux des changements
+    pvs.update(date_modification=timezone.now())
+    for pv_id, bureau_id in bureaux.items():
+        if resultats[pv_id]:
+            # Un résultat enregistré a déjà invalidé le cache (cache_resultats), pas un résultat supprimé
+            cache_resultats.invalider_bureau(bureau_id)
+        notifier_bureau_modifie(bureau_id)
+
+
+def _resultat_modifie(sender, instance, raw=False, origin=None, **kwargs):
+    # Résultats supprimés avec leur PV : le nombre de PV de la signature change déjà
+    if raw or isinstance(origin, ProcesVerbal) or getattr(origin, 'model', None) is ProcesVerbal:
+        return
+    if not hasattr(_local, 'resultats'):
+        _local.resultats = {}
+    pv_id = instance.proces_verbal_id
+    _local.resultats[pv_id] = _local.resultats.get(pv_id, False) or kwargs['signal'] is post_delete
+    transaction.on_commit(_dater_pv)
+
+
+def connecter_signaux():
+    """Suit les résultats enregistrés ou supprimés un par un (appelé depuis AppConfig.ready)"""
+    post_save.connect(_resultat_modifie, sender=ResultatCandidat, dispatch_uid='matrice_resultat_save')
+    post_delete.connect(_resultat_modifie, sender=ResultatCandidat, dispatch_uid='matrice_resultat_delete')
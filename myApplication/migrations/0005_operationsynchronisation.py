@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0004_relevéhoraire'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='relevéhoraire',
+            name='heure_releve',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Heure du relevé'),
+        ),
+        migrations.CreateModel(
+            name='OperationSynchronisation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('op_id', models.CharField(help_text='Identifiant généré par le client', max_length=64, unique=True)),
+                ('type_operation', models.CharField(choices=[('releve', 'Relevé horaire'), ('pv', 'Procès-verbal')], max_length=20)),
+                ('statut', models.CharField(choices=[('applique', 'Appliquée'), ('rejete', 'Rejetée')], max_length=20)),
+                ('reponse', models.JSONField(blank=True, default=dict)),
+                ('date_reception', models.DateTimeField(auto_now_add=True)),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='operations_synchronisees', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Opération synchronisée',
+                'verbose_name_plural': 'Opérations synchronisées',
+                'ordering': ['-date_reception'],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0005_operationsynchronisation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='identifiant',
+            field=models.UUIDField(blank=True, editable=False, help_text="Identifiant de l'entrée dans le spool, évite les doublons lors d'une reprise", null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
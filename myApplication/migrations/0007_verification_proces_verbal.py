@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0006_auditlog_identifiant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationVerification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_reservation', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expiration', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Réservation de vérification',
+                'verbose_name_plural': 'Réservations de vérification',
+                'ordering': ['expiration'],
+            },
+        ),
+        migrations.AddField(
+            model_name='procesverbal',
+            name='date_verification',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='procesverbal',
+            name='motif_rejet',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='procesverbal',
+            name='rejete',
+            field=models.BooleanField(default=False, help_text='PV rejeté à la vérification, en attente de correction'),
+        ),
+        migrations.AddField(
+            model_name='procesverbal',
+            name='verifie_par',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='proces_verbaux_verifies', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='procesverbal',
+            index=models.Index(fields=['verifie', 'rejete', 'date_saisie'], name='pv_file_verification_idx'),
+        ),
+        migrations.AddField(
+            model_name='reservationverification',
+            name='proces_verbal',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reservation', to='myApplication.procesverbal'),
+        ),
+        migrations.AddField(
+            model_name='reservationverification',
+            name='verificateur',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations_verification', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
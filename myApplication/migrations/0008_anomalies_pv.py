@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0007_verification_proces_verbal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procesverbal',
+            name='date_analyse_anomalies',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='AnomaliePV',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_anomalie', models.CharField(choices=[('participation_atypique', 'Participation atypique'), ('participation_totale', 'Participation de 100 %'), ('vote_unanime', 'Voix concentrées sur un candidat'), ('nuls_atypiques', 'Taux de bulletins nuls atypique'), ('derniers_chiffres', 'Derniers chiffres non uniformes'), ('releve_incoherent', 'Relevés horaires incohérents avec le PV')], max_length=30)),
+                ('valeur', models.FloatField(help_text='Valeur mesurée sur le PV')),
+                ('reference', models.FloatField(blank=True, help_text='Valeur attendue (centre, sous-préfecture, seuil)', null=True)),
+                ('message', models.CharField(max_length=255)),
+                ('date_detection', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resolue', models.BooleanField(default=False, help_text='Anomalie examinée et levée par un administrateur')),
+                ('proces_verbal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='myApplication.procesverbal')),
+                ('resolue_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='anomalies_resolues', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Anomalie de PV',
+                'verbose_name_plural': 'Anomalies de PV',
+                'ordering': ['-date_detection'],
+                'indexes': [models.Index(fields=['resolue', 'type_anomalie'], name='anomalie_ouverte_type_idx')],
+                'constraints': [models.UniqueConstraint(fields=('proces_verbal', 'type_anomalie'), name='anomalie_pv_type_unique')],
+            },
+        ),
+    ]
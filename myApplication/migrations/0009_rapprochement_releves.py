@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0008_anomalies_pv'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RapprochementReleves',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_releves', models.IntegerField()),
+                ('premier_releve', models.DateTimeField()),
+                ('dernier_releve', models.DateTimeField()),
+                ('votants_dernier_releve', models.IntegerField()),
+                ('votants_pv', models.IntegerField(blank=True, help_text='Votants du PV (vide si aucun PV)', null=True)),
+                ('nombre_baisses', models.IntegerField(default=0, help_text='Relevés inférieurs au relevé précédent')),
+                ('nombre_sauts', models.IntegerField(default=0, help_text='Hausses trop rapides entre deux relevés')),
+                ('saut_max', models.FloatField(default=0, help_text='Plus forte hausse, en % des inscrits par heure')),
+                ('ecart_pv', models.IntegerField(blank=True, help_text='Votants du PV - dernier relevé', null=True)),
+                ('ecart_pv_anormal', models.BooleanField(default=False)),
+                ('anomalie', models.BooleanField(default=False, help_text='Baisse, saut ou écart avec le PV')),
+                ('dernier_releve_id', models.IntegerField(help_text='Plus grand identifiant de relevé pris en compte')),
+                ('date_calcul', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Rapprochement relevés / PV',
+                'verbose_name_plural': 'Rapprochements relevés / PV',
+                'ordering': ['bureau_vote'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='relevéhoraire',
+            index=models.Index(fields=['bureau_vote', 'heure_releve'], name='releve_bureau_heure_idx'),
+        ),
+        migrations.AddField(
+            model_name='rapprochementreleves',
+            name='bureau_vote',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rapprochement_releves', to='myApplication.bureauvote'),
+        ),
+        migrations.AddIndex(
+            model_name='rapprochementreleves',
+            index=models.Index(fields=['anomalie', 'bureau_vote'], name='rapprochement_anomalie_idx'),
+        ),
+    ]
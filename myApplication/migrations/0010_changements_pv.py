@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0009_rapprochement_releves'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuppressionPV',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('proces_verbal_id', models.BigIntegerField()),
+                ('bureau_vote_id', models.BigIntegerField()),
+                ('date_suppression', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'PV supprimé',
+                'verbose_name_plural': 'PV supprimés',
+                'ordering': ['date_suppression', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='procesverbal',
+            index=models.Index(fields=['date_modification', 'id'], name='pv_changements_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suppressionpv',
+            index=models.Index(fields=['date_suppression', 'id'], name='suppression_pv_changements_idx'),
+        ),
+    ]
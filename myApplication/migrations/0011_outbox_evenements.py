@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0010_changements_pv'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvenementResultat',
+            fields=[
+                ('sequence', models.BigAutoField(primary_key=True, serialize=False)),
+                ('type_objet', models.CharField(choices=[('pv', 'Procès-verbal'), ('resultats', 'Résultats du PV'), ('bureau', 'Bureau de vote'), ('releve', 'Relevé horaire')], max_length=10)),
+                ('objet_id', models.BigIntegerField()),
+                ('bureau_vote_id', models.BigIntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('enregistrement', 'Création ou modification'), ('suppression', 'Suppression')], default='enregistrement', max_length=15)),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Événement de résultat',
+                'verbose_name_plural': 'Événements de résultats',
+                'ordering': ['sequence'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PositionConsommateur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=50, unique=True)),
+                ('sequence', models.BigIntegerField(default=0)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Position de consommateur',
+                'verbose_name_plural': 'Positions des consommateurs',
+                'ordering': ['nom'],
+            },
+        ),
+    ]
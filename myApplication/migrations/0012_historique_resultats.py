@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:15
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0011_outbox_evenements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoriqueResultats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identifiant', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('complet', models.BooleanField(default=False, help_text='Instantané de base : tous les bureaux')),
+                ('candidats', models.JSONField(default=list, help_text='Identifiants des candidats, ordre des colonnes de voix')),
+                ('totaux', models.JSONField(default=dict, help_text='Totaux du département, des sous-préfectures et des centres')),
+                ('bureaux', models.BinaryField(help_text='Bureaux modifiés (JSON compressé)')),
+                ('nombre_bureaux', models.IntegerField(default=0, help_text='Bureaux enregistrés dans cet instantané')),
+                ('empreinte', models.CharField(help_text="SHA-256 de l'état de tous les bureaux", max_length=64)),
+                ('departement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historique_resultats', to='myApplication.departement')),
+                ('precedent', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='suivant', to='myApplication.historiqueresultats')),
+            ],
+            options={
+                'verbose_name': 'Instantané historique des résultats',
+                'verbose_name_plural': 'Historique des résultats',
+                'ordering': ['departement', '-date'],
+                'indexes': [models.Index(fields=['departement', 'date'], name='historique_dept_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# Modèle → (champ source, filtre du bureau correspondant)
+SOURCES = {
+    'ProcesVerbal': ('bureau_vote_id', 'pk'),
+    'RelevéHoraire': ('bureau_vote_id', 'pk'),
+    'ResultatCandidat': ('proces_verbal_id', 'proces_verbal'),
+}
+
+CHEMINS_HIERARCHIE = {
+    'centre_vote_id': 'centre_vote_id',
+    'sous_prefecture_id': 'centre_vote__sous_prefecture_id',
+    'departement_id': 'centre_vote__sous_prefecture__departement_id',
+}
+
+
+def renseigner_cles(apps, schema_editor):
+    """Recopie centre, sous-préfecture et département depuis le bureau de chaque ligne (un UPDATE par table)"""
+    BureauVote = apps.get_model('myApplication', 'BureauVote')
+    for nom, (source, filtre) in SOURCES.items():
+        bureaux = BureauVote.objects.filter(**{filtre: OuterRef(source)})
+        apps.get_model('myApplication', nom).objects.update(**{
+            champ: Subquery(bureaux.values(chemin)[:1]) for champ, chemin in CHEMINS_HIERARCHIE.items()
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0012_historique_resultats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='procesverbal',
+            name='centre_vote',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.centrevote', verbose_name='Centre de vote'),
+        ),
+        migrations.AddField(
+            model_name='procesverbal',
+            name='departement',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.departement', verbose_name='Département'),
+        ),
+        migrations.AddField(
+            model_name='procesverbal',
+            name='sous_prefecture',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.sousprefecture', verbose_name='Sous-préfecture'),
+        ),
+        migrations.AddField(
+            model_name='relevéhoraire',
+            name='centre_vote',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.centrevote', verbose_name='Centre de vote'),
+        ),
+        migrations.AddField(
+            model_name='relevéhoraire',
+            name='departement',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.departement', verbose_name='Département'),
+        ),
+        migrations.AddField(
+            model_name='relevéhoraire',
+            name='sous_prefecture',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.sousprefecture', verbose_name='Sous-préfecture'),
+        ),
+        migrations.AddField(
+            model_name='resultatcandidat',
+            name='centre_vote',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.centrevote', verbose_name='Centre de vote'),
+        ),
+        migrations.AddField(
+            model_name='resultatcandidat',
+            name='departement',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.departement', verbose_name='Département'),
+        ),
+        migrations.AddField(
+            model_name='resultatcandidat',
+            name='sous_prefecture',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myApplication.sousprefecture', verbose_name='Sous-préfecture'),
+        ),
+        migrations.RunPython(renseigner_cles, migrations.RunPython.noop),
+    ]
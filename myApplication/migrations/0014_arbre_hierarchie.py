@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Hiérarchie de haut en bas : niveau, modèle, champ du parent, champ du libellé
+NIVEAUX = [
+    ('departement', 'Departement', None, 'nom'),
+    ('sous_prefecture', 'SousPrefecture', 'departement_id', 'nom'),
+    ('centre', 'CentreVote', 'sous_prefecture_id', 'nom'),
+    ('bureau', 'BureauVote', 'centre_vote_id', 'numero'),
+]
+
+
+def construire_arbre(apps, schema_editor):
+    """Crée les nœuds de la hiérarchie existante, niveau par niveau (chemins sur 11 caractères par segment)"""
+    NoeudHierarchie = apps.get_model('myApplication', 'NoeudHierarchie')
+    parents = {None: (None, '')}
+    for profondeur, (niveau, modele, champ_parent, champ_nom) in enumerate(NIVEAUX):
+        champs = ['pk', champ_nom] + ([champ_parent] if champ_parent else [])
+        noeuds = []
+        for objet_id, nom, *parent_id in apps.get_model('myApplication', modele).objects.values_list(*champs):
+            parent = parents.get(parent_id[0] if parent_id else None)
+            if parent is not None:
+                noeuds.append(NoeudHierarchie(
+                    niveau=niveau, objet_id=objet_id, nom=nom, parent_id=parent[0], profondeur=profondeur,
+                    chemin=f'{parent[1]}{objet_id:010d}/',
+                    bureau_vote_id=objet_id if profondeur == len(NIVEAUX) - 1 else None,
+                ))
+        NoeudHierarchie.objects.bulk_create(noeuds, batch_size=1000)
+        parents = {
+            objet_id: (pk, chemin)
+            for pk, objet_id, chemin in NoeudHierarchie.objects.filter(
+                profondeur=profondeur
+            ).values_list('pk', 'objet_id', 'chemin')
+        }
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0013_hierarchie_denormalisee'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoeudHierarchie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('niveau', models.CharField(max_length=30)),
+                ('objet_id', models.BigIntegerField()),
+                ('nom', models.CharField(blank=True, max_length=200)),
+                ('profondeur', models.PositiveSmallIntegerField()),
+                ('chemin', models.CharField(max_length=255, unique=True)),
+                ('bureau_vote', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='noeud_hierarchie', to='myApplication.bureauvote')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='enfants', to='myApplication.noeudhierarchie')),
+            ],
+            options={
+                'verbose_name': 'Nœud de la hiérarchie',
+                'verbose_name_plural': 'Nœuds de la hiérarchie',
+                'ordering': ['chemin'],
+                'indexes': [models.Index(fields=['profondeur', 'chemin'], name='noeud_profondeur_chemin_idx')],
+                'unique_together': {('niveau', 'objet_id')},
+            },
+        ),
+        migrations.RunPython(construire_arbre, migrations.RunPython.noop),
+    ]
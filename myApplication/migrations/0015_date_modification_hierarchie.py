@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0014_arbre_hierarchie'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bureauvote',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='centrevote',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='departement',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='sousprefecture',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApplication', '0015_date_modification_hierarchie'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relevéhoraire',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,13 +1,17 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 
 class Departement(models.Model):
     """Modèle pour les départements"""
     nom = models.CharField(max_length=100, unique=True)
     code = models.CharField(max_length=20, unique=True)
+    date_modification = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Département"
@@ -22,6 +26,7 @@ class SousPrefecture(models.Model):
     """Modèle pour les sous-préfectures"""
     nom = models.CharField(max_length=100)
     departement = models.ForeignKey(Departement, on_delete=models.CASCADE, related_name='sous_prefectures')
+    date_modification = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Sous-préfecture"
@@ -38,6 +43,7 @@ class CentreVote(models.Model):
     nom = models.CharField(max_length=200)
     sous_prefecture = models.ForeignKey(SousPrefecture, on_delete=models.CASCADE, related_name='centres_vote')
     adresse = models.TextField(blank=True, null=True)
+    date_modification = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Centre de vote"
@@ -53,6 +59,8 @@ class BureauVote(models.Model):
     numero = models.CharField(max_length=10)
     centre_vote = models.ForeignKey(CentreVote, on_delete=models.CASCADE, related_name='bureaux')
     nombre_inscrits = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    # Matrice des résultats : bureaux modifiés depuis le dernier chargement (myApplication.matrice_resultats)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = "Bureau de vote"
@@ -118,7 +126,89 @@ class User(AbstractUser):
         super().save(*args, **kwargs)
 
 
-class ProcesVerbal(models.Model):
+# ========================================
+# CLÉS DE HIÉRARCHIE DÉNORMALISÉES
+# ========================================
+
+# Clés recopiées sur les tables de faits → chemin depuis le bureau de vote
+CHEMINS_HIERARCHIE = {
+    'centre_vote_id': 'centre_vote_id',
+    'sous_prefecture_id': 'centre_vote__sous_prefecture_id',
+    'departement_id': 'centre_vote__sous_prefecture__departement_id',
+}
+
+
+class RattachementHierarchie(models.Model):
+    """
+    Centre, sous-préfecture et département recopiés sur une table de faits
+
+    Les filtres et regroupements par niveau se font sur la table elle-même,
+    sans remonter bureau → centre → sous-préfecture → département. Les clés
+    sont renseignées à l'enregistrement (une requête, seulement si la ligne
+    source change), recalculées quand un bureau, un centre ou une
+    sous-préfecture change de parent (myApplication.hierarchie) et contrôlées
+    par la commande verifier_hierarchie. Les insertions en masse les
+    renseignent elles-mêmes (cles_hierarchie()).
+    """
+    # Champ dont dépendent les clés, filtre du bureau correspondant, chemin vers le bureau
+    CHAMP_SOURCE = 'bureau_vote_id'
+    FILTRE_BUREAU = 'pk'
+    CHEMIN_BUREAU = 'bureau_vote'
+
+    centre_vote = models.ForeignKey(
+        CentreVote, on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='+',
+        verbose_name='Centre de vote'
+    )
+    sous_prefecture = models.ForeignKey(
+        SousPrefecture, on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='+',
+        verbose_name='Sous-préfecture'
+    )
+    departement = models.ForeignKey(
+        Departement, on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='+',
+        verbose_name='Département'
+    )
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Source telle que lue en base : les clés ne sont recalculées que si elle change
+        instance._source_hierarchie = instance.__dict__.get(cls.CHAMP_SOURCE)
+        return instance
+
+    @classmethod
+    def bureau_source(cls, source):
+        """Bureau dont dépend une ligne, d'après sa source (identifiant ou OuterRef)"""
+        return BureauVote.objects.filter(**{cls.FILTRE_BUREAU: source})
+
+    def cles_hierarchie(self):
+        """Clés de la ligne, à recopier sur les lignes qui en dépendent"""
+        return {champ: getattr(self, champ) for champ in CHEMINS_HIERARCHIE}
+
+    def rattacher_hierarchie(self):
+        """Renseigne les clés depuis la source ; renvoie True si elles ont été recalculées"""
+        source_id = getattr(self, self.CHAMP_SOURCE)
+        if source_id is None:
+            return False
+        if source_id == getattr(self, '_source_hierarchie', None) and self.departement_id is not None:
+            return False
+        cles = self.bureau_source(source_id).values_list(*CHEMINS_HIERARCHIE.values()).first()
+        if cles is None:
+            return False
+        for champ, valeur in zip(CHEMINS_HIERARCHIE, cles):
+            setattr(self, champ, valeur)
+        self._source_hierarchie = source_id
+        return True
+
+    def save(self, *args, **kwargs):
+        if self.rattacher_hierarchie() and kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *CHEMINS_HIERARCHIE}
+        super().save(*args, **kwargs)
+
+
+class ProcesVerbal(RattachementHierarchie):
     """Procès-verbal d'un bureau de vote - Données globales du bureau"""
     bureau_vote = models.OneToOneField(
         BureauVote, 
@@ -164,11 +254,32 @@ class ProcesVerbal(models.Model):
     date_modification = models.DateTimeField(auto_now=True)
     verifie = models.BooleanField(default=False, help_text="PV vérifié par l'administrateur")
     observations = models.TextField(blank=True, null=True)
+
+    # Vérification
+    rejete = models.BooleanField(default=False, help_text="PV rejeté à la vérification, en attente de correction")
+    motif_rejet = models.TextField(blank=True, default='')
+    verifie_par = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='proces_verbaux_verifies'
+    )
+    date_verification = models.DateTimeField(null=True, blank=True)
+
+    # Détection d'anomalies : à réanalyser si vide ou antérieure à date_modification
+    date_analyse_anomalies = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         verbose_name = "Procès-verbal"
         verbose_name_plural = "Procès-verbaux"
         ordering = ['-date_saisie']
+        indexes = [
+            # File de vérification : PV ni vérifiés ni rejetés, du plus ancien au plus récent
+            models.Index(fields=['verifie', 'rejete', 'date_saisie'], name='pv_file_verification_idx'),
+            # Flux des changements : pagination par clé (date_modification, id)
+            models.Index(fields=['date_modification', 'id'], name='pv_changements_idx'),
+        ]
     
     def __str__(self):
         return f"PV - {self.bureau_vote}"
@@ -240,8 +351,12 @@ class ProcesVerbal(models.Model):
         return round((self.bulletins_nuls / self.nombre_votants) * 100, 2)
 
 
-class ResultatCandidat(models.Model):
+class ResultatCandidat(RattachementHierarchie):
     """Résultats d'un candidat dans un bureau de vote"""
+    CHAMP_SOURCE = 'proces_verbal_id'
+    FILTRE_BUREAU = 'proces_verbal'
+    CHEMIN_BUREAU = 'proces_verbal__bureau_vote'
+
     proces_verbal = models.ForeignKey(
         ProcesVerbal,
         on_delete=models.CASCADE,
@@ -312,9 +427,16 @@ class AuditLog(models.Model):
     object_id = models.IntegerField()
     object_repr = models.CharField(max_length=200, blank=True)
     changes = models.JSONField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=500, blank=True)
+    identifiant = models.UUIDField(
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Identifiant de l'entrée dans le spool, évite les doublons lors d'une reprise"
+    )
 
     class Meta:
         verbose_name = "Journal d'audit"
@@ -329,10 +451,31 @@ class AuditLog(models.Model):
         user_str = self.user.get_full_name() if self.user else "Système"
         return f"{user_str} - {self.get_action_display()} - {self.model_name} #{self.object_id} - {self.timestamp.strftime('%d/%m/%Y %H:%M')}"
 
+    @staticmethod
+    def infos_requete(request):
+        """Retourne (adresse IP, User-Agent) d'une requête, ou (None, "") sans requête"""
+        if not request:
+            return None, ""
+
+        # Obtenir l'IP
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip_address = x_forwarded_for.split(',')[0]
+        else:
+            ip_address = request.META.get('REMOTE_ADDR')
+
+        # Obtenir le User-Agent
+        user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
+
+        return ip_address, user_agent
+
     @classmethod
     def log_action(cls, user, action, instance, changes=None, request=None):
         """
-        Méthode utilitaire pour logger une action
+        Méthode utilitaire pour logger une action de façon synchrone
+
+        Les chemins d'écriture de l'application passent par myApplication.audit.journaliser,
+        qui regroupe les entrées et les insère en arrière-plan.
 
         Usage:
             AuditLog.log_action(
@@ -343,19 +486,7 @@ class AuditLog(models.Model):
                 request=request
             )
         """
-        ip_address = None
-        user_agent = ""
-
-        if request:
-            # Obtenir l'IP
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            if x_forwarded_for:
-                ip_address = x_forwarded_for.split(',')[0]
-            else:
-                ip_address = request.META.get('REMOTE_ADDR')
-
-            # Obtenir le User-Agent
-            user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
+        ip_address, user_agent = cls.infos_requete(request)
 
         return cls.objects.create(
             user=user,
@@ -400,66 +531,11 @@ def get_model_changes(old_instance, new_instance, fields_to_track):
     return changes if changes else None
 
 
-# ========================================
-# EXEMPLE D'UTILISATION DANS views.py
-# ========================================
-
-"""
-Dans la vue saisie_resultat, après la sauvegarde du PV :
-
-# Déterminer l'action
-action = 'UPDATE' if pv_existant else 'CREATE'
-
-# Tracker les changements si c'est une modification
-changes = None
-if pv_existant:
-    fields_to_track = ['nombre_votants', 'bulletins_nuls', 'bulletins_blancs', 'suffrages_exprimes']
-    changes = get_model_changes(pv_existant, pv, fields_to_track)
-
-# Logger l'action
-AuditLog.log_action(
-    user=request.user,
-    action=action,
-    instance=pv,
-    changes=changes,
-    request=request
-)
-
-messages.success(request, f'✅ Procès-verbal {action.lower()}é avec succès !')
-"""
-
-
-# ========================================
-# ADMIN POUR AUDITLOG
-# ========================================
-
-"""
-Dans admin.py :
-
-@admin.register(AuditLog)
-class AuditLogAdmin(admin.ModelAdmin):
-    list_display = ['timestamp', 'user', 'action', 'model_name', 'object_id', 'ip_address']
-    list_filter = ['action', 'model_name', 'timestamp']
-    search_fields = ['user__username', 'user__first_name', 'user__last_name', 'object_repr', 'ip_address']
-    readonly_fields = ['timestamp', 'user', 'action', 'model_name', 'object_id', 'object_repr', 'changes', 'ip_address', 'user_agent']
-    date_hierarchy = 'timestamp'
-    
-    def has_add_permission(self, request):
-        return False  # Les logs ne peuvent pas être créés manuellement
-    
-    def has_change_permission(self, request, obj=None):
-        return False  # Les logs ne peuvent pas être modifiés
-    
-    def has_delete_permission(self, request, obj=None):
-        return False  # Les logs ne peuvent pas être supprimés
-"""
-
-
 # ========================================
 # À AJOUTER DANS models.py AVANT AuditLog
 # ========================================
 
-class RelevéHoraire(models.Model):
+class RelevéHoraire(RattachementHierarchie):
     """Relevé horaire du nombre de votants dans un bureau"""
     bureau_vote = models.ForeignKey(
         BureauVote,
@@ -473,17 +549,23 @@ class RelevéHoraire(models.Model):
         related_name='releves_saisis',
         limit_choices_to={'role': 'representant'}
     )
-    heure_releve = models.DateTimeField(auto_now_add=True, verbose_name='Heure du relevé')
+    heure_releve = models.DateTimeField(default=timezone.now, verbose_name='Heure du relevé')
     nombre_votants = models.IntegerField(
         validators=[MinValueValidator(0)],
         help_text='Nombre de votants à cette heure'
     )
     observations = models.TextField(blank=True, null=True, verbose_name='Observations')
+    # Rapprochement incrémental : relevé modifié depuis le dernier calcul (myApplication.rapprochement)
+    date_modification = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = 'Relevé horaire'
         verbose_name_plural = 'Relevés horaires'
         ordering = ['-heure_releve']
+        indexes = [
+            # Parcours des séries par bureau dans l'ordre chronologique (rapprochement relevés / PV)
+            models.Index(fields=['bureau_vote', 'heure_releve'], name='releve_bureau_heure_idx'),
+        ]
 
     def __str__(self):
         return f"{self.bureau_vote} - {self.heure_releve.strftime('%H:%M')} - {self.nombre_votants} votants"
@@ -493,3 +575,300 @@ class RelevéHoraire(models.Model):
         if self.bureau_vote.nombre_inscrits == 0:
             return 0
         return round((self.nombre_votants / self.bureau_vote.nombre_inscrits) * 100, 2)
+
+
+class OperationSynchronisation(models.Model):
+    """Opération reçue d'un client hors ligne, conservée pour rendre la synchronisation idempotente"""
+
+    TYPE_CHOICES = [
+        ('releve', 'Relevé horaire'),
+        ('pv', 'Procès-verbal'),
+    ]
+
+    STATUT_CHOICES = [
+        ('applique', 'Appliquée'),
+        ('rejete', 'Rejetée'),
+    ]
+
+    op_id = models.CharField(max_length=64, unique=True, help_text="Identifiant généré par le client")
+    utilisateur = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='operations_synchronisees'
+    )
+    type_operation = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES)
+    reponse = models.JSONField(default=dict, blank=True)
+    date_reception = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Opération synchronisée'
+        verbose_name_plural = 'Opérations synchronisées'
+        ordering = ['-date_reception']
+
+    def __str__(self):
+        return f"{self.get_type_operation_display()} {self.op_id} - {self.get_statut_display()}"
+
+
+class ReservationVerification(models.Model):
+    """
+    Réservation temporaire d'un PV par un vérificateur
+
+    L'unicité sur le PV garantit qu'un même PV n'est jamais attribué à deux
+    vérificateurs ; une réservation expirée peut être reprise par un autre.
+    """
+    proces_verbal = models.OneToOneField(
+        ProcesVerbal,
+        on_delete=models.CASCADE,
+        related_name='reservation'
+    )
+    verificateur = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reservations_verification'
+    )
+    date_reservation = models.DateTimeField(default=timezone.now)
+    expiration = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Réservation de vérification'
+        verbose_name_plural = 'Réservations de vérification'
+        ordering = ['expiration']
+
+    def __str__(self):
+        return f"{self.proces_verbal} - {self.verificateur.username}"
+
+
+class AnomaliePV(models.Model):
+    """
+    Anomalie statistique détectée sur un PV par l'analyse par lots (myApplication.anomalies)
+
+    Une seule ligne par PV et par type : une nouvelle analyse met à jour la
+    valeur mesurée sans perdre le traitement (résolue) déjà fait par un administrateur.
+    """
+
+    TYPE_CHOICES = [
+        ('participation_atypique', 'Participation atypique'),
+        ('participation_totale', 'Participation de 100 %'),
+        ('vote_unanime', 'Voix concentrées sur un candidat'),
+        ('nuls_atypiques', 'Taux de bulletins nuls atypique'),
+        ('derniers_chiffres', 'Derniers chiffres non uniformes'),
+        ('releve_incoherent', 'Relevés horaires incohérents avec le PV'),
+    ]
+
+    proces_verbal = models.ForeignKey(
+        ProcesVerbal,
+        on_delete=models.CASCADE,
+        related_name='anomalies'
+    )
+    type_anomalie = models.CharField(max_length=30, choices=TYPE_CHOICES)
+    valeur = models.FloatField(help_text="Valeur mesurée sur le PV")
+    reference = models.FloatField(null=True, blank=True, help_text="Valeur attendue (centre, sous-préfecture, seuil)")
+    message = models.CharField(max_length=255)
+    date_detection = models.DateTimeField(default=timezone.now)
+    resolue = models.BooleanField(default=False, help_text="Anomalie examinée et levée par un administrateur")
+    resolue_par = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='anomalies_resolues'
+    )
+
+    class Meta:
+        verbose_name = 'Anomalie de PV'
+        verbose_name_plural = 'Anomalies de PV'
+        ordering = ['-date_detection']
+        constraints = [
+            models.UniqueConstraint(fields=['proces_verbal', 'type_anomalie'], name='anomalie_pv_type_unique'),
+        ]
+        indexes = [
+            # Anomalies ouvertes par type (admin, tableaux de bord)
+            models.Index(fields=['resolue', 'type_anomalie'], name='anomalie_ouverte_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_anomalie_display()} - {self.proces_verbal}"
+
+
+class RapprochementReleves(models.Model):
+    """
+    Rapprochement de la série des relevés horaires d'un bureau avec son PV (myApplication.rapprochement)
+
+    Recalculé quand un relevé du bureau est ajouté, modifié ou supprimé, ou quand son PV change.
+    """
+    bureau_vote = models.OneToOneField(
+        BureauVote,
+        on_delete=models.CASCADE,
+        related_name='rapprochement_releves'
+    )
+    nombre_releves = models.IntegerField()
+    premier_releve = models.DateTimeField()
+    dernier_releve = models.DateTimeField()
+    votants_dernier_releve = models.IntegerField()
+    votants_pv = models.IntegerField(null=True, blank=True, help_text="Votants du PV (vide si aucun PV)")
+
+    nombre_baisses = models.IntegerField(default=0, help_text="Relevés inférieurs au relevé précédent")
+    nombre_sauts = models.IntegerField(default=0, help_text="Hausses trop rapides entre deux relevés")
+    saut_max = models.FloatField(default=0, help_text="Plus forte hausse, en % des inscrits par heure")
+    ecart_pv = models.IntegerField(null=True, blank=True, help_text="Votants du PV - dernier relevé")
+    ecart_pv_anormal = models.BooleanField(default=False)
+    anomalie = models.BooleanField(default=False, help_text="Baisse, saut ou écart avec le PV")
+
+    dernier_releve_id = models.IntegerField(help_text="Plus grand identifiant de relevé pris en compte")
+    date_calcul = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Rapprochement relevés / PV'
+        verbose_name_plural = 'Rapprochements relevés / PV'
+        ordering = ['bureau_vote']
+        indexes = [
+            models.Index(fields=['anomalie', 'bureau_vote'], name='rapprochement_anomalie_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rapprochement - {self.bureau_vote}"
+
+
+class SuppressionPV(models.Model):
+    """
+    Trace d'un PV supprimé, servie par le flux des changements (myApplication.changements)
+
+    Les identifiants sont de simples entiers : la trace survit à la suppression
+    du PV comme à celle de son bureau.
+    """
+    proces_verbal_id = models.BigIntegerField()
+    bureau_vote_id = models.BigIntegerField()
+    date_suppression = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'PV supprimé'
+        verbose_name_plural = 'PV supprimés'
+        ordering = ['date_suppression', 'id']
+        indexes = [
+            models.Index(fields=['date_suppression', 'id'], name='suppression_pv_changements_idx'),
+        ]
+
+    def __str__(self):
+        return f"PV {self.proces_verbal_id} supprimé (bureau {self.bureau_vote_id})"
+
+
+class EvenementResultat(models.Model):
+    """
+    Événement de la boîte d'envoi (outbox) des changements de résultats (myApplication.outbox)
+
+    Écrit dans la même transaction que le changement qu'il décrit ; la séquence
+    croît strictement (AUTOINCREMENT) et ordonne le traitement par les consommateurs.
+    """
+    TYPE_CHOICES = [
+        ('pv', 'Procès-verbal'),
+        ('resultats', 'Résultats du PV'),
+        ('bureau', 'Bureau de vote'),
+        ('releve', 'Relevé horaire'),
+    ]
+    ACTION_CHOICES = [
+        ('enregistrement', 'Création ou modification'),
+        ('suppression', 'Suppression'),
+    ]
+
+    sequence = models.BigAutoField(primary_key=True)
+    type_objet = models.CharField(max_length=10, choices=TYPE_CHOICES)
+    objet_id = models.BigIntegerField()
+    bureau_vote_id = models.BigIntegerField(null=True, blank=True)
+    action = models.CharField(max_length=15, choices=ACTION_CHOICES, default='enregistrement')
+    date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Événement de résultat'
+        verbose_name_plural = 'Événements de résultats'
+        ordering = ['sequence']
+
+    def __str__(self):
+        return f"#{self.sequence} {self.type_objet} {self.objet_id} ({self.action})"
+
+
+class PositionConsommateur(models.Model):
+    """Dernier événement de la boîte d'envoi traité par un consommateur"""
+    nom = models.CharField(max_length=50, unique=True)
+    sequence = models.BigIntegerField(default=0)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Position de consommateur'
+        verbose_name_plural = 'Positions des consommateurs'
+        ordering = ['nom']
+
+    def __str__(self):
+        return f"{self.nom} : {self.sequence}"
+
+
+class HistoriqueResultats(models.Model):
+    """
+    Instantané immuable des résultats d'un département (myApplication.historique)
+
+    Totaux par niveau, plus les bureaux modifiés depuis l'instantané précédent
+    (ou tous les bureaux pour un instantané de base, complet=True).
+    L'identifiant est permanent : les URL d'un instantané peuvent être mises en
+    cache sans limite.
+    """
+    identifiant = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    departement = models.ForeignKey(Departement, on_delete=models.CASCADE, related_name='historique_resultats')
+    date = models.DateTimeField(default=timezone.now)
+    precedent = models.OneToOneField(
+        'self', on_delete=models.PROTECT, null=True, blank=True, related_name='suivant'
+    )
+    complet = models.BooleanField(default=False, help_text="Instantané de base : tous les bureaux")
+    candidats = models.JSONField(default=list, help_text="Identifiants des candidats, ordre des colonnes de voix")
+    totaux = models.JSONField(default=dict, help_text="Totaux du département, des sous-préfectures et des centres")
+    bureaux = models.BinaryField(help_text="Bureaux modifiés (JSON compressé)")
+    nombre_bureaux = models.IntegerField(default=0, help_text="Bureaux enregistrés dans cet instantané")
+    empreinte = models.CharField(max_length=64, help_text="SHA-256 de l'état de tous les bureaux")
+
+    class Meta:
+        verbose_name = 'Instantané historique des résultats'
+        verbose_name_plural = 'Historique des résultats'
+        ordering = ['departement', '-date']
+        indexes = [
+            # « Au » moment donné : dernier instantané antérieur du département
+            models.Index(fields=['departement', 'date'], name='historique_dept_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.departement} au {timezone.localtime(self.date):%d/%m/%Y %H:%M}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Un instantané historique ne peut pas être modifié")
+        super().save(*args, **kwargs)
+
+
+class NoeudHierarchie(models.Model):
+    """
+    Nœud de l'arbre de la hiérarchie électorale (myApplication.arbre)
+
+    Le chemin matérialisé enchaîne l'identifiant de chaque ancêtre, sur une
+    largeur fixe : les descendants d'un nœud sont un intervalle de chemins, et
+    le chemin d'un ancêtre est un préfixe de longueur connue.
+    """
+    niveau = models.CharField(max_length=30)
+    objet_id = models.BigIntegerField()
+    nom = models.CharField(max_length=200, blank=True)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='enfants')
+    profondeur = models.PositiveSmallIntegerField()
+    chemin = models.CharField(max_length=255, unique=True)
+    bureau_vote = models.OneToOneField(
+        BureauVote, on_delete=models.CASCADE, null=True, blank=True, related_name='noeud_hierarchie'
+    )
+
+    class Meta:
+        verbose_name = 'Nœud de la hiérarchie'
+        verbose_name_plural = 'Nœuds de la hiérarchie'
+        ordering = ['chemin']
+        unique_together = ['niveau', 'objet_id']
+        indexes = [
+            # Descendants d'un nœud à une profondeur donnée : égalité puis intervalle de chemins
+            models.Index(fields=['profondeur', 'chemin'], name='noeud_profondeur_chemin_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.niveau} {self.nom}"
@@ -0,0 +1,198 @@
+"""
+Boîte d'envoi (outbox) transactionnelle des changements de résultats
+
+Chaque enregistrement ou suppression d'un PV, de ses résultats, d'un bureau ou
+d'un relevé horaire ajoute un EvenementResultat dans la même transaction : si
+la transaction est annulée, l'événement disparaît avec elle. Les signaux
+couvrent l'admin, les vues et les imports ; les écritures en masse qui ne
+déclenchent pas de signal (bulk_create, bulk_update, suppressions par
+queryset) publient leurs événements explicitement avec publier().
+
+Les consommateurs (décorateur consommateur) lisent les événements par lots,
+dans l'ordre de la séquence ; les événements d'un même objet dans un lot sont
+regroupés (les résultats d'un PV enregistrés ligne à ligne n'en font qu'un).
+Un lot est traité dans une transaction qui avance aussi la position du
+consommateur : les données dérivées écrites en base par le consommateur et sa
+position sont validées ensemble, chaque événement est donc appliqué
+exactement une fois. Avec SQLite, les écritures
+sont sérialisées : une séquence visible garantit que toutes les précédentes
+le sont aussi.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import BureauVote, EvenementResultat, PositionConsommateur, ProcesVerbal, RelevéHoraire, ResultatCandidat
+
+ENREGISTREMENT = 'enregistrement'
+SUPPRESSION = 'suppression'
+
+# Consommateurs enregistrés : nom → (fonction, types d'objets traités ou None pour tous)
+CONSOMMATEURS = {}
+
+
+def taille_lot():
+    return getattr(settings, 'OUTBOX_TAILLE_LOT', 500)
+
+
+# ========================================
+# PUBLICATION
+# ========================================
+
+def publier(type_objet, objet_id, bureau_id=None, action=ENREGISTREMENT):
+    """Ajoute un événement dans la transaction en cours"""
+    EvenementResultat.objects.create(
+        type_objet=type_objet, objet_id=objet_id, bureau_vote_id=bureau_id, action=action
+    )
+
+
+def publier_lot(evenements):
+    """
+    Ajoute plusieurs événements en une requête
+
+    Args:
+        evenements: Liste de tuples (type_objet, objet_id, bureau_id, action)
+    """
+    maintenant = timezone.now()
+    EvenementResultat.objects.bulk_create([
+        EvenementResultat(
+            type_objet=type_objet, objet_id=objet_id, bureau_vote_id=bureau_id, action=action, date=maintenant
+        )
+        for type_objet, objet_id, bureau_id, action in evenements
+    ])
+
+
+def _action(kwargs):
+    return SUPPRESSION if kwargs['signal'] is post_delete else ENREGISTREMENT
+
+
+def _pv(sender, instance, **kwargs):
+    publier('pv', instance.pk, instance.bureau_vote_id, _action(kwargs))
+
+
+def _resultat(sender, instance, **kwargs):
+    # Objet de l'événement : le PV, dont les consommateurs relisent tous les résultats
+    # (regroupés à la consommation). PV déjà chargé (inline de l'admin) : pas de requête.
+    if ResultatCandidat.proces_verbal.is_cached(instance):
+        bureau_id = instance.proces_verbal.bureau_vote_id
+    else:
+        bureau_id = ProcesVerbal.objects.filter(pk=instance.proces_verbal_id).values_list(
+            'bureau_vote_id', flat=True
+        ).first()
+    publier('resultats', instance.proces_verbal_id, bureau_id, _action(kwargs))
+
+
+def _bureau(sender, instance, **kwargs):
+    publier('bureau', instance.pk, instance.pk, _action(kwargs))
+
+
+def _releve(sender, instance, **kwargs):
+    publier('releve', instance.pk, instance.bureau_vote_id, _action(kwargs))
+
+
+RECEPTEURS = {
+    ProcesVerbal: _pv,
+    ResultatCandidat: _resultat,
+    BureauVote: _bureau,
+    RelevéHoraire: _releve,
+}
+
+
+def connecter_signaux():
+    """Publie les changements des modèles suivis (appelé depuis AppConfig.ready)"""
+    for modele, recepteur in RECEPTEURS.items():
+        post_save.connect(recepteur, sender=modele, dispatch_uid=f'outbox_save_{modele.__name__}')
+        # Pas de post_delete sur ResultatCandidat : la suppression d'un PV publie déjà
+        # son événement, et les remplacements de résultats publient le leur
+        if modele is not ResultatCandidat:
+            post_delete.connect(recepteur, sender=modele, dispatch_uid=f'outbox_delete_{modele.__name__}')
+
+
+# ========================================
+# CONSOMMATION
+# ========================================
+
+def consommateur(nom, types=None):
+    """
+    Enregistre une fonction de traitement des événements
+
+    La fonction reçoit une liste d'EvenementResultat (le dernier de chaque
+    objet du lot, dans l'ordre de la séquence), à l'intérieur de la
+    transaction qui avance la position.
+
+    Args:
+        nom: Nom du consommateur (clé de sa position)
+        types: Types d'objets à traiter ; les autres événements sont sautés
+    """
+    def enregistrer(fonction):
+        CONSOMMATEURS[nom] = (fonction, set(types) if types else None)
+        return fonction
+    return enregistrer
+
+
+def regrouper(evenements):
+    """Dernier événement de chaque objet (type, identifiant), dans l'ordre de la séquence"""
+    derniers = {(evenement.type_objet, evenement.objet_id): evenement for evenement in evenements}
+    return sorted(derniers.values(), key=attrgetter('sequence'))
+
+
+def consommer(nom, taille=None, lots_max=None):
+    """
+    Traite les événements en attente d'un consommateur, lot par lot
+
+    Returns:
+        dict: Nombre de lots et d'événements traités, position finale
+    """
+    fonction, types = CONSOMMATEURS[nom]
+    taille = taille or taille_lot()
+    PositionConsommateur.objects.get_or_create(nom=nom)
+
+    lots = evenements_traites = 0
+    position = None
+    while lots_max is None or lots < lots_max:
+        with transaction.atomic():
+            # Écriture en tête de transaction : un seul processus traite ce consommateur
+            # à la fois (verrou d'écriture SQLite, verrou de ligne ailleurs)
+            PositionConsommateur.objects.filter(nom=nom).update(date_maj=timezone.now())
+            position = PositionConsommateur.objects.select_for_update().get(nom=nom)
+            evenements = list(
+                EvenementResultat.objects.filter(sequence__gt=position.sequence).order_by('sequence')[:taille]
+            )
+            if not evenements:
+                break
+            a_traiter = regrouper(
+                evenement for evenement in evenements if types is None or evenement.type_objet in types
+            )
+            if a_traiter:
+                fonction(a_traiter)
+            position.sequence = evenements[-1].sequence
+            position.save(update_fields=['sequence', 'date_maj'])
+        lots += 1
+        evenements_traites += len(evenements)
+
+    return {'lots': lots, 'evenements': evenements_traites, 'position': position.sequence if position else 0}
+
+
+def purger():
+    """Supprime les événements déjà traités par tous les consommateurs enregistrés"""
+    PositionConsommateur.objects.bulk_create(
+        [PositionConsommateur(nom=nom) for nom in CONSOMMATEURS], ignore_conflicts=True
+    )
+    minimum = PositionConsommateur.objects.filter(nom__in=CONSOMMATEURS).aggregate(Min('sequence'))['sequence__min']
+    if not minimum:
+        return 0
+    return EvenementResultat.objects.filter(sequence__lte=minimum).delete()[0]
+
+
+# ---------- Consommateurs fournis ----------
+
+@consommateur('rapprochement', types=['pv', 'bureau', 'releve'])
+def _rapprocher(evenements):
+    """Rapprochement relevés / PV des bureaux touchés (myApplication.rapprochement)"""
+    from .rapprochement import rapprocher
+
+    rapprocher(bureaux={evenement.bureau_vote_id for evenement in evenements if evenement.bureau_vote_id})
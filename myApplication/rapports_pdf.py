@@ -0,0 +1,459 @@
+"""
+Rapports PDF des résultats
+
+Deux moteurs produisent le document :
+- WeasyPrint, à partir du gabarit export_pdf.html, pour un département, une
+  sous-préfecture ou un centre de vote. La feuille de style export_pdf.css est
+  analysée une seule fois par processus, et la configuration des polices
+  (fontconfig, @font-face) est réutilisée d'un rendu à l'autre. Seuls le
+  gabarit et la mise en page sont refaits à chaque document (le gabarit ne
+  contient pas d'image : aucun cache d'images n'est gardé).
+- ReportLab (pdf_reportlab), le rapport départemental historique, utilisé
+  quand WeasyPrint ou ses bibliothèques système (Pango) sont absents.
+
+Les chiffres viennent de la matrice des résultats. La commande benchmark_pdf
+compare les temps de rendu des deux moteurs.
+"""
+import importlib
+import importlib.util
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+
+from .matrice_resultats import get_matrice
+from .models import BureauVote, CentreVote, Departement, ProcesVerbal, SousPrefecture, User
+
+logger = logging.getLogger(__name__)
+
+# Niveau du rapport → (modèle, libellé, niveau détaillé dans le tableau, libellé du niveau détaillé)
+NIVEAUX_RAPPORT = {
+    'departement': (Departement, 'Département', 'sous_prefecture', 'Sous-préfecture'),
+    'sous_prefecture': (SousPrefecture, 'Sous-préfecture', 'centre', 'Centre de vote'),
+    'centre': (CentreVote, 'Centre de vote', 'bureau', 'Bureau'),
+}
+
+_ressources = {}
+_verrou_ressources = threading.Lock()
+
+
+# ========================================
+# WEASYPRINT
+# ========================================
+
+def weasyprint_disponible():
+    """WeasyPrint et ses bibliothèques système sont-ils utilisables dans ce processus ?"""
+    if 'disponible' not in _ressources:
+        disponible = importlib.util.find_spec('weasyprint') is not None
+        if disponible:
+            # Paquet installé : l'import charge aussi Pango (OSError s'il est introuvable)
+            try:
+                importlib.import_module('weasyprint')
+            except (ImportError, OSError):
+                disponible = False
+        _ressources['disponible'] = disponible
+    return _ressources['disponible']
+
+
+def _ressources_weasyprint():
+    """Feuille de style analysée et polices, partagées par les rendus du processus"""
+    with _verrou_ressources:
+        if 'feuille_style' not in _ressources:
+            from weasyprint import CSS
+            from weasyprint.text.fonts import FontConfiguration
+
+            polices = FontConfiguration()
+            source = get_template('export_pdf.css').template.source
+            _ressources['polices'] = polices
+            _ressources['feuille_style'] = CSS(string=source, font_config=polices)
+        return _ressources
+
+
+def objet_rapport(niveau, identifiant):
+    """Département, sous-préfecture ou centre du rapport (None si inexistant)"""
+    modele = NIVEAUX_RAPPORT[niveau][0]
+    queryset = modele.objects.all()
+    if niveau == 'sous_prefecture':
+        queryset = queryset.select_related('departement')
+    elif niveau == 'centre':
+        queryset = queryset.select_related('sous_prefecture__departement')
+    return queryset.filter(pk=identifiant).first()
+
+
+def contexte_rapport(niveau, objet, matrice=None):
+    """
+    Données du gabarit export_pdf.html pour une partie de la hiérarchie
+
+    Args:
+        niveau: 'departement', 'sous_prefecture' ou 'centre'
+        objet: Instance du niveau (voir objet_rapport)
+        matrice: Matrice des résultats (get_matrice() par défaut)
+    """
+    matrice = matrice or get_matrice(a_jour=True)
+    _, libelle, sous_niveau, libelle_sous_niveau = NIVEAUX_RAPPORT[niveau]
+    masque = matrice.masque(**{f'{niveau}_id': objet.id})
+    totaux = matrice.totaux(masque)
+
+    candidats = [
+        {**candidat, 'get_full_name': f"{candidat['first_name']} {candidat['last_name']}".strip()}
+        for candidat in matrice.classement(masque)
+    ]
+
+    # Une ligne par sous-préfecture, centre ou bureau de la sélection, avec le candidat en tête
+    cumul = matrice.cumul(sous_niveau, masque)
+    lignes = []
+    for i in cumul['present'].nonzero()[0]:
+        en_tete = int(cumul['voix'][i].argmax()) if len(candidats) and cumul['exprimes'][i] else None
+        lignes.append({
+            'nom': cumul['noms'][i],
+            'bureaux': int(cumul['bureaux'][i]),
+            'bureaux_saisis': int(cumul['bureaux_saisis'][i]),
+            'inscrits': int(cumul['inscrits'][i]),
+            'votants': int(cumul['votants'][i]),
+            'exprimes': int(cumul['exprimes'][i]),
+            'taux_participation': float(cumul['taux_participation'][i]),
+            'en_tete': None if en_tete is None else {
+                'nom': f"{matrice.candidats[en_tete]['first_name']} {matrice.candidats[en_tete]['last_name']}".strip(),
+                'pourcentage': float(cumul['parts'][i][en_tete]),
+            },
+        })
+
+    parents = []
+    if niveau == 'sous_prefecture':
+        parents = [f"Département de {objet.departement.nom}"]
+    elif niveau == 'centre':
+        parents = [f"Sous-préfecture de {objet.sous_prefecture.nom}",
+                   f"Département de {objet.sous_prefecture.departement.nom}"]
+
+    return {
+        'niveau': niveau,
+        'libelle_niveau': libelle,
+        'nom': objet.nom,
+        'parents': parents,
+        'candidats': candidats,
+        'totaux': totaux,
+        'total_suffrages_exprimes': totaux['exprimes'],
+        'libelle_sous_niveau': libelle_sous_niveau,
+        'lignes': lignes,
+        'date_generation': timezone.localtime(),
+    }
+
+
+def pdf_weasyprint(contexte):
+    """Document PDF rendu par WeasyPrint depuis export_pdf.html, en octets"""
+    from weasyprint import HTML
+
+    ressources = _ressources_weasyprint()
+    debut = time.perf_counter()
+    html = render_to_string('export_pdf.html', contexte)
+    document = HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf(
+        stylesheets=[ressources['feuille_style']],
+        font_config=ressources['polices'],
+    )
+    logger.info("Rapport PDF %s « %s » rendu en %.0f ms",
+                contexte['niveau'], contexte['nom'], (time.perf_counter() - debut) * 1000)
+    return document
+
+
+def moteur_pdf():
+    """Moteur utilisé pour les rapports : PDF_MOTEUR, ou ReportLab si WeasyPrint est inutilisable"""
+    if getattr(settings, 'PDF_MOTEUR', 'weasyprint') == 'weasyprint' and weasyprint_disponible():
+        return 'weasyprint'
+    return 'reportlab'
+
+
+def rapport_pdf(niveau, objet):
+    """Rapport PDF d'un département, d'une sous-préfecture ou d'un centre, avec le moteur configuré"""
+    if moteur_pdf() == 'weasyprint':
+        return pdf_weasyprint(contexte_rapport(niveau, objet))
+    if niveau != 'departement':
+        raise ValueError("Les rapports par sous-préfecture et par centre nécessitent WeasyPrint")
+    return pdf_reportlab(objet)
+
+
+# ========================================
+# REPORTLAB
+# ========================================
+
+def pdf_reportlab(danane):
+    """Document PDF des résultats du département construit avec ReportLab, en octets"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+    from io import BytesIO
+    from datetime import datetime
+
+    # Récupérer les données des candidats
+    candidats = User.objects.filter(role='candidat').annotate(
+        total_voix=Sum('resultats_obtenus__nombre_voix', filter=Q(
+            resultats_obtenus__departement=danane
+        )),
+        nombre_bureaux=Count('resultats_obtenus', filter=Q(
+            resultats_obtenus__departement=danane
+        ))
+    ).order_by('-total_voix')
+
+    # Calculer le total des suffrages exprimés
+    total_suffrages_exprimes = ProcesVerbal.objects.filter(
+        departement=danane
+    ).aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
+
+    # Créer le buffer pour le PDF
+    buffer = BytesIO()
+
+    # Créer le document PDF
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm,
+        title=f"Résultats Électoraux - {danane.nom}",
+        author="Système de Gestion Électorale"
+    )
+
+    # Container pour les éléments du PDF
+    elements = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+
+    # Style pour le titre principal
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#FF8C00'),
+        spaceAfter=10,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    # Style pour le sous-titre
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Normal'],
+        fontSize=14,
+        textColor=colors.HexColor('#666666'),
+        spaceAfter=5,
+        alignment=TA_CENTER,
+        fontName='Helvetica'
+    )
+
+    # Style pour les infos
+    info_style = ParagraphStyle(
+        'InfoStyle',
+        parent=styles['Normal'],
+        fontSize=10,
+        textColor=colors.HexColor('#999999'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica'
+    )
+
+    # Style pour le footer
+    footer_style = ParagraphStyle(
+        'Footer',
+        parent=styles['Normal'],
+        fontSize=8,
+        textColor=colors.HexColor('#999999'),
+        alignment=TA_CENTER,
+        fontName='Helvetica'
+    )
+
+    # Style pour les sections
+    section_style = ParagraphStyle(
+        'SectionTitle',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#4472C4'),
+        spaceAfter=15,
+        spaceBefore=20,
+        alignment=TA_LEFT,
+        fontName='Helvetica-Bold'
+    )
+
+    # ====== EN-TÊTE ======
+    elements.append(Paragraph("🗳️ RÉSULTATS ÉLECTORAUX", title_style))
+    elements.append(Paragraph(f"<b>Département de {danane.nom}</b>", subtitle_style))
+    elements.append(Paragraph("Élections Législatives 2025", subtitle_style))
+    elements.append(Paragraph(
+        f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}",
+        info_style
+    ))
+
+    # ====== SECTION CLASSEMENT ======
+    elements.append(Paragraph("📊 Classement des Candidats", section_style))
+    elements.append(Spacer(1, 0.5*cm))
+
+    # Préparer les données du tableau
+    data = [['Rang', 'N°', 'Candidat', 'Parti Politique', 'Voix', 'Pourcentage']]
+
+    for i, candidat in enumerate(candidats, 1):
+        # Médailles pour le top 3
+        if i == 1:
+            rang = '🥇'
+        elif i == 2:
+            rang = '🥈'
+        elif i == 3:
+            rang = '🥉'
+        else:
+            rang = str(i)
+
+        numero = str(candidat.numero_candidat) if candidat.numero_candidat else str(i)
+        nom = candidat.get_full_name()
+        parti = candidat.parti_politique or "Indépendant"
+        voix = f"{candidat.total_voix or 0:,}".replace(',', ' ')
+
+        # Calculer le pourcentage
+        if total_suffrages_exprimes > 0 and candidat.total_voix:
+            pourcentage = f"{(candidat.total_voix / total_suffrages_exprimes * 100):.2f}%"
+        else:
+            pourcentage = "0.00%"
+
+        data.append([rang, numero, nom, parti, voix, pourcentage])
+
+    # Ligne de total
+    data.append([
+        '',
+        '',
+        '',
+        'TOTAL SUFFRAGES EXPRIMÉS',
+        f"{total_suffrages_exprimes:,}".replace(',', ' '),
+        '100.00%'
+    ])
+
+    # Définir les largeurs de colonnes
+    col_widths = [2*cm, 1.5*cm, 5*cm, 4.5*cm, 2.5*cm, 2.5*cm]
+
+    # Créer le tableau
+    table = Table(data, colWidths=col_widths, repeatRows=1)
+
+    # Style du tableau
+    table_style = TableStyle([
+        # En-tête
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+
+        # Corps du tableau
+        ('BACKGROUND', (0, 1), (-1, -2), colors.white),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('ALIGN', (0, 1), (0, -1), 'CENTER'),  # Rang centré
+        ('ALIGN', (1, 1), (1, -1), 'CENTER'),  # N° centré
+        ('ALIGN', (2, 1), (2, -1), 'LEFT'),    # Nom à gauche
+        ('ALIGN', (3, 1), (3, -1), 'LEFT'),    # Parti à gauche
+        ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),  # Voix et % à droite
+        ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -2), 10),
+        ('TOPPADDING', (0, 1), (-1, -2), 8),
+        ('BOTTOMPADDING', (0, 1), (-1, -2), 8),
+
+        # Bordures
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#4472C4')),
+
+        # Alternance de couleurs pour les lignes
+        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f9f9f9')]),
+
+        # Ligne de total
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e6e6e6')),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, -1), (-1, -1), 11),
+        ('TOPPADDING', (0, -1), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
+        ('LINEABOVE', (0, -1), (-1, -1), 2, colors.HexColor('#4472C4')),
+    ])
+
+    table.setStyle(table_style)
+    elements.append(table)
+
+    # Espacement
+    elements.append(Spacer(1, 1*cm))
+
+    # ====== STATISTIQUES SUPPLÉMENTAIRES ======
+    # Calculer statistiques
+    total_bureaux = BureauVote.objects.filter(
+        centre_vote__sous_prefecture__departement=danane
+    ).count()
+
+    bureaux_saisis = ProcesVerbal.objects.filter(
+        departement=danane
+    ).count()
+
+    taux_saisie = (bureaux_saisis / total_bureaux * 100) if total_bureaux > 0 else 0
+
+    # Boîte d'informations
+    info_data = [
+        ['Statistiques de Saisie', ''],
+        ['Bureaux de vote (total)', str(total_bureaux)],
+        ['Procès-verbaux enregistrés', str(bureaux_saisis)],
+        ['Taux de saisie', f"{taux_saisie:.1f}%"],
+        ['', ''],
+        ['Total suffrages exprimés', f"{total_suffrages_exprimes:,}".replace(',', ' ')],
+    ]
+
+    info_table = Table(info_data, colWidths=[8*cm, 4*cm])
+    info_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('SPAN', (0, 0), (-1, 0)),
+        ('TOPPADDING', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9f9f9')),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+
+        # Ligne vide
+        ('BACKGROUND', (0, 4), (-1, 4), colors.white),
+        ('GRID', (0, 4), (-1, 4), 0, colors.white),
+
+        # Ligne total
+        ('BACKGROUND', (0, 5), (-1, 5), colors.HexColor('#e6e6e6')),
+        ('FONTNAME', (0, 5), (-1, 5), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 5), (-1, 5), 11),
+    ]))
+
+    elements.append(info_table)
+
+    # ====== FOOTER ======
+    elements.append(Spacer(1, 2*cm))
+    elements.append(Paragraph(
+        "─────────────────────────────────────────────────────────",
+        footer_style
+    ))
+    elements.append(Spacer(1, 0.3*cm))
+    elements.append(Paragraph(
+        f"© 2025 Gestion des Résultats Électoraux - Département de {danane.nom}",
+        footer_style
+    ))
+    elements.append(Paragraph(
+        "Document officiel généré automatiquement",
+        footer_style
+    ))
+
+    # Construire le PDF
+    doc.build(elements)
+    return buffer.getvalue()
@@ -0,0 +1,159 @@
+"""
+Rapprochement des relevés horaires avec les procès-verbaux
+
+Les relevés sont lus une seule fois, en flux, triés par (bureau, heure) : seule
+la série du bureau en cours est gardée en mémoire. Pour chaque bureau on
+détecte les baisses (un relevé inférieur au précédent), les sauts (hausse plus
+rapide que SAUT_MAX_PAR_HEURE des inscrits par heure) et l'écart entre le
+dernier relevé et les votants du PV. Le résultat est écrit dans
+RapprochementReleves, une ligne par bureau.
+
+En mode incrémental, seuls les bureaux dont un relevé a été ajouté, modifié ou
+supprimé, ou dont le PV a été modifié ou supprimé depuis le calcul, sont relus.
+Le rapprochement d'un bureau qui n'a plus aucun relevé est supprimé.
+"""
+from itertools import groupby
+
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BureauVote, RapprochementReleves, RelevéHoraire
+
+# Hausse maximale plausible entre deux relevés, en part des inscrits par heure
+SAUT_MAX_PAR_HEURE = 0.30
+# Durée minimale prise en compte entre deux relevés (relevés très rapprochés)
+INTERVALLE_MIN_HEURES = 0.25
+# Écart toléré entre le dernier relevé et le PV : part des inscrits, et minimum absolu
+ECART_PV_TOLERANCE = 0.10
+ECART_PV_MIN = 10
+
+# Relevés lus par aller-retour avec la base, et lignes écrites par requête
+TAILLE_FLUX = 2000
+LOT_ECRITURE = 500
+
+
+def bureaux_a_rapprocher():
+    """
+    Bureaux dont la série de relevés ou le PV a changé depuis le calcul
+
+    Relevé plus récent que le dernier pris en compte ou modifié depuis le
+    calcul, relevé supprimé (nombre de relevés différent), PV modifié depuis
+    le calcul ou supprimé.
+    """
+    releves = RelevéHoraire.objects.filter(bureau_vote=OuterRef('pk'))
+    releve_nouveau = releves.filter(
+        Q(bureau_vote__rapprochement_releves__isnull=True)
+        | Q(id__gt=OuterRef('rapprochement_releves__dernier_releve_id'))
+        | Q(date_modification__gt=OuterRef('rapprochement_releves__date_calcul'))
+    )
+    nombre_releves = releves.order_by().values('bureau_vote').annotate(nombre=Count('id')).values('nombre')
+    return BureauVote.objects.annotate(nombre_releves=Coalesce(Subquery(nombre_releves), 0)).filter(
+        Exists(releve_nouveau)
+        | Q(proces_verbal__date_modification__gt=F('rapprochement_releves__date_calcul'))
+        | Q(rapprochement_releves__votants_pv__isnull=False, proces_verbal__isnull=True)
+        | (Q(rapprochement_releves__isnull=False)
+           & ~Q(rapprochement_releves__nombre_releves=F('nombre_releves')))
+    )
+
+
+def analyser_serie(releves, inscrits, votants_pv):
+    """
+    Contrôles d'une série de relevés d'un bureau, déjà triée par heure
+
+    Args:
+        releves: Liste de tuples (id, heure_releve, nombre_votants)
+        inscrits: Inscrits du bureau
+        votants_pv: Votants du PV, None si le PV n'est pas saisi
+
+    Returns:
+        dict: Champs de RapprochementReleves (hors bureau et date de calcul)
+    """
+    baisses = sauts = 0
+    saut_max = 0.0
+    for (_, heure_precedente, precedent), (_, heure, votants) in zip(releves, releves[1:]):
+        if votants < precedent:
+            baisses += 1
+        elif inscrits:
+            heures = max((heure - heure_precedente).total_seconds() / 3600, INTERVALLE_MIN_HEURES)
+            hausse = (votants - precedent) / inscrits / heures
+            saut_max = max(saut_max, hausse * 100)
+            if hausse > SAUT_MAX_PAR_HEURE:
+                sauts += 1
+
+    dernier = releves[-1][2]
+    ecart_pv = None if votants_pv is None else votants_pv - dernier
+    ecart_pv_anormal = ecart_pv is not None and (
+        ecart_pv < 0 or ecart_pv > max(ECART_PV_MIN, ECART_PV_TOLERANCE * inscrits)
+    )
+
+    return {
+        'nombre_releves': len(releves),
+        'premier_releve': releves[0][1],
+        'dernier_releve': releves[-1][1],
+        'votants_dernier_releve': dernier,
+        'votants_pv': votants_pv,
+        'nombre_baisses': baisses,
+        'nombre_sauts': sauts,
+        'saut_max': round(saut_max, 2),
+        'ecart_pv': ecart_pv,
+        'ecart_pv_anormal': ecart_pv_anormal,
+        'anomalie': bool(baisses or sauts or ecart_pv_anormal),
+        'dernier_releve_id': max(releve[0] for releve in releves),
+    }
+
+
+def _ecrire(lignes):
+    RapprochementReleves.objects.bulk_create(
+        lignes, update_conflicts=True, unique_fields=['bureau_vote'],
+        update_fields=[
+            'nombre_releves', 'premier_releve', 'dernier_releve', 'votants_dernier_releve', 'votants_pv',
+            'nombre_baisses', 'nombre_sauts', 'saut_max', 'ecart_pv', 'ecart_pv_anormal', 'anomalie',
+            'dernier_releve_id', 'date_calcul',
+        ]
+    )
+
+
+def rapprocher(complet=False, bureaux=None):
+    """
+    Recalcule le rapprochement des bureaux concernés (tous si complet=True)
+
+    Args:
+        bureaux: Identifiants des bureaux à recalculer, à la place de la détection des
+            bureaux concernés (consommateur de la boîte d'envoi, myApplication.outbox)
+
+    Returns:
+        dict: Nombre de bureaux rapprochés et de bureaux en anomalie
+    """
+    releves = RelevéHoraire.objects.all()
+    rapprochements = RapprochementReleves.objects.all()
+    if bureaux is not None:
+        releves = releves.filter(bureau_vote_id__in=bureaux)
+        rapprochements = rapprochements.filter(bureau_vote_id__in=bureaux)
+    elif not complet:
+        releves = releves.filter(bureau_vote__in=bureaux_a_rapprocher().values('pk'))
+
+    # Bureaux sans relevé : plus rien à rapprocher
+    rapprochements.filter(~Exists(RelevéHoraire.objects.filter(bureau_vote=OuterRef('bureau_vote')))).delete()
+
+    flux = releves.order_by('bureau_vote_id', 'heure_releve', 'id').values_list(
+        'bureau_vote_id', 'id', 'heure_releve', 'nombre_votants',
+        'bureau_vote__nombre_inscrits', 'bureau_vote__proces_verbal__nombre_votants'
+    ).iterator(chunk_size=TAILLE_FLUX)
+
+    maintenant = timezone.now()
+    lignes = []
+    bureaux = anomalies = 0
+    for bureau_id, serie in groupby(flux, key=lambda releve: releve[0]):
+        serie = list(serie)
+        champs = analyser_serie([releve[1:4] for releve in serie], serie[0][4], serie[0][5])
+        lignes.append(RapprochementReleves(bureau_vote_id=bureau_id, date_calcul=maintenant, **champs))
+        bureaux += 1
+        anomalies += champs['anomalie']
+        if len(lignes) >= LOT_ECRITURE:
+            _ecrire(lignes)
+            lignes = []
+    if lignes:
+        _ecrire(lignes)
+
+    return {'bureaux': bureaux, 'anomalies': anomalies}
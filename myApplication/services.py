@@ -0,0 +1,111 @@
+"""
+Opérations d'écriture partagées entre les vues, l'API de synchronisation et l'admin
+"""
+import copy
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .audit import journaliser_modification
+from .matrice_resultats import notifier_bureau_modifie
+from .models import ProcesVerbal, ResultatCandidat, RelevéHoraire
+from .outbox import publier
+
+
+def enregistrer_releve(bureau, representant, nombre_votants, observations='', heure_releve=None, request=None):
+    """
+    Valide et crée un relevé horaire pour un bureau
+
+    heure_releve permet de conserver l'heure réelle d'un relevé saisi hors ligne ;
+    une heure dans le futur est ramenée à maintenant.
+    """
+    if nombre_votants < 0:
+        raise ValidationError('Le nombre de votants ne peut pas être négatif')
+
+    if nombre_votants > bureau.nombre_inscrits:
+        raise ValidationError(
+            f'Le nombre de votants ne peut pas dépasser les inscrits ({bureau.nombre_inscrits})'
+        )
+
+    maintenant = timezone.now()
+    if heure_releve is None or heure_releve > maintenant:
+        heure_releve = maintenant
+
+    releve = RelevéHoraire.objects.create(
+        bureau_vote=bureau,
+        representant=representant,
+        nombre_votants=nombre_votants,
+        observations=observations,
+        heure_releve=heure_releve
+    )
+    journaliser_modification(representant, None, releve, request)
+
+    # Le contrôle relevés / PV du bureau est à refaire (myApplication.anomalies)
+    ProcesVerbal.objects.filter(bureau_vote=bureau).update(date_analyse_anomalies=None)
+
+    return releve
+
+
+def enregistrer_proces_verbal(bureau, representant, pv_form, nombre_inscrits, voix_candidats, request=None):
+    """
+    Enregistre un PV validé et les voix de chaque candidat dans une seule transaction
+
+    Args:
+        bureau: Bureau de vote du représentant
+        representant: Utilisateur qui saisit le PV
+        pv_form: ProcesVerbalForm déjà validé
+        nombre_inscrits: Nombre d'inscrits saisi pour le bureau
+        voix_candidats: Liste de tuples (candidat, nombre_voix)
+        request: Requête d'origine, pour le journal d'audit
+
+    Returns:
+        ProcesVerbal: Le procès-verbal enregistré
+    """
+    with transaction.atomic():
+        # État avant modification, pour le journal d'audit
+        ancien_bureau = copy.copy(bureau)
+        ancien_pv = None
+        anciens_resultats = {}
+        if pv_form.instance.pk:
+            ancien_pv = ProcesVerbal.objects.filter(pk=pv_form.instance.pk).first()
+            anciens_resultats = {
+                resultat.candidat_id: resultat
+                for resultat in ResultatCandidat.objects.filter(proces_verbal_id=pv_form.instance.pk)
+            }
+
+        # Mettre à jour le nombre d'inscrits du bureau
+        bureau.nombre_inscrits = nombre_inscrits
+        # Le bureau ne change pas de centre (myApplication.hierarchie) ; date_modification
+        # signale les nouveaux inscrits à la matrice des résultats
+        bureau.save(update_fields=['nombre_inscrits', 'date_modification'])
+
+        # Sauvegarder le PV
+        pv = pv_form.save(commit=False)
+        pv.bureau_vote = bureau
+        pv.representant = representant
+        if pv.rejete:
+            # PV corrigé après un rejet : il retourne dans la file de vérification
+            pv.rejete = False
+            pv.motif_rejet = ''
+        pv.save()
+
+        # Remplacer les anciens résultats
+        ResultatCandidat.objects.filter(proces_verbal=pv).delete()
+        resultats = ResultatCandidat.objects.bulk_create([
+            ResultatCandidat(
+                proces_verbal=pv, candidat=candidat, nombre_voix=nombre_voix or 0, **pv.cles_hierarchie()
+            )
+            for candidat, nombre_voix in voix_candidats
+        ])
+        # bulk_create ne déclenche pas post_save : événement publié explicitement
+        publier('resultats', pv.id, bureau.id)
+
+        journaliser_modification(representant, ancien_bureau, bureau, request)
+        journaliser_modification(representant, ancien_pv, pv, request)
+        for resultat in resultats:
+            journaliser_modification(representant, anciens_resultats.get(resultat.candidat_id), resultat, request)
+
+        notifier_bureau_modifie(bureau.id)
+
+    return pv
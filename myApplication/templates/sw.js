@@ -0,0 +1,63 @@
+// Service worker du mode hors ligne des représentants
+// Les pages de saisie sont servies depuis le cache quand le réseau est indisponible ;
+// les écritures sont mises en file d'attente par la page elle-même (IndexedDB).
+const CACHE_NAME = 'saisie-hors-ligne-v1';
+const PAGES_HORS_LIGNE = [
+    '{% url "saisie_resultat" %}',
+];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then(cache => cache.addAll(PAGES_HORS_LIGNE))
+            .catch(() => null)
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(noms => Promise.all(noms.filter(nom => nom !== CACHE_NAME).map(nom => caches.delete(nom))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const requete = event.request;
+    if (requete.method !== 'GET') {
+        return;
+    }
+
+    const url = new URL(requete.url);
+
+    // Pages : réseau d'abord, copie en cache, cache en secours
+    if (requete.mode === 'navigate') {
+        if (!PAGES_HORS_LIGNE.includes(url.pathname)) {
+            return;
+        }
+        event.respondWith(
+            fetch(requete)
+                .then(reponse => {
+                    if (reponse.ok && !reponse.redirected) {
+                        const copie = reponse.clone();
+                        caches.open(CACHE_NAME).then(cache => cache.put(url.pathname, copie));
+                    }
+                    return reponse;
+                })
+                .catch(() => caches.match(url.pathname))
+        );
+        return;
+    }
+
+    // Ressources externes (Tailwind CDN) : cache d'abord
+    if (url.origin !== self.location.origin) {
+        event.respondWith(
+            caches.match(requete).then(enCache => enCache || fetch(requete).then(reponse => {
+                const copie = reponse.clone();
+                caches.open(CACHE_NAME).then(cache => cache.put(requete, copie));
+                return reponse;
+            }))
+        );
+    }
+});
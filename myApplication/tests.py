@@ -1,3 +1,1698 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import openpyxl
+from PIL import Image
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    arbre, archive_photos, archives_audit, audit, cache_resultats, certificats, changements, compteurs, flux_resultats,
+    hierarchie, historique, instantane_resultats, matrice_resultats, outbox, rapports_pdf, rapprochement, services,
+    verification, views,
+)
+from .anomalies import detecter
+from .cache_resultats import GLOBAL, en_cache_partage
+from .cache_sqlite import SQLiteCache
+from .forms import ProcesVerbalForm
+from .matrice_resultats import MatriceResultats
+from .models import (
+    Departement, SousPrefecture, CentreVote, BureauVote, User,
+    ProcesVerbal, ResultatCandidat, RelevéHoraire, AuditLog, HistoriqueResultats,
+    EvenementResultat, PositionConsommateur, SuppressionPV, ReservationVerification,
+    OperationSynchronisation, RapprochementReleves, NoeudHierarchie, AnomaliePV,
+)
+from .projections import projeter
+
+_isolation = {}
+
+
+def setUpModule():
+    """
+    Fichiers d'exécution (cache, instantané, spools, archives, certificats, médias)
+    dans un dossier temporaire, quel que soit le lanceur des tests
+    """
+    var_dir = Path(tempfile.mkdtemp(prefix='legislatives-tests-'))
+
+    def deplacer(chemin):
+        if isinstance(chemin, Path) and chemin.is_relative_to(settings.VAR_DIR):
+            return var_dir / chemin.relative_to(settings.VAR_DIR)
+        return chemin
+
+    reglages = override_settings(
+        VAR_DIR=var_dir,
+        MEDIA_ROOT=var_dir / 'media',
+        CACHES={alias: {**reglage, 'LOCATION': deplacer(reglage.get('LOCATION', ''))}
+                for alias, reglage in settings.CACHES.items()},
+        AUDIT_SPOOL_DIR=deplacer(settings.AUDIT_SPOOL_DIR),
+        AUDIT_ARCHIVE_DIR=deplacer(settings.AUDIT_ARCHIVE_DIR),
+        CERTIFICATS_DIR=deplacer(settings.CERTIFICATS_DIR),
+        MATRICE_RESULTATS_INSTANTANE=deplacer(settings.MATRICE_RESULTATS_INSTANTANE),
+        # Insertion immédiate : le thread d'arrière-plan écrirait hors de la base de test
+        AUDIT_ASYNC=False,
+    )
+    reglages.enable()
+    _isolation.update(reglages=reglages, var_dir=var_dir, tampon=audit._tampon)
+    audit._tampon = None
+
+
+def tearDownModule():
+    _isolation['reglages'].disable()
+    audit._tampon = _isolation['tampon']
+    shutil.rmtree(_isolation['var_dir'], ignore_errors=True)
+
+
+class AdminChangelistQueriesTest(TestCase):
+    """Le nombre de requêtes des listes de l'admin ne dépend pas du nombre de lignes affichées"""
+
+    CHANGELISTS = [
+        'admin:myApplication_departement_changelist',
+        'admin:myApplication_sousprefecture_changelist',
+        'admin:myApplication_centrevote_changelist',
+        'admin:myApplication_bureauvote_changelist',
+        'admin:myApplication_user_changelist',
+        'admin:myApplication_procesverbal_changelist',
+        'admin:myApplication_resultatcandidat_changelist',
+        'admin:myApplication_relevéhoraire_changelist',
+        'admin:myApplication_auditlog_changelist',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse')
+        cls.candidats = [
+            User.objects.create_user(f'candidat{i}', role='candidat', numero_candidat=i)
+            for i in (1, 2)
+        ]
+        cls.nombre_lignes = 0
+
+    def ajouter_lignes(self, nombre):
+        """Crée `nombre` branches complètes de la hiérarchie, avec PV, résultats et relevés"""
+        for _ in range(nombre):
+            i = self.nombre_lignes
+            self.nombre_lignes += 1
+
+            departement = Departement.objects.create(nom=f'Département {i}', code=f'D{i}')
+            sous_prefecture = SousPrefecture.objects.create(nom=f'SP {i}', departement=departement)
+            centre = CentreVote.objects.create(nom=f'Centre {i}', sous_prefecture=sous_prefecture)
+            bureau = BureauVote.objects.create(numero='01', centre_vote=centre, nombre_inscrits=200)
+            BureauVote.objects.create(numero='02', centre_vote=centre, nombre_inscrits=150)
+            representant = User.objects.create_user(f'representant{i}', role='representant', bureau_vote=bureau)
+
+            pv = ProcesVerbal.objects.create(
+                bureau_vote=bureau, representant=representant, nombre_votants=100,
+                bulletins_nuls=5, bulletins_blancs=5, photo_pv='pv_photos/test.png'
+            )
+            for candidat, voix in zip(self.candidats, (60, 30)):
+                ResultatCandidat.objects.create(proces_verbal=pv, candidat=candidat, nombre_voix=voix)
+
+            RelevéHoraire.objects.create(bureau_vote=bureau, representant=representant, nombre_votants=40)
+            AuditLog.objects.create(user=representant, action='CREATE', model_name='ProcesVerbal', object_id=pv.pk)
+
+    def compter_requetes(self, url):
+        with CaptureQueriesContext(connection) as contexte:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(contexte.captured_queries)
+
+    def test_nombre_de_requetes_constant(self):
+        self.client.force_login(self.admin)
+
+        self.ajouter_lignes(2)
+        avant = {nom: self.compter_requetes(reverse(nom)) for nom in self.CHANGELISTS}
+
+        self.ajouter_lignes(6)
+        for nom in self.CHANGELISTS:
+            with self.subTest(changelist=nom):
+                self.assertEqual(self.compter_requetes(reverse(nom)), avant[nom])
+
+    def test_colonnes_calculees_triables(self):
+        self.client.force_login(self.admin)
+        self.ajouter_lignes(3)
+
+        # Colonnes calculées triées par leur annotation (o=<index de la colonne>)
+        for nom, colonne in [
+            ('admin:myApplication_departement_changelist', 3),
+            ('admin:myApplication_sousprefecture_changelist', 3),
+            ('admin:myApplication_centrevote_changelist', 4),
+            ('admin:myApplication_bureauvote_changelist', 5),
+            ('admin:myApplication_resultatcandidat_changelist', 4),
+        ]:
+            with self.subTest(changelist=nom):
+                response = self.client.get(reverse(nom), {'o': colonne})
+                self.assertEqual(response.status_code, 200)
+
+
+@override_settings(HISTORIQUE_BASE=2)
+class HistoriqueResultatsTest(TestCase):
+    """Chaîne d'instantanés : base, différences, reconstruction et lecture « au » moment donné"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.departement = Departement.objects.create(nom='Danané', code='DAN')
+        sous_prefecture = SousPrefecture.objects.create(nom='SP', departement=cls.departement)
+        centre = CentreVote.objects.create(nom='Centre', sous_prefecture=sous_prefecture)
+        cls.bureaux = [
+            BureauVote.objects.create(numero=f'0{i}', centre_vote=centre, nombre_inscrits=100 * i)
+            for i in (1, 2, 3)
+        ]
+        cls.candidats = [
+            User.objects.create_user(f'candidat{i}', role='candidat', numero_candidat=i)
+            for i in (1, 2)
+        ]
+
+    def saisir(self, bureau, votants, voix):
+        representant = User.objects.create_user(f'representant{bureau.pk}', role='representant', bureau_vote=bureau)
+        pv = ProcesVerbal.objects.create(
+            bureau_vote=bureau, representant=representant, nombre_votants=votants,
+            bulletins_nuls=0, bulletins_blancs=0, photo_pv='pv_photos/test.png'
+        )
+        for candidat, nombre in zip(self.candidats, voix):
+            ResultatCandidat.objects.create(proces_verbal=pv, candidat=candidat, nombre_voix=nombre)
+
+    def historiser(self):
+        instantane, cree = historique.historiser(self.departement)
+        self.assertTrue(cree)
+        return instantane, historique.etat_courant(self.departement)[2]
+
+    def test_difference_apres_base(self):
+        base, _ = self.historiser()
+        self.assertTrue(base.complet)
+        self.assertEqual(base.nombre_bureaux, 3)
+
+        self.saisir(self.bureaux[0], 80, (50, 30))
+        difference, etats = self.historiser()
+        self.assertFalse(difference.complet)
+        self.assertEqual(difference.precedent, base)
+        self.assertEqual(difference.nombre_bureaux, 1)
+        self.assertEqual(difference.totaux['departement']['votants'], 80)
+        self.assertEqual(difference.totaux['departement']['voix'], [50, 30])
+        self.assertEqual(historique.etats_bureaux(difference), etats)
+
+        # État inchangé : pas de nouvel instantané
+        self.assertEqual(historique.historiser(self.departement), (difference, False))
+
+    def test_reconstruction_de_chaque_instantane(self):
+        attendus = []
+        for bureau, voix in zip(self.bureaux, ((50, 30), (20, 60), (10, 10))):
+            self.saisir(bureau, sum(voix), voix)
+            attendus.append(self.historiser())
+        BureauVote.objects.filter(pk=self.bureaux[2].pk).update(nombre_inscrits=999)
+        attendus.append(self.historiser())
+
+        self.assertEqual([instantane.complet for instantane, _ in attendus], [True, False, True, False])
+        for instantane, etats in attendus:
+            with self.subTest(instantane=instantane.pk):
+                self.assertEqual(historique.etats_bureaux(instantane), etats)
+
+    def test_au_de_part_et_d_autre_d_une_base(self):
+        debut = timezone.now() - timedelta(hours=4)
+        instantanes = []
+        for heure, (bureau, voix) in enumerate(zip(self.bureaux, ((50, 30), (20, 60), (10, 10)))):
+            self.saisir(bureau, sum(voix), voix)
+            instantane, etats = self.historiser()
+            # Dates espacées d'une heure (update() contourne le refus de modification)
+            HistoriqueResultats.objects.filter(pk=instantane.pk).update(date=debut + timedelta(hours=heure))
+            instantanes.append((instantane, etats))
+
+        self.assertIsNone(historique.au(self.departement, debut - timedelta(minutes=1)))
+        for heure, (instantane, etats) in enumerate(instantanes):
+            with self.subTest(heure=heure):
+                trouve = historique.au(self.departement, debut + timedelta(hours=heure, minutes=30))
+                self.assertEqual(trouve, instantane)
+                self.assertEqual(historique.etats_bureaux(trouve), etats)
+        # Le dernier instantané est une base, le précédent une différence de la base initiale
+        self.assertEqual([instantane.complet for instantane, _ in instantanes], [True, False, True])
+
+    def test_instantane_non_modifiable(self):
+        instantane, _ = self.historiser()
+        instantane.nombre_bureaux = 0
+        with self.assertRaises(ValidationError):
+            instantane.save()
+        self.assertEqual(HistoriqueResultats.objects.get(pk=instantane.pk).nombre_bureaux, 3)
+
+
+def _reinitialiser_matrices():
+    """Oublie les matrices gardées par le processus (comme au démarrage d'un worker)"""
+    matrice_resultats._matrice = None
+    instantane_resultats._etat.update({'matrice': None, 'version': None, 'fichier': None, 'verifiee_le': 0.0})
+
+
+def _image_pv():
+    contenu = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(contenu, 'PNG')
+    return SimpleUploadedFile('pv.png', contenu.getvalue(), content_type='image/png')
+
+
+class ResultatsTestCase(TestCase):
+    """Hiérarchie de deux centres (un sans inscrits) et deux candidats"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse')
+        cls.departement = Departement.objects.create(nom='Danané', code='DAN')
+        cls.sous_prefecture = SousPrefecture.objects.create(nom='SP', departement=cls.departement)
+        cls.centre = CentreVote.objects.create(nom='Centre', sous_prefecture=cls.sous_prefecture)
+        cls.centre_vide = CentreVote.objects.create(nom='Centre sans inscrits', sous_prefecture=cls.sous_prefecture)
+        cls.bureaux = [
+            BureauVote.objects.create(numero=f'0{i}', centre_vote=cls.centre, nombre_inscrits=200)
+            for i in range(1, 6)
+        ]
+        cls.bureaux_vides = [
+            BureauVote.objects.create(numero=f'0{i}', centre_vote=cls.centre_vide, nombre_inscrits=0)
+            for i in (1, 2)
+        ]
+        cls.candidats = [
+            User.objects.create_user(f'candidat{i}', role='candidat', numero_candidat=i)
+            for i in (1, 2)
+        ]
+
+    def setUp(self):
+        _reinitialiser_matrices()
+        self.addCleanup(_reinitialiser_matrices)
+
+    def saisir(self, bureau, votants, voix):
+        representant = User.objects.create_user(f'representant{bureau.pk}', role='representant', bureau_vote=bureau)
+        pv = ProcesVerbal.objects.create(
+            bureau_vote=bureau, representant=representant, nombre_votants=votants,
+            bulletins_nuls=0, bulletins_blancs=0, photo_pv='pv_photos/test.png'
+        )
+        for candidat, nombre in zip(self.candidats, voix):
+            ResultatCandidat.objects.create(proces_verbal=pv, candidat=candidat, nombre_voix=nombre)
+        return pv
+
+    def inscrits_en_base(self):
+        return BureauVote.objects.aggregate(total=Sum('nombre_inscrits'))['total']
+
+
+class MatriceResultatsTest(ResultatsTestCase):
+    """La matrice (locale ou instantané partagé) suit les inscrits, la structure et les candidats"""
+
+    def enregistrer(self, bureau, nombre_inscrits, voix):
+        representant = User.objects.create_user(f'saisie{bureau.pk}', role='representant', bureau_vote=bureau)
+        pv_form = ProcesVerbalForm(
+            data={
+                'nombre_inscrits': nombre_inscrits, 'nombre_votants': sum(voix),
+                'bulletins_nuls': 0, 'bulletins_blancs': 0,
+            },
+            files={'photo_pv': _image_pv()},
+            bureau_vote=bureau,
+        )
+        self.assertTrue(pv_form.is_valid(), pv_form.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.enregistrer_proces_verbal(
+                bureau, representant, pv_form, nombre_inscrits, list(zip(self.candidats, voix))
+            )
+
+    def totaux(self):
+        matrice = matrice_resultats.get_matrice(a_jour=True)
+        return matrice.totaux(matrice.masque(departement_id=self.departement.pk))
+
+    def test_inscrits_saisis_avec_le_pv(self):
+        self.assertEqual(self.totaux()['inscrits'], self.inscrits_en_base())
+
+        self.enregistrer(self.bureaux[0], 500, (300, 100))
+        totaux = self.totaux()
+        self.assertEqual(totaux['inscrits'], self.inscrits_en_base())
+        self.assertEqual(totaux['votants'], 400)
+        self.assertEqual(totaux['voix'].tolist(), [300, 100])
+
+        # Redémarrage : l'instantané relu depuis le fichier est à jour
+        _reinitialiser_matrices()
+        self.assertEqual(self.totaux()['inscrits'], self.inscrits_en_base())
+
+    @override_settings(MATRICE_RESULTATS_INSTANTANE=None)
+    def test_inscrits_saisis_avec_le_pv_matrice_locale(self):
+        self.assertEqual(self.totaux()['inscrits'], self.inscrits_en_base())
+        self.enregistrer(self.bureaux[0], 500, (300, 100))
+        self.assertEqual(self.totaux()['inscrits'], self.inscrits_en_base())
+
+    @override_settings(MATRICE_RESULTATS_INSTANTANE=None)
+    def test_bureau_deplace_et_candidat_renomme(self):
+        matrice_resultats.get_matrice(a_jour=True)
+
+        bureau = self.bureaux[4]
+        bureau.centre_vote = self.centre_vide
+        bureau.save()
+        User.objects.filter(pk=self.candidats[0].pk).update(last_name='Renommé')
+
+        matrice = matrice_resultats.get_matrice(a_jour=True)
+        rang = list(matrice.libelles['bureau']['ids']).index(bureau.pk)
+        self.assertEqual(matrice.libelles['centre']['ids'][matrice.indices['centre'][rang]], self.centre_vide.pk)
+        self.assertEqual(matrice.candidats[0]['last_name'], 'Renommé')
+
+    def modifier_resultats(self):
+        pv = self.saisir(self.bureaux[0], 100, (60, 40))
+        self.assertEqual([c['total_voix'] for c in matrice_resultats.get_matrice(a_jour=True).classement()], [60, 40])
+
+        # Résultats modifiés un par un, comme dans ResultatCandidatAdmin
+        for resultat, voix in zip(pv.resultats.order_by('candidat__numero_candidat'), (30, 70)):
+            with self.captureOnCommitCallbacks(execute=True):
+                resultat.nombre_voix = voix
+                resultat.save()
+        classement = matrice_resultats.get_matrice(a_jour=True).classement()
+        self.assertEqual([(c['id'], c['total_voix']) for c in classement],
+                         [(self.candidats[1].pk, 70), (self.candidats[0].pk, 30)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pv.resultats.get(candidat=self.candidats[1]).delete()
+        totaux = self.totaux()
+        self.assertEqual(totaux['voix'].tolist(), [30, 0])
+        self.assertEqual(totaux['bureaux_par_candidat'].tolist(), [1, 0])
+
+    def test_resultat_modifie_seul(self):
+        self.modifier_resultats()
+
+    @override_settings(MATRICE_RESULTATS_INSTANTANE=None)
+    def test_resultat_modifie_seul_matrice_locale(self):
+        self.modifier_resultats()
+
+    @unittest.skipUnless(settings.MATRICE_RESULTATS_INSTANTANE, "Instantané désactivé (Windows)")
+    def test_instantane_perime_au_demarrage(self):
+        self.totaux()
+        # PV saisi par un autre worker avant la première lecture de ce processus : a_jour compare à la base
+        _reinitialiser_matrices()
+        self.saisir(self.bureaux[0], 100, (60, 40))
+        self.assertEqual(self.totaux()['votants'], 100)
+
+    @unittest.skipUnless(settings.MATRICE_RESULTATS_INSTANTANE, "Instantané désactivé (Windows)")
+    def test_instantane_d_une_autre_base(self):
+        self.totaux()
+        chemin = instantane_resultats.chemin_instantane()
+        self.assertIsNotNone(instantane_resultats.lire_version(chemin))
+
+        with mock.patch.object(instantane_resultats, 'identite_base', return_value=b'\0' * 32):
+            self.assertIsNone(instantane_resultats.lire_version(chemin))
+            with self.assertRaises(ValueError):
+                instantane_resultats.projeter_instantane(chemin)
+            # Écarté puis reconstruit pour la base courante
+            _reinitialiser_matrices()
+            self.assertEqual(self.totaux()['inscrits'], self.inscrits_en_base())
+            self.assertIsNotNone(instantane_resultats.lire_version(chemin))
+
+
+class ProjectionTest(ResultatsTestCase):
+    """Un centre dépouillé sans inscrits ne fait échouer ni la projection ni le tableau de bord"""
+
+    def setUp(self):
+        super().setUp()
+        for i, bureau in enumerate(self.bureaux[:3]):
+            self.saisir(bureau, 100 + 10 * i, (60 + 10 * i, 40))
+        self.saisir(self.bureaux_vides[0], 0, (0, 0))
+
+    def test_centre_sans_inscrits(self):
+        with np.errstate(all='raise'):
+            projection = projeter(MatriceResultats.charger(), replications=200)
+        self.assertEqual(projection['bureaux_depouilles'], 4)
+        for candidat in projection['candidats']:
+            with self.subTest(candidat=candidat['id']):
+                self.assertTrue(np.isfinite([
+                    candidat['voix_projetees'], candidat['pourcentage_bas'], candidat['pourcentage_haut']
+                ]).all())
+                self.assertLessEqual(candidat['pourcentage_bas'], candidat['pourcentage_haut'])
+
+    def test_tableau_de_bord_sans_projection_si_erreur_numerique(self):
+        self.client.force_login(self.admin)
+        with mock.patch('myApplication.views.projeter_en_cache', side_effect=np.linalg.LinAlgError), \
+                self.assertLogs('myApplication.views', 'ERROR'):
+            response = self.client.get(reverse('api_projection'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['projection'])
+
+
+class AnomaliesTest(ResultatsTestCase):
+    """La participation d'un bureau sans inscrits n'est ni signalée ni prise comme référence"""
+
+    def test_bureau_sans_inscrits(self):
+        for bureau in self.bureaux:
+            self.saisir(bureau, 100, (60, 40))
+        pv_vide = self.saisir(self.bureaux_vides[0], 0, (0, 0))
+        self.saisir(self.bureaux_vides[1], 0, (0, 0))
+
+        matrice = MatriceResultats.charger()
+        anomalies = detecter(matrice, np.flatnonzero(matrice.a_pv), {})
+        self.assertNotIn('participation_atypique', [type_anomalie for _, type_anomalie, *_ in anomalies])
+        rang_vide = list(matrice.libelles['bureau']['ids']).index(pv_vide.bureau_vote_id)
+        self.assertNotIn(rang_vide, [rang for rang, *_ in anomalies])
+
+
+class CachePartageTest(TestCase):
+    """en_cache_partage sert la valeur périmée pendant un unique recalcul en arrière-plan"""
+
+    NOEUDS = [('departement', 999999), GLOBAL]
+
+    def attendre(self, calcul):
+        limite = time.monotonic() + 5
+        while time.monotonic() < limite:
+            valeur, perimee = en_cache_partage('test', self.NOEUDS, calcul)
+            if not perimee:
+                return valeur
+            time.sleep(0.01)
+        self.fail("Valeur toujours périmée")
+
+    def test_valeur_perimee_puis_rafraichie(self):
+        self.assertEqual(en_cache_partage('test', self.NOEUDS, lambda: 'v1'), ('v1', False))
+        self.assertEqual(en_cache_partage('test', self.NOEUDS, lambda: 'autre'), ('v1', False))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache_resultats.invalider([('departement', 999999)])
+
+        reprise = threading.Event()
+        appels = []
+
+        def recalcul():
+            appels.append(1)
+            reprise.wait(5)
+            return 'v2'
+
+        # Un seul recalcul lancé, tous les appels servent la valeur précédente
+        for _ in range(3):
+            self.assertEqual(en_cache_partage('test', self.NOEUDS, recalcul), ('v1', True))
+        reprise.set()
+        self.assertEqual(self.attendre(recalcul), 'v2')
+        self.assertEqual(len(appels), 1)
+
+
+class OutboxTest(ResultatsTestCase):
+    """Événements écrits dans la transaction du changement et consommés une seule fois"""
+
+    def setUp(self):
+        super().setUp()
+        self.lots = []
+        outbox.consommateur('test')(self.lots.append)
+        self.addCleanup(outbox.CONSOMMATEURS.pop, 'test')
+
+    def test_evenements_valides_ou_annules_avec_la_transaction(self):
+        avant = EvenementResultat.objects.count()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.saisir(self.bureaux[0], 100, (60, 40))
+            self.assertGreater(EvenementResultat.objects.count(), avant)
+            raise RuntimeError
+        self.assertEqual(EvenementResultat.objects.count(), avant)
+
+        pv = self.saisir(self.bureaux[0], 100, (60, 40))
+        self.assertEqual(
+            list(EvenementResultat.objects.filter(sequence__gt=avant).values_list('type_objet', 'objet_id')),
+            [('pv', pv.pk), ('resultats', pv.pk), ('resultats', pv.pk)]
+        )
+        self.assertEqual(
+            set(EvenementResultat.objects.filter(sequence__gt=avant).values_list('bureau_vote_id', flat=True)),
+            {self.bureaux[0].pk}
+        )
+
+    def test_position_avancee_une_seule_fois(self):
+        self.saisir(self.bureaux[0], 100, (60, 40))
+        derniere = EvenementResultat.objects.latest('sequence').sequence
+
+        resultat = outbox.consommer('test', taille=3)
+        self.assertEqual(resultat['position'], derniere)
+        self.assertEqual(PositionConsommateur.objects.get(nom='test').sequence, derniere)
+        recus = [evenement.sequence for lot in self.lots for evenement in lot]
+        self.assertEqual(len(recus), len(set(recus)))
+        self.assertEqual(recus, sorted(recus))
+
+        self.lots.clear()
+        self.assertEqual(outbox.consommer('test'), {'lots': 0, 'evenements': 0, 'position': derniere})
+        self.assertEqual(self.lots, [])
+
+    def test_resultats_regroupes_par_pv(self):
+        pv = self.saisir(self.bureaux[0], 100, (60, 40))
+        outbox.consommer('test')
+        self.assertEqual(
+            [evenement.objet_id for lot in self.lots for evenement in lot if evenement.type_objet == 'resultats'],
+            [pv.pk]
+        )
+
+    def test_echec_du_consommateur(self):
+        self.saisir(self.bureaux[0], 100, (60, 40))
+        derniere = EvenementResultat.objects.latest('sequence').sequence
+
+        def echec(evenements):
+            raise RuntimeError
+        outbox.CONSOMMATEURS['test'] = (echec, None)
+        with self.assertRaises(RuntimeError):
+            outbox.consommer('test')
+        self.assertEqual(PositionConsommateur.objects.get(nom='test').sequence, 0)
+
+        # Nouvel essai : les mêmes événements sont livrés
+        outbox.CONSOMMATEURS['test'] = (self.lots.append, None)
+        self.assertEqual(outbox.consommer('test')['position'], derniere)
+        self.assertEqual(PositionConsommateur.objects.get(nom='test').sequence, derniere)
+
+
+@override_settings(CHANGEMENTS_MARGE=0)
+class ChangementsTest(ResultatsTestCase):
+    """Fusion par clé des PV et des suppressions, y compris à date égale, et jeton de reprise"""
+
+    def setUp(self):
+        super().setUp()
+        debut = timezone.now() - timedelta(hours=1)
+        self.pvs = [self.saisir(bureau, 100, (60, 40)) for bureau in self.bureaux[:3]]
+        # Deux PV et une suppression à la même date, puis un PV et une suppression une minute après
+        for pv, date in zip(self.pvs, (debut, debut, debut + timedelta(minutes=1))):
+            ProcesVerbal.objects.filter(pk=pv.pk).update(date_modification=date)
+        self.suppressions = [
+            SuppressionPV.objects.create(
+                proces_verbal_id=900 + i, bureau_vote_id=self.bureaux[4].pk, date_suppression=date
+            )
+            for i, date in enumerate((debut, debut + timedelta(minutes=1)))
+        ]
+        self.attendus = [
+            ('pv', self.pvs[0].pk), ('pv', self.pvs[1].pk), ('suppression', 900),
+            ('pv', self.pvs[2].pk), ('suppression', 901),
+        ]
+
+    def test_fusion_et_egalites(self):
+        resultat, _dernier, termine = changements.changements()
+        self.assertEqual([(c['type'], c['pv_id']) for c in resultat], self.attendus)
+        self.assertTrue(termine)
+        self.assertEqual(resultat[0]['voix'], {self.candidats[0].pk: 60, self.candidats[1].pk: 40})
+
+    def test_pages_successives(self):
+        for limite in (1, 2, 3):
+            with self.subTest(limite=limite):
+                recus, position, termine = [], None, False
+                while not termine:
+                    page, position, termine = changements.changements(position, limite)
+                    self.assertLessEqual(len(page), limite)
+                    recus += [(c['type'], c['pv_id']) for c in page]
+                    position = changements.lire_jeton(changements.jeton(position))
+                self.assertEqual(recus, self.attendus)
+                # À jour : plus rien après la dernière position
+                self.assertEqual(changements.changements(position, limite)[0], [])
+
+    def test_jeton(self):
+        position = (timezone.now(), changements.SUPPRESSION, 42)
+        self.assertEqual(changements.lire_jeton(changements.jeton(position)), position)
+        self.assertIsNone(changements.lire_jeton(''))
+        for valeur in (changements.jeton(position)[:-1] + 'x', 'abc'):
+            with self.subTest(valeur=valeur), self.assertRaises(changements.JetonInvalide):
+                changements.lire_jeton(valeur)
+
+    def test_api(self):
+        self.client.force_login(self.admin)
+        url = reverse('api_changements')
+
+        recus, suivant = [], ''
+        for _ in self.attendus:
+            donnees = self.client.get(url, {'depuis': suivant, 'limite': 1}).json()
+            recus += [(c['type'], c['pv_id']) for c in donnees['changements']]
+            suivant = donnees['suivant']
+        self.assertEqual(recus, self.attendus)
+        self.assertTrue(self.client.get(url, {'depuis': suivant}).json()['termine'])
+
+        for params in ({'limite': 'abc'}, {'depuis': 'abc'}):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn('invalid literal', response.json()['error'])
+
+
+class AuditSpoolTest(TestCase):
+    """Spool verrouillé par son processus, vidé par lots, rejoué sans doublon après un arrêt"""
+
+    def setUp(self):
+        self.dossier = Path(tempfile.mkdtemp(dir=settings.VAR_DIR))
+        self.addCleanup(shutil.rmtree, self.dossier, True)
+
+    def entree(self, action='UPDATE'):
+        return {
+            'identifiant': str(uuid.uuid4()), 'user_id': None, 'action': action,
+            'model_name': 'ProcesVerbal', 'object_id': 1, 'object_repr': 'PV - Bureau 01', 'changes': None,
+            'timestamp': timezone.now().isoformat(), 'ip_address': None, 'user_agent': 'Navigateur éè',
+        }
+
+    def tampon(self):
+        # Sans thread de vidage : les vidages sont appelés par le test
+        with mock.patch.object(audit.TamponAudit, '_boucle', lambda tampon: None):
+            tampon = audit.TamponAudit(taille_lot=100, intervalle_ms=500, dossier_spool=self.dossier)
+            tampon.ajouter(self.entree())
+        return tampon
+
+    def spools(self):
+        return sorted(self.dossier.glob('audit-*.jsonl'))
+
+    def test_spool_puis_insertion_par_lot(self):
+        tampon = self.tampon()
+        entrees = [tampon._entrees[0], self.entree('DELETE')]
+        tampon.ajouter(entrees[1])
+
+        # Rien en base avant le vidage, tout dans le spool
+        self.assertFalse(AuditLog.objects.filter(identifiant__in=[e['identifiant'] for e in entrees]).exists())
+        (spool,) = self.spools()
+        self.assertEqual([json.loads(ligne) for ligne in spool.read_text(encoding='utf-8').splitlines()], entrees)
+
+        with CaptureQueriesContext(connection) as contexte:
+            self.assertEqual(tampon.vider(), 2)
+        self.assertEqual(len([q for q in contexte.captured_queries if 'INSERT' in q['sql']]), 1)
+        self.assertEqual(
+            list(AuditLog.objects.filter(identifiant__in=[e['identifiant'] for e in entrees])
+                 .order_by('id').values_list('action', 'user_agent')),
+            [('UPDATE', 'Navigateur éè'), ('DELETE', 'Navigateur éè')]
+        )
+        # Spool inséré supprimé, nouveau spool vide
+        self.assertNotIn(spool, self.spools())
+        tampon.fermer()
+        self.assertEqual(self.spools(), [])
+
+    def test_spool_d_un_processus_actif_non_rejoue(self):
+        tampon = self.tampon()
+        self.assertEqual(audit.recuperer_spools(self.dossier), 0)
+        self.assertEqual(len(self.spools()), 1)
+        self.assertEqual(tampon.vider(), 1)
+
+    def test_reprise_du_spool_d_un_processus_arrete(self):
+        entrees = [self.entree(), self.entree()]
+        # Spool d'un processus arrêté en cours d'écriture (dernière ligne tronquée), donc sans verrou
+        chemin = self.dossier / f'audit-{os.getpid()}-arrete.jsonl'
+        chemin.write_text(''.join(json.dumps(e) + '\n' for e in entrees) + '{"identifiant": "tron', encoding='utf-8')
+
+        self.assertEqual(audit.recuperer_spools(self.dossier), 2)
+        self.assertFalse(chemin.exists())
+        self.assertEqual(AuditLog.objects.filter(identifiant__in=[e['identifiant'] for e in entrees]).count(), 2)
+
+    def test_reinsertion_idempotente(self):
+        entrees = [self.entree(), self.entree()]
+        audit.inserer_entrees(entrees[:1])
+        avant = AuditLog.objects.count()
+
+        # Spool rejoué alors qu'une partie de ses entrées était déjà insérée
+        chemin = self.dossier / 'audit-1-rejoue.jsonl'
+        chemin.write_text(''.join(json.dumps(e) + '\n' for e in entrees), encoding='utf-8')
+        audit.recuperer_spools(self.dossier)
+        audit.inserer_entrees(entrees)
+        self.assertEqual(AuditLog.objects.count(), avant + 1)
+
+
+class VerificationTest(ResultatsTestCase):
+    """Réservations exclusives, expirées ou rendues, et décisions limitées aux PV réservés"""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pvs = [self.saisir(bureau, 100, (60, 40)) for bureau in self.bureaux[:4]]
+        self.verificateurs = [
+            User.objects.create_user(f'verificateur{i}', role='admin', is_staff=True) for i in (1, 2)
+        ]
+
+    def ids(self, pvs):
+        return [pv.pk for pv in pvs]
+
+    def test_reservations_exclusives(self):
+        premier = verification.reserver_lot(self.verificateurs[0], 3)
+        second = verification.reserver_lot(self.verificateurs[1], 3)
+        self.assertEqual(self.ids(premier), self.ids(self.pvs[:3]))
+        self.assertEqual(self.ids(second), self.ids(self.pvs[3:]))
+
+        # Rechargement : le même lot, prolongé
+        self.assertEqual(self.ids(verification.reserver_lot(self.verificateurs[0], 3)), self.ids(premier))
+
+    def test_reservation_expiree_ou_rendue(self):
+        verification.reserver_lot(self.verificateurs[0], 4)
+        self.assertEqual(verification.reserver_lot(self.verificateurs[1], 4), [])
+
+        ReservationVerification.objects.filter(proces_verbal=self.pvs[0]).update(
+            expiration=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.ids(verification.reserver_lot(self.verificateurs[1], 4)), self.ids(self.pvs[:1]))
+
+        self.assertEqual(verification.liberer(self.verificateurs[0], [self.pvs[1].pk]), 1)
+        self.assertEqual(self.ids(verification.reserver_lot(self.verificateurs[1], 4)), self.ids(self.pvs[:2]))
+        # Le premier vérificateur ne retrouve que ce qu'il tient encore
+        self.assertEqual(self.ids(verification.reserver_lot(self.verificateurs[0], 2)), self.ids(self.pvs[2:]))
+
+    def test_decisions_sur_des_pv_non_reserves(self):
+        verification.reserver_lot(self.verificateurs[0], 2)
+        verification.reserver_lot(self.verificateurs[1], 2)
+
+        traites, refuses = verification.appliquer_decisions(self.verificateurs[1], [
+            {'pv_id': self.pvs[0].pk, 'decision': 'accepter'},
+            {'pv_id': self.pvs[2].pk, 'decision': 'rejeter', 'motif': ' Photo illisible '},
+        ])
+        self.assertEqual((traites, refuses), ([self.pvs[2].pk], [self.pvs[0].pk]))
+        self.assertFalse(ProcesVerbal.objects.get(pk=self.pvs[0].pk).verifie)
+        rejete = ProcesVerbal.objects.get(pk=self.pvs[2].pk)
+        self.assertEqual((rejete.rejete, rejete.motif_rejet, rejete.verifie_par), (True, 'Photo illisible',
+                                                                                  self.verificateurs[1]))
+        # Réservation du PV traité levée, celle de l'autre vérificateur conservée
+        self.assertFalse(ReservationVerification.objects.filter(proces_verbal=self.pvs[2]).exists())
+        self.assertTrue(ReservationVerification.objects.filter(proces_verbal=self.pvs[0]).exists())
+
+    def test_decision_invalide_le_cache_de_la_branche(self):
+        verification.reserver_lot(self.verificateurs[0], 1)
+        branche = cache_resultats.ancetres_bureau(self.bureaux[0].pk)
+        autre = [('bureau', self.bureaux[1].pk)]
+        avant = cache_resultats.versions(branche + autre)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            verification.appliquer_decisions(self.verificateurs[0], [{'pv_id': self.pvs[0].pk, 'decision': 'accepter'}])
+        apres = cache_resultats.versions(branche + autre)
+        self.assertTrue(all(a != b for a, b in zip(avant[:-1], apres[:-1])))
+        self.assertEqual(avant[-1], apres[-1])
+
+
+class ArchivesAuditTest(TestCase):
+    """Journées closes archivées (un segment et une transaction par jour) puis retrouvées par la recherche"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse')
+        maintenant = timezone.localtime()
+        cls.jours = [maintenant - timedelta(days=jours) for jours in (3, 2)]
+        for i, date in enumerate(cls.jours + [maintenant]):
+            for objet in (1, 2):
+                AuditLog.objects.create(
+                    user=cls.admin, action='UPDATE', model_name='RelevéHoraire', object_id=objet,
+                    object_repr=f'Relevé {i}-{objet}', timestamp=date + timedelta(seconds=objet)
+                )
+        AuditLog.objects.create(user=cls.admin, action='CREATE', model_name='ProcesVerbal', object_id=1,
+                                timestamp=cls.jours[0])
+
+    def setUp(self):
+        self.dossier = Path(tempfile.mkdtemp(dir=settings.VAR_DIR))
+        self.addCleanup(shutil.rmtree, self.dossier, True)
+        self.enterContext(override_settings(AUDIT_ARCHIVE_DIR=self.dossier))
+
+    def test_archivage_puis_recherche(self):
+        self.assertEqual(archives_audit.archiver(timezone.now()), 5)
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+        index = archives_audit.charger_index()
+        self.assertEqual([segment['nombre'] for segment in index], [3, 2])
+        self.assertEqual(index[0]['objets'], {'RelevéHoraire': [1, 2], 'ProcesVerbal': [1]})
+        self.assertIn('RelevéHoraire'.encode('utf-8'), (self.dossier / 'index.json').read_bytes())
+
+        # Table vivante et segments, du plus récent au plus ancien
+        trouvees = archives_audit.rechercher_audit(model_name='RelevéHoraire', object_id=2)
+        self.assertEqual([e['object_repr'] for e in trouvees], ['Relevé 2-2', 'Relevé 1-2', 'Relevé 0-2'])
+        self.assertEqual(
+            [e['object_repr'] for e in archives_audit.rechercher_audit(model_name='RelevéHoraire', limite=3)],
+            ['Relevé 2-2', 'Relevé 2-1', 'Relevé 1-2']
+        )
+        self.assertEqual([e['model_name'] for e in archives_audit.rechercher_audit(action='CREATE')],
+                         ['ProcesVerbal'])
+
+        # Rien de plus à archiver
+        self.assertEqual(archives_audit.archiver(timezone.now()), 0)
+
+    def test_une_transaction_par_jour(self):
+        ecrire_segment = archives_audit._ecrire_segment
+
+        def echec_au_second_jour(dossier, jour, entrees, index):
+            if index:
+                raise OSError("Disque plein")
+            ecrire_segment(dossier, jour, entrees, index)
+
+        with mock.patch.object(archives_audit, '_ecrire_segment', echec_au_second_jour), \
+                self.assertRaises(OSError):
+            archives_audit.archiver(timezone.now())
+        # Premier jour archivé et supprimé, second jour intact
+        self.assertEqual(len(archives_audit.charger_index()), 1)
+        self.assertEqual(AuditLog.objects.count(), 4)
+
+        self.assertEqual(archives_audit.archiver(timezone.now()), 2)
+        self.assertEqual(len(archives_audit.rechercher_audit(model_name='RelevéHoraire')), 6)
+
+    def test_api(self):
+        archives_audit.archiver(timezone.now())
+        url = reverse('api_audit')
+
+        self.client.force_login(User.objects.create_user('representant', role='representant'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.admin)
+        donnees = self.client.get(url, {'modele': 'RelevéHoraire', 'objet': 1, 'limite': 2}).json()
+        self.assertEqual([e['object_repr'] for e in donnees['entrees']], ['Relevé 2-1', 'Relevé 1-1'])
+        donnees = self.client.get(url, {'fin': (self.jours[1] - timedelta(hours=1)).isoformat()}).json()
+        self.assertEqual(len(donnees['entrees']), 3)
+        for params in ({'limite': 'abc'}, {'debut': 'hier'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+
+class SynchronisationTest(ResultatsTestCase):
+    """Lots d'opérations hors ligne : rejeu idempotent, op_id d'un autre utilisateur, échecs partiels"""
+
+    def setUp(self):
+        super().setUp()
+        self.representant = User.objects.create_user('hors_ligne', role='representant', bureau_vote=self.bureaux[0])
+        self.client.force_login(self.representant)
+
+    def envoyer(self, *operations):
+        response = self.client.post(
+            reverse('api_synchronisation'), json.dumps({'operations': list(operations)}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['resultats']
+
+    def releve(self, op_id, nombre_votants=40, **data):
+        return {'op_id': op_id, 'type': 'releve', 'data': {'nombre_votants': nombre_votants, **data}}
+
+    def pv(self, op_id):
+        photo = 'data:image/png;base64,' + base64.b64encode(_image_pv().read()).decode('ascii')
+        return {'op_id': op_id, 'type': 'pv', 'data': {
+            'nombre_inscrits': 200, 'nombre_votants': 100, 'bulletins_nuls': 0, 'bulletins_blancs': 0,
+            'voix': {str(self.candidats[0].pk): 60, str(self.candidats[1].pk): 40}, 'photo': photo,
+        }}
+
+    def test_rejeu_idempotent(self):
+        premiers = self.envoyer(self.releve('op-releve'), self.pv('op-pv'))
+        self.assertEqual([r['statut'] for r in premiers], ['applique', 'applique'])
+        self.assertEqual([r['doublon'] for r in premiers], [False, False])
+
+        # Lot renvoyé (réponse perdue) : mêmes réponses, rien de réappliqué
+        rejoues = self.envoyer(self.releve('op-releve'), self.pv('op-pv'))
+        self.assertEqual([r['doublon'] for r in rejoues], [True, True])
+        self.assertEqual([{**r, 'doublon': False} for r in rejoues], premiers)
+        self.assertEqual(RelevéHoraire.objects.filter(bureau_vote=self.bureaux[0]).count(), 1)
+        self.assertEqual(ProcesVerbal.objects.filter(bureau_vote=self.bureaux[0]).count(), 1)
+        self.assertEqual(ResultatCandidat.objects.filter(proces_verbal__bureau_vote=self.bureaux[0]).count(), 2)
+
+    def test_op_id_d_un_autre_utilisateur(self):
+        self.envoyer(self.releve('op-partage'))
+        autre = User.objects.create_user('autre', role='representant', bureau_vote=self.bureaux[1])
+        self.client.force_login(autre)
+
+        (resultat,) = self.envoyer(self.releve('op-partage'))
+        self.assertEqual(resultat['statut'], 'rejete')
+        self.assertFalse(RelevéHoraire.objects.filter(bureau_vote=self.bureaux[1]).exists())
+
+    def test_echecs_partiels(self):
+        resultats = self.envoyer(
+            self.releve('op-1'),
+            self.releve('op-2', nombre_votants=500),
+            {'op_id': 'op-3', 'type': 'releve', 'data': [40]},
+            {'op_id': 'op-4', 'type': 'pv', 'data': {**self.pv('op-4')['data'], 'voix': [60, 40]}},
+            {'op_id': 'op-5', 'type': 'inconnu'},
+            self.releve('op-6', observations=['liste']),
+        )
+        self.assertEqual([r['statut'] for r in resultats], ['applique'] + ['rejete'] * 5)
+        self.assertEqual(RelevéHoraire.objects.filter(bureau_vote=self.bureaux[0]).count(), 1)
+        self.assertFalse(ProcesVerbal.objects.filter(bureau_vote=self.bureaux[0]).exists())
+
+        # Rejets de données mémorisés : renvoyés tels quels, sans nouvel essai
+        self.assertEqual(
+            set(OperationSynchronisation.objects.filter(statut='rejete').values_list('op_id', flat=True)),
+            {'op-2', 'op-3', 'op-4', 'op-6'}
+        )
+        self.assertTrue(all(r['doublon'] for r in self.envoyer(self.releve('op-3'), self.releve('op-4'))))
+
+    def test_erreur_inattendue_non_memorisee(self):
+        with mock.patch('myApplication.views.enregistrer_releve', side_effect=RuntimeError('base verrouillée')), \
+                self.assertLogs('myApplication.views', 'ERROR'):
+            (resultat,) = self.envoyer(self.releve('op-erreur'))
+        self.assertEqual(resultat['statut'], 'erreur')
+        self.assertNotIn('verrouillée', resultat['erreur'])
+        self.assertFalse(OperationSynchronisation.objects.filter(op_id='op-erreur').exists())
+
+        # Nouvel essai du client : appliqué
+        self.assertEqual(self.envoyer(self.releve('op-erreur'))[0]['statut'], 'applique')
+
+
+class RapprochementTest(ResultatsTestCase):
+    """Contrôles d'une série de relevés et sélection incrémentale des bureaux à relire"""
+
+    def test_analyser_serie(self):
+        debut = timezone.now()
+
+        def serie(*votants, pas=timedelta(hours=1)):
+            return [(i + 1, debut + i * pas, nombre) for i, nombre in enumerate(votants)]
+
+        normale = rapprochement.analyser_serie(serie(20, 50, 90), 200, 95)
+        self.assertEqual((normale['nombre_baisses'], normale['nombre_sauts'], normale['anomalie']), (0, 0, False))
+        self.assertEqual((normale['ecart_pv'], normale['dernier_releve_id']), (5, 3))
+
+        baisse = rapprochement.analyser_serie(serie(20, 50, 40), 200, None)
+        self.assertEqual((baisse['nombre_baisses'], baisse['ecart_pv'], baisse['anomalie']), (1, None, True))
+
+        # 80 votants en 30 minutes sur 200 inscrits : 80 % des inscrits par heure
+        saut = rapprochement.analyser_serie(serie(10, 90, pas=timedelta(minutes=30)), 200, 90)
+        self.assertEqual((saut['nombre_sauts'], saut['saut_max'], saut['anomalie']), (1, 80.0, True))
+
+        # Écart avec le PV : négatif, ou au-delà de 10 % des inscrits (20, minimum 10)
+        for votants_pv, anormal in ((100, False), (110, False), (111, True), (89, True)):
+            with self.subTest(votants_pv=votants_pv):
+                self.assertEqual(
+                    rapprochement.analyser_serie(serie(50, 90), 200, votants_pv)['ecart_pv_anormal'], anormal
+                )
+
+    def releve(self, bureau, votants, heure):
+        return RelevéHoraire.objects.create(bureau_vote=bureau, nombre_votants=votants, heure_releve=heure)
+
+    def a_relire(self):
+        return set(rapprochement.bureaux_a_rapprocher().values_list('pk', flat=True))
+
+    def test_selection_incrementale(self):
+        debut = timezone.now() - timedelta(hours=3)
+        premier, second, troisieme = self.bureaux[:3]
+        releves = [self.releve(premier, votants, debut + timedelta(hours=i)) for i, votants in enumerate((20, 60))]
+        self.releve(second, 30, debut)
+        pv = self.saisir(troisieme, 100, (60, 40))
+        self.releve(troisieme, 90, debut)
+
+        self.assertEqual(self.a_relire(), {premier.pk, second.pk, troisieme.pk})
+        self.assertEqual(rapprochement.rapprocher(), {'bureaux': 3, 'anomalies': 0})
+        self.assertEqual(self.a_relire(), set())
+
+        # Relevé modifié : baisse détectée sans --complet
+        releves[1].nombre_votants = 10
+        releves[1].save()
+        self.assertEqual(self.a_relire(), {premier.pk})
+        self.assertEqual(rapprochement.rapprocher(), {'bureaux': 1, 'anomalies': 1})
+        self.assertEqual(RapprochementReleves.objects.get(bureau_vote=premier).nombre_baisses, 1)
+
+        # Relevé supprimé : la baisse disparaît
+        releves[1].delete()
+        self.assertEqual(self.a_relire(), {premier.pk})
+        rapprochement.rapprocher()
+        self.assertEqual(RapprochementReleves.objects.get(bureau_vote=premier).nombre_releves, 1)
+        self.assertFalse(RapprochementReleves.objects.get(bureau_vote=premier).anomalie)
+
+        # PV supprimé, puis dernier relevé d'un bureau supprimé
+        pv.delete()
+        RelevéHoraire.objects.filter(bureau_vote=second).delete()
+        self.assertEqual(self.a_relire(), {second.pk, troisieme.pk})
+        rapprochement.rapprocher()
+        self.assertIsNone(RapprochementReleves.objects.get(bureau_vote=troisieme).votants_pv)
+        self.assertFalse(RapprochementReleves.objects.filter(bureau_vote=second).exists())
+        self.assertEqual(self.a_relire(), set())
+
+
+class ExportsAdminTest(ResultatsTestCase):
+    """Actions d'export CSV et XLSX de l'admin, relues depuis les octets envoyés"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+        for bureau in self.bureaux[:2]:
+            self.saisir(bureau, 100, (60, 40))
+            RelevéHoraire.objects.create(bureau_vote=bureau, nombre_votants=50, observations='File d’attente à l’ouverture')
+
+    def exporter(self, modele, action):
+        model_admin = admin.site._registry[modele]
+        response = self.client.post(
+            reverse(f'admin:myApplication_{modele._meta.model_name}_changelist'),
+            {'action': action, '_selected_action': list(modele.objects.values_list('pk', flat=True))},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        entetes = [colonne.entete for colonne in model_admin.export_colonnes]
+        return entetes, b''.join(response.streaming_content)
+
+    def test_exports(self):
+        for modele, nombre in (
+            (BureauVote, 7), (ProcesVerbal, 2), (ResultatCandidat, 4), (RelevéHoraire, 2),
+        ):
+            with self.subTest(modele=modele.__name__, format='csv'):
+                entetes, contenu = self.exporter(modele, 'exporter_csv')
+                self.assertTrue(contenu.startswith(b'\xef\xbb\xbf'))
+                lignes = list(csv.reader(io.StringIO(contenu.decode('utf-8-sig')), delimiter=';'))
+                self.assertEqual(lignes[0], entetes)
+                self.assertEqual(len(lignes) - 1, nombre)
+
+            with self.subTest(modele=modele.__name__, format='xlsx'):
+                entetes, contenu = self.exporter(modele, 'exporter_xlsx')
+                feuille = openpyxl.load_workbook(io.BytesIO(contenu)).active
+                lignes = [list(ligne) for ligne in feuille.iter_rows(values_only=True)]
+                self.assertEqual(lignes[0], entetes)
+                self.assertEqual(len(lignes) - 1, nombre)
+
+        # Texte accentué conservé dans les deux formats
+        _, contenu = self.exporter(RelevéHoraire, 'exporter_csv')
+        ligne = next(csv.DictReader(io.StringIO(contenu.decode('utf-8-sig')), delimiter=';'))
+        self.assertEqual((ligne['Département'], ligne['Observations']), ('Danané', 'File d’attente à l’ouverture'))
+
+        _, contenu = self.exporter(ProcesVerbal, 'exporter_xlsx')
+        feuille = openpyxl.load_workbook(io.BytesIO(contenu)).active
+        self.assertEqual(feuille['A1'].value, 'Département')
+        self.assertEqual(feuille['A2'].value, 'Danané')
+        self.assertEqual(feuille['F2'].value, 100)
+
+
+class DashboardCandidatTest(ResultatsTestCase):
+    """Statistiques groupées du tableau de bord candidat et pagination du détail par bureau"""
+
+    def setUp(self):
+        super().setUp()
+        autre_sp = SousPrefecture.objects.create(nom='Zouan-Hounien', departement=self.departement)
+        autre_centre = CentreVote.objects.create(nom='École', sous_prefecture=autre_sp)
+        self.autres_bureaux = [
+            BureauVote.objects.create(numero=f'0{i}', centre_vote=autre_centre, nombre_inscrits=300)
+            for i in (1, 2)
+        ]
+        for i, bureau in enumerate(self.bureaux + self.autres_bureaux):
+            self.saisir(bureau, 100 + i, (60 + i, 40 - i))
+
+    def test_statistiques_groupees(self):
+        candidat = self.candidats[0]
+        stats = views._statistiques_candidat(candidat)
+
+        # Référence : sommes bureau par bureau
+        attendu_sp, attendu_centre = {}, {}
+        for resultat in ResultatCandidat.objects.filter(candidat=candidat).select_related(
+            'proces_verbal__bureau_vote__centre_vote'
+        ):
+            centre = resultat.proces_verbal.bureau_vote.centre_vote
+            for attendu, cle in ((attendu_sp, centre.sous_prefecture_id), (attendu_centre, centre.pk)):
+                voix, bureaux, exprimes = attendu.get(cle, (0, 0, 0))
+                attendu[cle] = (
+                    voix + resultat.nombre_voix, bureaux + 1, exprimes + resultat.proces_verbal.suffrages_exprimes
+                )
+
+        for lignes, cle, attendu in (
+            (stats['stats_sous_prefecture'], 'sous_prefecture_id', attendu_sp),
+            (stats['stats_centre'], 'centre_id', attendu_centre),
+        ):
+            self.assertEqual(
+                {ligne[cle]: (ligne['total_voix'], ligne['nombre_bureaux'], ligne['suffrages_exprimes'])
+                 for ligne in lignes},
+                attendu
+            )
+            for ligne in lignes:
+                self.assertAlmostEqual(ligne['pourcentage'], ligne['total_voix'] / ligne['suffrages_exprimes'] * 100)
+
+        self.assertEqual(stats['total_voix'], sum(voix for voix, _, _ in attendu_sp.values()))
+        self.assertEqual(stats['total_bureaux_avec_resultats'], 7)
+        self.assertEqual(stats['total_inscrits'], 5 * 200 + 2 * 300)
+
+    def test_pagination_bureaux(self):
+        self.client.force_login(self.candidats[0])
+        url = reverse('dashboard_candidat_bureaux')
+
+        with mock.patch.object(views, 'BUREAUX_PAR_PAGE', 3):
+            pages = [self.client.get(url, {'page': numero}).context['page'] for numero in (1, 2, 3, 99)]
+
+        self.assertEqual([len(page.object_list) for page in pages], [3, 3, 1, 1])
+        self.assertEqual(pages[0].paginator.num_pages, 3)
+        self.assertEqual(pages[3].number, 3)
+        vus = [resultat.pk for page in pages[:3] for resultat in page.object_list]
+        self.assertCountEqual(vus, ResultatCandidat.objects.filter(candidat=self.candidats[0]).values_list('pk', flat=True))
+
+        # Réservé aux candidats
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class HierarchieTest(ResultatsTestCase):
+    """Propagation des clés dénormalisées et commande verifier_hierarchie"""
+
+    def setUp(self):
+        super().setUp()
+        self.pv = self.saisir(self.bureaux[0], 100, (60, 40))
+        self.releve = RelevéHoraire.objects.create(bureau_vote=self.bureaux[0], nombre_votants=50)
+        self.autre_departement = Departement.objects.create(nom='Man', code='MAN')
+        self.autre_sp = SousPrefecture.objects.create(nom='Logoualé', departement=self.autre_departement)
+
+    def cles(self):
+        lignes = [self.pv, self.releve, *ResultatCandidat.objects.filter(proces_verbal=self.pv)]
+        for ligne in lignes:
+            ligne.refresh_from_db()
+        return {(ligne.centre_vote_id, ligne.sous_prefecture_id, ligne.departement_id) for ligne in lignes}
+
+    def test_deplacement_centre(self):
+        self.assertEqual(self.cles(), {(self.centre.pk, self.sous_prefecture.pk, self.departement.pk)})
+
+        self.centre.sous_prefecture = self.autre_sp
+        self.centre.save()
+        self.assertEqual(self.cles(), {(self.centre.pk, self.autre_sp.pk, self.autre_departement.pk)})
+
+        # Changement de département de la sous-préfecture, puis bureau déplacé vers un autre centre
+        self.autre_sp.departement = self.departement
+        self.autre_sp.save()
+        self.assertEqual(self.cles(), {(self.centre.pk, self.autre_sp.pk, self.departement.pk)})
+
+        nouveau_centre = CentreVote.objects.create(nom='Nouveau centre', sous_prefecture=self.sous_prefecture)
+        self.bureaux[0].centre_vote = nouveau_centre
+        self.bureaux[0].save()
+        self.assertEqual(self.cles(), {(nouveau_centre.pk, self.sous_prefecture.pk, self.departement.pk)})
+
+        # Enregistrement sans le parent : aucune lecture du parent ni réécriture des faits
+        with CaptureQueriesContext(connection) as contexte:
+            self.centre.save(update_fields=['nom'])
+        tables = {'myApplication_procesverbal', 'myApplication_resultatcandidat', 'myApplication_relevéhoraire'}
+        self.assertFalse([
+            requete['sql'] for requete in contexte.captured_queries
+            if any(table in requete['sql'] for table in tables) or 'sous_prefecture_id" FROM' in requete['sql']
+        ])
+        self.assertEqual(set(hierarchie.verifier().values()), {0})
+
+    def test_verifier_corrige_un_ecart(self):
+        # Mise à jour en masse : pas de signal, les clés dérivent
+        CentreVote.objects.filter(pk=self.centre.pk).update(sous_prefecture=self.autre_sp)
+        ResultatCandidat.objects.filter(proces_verbal=self.pv).update(departement=None)
+
+        sortie = io.StringIO()
+        call_command('verifier_hierarchie', stdout=sortie)
+        self.assertIn('⚠', sortie.getvalue())
+        ecarts = {modele: hierarchie.ecarts(modele).count() for modele in hierarchie.FAITS}
+        self.assertEqual(ecarts, {ProcesVerbal: 1, ResultatCandidat: 2, RelevéHoraire: 1})
+
+        call_command('verifier_hierarchie', '--corriger', stdout=io.StringIO())
+        self.assertEqual(self.cles(), {(self.centre.pk, self.autre_sp.pk, self.autre_departement.pk)})
+        self.assertFalse(any(hierarchie.ecarts(modele).exists() for modele in hierarchie.FAITS))
+
+
+class ArbreTest(ResultatsTestCase):
+    """Agrégation par l'arbre de la hiérarchie, déplacement d'un sous-arbre et reconstruction"""
+
+    # Niveau de l'arbre → chemin du bureau vers l'objet correspondant
+    CHEMINS = {
+        'departement': 'centre_vote__sous_prefecture__departement_id',
+        'sous_prefecture': 'centre_vote__sous_prefecture_id',
+        'centre': 'centre_vote_id',
+        'bureau': 'pk',
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.autre_departement = Departement.objects.create(nom='Man', code='MAN')
+        self.autre_sp = SousPrefecture.objects.create(nom='Logoualé', departement=self.autre_departement)
+        self.autre_centre = CentreVote.objects.create(nom='École', sous_prefecture=self.autre_sp)
+        self.autres_bureaux = [
+            BureauVote.objects.create(numero=f'0{i}', centre_vote=self.autre_centre, nombre_inscrits=300)
+            for i in (1, 2)
+        ]
+        for i, bureau in enumerate(self.bureaux[:3] + self.autres_bureaux[:1]):
+            self.saisir(bureau, 100 + i, (60 + i, 40 - i))
+
+    def attendu(self, niveau, objet_id):
+        """Totaux calculés directement depuis les bureaux"""
+        bureaux = BureauVote.objects.filter(**{self.CHEMINS[niveau]: objet_id})
+        pvs = ProcesVerbal.objects.filter(bureau_vote__in=bureaux)
+        totaux = pvs.aggregate(votants=Sum('nombre_votants'), exprimes=Sum('suffrages_exprimes'))
+        return {
+            'bureaux': bureaux.count(),
+            'bureaux_saisis': pvs.count(),
+            'inscrits': bureaux.aggregate(total=Sum('nombre_inscrits'))['total'] or 0,
+            'votants': totaux['votants'] or 0,
+            'exprimes': totaux['exprimes'] or 0,
+            'voix': dict(
+                ResultatCandidat.objects.filter(proces_verbal__in=pvs).values('candidat_id').annotate(
+                    total=Sum('nombre_voix')
+                ).values_list('candidat_id', 'total')
+            ),
+        }
+
+    def obtenu(self, ligne):
+        return {champ: ligne[champ] for champ in ('bureaux', 'bureaux_saisis', 'inscrits', 'votants', 'exprimes', 'voix')}
+
+    def test_agregation_a_chaque_niveau(self):
+        for profondeur, niveau in enumerate(self.CHEMINS, start=1):
+            with self.subTest(niveau=niveau):
+                lignes = arbre.agreger(profondeur=profondeur)
+                self.assertEqual({ligne['niveau'] for ligne in lignes}, {niveau})
+                self.assertEqual(len(lignes), BureauVote.objects.values(self.CHEMINS[niveau]).distinct().count())
+                for ligne in lignes:
+                    self.assertEqual(self.obtenu(ligne), self.attendu(niveau, ligne['objet_id']))
+
+        # Sous un nœud : ses seuls descendants
+        noeud = NoeudHierarchie.objects.get(niveau='sous_prefecture', objet_id=self.sous_prefecture.pk)
+        centres = arbre.agreger(noeud, profondeur=1)
+        self.assertEqual({ligne['objet_id'] for ligne in centres}, {self.centre.pk, self.centre_vide.pk})
+        self.assertEqual(len(arbre.agreger(noeud, profondeur=2)), 7)
+        with self.assertRaises(ValueError):
+            arbre.agreger(noeud, profondeur=3)
+
+    def test_deplacement_sous_arbre(self):
+        self.centre.sous_prefecture = self.autre_sp
+        self.centre.save()
+
+        noeud_centre = NoeudHierarchie.objects.get(niveau='centre', objet_id=self.centre.pk)
+        noeud_sp = NoeudHierarchie.objects.get(niveau='sous_prefecture', objet_id=self.autre_sp.pk)
+        self.assertEqual(noeud_centre.parent_id, noeud_sp.pk)
+        self.assertEqual(noeud_centre.chemin, noeud_sp.chemin + arbre.segment(self.centre.pk))
+        for bureau in self.bureaux:
+            self.assertEqual(
+                NoeudHierarchie.objects.get(bureau_vote=bureau).chemin,
+                noeud_centre.chemin + arbre.segment(bureau.pk)
+            )
+
+        # Les totaux suivent le sous-arbre déplacé
+        for ligne in arbre.agreger(profondeur=1):
+            self.assertEqual(self.obtenu(ligne), self.attendu('departement', ligne['objet_id']))
+        self.assertEqual(
+            {ligne['objet_id'] for ligne in arbre.agreger(noeud_sp, profondeur=1)},
+            {self.centre.pk, self.autre_centre.pk}
+        )
+
+    def test_reconstruire_arbre(self):
+        champs = ('niveau', 'objet_id', 'nom', 'profondeur', 'chemin', 'parent__objet_id', 'bureau_vote_id')
+        avant = set(NoeudHierarchie.objects.values_list(*champs))
+        self.assertEqual(len(avant), 2 + 2 + 3 + 9)
+
+        NoeudHierarchie.objects.all().delete()
+        sortie = io.StringIO()
+        call_command('reconstruire_arbre', stdout=sortie)
+        self.assertIn('2 departement', sortie.getvalue())
+        self.assertEqual(set(NoeudHierarchie.objects.values_list(*champs)), avant)
+        self.assertEqual(
+            [self.obtenu(ligne) for ligne in arbre.agreger(profondeur=1)],
+            [self.attendu('departement', departement.pk) for departement in (self.departement, self.autre_departement)]
+        )
+
+
+class CompteursAccueilTest(ResultatsTestCase):
+    """Compteurs de la page d'accueil servis depuis le cache et ajustés par les signaux"""
+
+    def setUp(self):
+        super().setUp()
+        compteurs.reconcilier()
+
+    def attendu(self):
+        return {nom: compteurs._compter(nom) for nom in compteurs.COMPTEURS}
+
+    def test_accueil_sans_requete(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_bureaux'], 7)
+        self.assertEqual(response.context['total_candidats'], 2)
+
+    def test_creation_et_suppression(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            centre = CentreVote.objects.create(nom='Nouveau centre', sous_prefecture=self.sous_prefecture)
+            BureauVote.objects.create(numero='01', centre_vote=centre, nombre_inscrits=100)
+            pv = self.saisir(self.bureaux[0], 100, (60, 40))
+        with self.assertNumQueries(0):
+            valeurs = compteurs.get_compteurs()
+        self.assertEqual(valeurs, self.attendu())
+        self.assertEqual((valeurs['total_centres'], valeurs['resultats_saisis']), (3, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pv.delete()
+            centre.delete()
+        with self.assertNumQueries(0):
+            valeurs = compteurs.get_compteurs()
+        self.assertEqual(valeurs, self.attendu())
+        self.assertEqual((valeurs['total_centres'], valeurs['total_bureaux'], valeurs['resultats_saisis']), (2, 7, 0))
+
+    def test_changement_de_role(self):
+        candidat = self.candidats[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            candidat.role = 'representant'
+            candidat.save(update_fields=['role'])
+        self.assertEqual(compteurs.get_compteurs()['total_candidats'], 1)
+
+        # Enregistrement sans le rôle : le compteur reste en cache
+        with self.captureOnCommitCallbacks(execute=True):
+            self.candidats[1].save(update_fields=['first_name'])
+        with self.assertNumQueries(0):
+            self.assertEqual(compteurs.get_compteurs()['total_candidats'], 1)
+
+
+class CacheSQLiteTest(TestCase):
+    """Backend de cache SQLite : expiration, incrément, touch et purge"""
+
+    def setUp(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        self.cache = SQLiteCache(Path(dossier) / 'cache.sqlite3', {})
+
+    def test_add_sur_entree_expiree(self):
+        self.assertTrue(self.cache.add('cle', 'a'))
+        self.assertFalse(self.cache.add('cle', 'b'))
+        self.assertEqual(self.cache.get('cle'), 'a')
+
+        self.cache.set('cle', 'a', timeout=0)
+        self.assertIsNone(self.cache.get('cle'))
+        self.assertTrue(self.cache.add('cle', 'b'))
+        self.assertEqual(self.cache.get('cle'), 'b')
+
+    def test_incr(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('absente')
+        self.cache.set('compteur', 1, timeout=None)
+        self.assertEqual(self.cache.incr('compteur', 5), 6)
+        self.assertEqual(self.cache.get('compteur'), 6)
+
+        # Entrée expirée : absente pour incr
+        self.cache.set('compteur', 1, timeout=0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('compteur')
+
+    def test_touch(self):
+        self.assertFalse(self.cache.touch('absente'))
+        self.cache.set('cle', 'valeur', timeout=60)
+        self.assertTrue(self.cache.touch('cle', timeout=None))
+        self.assertEqual(self.cache.get('cle'), 'valeur')
+        self.assertTrue(self.cache.touch('cle', timeout=0))
+        self.assertIsNone(self.cache.get('cle'))
+        self.assertFalse(self.cache.touch('cle'))
+
+    def test_purger(self):
+        self.cache.set_many({'expiree1': 1, 'expiree2': 2}, timeout=0)
+        self.cache.set('permanente', 3, timeout=None)
+        self.cache.set('valide', 4, timeout=60)
+        self.assertEqual(self.cache.purger(), 2)
+        self.assertEqual(self.cache.purger(), 0)
+        self.assertEqual(self.cache.get_many(['expiree1', 'permanente', 'valide']), {'permanente': 3, 'valide': 4})
+
+
+class InvalidationCacheTest(ResultatsTestCase):
+    """La saisie d'un PV n'invalide que sa branche de la hiérarchie"""
+
+    def test_saisie_pv_invalide_sa_branche(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            autre_departement = Departement.objects.create(nom='Man', code='MAN')
+            autre_sp = SousPrefecture.objects.create(nom='Logoualé', departement=autre_departement)
+            autre_centre = CentreVote.objects.create(nom='École', sous_prefecture=autre_sp)
+
+        bureau = self.bureaux[0]
+        branche = cache_resultats.ancetres_bureau(bureau.pk)
+        self.assertEqual(branche, [
+            ('bureau', bureau.pk), ('centre', self.centre.pk), ('sous_prefecture', self.sous_prefecture.pk),
+            ('departement', self.departement.pk), GLOBAL,
+        ])
+        autres = [
+            ('bureau', self.bureaux[1].pk), ('centre', self.centre_vide.pk), ('centre', autre_centre.pk),
+            ('sous_prefecture', autre_sp.pk), ('departement', autre_departement.pk),
+        ]
+        avant = dict(zip(branche + autres, cache_resultats.versions(branche + autres)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.saisir(bureau, 100, (60, 40))
+
+        apres = dict(zip(branche + autres, cache_resultats.versions(branche + autres)))
+        for noeud in branche:
+            self.assertGreater(apres[noeud], avant[noeud], noeud)
+        for noeud in autres:
+            self.assertEqual(apres[noeud], avant[noeud], noeud)
+
+
+class CertificatsTest(ResultatsTestCase):
+    """Génération des certificats : reprise des bureaux à jour et archive ZIP en flux"""
+
+    def setUp(self):
+        super().setUp()
+        self.dossier = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+        self.pvs = [self.saisir(bureau, 100 + i, (60 + i, 40)) for i, bureau in enumerate(self.bureaux[:3])]
+
+    def generer(self):
+        donnees = certificats.preparer(BureauVote.objects.all())
+        return {bureau['id']: statut for bureau, _chemin, statut in certificats.generer(
+            donnees, processus=1, dossier=self.dossier
+        )}
+
+    def test_reprise(self):
+        ids = [pv.bureau_vote_id for pv in self.pvs]
+        self.assertEqual(self.generer(), dict.fromkeys(ids, certificats.GENERE))
+        manifeste = json.loads((self.dossier / 'manifeste.json').read_text(encoding='utf-8'))
+        self.assertEqual(set(manifeste), {str(pk) for pk in ids})
+        for pk in ids:
+            self.assertTrue((self.dossier / f'bureau_{pk}.pdf').read_bytes().startswith(b'%PDF'))
+
+        # Rien n'a changé : aucun rendu
+        with mock.patch.object(certificats, 'rendre_certificat') as rendre:
+            self.assertEqual(self.generer(), dict.fromkeys(ids, certificats.A_JOUR))
+        rendre.assert_not_called()
+
+        # PV corrigé et certificat supprimé : seuls ces deux bureaux sont refaits
+        self.pvs[0].nombre_votants = 90
+        self.pvs[0].save()
+        (self.dossier / f'bureau_{ids[1]}.pdf').unlink()
+        self.assertEqual(self.generer(), {
+            ids[0]: certificats.GENERE, ids[1]: certificats.GENERE, ids[2]: certificats.A_JOUR,
+        })
+
+    def test_archive_zip(self):
+        centre = CentreVote.objects.create(nom='École Sainte-Thérèse', sous_prefecture=self.sous_prefecture)
+        bureau = BureauVote.objects.create(numero='01', centre_vote=centre, nombre_inscrits=150)
+        self.saisir(bureau, 80, (50, 30))
+
+        donnees = certificats.preparer(BureauVote.objects.all())
+        contenu = b''.join(certificats.flux_zip(donnees, processus=1, dossier=self.dossier))
+        with zipfile.ZipFile(io.BytesIO(contenu)) as archive:
+            self.assertIsNone(archive.testzip())
+            noms = archive.namelist()
+            self.assertEqual(noms, [certificats.nom_archive(bureau) for bureau in donnees])
+            self.assertIn(f'ecole-sainte-therese-{centre.pk}/bureau_01.pdf', noms)
+            for nom in noms:
+                self.assertTrue(archive.read(nom).startswith(b'%PDF'))
+
+
+class ArchivePhotosTest(ResultatsTestCase):
+    """Archive des photos de PV : photos stockées telles quelles et manifeste avec empreintes"""
+
+    def test_flux_archive(self):
+        contenu_photo = _image_pv().read()
+        photo = default_storage.save(f'pv_photos/archive-{uuid.uuid4().hex}.png', ContentFile(contenu_photo))
+        self.addCleanup(default_storage.delete, photo)
+
+        present = self.saisir(self.bureaux[0], 100, (60, 40))
+        absent = self.saisir(self.bureaux[1], 120, (70, 50))
+        ProcesVerbal.objects.filter(pk=present.pk).update(photo_pv=photo)
+        ProcesVerbal.objects.filter(pk=absent.pk).update(photo_pv='pv_photos/introuvable.png')
+
+        contenu = b''.join(archive_photos.flux_archive(archive_photos.selection()))
+        with zipfile.ZipFile(io.BytesIO(contenu)) as archive:
+            self.assertIsNone(archive.testzip())
+            nom = f'photos/sp/centre-{self.centre.pk}/bureau_01.png'
+            self.assertEqual(archive.namelist(), [nom, 'manifeste.csv'])
+            self.assertEqual(archive.read(nom), contenu_photo)
+            self.assertEqual(archive.getinfo(nom).compress_type, zipfile.ZIP_STORED)
+            manifeste = list(csv.DictReader(
+                io.StringIO(archive.read('manifeste.csv').decode('utf-8-sig')), delimiter=';'
+            ))
+
+        self.assertEqual([ligne['Bureau'] for ligne in manifeste], ['01', '02'])
+        trouvee, manquante = manifeste
+        self.assertEqual(trouvee['Département'], 'Danané')
+        self.assertEqual(trouvee["Fichier dans l'archive"], nom)
+        self.assertEqual(trouvee['Taille (octets)'], str(len(contenu_photo)))
+        self.assertEqual(trouvee['SHA-256'], hashlib.sha256(contenu_photo).hexdigest())
+        self.assertEqual(
+            (manquante["Fichier d'origine"], manquante["Fichier dans l'archive"],
+             manquante['Taille (octets)'], manquante['SHA-256']),
+            ('pv_photos/introuvable.png', '', '', '')
+        )
+
+
+class FluxResultatsTest(ResultatsTestCase):
+    """Flux des résultats par bureau en NDJSON, CSV et npz"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+        self.saisir(self.bureaux[0], 100, (60, 40))
+        self.saisir(self.bureaux[2], 150, (50, 100))
+        self.ids = sorted(BureauVote.objects.values_list('pk', flat=True))
+
+    def telecharger(self, format_sortie):
+        response = self.client.get(
+            reverse('api_flux_resultats'), {'format': format_sortie, 'departement': self.departement.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], flux_resultats.FORMATS[format_sortie])
+        return b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        enregistrements = [json.loads(ligne) for ligne in self.telecharger('ndjson').decode('utf-8').splitlines()]
+        self.assertEqual([e['bureau_id'] for e in enregistrements], self.ids)
+        par_bureau = {e['bureau_id']: e for e in enregistrements}
+
+        saisi = par_bureau[self.bureaux[0].pk]
+        self.assertEqual((saisi['departement'], saisi['inscrits'], saisi['votants'], saisi['exprimes']),
+                         ('Danané', 200, 100, 100))
+        self.assertEqual(saisi['voix'], {str(self.candidats[0].pk): 60, str(self.candidats[1].pk): 40})
+        self.assertIsNotNone(saisi['date_modification'])
+
+        vide = par_bureau[self.bureaux[1].pk]
+        self.assertEqual((vide['votants'], vide['voix'], vide['date_modification']), (None, {}, None))
+
+    def test_csv(self):
+        lignes = list(csv.reader(io.StringIO(self.telecharger('csv').decode('utf-8'))))
+        self.assertEqual(
+            lignes[0], flux_resultats.NOMS_CHAMPS + [f'voix_{candidat.pk}' for candidat in self.candidats]
+        )
+        self.assertEqual(len(lignes) - 1, len(self.ids))
+        par_bureau = {int(ligne[0]): dict(zip(lignes[0], ligne)) for ligne in lignes[1:]}
+
+        saisi = par_bureau[self.bureaux[2].pk]
+        self.assertEqual(
+            (saisi['departement'], saisi['votants'], saisi['verifie'],
+             saisi[f'voix_{self.candidats[0].pk}'], saisi[f'voix_{self.candidats[1].pk}']),
+            ('Danané', '150', 'false', '50', '100')
+        )
+        vide = par_bureau[self.bureaux[1].pk]
+        self.assertEqual((vide['votants'], vide['verifie'], vide[f'voix_{self.candidats[0].pk}']), ('', '', ''))
+
+    def test_npz(self):
+        with np.load(io.BytesIO(self.telecharger('npz'))) as colonnes:
+            self.assertEqual(colonnes['bureau_id'].tolist(), self.ids)
+            self.assertEqual(colonnes['candidat_id'].tolist(), [candidat.pk for candidat in self.candidats])
+            lignes = {pk: i for i, pk in enumerate(self.ids)}
+            saisi, vide = lignes[self.bureaux[0].pk], lignes[self.bureaux[1].pk]
+
+            self.assertEqual(colonnes['voix'].shape, (len(self.ids), 2))
+            self.assertEqual(colonnes['voix'][saisi].tolist(), [60, 40])
+            self.assertEqual(colonnes['voix'][vide].tolist(), [0, 0])
+            self.assertEqual((colonnes['votants'][saisi], colonnes['votants'][vide]), (100, -1))
+            self.assertEqual(colonnes['a_pv'].sum(), 2)
+            self.assertTrue(np.isnat(colonnes['date_modification'][vide]))
+            self.assertEqual(colonnes['departement'][saisi], 'Danané')
+
+    def test_nombre_de_requetes_constant(self):
+        def compter(format_sortie):
+            with CaptureQueriesContext(connection) as contexte:
+                b''.join(
+                    morceau if isinstance(morceau, bytes) else morceau.encode('utf-8')
+                    for morceau in flux_resultats.flux(format_sortie, flux_resultats.selection(self.departement.pk))
+                )
+            return len(contexte.captured_queries)
+
+        avant = {format_sortie: compter(format_sortie) for format_sortie in flux_resultats.FORMATS}
+        for bureau in self.bureaux[3:] + [self.bureaux[1]]:
+            self.saisir(bureau, 120, (70, 50))
+        for format_sortie in flux_resultats.FORMATS:
+            with self.subTest(format=format_sortie):
+                # Bureaux et résultats, plus les candidats pour les colonnes CSV et npz
+                self.assertLessEqual(avant[format_sortie], 3)
+                self.assertEqual(compter(format_sortie), avant[format_sortie])
+
+
+class DashboardGeneralTest(ResultatsTestCase):
+    """Coquille, empreintes et fragments du tableau de bord général : 304 et section réservée"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        pv = self.saisir(self.bureaux[0], 100, (60, 40))
+        AnomaliePV.objects.create(
+            proces_verbal=pv, type_anomalie='vote_unanime', valeur=0.9, message='Voix concentrées'
+        )
+        self.representant = User.objects.get(bureau_vote=self.bureaux[0])
+
+    def assertRevalide(self, url):
+        """Première réponse avec ETag, puis 304 avec If-None-Match"""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        revalidation = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidation.status_code, 304)
+        self.assertEqual(revalidation.content, b'')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"autre"').status_code, 200)
+        return response
+
+    def test_coquille_et_empreintes(self):
+        self.client.force_login(self.admin)
+        self.assertRevalide(reverse('dashboard_general'))
+
+        data = self.assertRevalide(reverse('api_dashboard')).json()
+        self.assertEqual(set(data['sections']), set(views.SECTIONS_DASHBOARD) | {'anomalies'})
+        self.assertEqual(data['graphique']['voix'], [60, 40])
+
+        # L'ETag d'un fragment est l'empreinte annoncée pour sa section
+        for section, empreinte in data['sections'].items():
+            with self.subTest(section=section):
+                response = self.assertRevalide(reverse('dashboard_fragment', args=[section]))
+                self.assertEqual(response['ETag'], f'"{empreinte}"')
+        self.assertContains(self.client.get(reverse('dashboard_fragment', args=['anomalies'])), 'Voix concentrées')
+
+    def test_section_anomalies_reservee(self):
+        self.client.force_login(self.representant)
+        data = self.client.get(reverse('api_dashboard')).json()
+        self.assertEqual(set(data['sections']), set(views.SECTIONS_DASHBOARD))
+        self.assertEqual(self.client.get(reverse('dashboard_fragment', args=['anomalies'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('dashboard_fragment', args=['progression'])).status_code, 200)
+
+    def test_section_inconnue(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('dashboard_fragment', args=['inconnue'])).status_code, 404)
+
+
+class RapportsPDFTest(ResultatsTestCase):
+    """Chiffres des rapports à chaque niveau et repli sur ReportLab sans WeasyPrint"""
+
+    def setUp(self):
+        super().setUp()
+        self.autre_sp = SousPrefecture.objects.create(nom='Zouan-Hounien', departement=self.departement)
+        autre_centre = CentreVote.objects.create(nom='École', sous_prefecture=self.autre_sp)
+        self.autre_bureau = BureauVote.objects.create(numero='01', centre_vote=autre_centre, nombre_inscrits=300)
+        self.saisir(self.bureaux[0], 100, (60, 40))
+        self.saisir(self.bureaux[1], 150, (50, 100))
+        self.saisir(self.autre_bureau, 200, (150, 50))
+        for candidat, (prenom, nom) in zip(self.candidats, [('Aya', 'Koné'), ('Bamba', 'Touré')]):
+            User.objects.filter(pk=candidat.pk).update(first_name=prenom, last_name=nom)
+
+    def test_contexte_a_chaque_niveau(self):
+        cas = [
+            # Niveau, objet, totaux (bureaux, saisis, inscrits, votants, exprimés), voix,
+            # lignes du sous-niveau (nom, bureaux saisis, candidat en tête)
+            ('departement', self.departement, (8, 3, 1300, 450, 450), [260, 190], [
+                ('SP', 2, 'Bamba Touré'), ('Zouan-Hounien', 1, 'Aya Koné'),
+            ]),
+            ('sous_prefecture', self.sous_prefecture, (7, 2, 1000, 250, 250), [140, 110], [
+                ('Centre', 2, 'Bamba Touré'), ('Centre sans inscrits', 0, None),
+            ]),
+            ('centre', self.centre, (5, 2, 1000, 250, 250), [140, 110], [
+                ('Bureau 01', 1, 'Aya Koné'), ('Bureau 02', 1, 'Bamba Touré'),
+                ('Bureau 03', 0, None), ('Bureau 04', 0, None), ('Bureau 05', 0, None),
+            ]),
+        ]
+        for niveau, objet, totaux, voix, lignes in cas:
+            with self.subTest(niveau=niveau):
+                contexte = rapports_pdf.contexte_rapport(niveau, rapports_pdf.objet_rapport(niveau, objet.pk))
+                self.assertEqual(contexte['nom'], objet.nom)
+                self.assertEqual(
+                    tuple(contexte['totaux'][champ] for champ in
+                          ('bureaux', 'bureaux_saisis', 'inscrits', 'votants', 'exprimes')),
+                    totaux
+                )
+                self.assertEqual(sorted((c['total_voix'] for c in contexte['candidats']), reverse=True), voix)
+                self.assertEqual(
+                    sorted((ligne['nom'], ligne['bureaux_saisis'], ligne['en_tete'] and ligne['en_tete']['nom'])
+                           for ligne in contexte['lignes']),
+                    lignes
+                )
+                self.assertEqual(sum(ligne['exprimes'] for ligne in contexte['lignes']), totaux[4])
+
+        contexte = rapports_pdf.contexte_rapport('centre', rapports_pdf.objet_rapport('centre', self.centre.pk))
+        self.assertEqual(contexte['parents'], ['Sous-préfecture de SP', 'Département de Danané'])
+
+    def test_repli_reportlab(self):
+        cache.clear()
+        with mock.patch.dict(rapports_pdf._ressources, {'disponible': False}):
+            self.assertEqual(rapports_pdf.moteur_pdf(), 'reportlab')
+            self.assertTrue(rapports_pdf.rapport_pdf('departement', self.departement).startswith(b'%PDF'))
+            with self.assertRaises(ValueError):
+                rapports_pdf.rapport_pdf('centre', self.centre)
+
+            self.client.force_login(self.admin)
+            response = self.client.get(reverse('export_resultats_pdf'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertTrue(response.content.startswith(b'%PDF'))
+
+            # Rapport par centre indisponible sans WeasyPrint : retour au tableau de bord
+            response = self.client.get(reverse('export_resultats_pdf'), {'niveau': 'centre', 'id': self.centre.pk})
+            self.assertRedirects(response, reverse('dashboard_general'), fetch_redirect_response=False)
@@ -7,8 +7,18 @@ urlpatterns = [
     path('deconnexion/', views.logout_view, name='logout'),
     path('saisie-resultat/', views.saisie_resultat, name='saisie_resultat'),
     path('dashboard-legacy/', views.dashboard_candidat, name='dashboard_candidat'),
+    path('dashboard-legacy/bureaux/', views.dashboard_candidat_bureaux, name='dashboard_candidat_bureaux'),
     path('bureau/<int:bureau_id>/', views.detail_bureau, name='detail_bureau'),
     path('dashboard/', views.dashboard_general, name='dashboard_general'),
+    path('dashboard/fragments/<str:section>/', views.dashboard_fragment, name='dashboard_fragment'),
+    path('api/dashboard/', views.api_dashboard, name='api_dashboard'),
+    path('api/projection/', views.api_projection, name='api_projection'),
+    path('api/resultats/flux/', views.api_flux_resultats, name='api_flux_resultats'),
+    path('api/changements/', views.api_changements, name='api_changements'),
+    path('api/audit/', views.api_audit, name='api_audit'),
+    path('api/historique/', views.api_historique, name='api_historique'),
+    path('api/historique/<uuid:identifiant>/', views.api_historique_instantane, name='api_historique_instantane'),
+    path('api/hierarchie/agregation/', views.api_agregation, name='api_agregation'),
 
     # API - IMPORTANT : Cette ligne doit être présente
     path('api/sous-prefecture/<int:sous_prefecture_id>/bureaux/',
@@ -17,6 +27,7 @@ urlpatterns = [
 
     path('export/excel/', views.export_resultats_excel, name='export_resultats_excel'),
     path('export/pdf/', views.export_resultats_pdf, name='export_resultats_pdf'),
+    path('export/photos/', views.export_photos_pv, name='export_photos_pv'),
 
 
     path('releve-horaire/ajouter/', views.ajouter_releve_horaire, name='ajouter_releve_horaire'),
@@ -24,4 +35,14 @@ urlpatterns = [
     path('suivi-participation/', views.suivi_participation, name='suivi_participation'),
     path('api/derniers-releves/', views.api_derniers_releves, name='api_derniers_releves'),
 
+    # Mode hors ligne (PWA)
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('manifest.webmanifest', views.manifest_pwa, name='manifest_pwa'),
+    path('api/synchronisation/', views.api_synchronisation, name='api_synchronisation'),
+
+    # Vérification des procès-verbaux
+    path('verification/', views.verification_pv, name='verification_pv'),
+    path('api/verification/lot/', views.api_verification_lot, name='api_verification_lot'),
+    path('api/verification/decisions/', views.api_verification_decisions, name='api_verification_decisions'),
+
 ]
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+File de vérification des procès-verbaux
+
+Chaque vérificateur réserve un lot de PV en attente. Une réservation est une
+ligne de ReservationVerification (unique par PV) avec une date d'expiration :
+deux vérificateurs ne reçoivent jamais le même PV, et le lot d'un vérificateur
+absent redevient disponible à l'expiration. Les décisions d'un lot sont
+appliquées en une seule transaction (bulk_update) et journalisées ensemble ;
+le cache des bureaux concernés est invalidé au commit.
+"""
+import copy
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache_resultats
+from .audit import journaliser_modification
+from .models import ProcesVerbal, ReservationVerification
+from .outbox import ENREGISTREMENT, publier_lot
+
+# Nombre d'essais de réservation quand d'autres vérificateurs prennent les mêmes PV
+ESSAIS_RESERVATION = 3
+
+# date_modification : bulk_update ne met pas à jour les champs auto_now (flux des changements)
+CHAMPS_DECISION = ['verifie', 'rejete', 'motif_rejet', 'verifie_par', 'date_verification', 'date_modification']
+
+
+def duree_reservation():
+    return timedelta(seconds=getattr(settings, 'VERIFICATION_LEASE_SECONDS', 600))
+
+
+def taille_lot_verification():
+    return getattr(settings, 'VERIFICATION_BATCH_SIZE', 20)
+
+
+def pv_en_attente():
+    """PV à vérifier : ni vérifiés ni rejetés, du plus ancien au plus récent"""
+    return ProcesVerbal.objects.filter(verifie=False, rejete=False).order_by('date_saisie', 'id')
+
+
+def _reservations_actives(verificateur, maintenant):
+    return ReservationVerification.objects.filter(verificateur=verificateur, expiration__gt=maintenant)
+
+
+def reserver_lot(verificateur, taille=None):
+    """
+    Réserve jusqu'à `taille` PV pour le vérificateur et prolonge ses réservations en cours
+
+    Les réservations encore valides du vérificateur sont conservées (rechargement
+    de la page), puis complétées avec des PV libres. Une réservation concurrente
+    sur le même PV échoue sur la contrainte d'unicité et est simplement ignorée.
+
+    Returns:
+        list: ProcesVerbal réservés, dans l'ordre de la file
+    """
+    taille = taille or taille_lot_verification()
+    maintenant = timezone.now()
+    expiration = maintenant + duree_reservation()
+
+    with transaction.atomic():
+        ReservationVerification.objects.filter(expiration__lte=maintenant).delete()
+        _reservations_actives(verificateur, maintenant).update(expiration=expiration)
+
+    for _ in range(ESSAIS_RESERVATION):
+        manquants = taille - _reservations_actives(verificateur, maintenant).count()
+        if manquants <= 0:
+            break
+
+        with transaction.atomic():
+            libres = pv_en_attente().filter(reservation__isnull=True)
+            if connection.features.has_select_for_update_skip_locked:
+                # PostgreSQL : les PV verrouillés par un autre vérificateur sont sautés
+                libres = libres.select_for_update(skip_locked=True, of=('self',))
+            ids = list(libres.values_list('id', flat=True)[:manquants])
+            if not ids:
+                break
+
+            ReservationVerification.objects.bulk_create(
+                [
+                    ReservationVerification(
+                        proces_verbal_id=pv_id,
+                        verificateur=verificateur,
+                        date_reservation=maintenant,
+                        expiration=expiration
+                    )
+                    for pv_id in ids
+                ],
+                ignore_conflicts=True
+            )
+
+    ids = _reservations_actives(verificateur, maintenant).values('proces_verbal_id')
+    return list(
+        ProcesVerbal.objects.filter(id__in=ids, verifie=False, rejete=False)
+        .select_related('bureau_vote__centre_vote__sous_prefecture', 'representant')
+        .prefetch_related('resultats__candidat', 'anomalies')
+        .order_by('date_saisie', 'id')[:taille]
+    )
+
+
+def liberer(verificateur, pv_ids=None):
+    """Rend au pool les réservations du vérificateur (toutes, ou celles des PV indiqués)"""
+    reservations = ReservationVerification.objects.filter(verificateur=verificateur)
+    if pv_ids is not None:
+        reservations = reservations.filter(proces_verbal_id__in=pv_ids)
+    return reservations.delete()[0]
+
+
+def appliquer_decisions(verificateur, decisions, request=None):
+    """
+    Applique un lot de décisions d'acceptation ou de rejet
+
+    Args:
+        verificateur: Utilisateur qui a réservé les PV
+        decisions: Liste de dicts {'pv_id': int, 'decision': 'accepter'|'rejeter', 'motif': str}
+        request: Requête d'origine, pour le journal d'audit
+
+    Returns:
+        tuple: (ids des PV traités, ids refusés car non réservés par ce vérificateur ou réservation expirée)
+    """
+    maintenant = timezone.now()
+    decisions = {int(decision['pv_id']): decision for decision in decisions}
+
+    with transaction.atomic():
+        reserves = set(
+            _reservations_actives(verificateur, maintenant)
+            .filter(proces_verbal_id__in=decisions)
+            .values_list('proces_verbal_id', flat=True)
+        )
+        pvs = list(ProcesVerbal.objects.select_for_update().filter(id__in=reserves))
+
+        anciens = []
+        for pv in pvs:
+            decision = decisions[pv.id]
+            anciens.append(copy.copy(pv))
+            pv.verifie = decision['decision'] == 'accepter'
+            pv.rejete = not pv.verifie
+            pv.motif_rejet = '' if pv.verifie else (decision.get('motif') or '').strip()
+            pv.verifie_par = verificateur
+            pv.date_verification = maintenant
+            pv.date_modification = maintenant
+
+        ProcesVerbal.objects.bulk_update(pvs, CHAMPS_DECISION)
+        publier_lot([('pv', pv.id, pv.bureau_vote_id, ENREGISTREMENT) for pv in pvs])
+        # bulk_update n'envoie pas post_save : versions du cache incrémentées après le commit
+        for bureau_id in {pv.bureau_vote_id for pv in pvs}:
+            cache_resultats.invalider_bureau(bureau_id)
+        ReservationVerification.objects.filter(proces_verbal_id__in=reserves).delete()
+
+        for ancien, pv in zip(anciens, pvs):
+            journaliser_modification(verificateur, ancien, pv, request)
+
+    traites = [pv.id for pv in pvs]
+    refuses = [pv_id for pv_id in decisions if pv_id not in reserves]
+    return traites, refuses
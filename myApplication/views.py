@@ -1,16 +1,40 @@
+import hashlib
+import json
+import logging
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Count, Q, F, Avg
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Sum, Count, Q, F, Avg, Case, When, Value, FloatField, ExpressionWrapper
 from django.forms import formset_factory
 from django.db import transaction
-from django.http import HttpResponse, JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import get_template
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.urls import reverse
+from django.utils.http import quote_etag
 from .models import (
     ProcesVerbal, ResultatCandidat, BureauVote,
-    CentreVote, SousPrefecture, User, Departement
+    CentreVote, SousPrefecture, User, Departement, HistoriqueResultats, NoeudHierarchie
 )
 from .forms import LoginForm, ProcesVerbalForm, ResultatCandidatForm, ResultatCandidatFormSet
+from .matrice_resultats import get_matrice
+from .projections import projeter_en_cache
+from .anomalies import anomalies_ouvertes
+from .archives_audit import rechercher_audit
+from .archive_photos import flux_archive, selection
+from . import arbre, changements, flux_resultats, historique
+from .compteurs import get_compteurs
+from .cache_resultats import GLOBAL, en_cache, en_cache_partage
+from .rapports_pdf import NIVEAUX_RAPPORT, moteur_pdf, objet_rapport, rapport_pdf
+from .services import enregistrer_proces_verbal, enregistrer_releve
+
+logger = logging.getLogger(__name__)
 
 
 # ========================================
@@ -18,15 +42,8 @@ from .forms import LoginForm, ProcesVerbalForm, ResultatCandidatForm, ResultatCa
 # ========================================
 
 def home(request):
-    """Page d'accueil"""
-    context = {
-        'total_bureaux': BureauVote.objects.count(),
-        'total_centres': CentreVote.objects.count(),
-        'total_sous_prefectures': SousPrefecture.objects.count(),
-        'resultats_saisis': ProcesVerbal.objects.count(),
-        'total_candidats': User.objects.filter(role='candidat').count(),
-    }
-    return render(request, "home.html", context)
+    """Page d'accueil (compteurs servis depuis le cache)"""
+    return render(request, "home.html", get_compteurs())
 
 
 def login_view(request):
@@ -140,39 +157,23 @@ def saisie_resultat(request):
 
         if pv_form.is_valid() and resultat_formset.is_valid():
             try:
-                with transaction.atomic():
-                    # Mettre à jour le nombre d'inscrits du bureau
-                    bureau.nombre_inscrits = nombre_inscrits_saisi
-                    bureau.save()
-
-                    # Sauvegarder le PV
-                    pv = pv_form.save(commit=False)
-                    pv.bureau_vote = bureau
-                    pv.representant = request.user
-                    pv.save()
-
-                    # Supprimer les anciens résultats
-                    ResultatCandidat.objects.filter(proces_verbal=pv).delete()
-
-                    # Sauvegarder les résultats des candidats
-                    for i, (form, candidat) in enumerate(zip(resultat_formset.forms, candidats)):
-                        if form.is_valid() and form.cleaned_data:
-                            nombre_voix = form.cleaned_data.get('nombre_voix', 0)
-                            if nombre_voix is None:
-                                nombre_voix = 0
-                            ResultatCandidat.objects.create(
-                                proces_verbal=pv,
-                                candidat=candidat,
-                                nombre_voix=nombre_voix
-                            )
-
-                    action = "mis à jour" if pv_existant else "enregistré"
-                    messages.success(
-                        request,
-                        f'✅ Procès-verbal {action} avec succès ! '
-                        f'{nombre_inscrits_saisi} inscrits, {pv.nombre_votants} votants, {pv.suffrages_exprimes} suffrages exprimés.'
-                    )
-                    return redirect('saisie_resultat')
+                # Résultats des candidats dans l'ordre du formset
+                voix_candidats = [
+                    (candidat, form.cleaned_data.get('nombre_voix', 0))
+                    for form, candidat in zip(resultat_formset.forms, candidats)
+                    if form.cleaned_data
+                ]
+                pv = enregistrer_proces_verbal(
+                    bureau, request.user, pv_form, nombre_inscrits_saisi, voix_candidats, request=request
+                )
+
+                action = "mis à jour" if pv_existant else "enregistré"
+                messages.success(
+                    request,
+                    f'✅ Procès-verbal {action} avec succès ! '
+                    f'{nombre_inscrits_saisi} inscrits, {pv.nombre_votants} votants, {pv.suffrages_exprimes} suffrages exprimés.'
+                )
+                return redirect('saisie_resultat')
 
             except Exception as e:
                 messages.error(request, f'Erreur lors de la sauvegarde : {str(e)}')
@@ -234,6 +235,19 @@ def saisie_resultat(request):
     return render(request, 'saisie_resultat.html', context)
 
 
+def _pourcentage_sql(voix, exprimes):
+    """Pourcentage voix / suffrages exprimés calculé en SQL (0 si aucun suffrage)"""
+    return Case(
+        When(**{exprimes: 0}, then=Value(0.0)),
+        default=ExpressionWrapper(F(voix) * 100.0 / F(exprimes), output_field=FloatField()),
+        output_field=FloatField()
+    )
+
+
+# Nombre de bureaux par page dans le détail du tableau de bord candidat
+BUREAUX_PAR_PAGE = 48
+
+
 @login_required
 def dashboard_candidat(request):
     """Tableau de bord pour un candidat - Vue de ses résultats"""
@@ -241,87 +255,64 @@ def dashboard_candidat(request):
         messages.error(request, 'Accès non autorisé. Cette page est réservée aux candidats.')
         return redirect('home')
 
-    candidat = request.user
-
-    # Récupérer tous les résultats du candidat
-    resultats = ResultatCandidat.objects.filter(
-        candidat=candidat
-    ).select_related(
-        'proces_verbal',
-        'proces_verbal__bureau_vote',
-        'proces_verbal__bureau_vote__centre_vote',
-        'proces_verbal__bureau_vote__centre_vote__sous_prefecture',
-        'proces_verbal__bureau_vote__centre_vote__sous_prefecture__departement'
-    ).order_by(
-        'proces_verbal__bureau_vote__centre_vote__sous_prefecture__nom',
-        'proces_verbal__bureau_vote__centre_vote__nom',
-        'proces_verbal__bureau_vote__numero'
+    # Statistiques recalculées seulement quand un résultat a changé (version globale)
+    context = en_cache(
+        'dashboard_candidat', [GLOBAL], lambda: _statistiques_candidat(request.user), candidat=request.user.pk
     )
+    return render(request, 'dashboard_candidat.html', {'candidat': request.user, **context})
 
-    # Statistiques globales
-    total_voix = resultats.aggregate(Sum('nombre_voix'))['nombre_voix__sum'] or 0
-    total_bureaux_avec_resultats = resultats.count()
-    total_bureaux = BureauVote.objects.count()
 
-    # Calculer le total des suffrages exprimés
-    pvs = ProcesVerbal.objects.filter(
-        resultats__candidat=candidat
-    ).distinct()
+def _statistiques_candidat(candidat):
+    """Statistiques du tableau de bord d'un candidat"""
+    resultats = ResultatCandidat.objects.filter(candidat=candidat)
 
-    total_suffrages_exprimes = pvs.aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-    total_votants = pvs.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0
-    total_inscrits = sum([pv.bureau_vote.nombre_inscrits for pv in pvs])
+    # Statistiques globales : un seul résultat par PV pour un candidat, les sommes sont donc exactes
+    totaux = resultats.aggregate(
+        total_voix=Sum('nombre_voix'),
+        total_bureaux_avec_resultats=Count('id'),
+        total_suffrages_exprimes=Sum('proces_verbal__suffrages_exprimes'),
+        total_votants=Sum('proces_verbal__nombre_votants'),
+        total_inscrits=Sum('proces_verbal__bureau_vote__nombre_inscrits'),
+    )
+    total_voix = totaux['total_voix'] or 0
+    total_bureaux_avec_resultats = totaux['total_bureaux_avec_resultats']
+    total_suffrages_exprimes = totaux['total_suffrages_exprimes'] or 0
+    total_votants = totaux['total_votants'] or 0
+    total_inscrits = totaux['total_inscrits'] or 0
+    total_bureaux = BureauVote.objects.count()
 
     # Calculs des taux
     taux_couverture = (total_bureaux_avec_resultats / total_bureaux * 100) if total_bureaux > 0 else 0
     pourcentage_voix = (total_voix / total_suffrages_exprimes * 100) if total_suffrages_exprimes > 0 else 0
     taux_participation = (total_votants / total_inscrits * 100) if total_inscrits > 0 else 0
 
-    # Statistiques par sous-préfecture
-    stats_sous_prefecture = {}
-    for resultat in resultats:
-        sous_pref = resultat.proces_verbal.bureau_vote.centre_vote.sous_prefecture
-        if sous_pref.id not in stats_sous_prefecture:
-            stats_sous_prefecture[sous_pref.id] = {
-                'nom': sous_pref.nom,
-                'departement': sous_pref.departement.nom,
-                'total_voix': 0,
-                'nombre_bureaux': 0,
-                'suffrages_exprimes': 0,
-            }
-        stats_sous_prefecture[sous_pref.id]['total_voix'] += resultat.nombre_voix
-        stats_sous_prefecture[sous_pref.id]['nombre_bureaux'] += 1
-        stats_sous_prefecture[sous_pref.id]['suffrages_exprimes'] += resultat.proces_verbal.suffrages_exprimes
-
-    # Ajouter le pourcentage par sous-préfecture
-    for sp_id in stats_sous_prefecture:
-        sp = stats_sous_prefecture[sp_id]
-        sp['pourcentage'] = (sp['total_voix'] / sp['suffrages_exprimes'] * 100) if sp['suffrages_exprimes'] > 0 else 0
+    # Statistiques par sous-préfecture (GROUP BY sur la clé dénormalisée du résultat)
+    stats_sous_prefecture = resultats.values(
+        'sous_prefecture_id',
+        nom=F('sous_prefecture__nom'),
+        departement_nom=F('departement__nom'),
+    ).annotate(
+        total_voix=Sum('nombre_voix'),
+        nombre_bureaux=Count('id'),
+        suffrages_exprimes=Sum('proces_verbal__suffrages_exprimes'),
+    ).annotate(
+        pourcentage=_pourcentage_sql('total_voix', 'suffrages_exprimes')
+    ).order_by('-total_voix', 'nom')
 
     # Statistiques par centre de vote (Top 10)
-    stats_centre = {}
-    for resultat in resultats:
-        centre = resultat.proces_verbal.bureau_vote.centre_vote
-        if centre.id not in stats_centre:
-            stats_centre[centre.id] = {
-                'nom': centre.nom,
-                'sous_prefecture': centre.sous_prefecture.nom,
-                'total_voix': 0,
-                'nombre_bureaux': 0,
-                'suffrages_exprimes': 0,
-            }
-        stats_centre[centre.id]['total_voix'] += resultat.nombre_voix
-        stats_centre[centre.id]['nombre_bureaux'] += 1
-        stats_centre[centre.id]['suffrages_exprimes'] += resultat.proces_verbal.suffrages_exprimes
-
-    # Ajouter le pourcentage par centre
-    for c_id in stats_centre:
-        c = stats_centre[c_id]
-        c['pourcentage'] = (c['total_voix'] / c['suffrages_exprimes'] * 100) if c['suffrages_exprimes'] > 0 else 0
-
-    context = {
-        'candidat': candidat,
-        'resultats': resultats,
+    stats_centre = resultats.values(
+        centre_id=F('centre_vote'),
+        nom=F('centre_vote__nom'),
+        sous_prefecture_nom=F('sous_prefecture__nom'),
+    ).annotate(
+        total_voix=Sum('nombre_voix'),
+        nombre_bureaux=Count('id'),
+        suffrages_exprimes=Sum('proces_verbal__suffrages_exprimes'),
+    ).annotate(
+        pourcentage=_pourcentage_sql('total_voix', 'suffrages_exprimes')
+    ).order_by('-total_voix', 'nom')[:10]
+
+    return {
         'total_voix': total_voix,
         'total_suffrages_exprimes': total_suffrages_exprimes,
         'total_votants': total_votants,
@@ -331,11 +322,39 @@ def dashboard_candidat(request):
         'taux_couverture': round(taux_couverture, 2),
         'pourcentage_voix': round(pourcentage_voix, 2),
         'taux_participation': round(taux_participation, 2),
-        'stats_sous_prefecture': sorted(stats_sous_prefecture.values(), key=lambda x: x['total_voix'], reverse=True),
-        'stats_centre': sorted(stats_centre.values(), key=lambda x: x['total_voix'], reverse=True)[:10],
+        'stats_sous_prefecture': list(stats_sous_prefecture),
+        'stats_centre': list(stats_centre),
     }
 
-    return render(request, 'dashboard_candidat.html', context)
+
+@login_required
+def dashboard_candidat_bureaux(request):
+    """Page du détail par bureau du tableau de bord candidat, chargée à la demande"""
+    if request.user.role != 'candidat':
+        return JsonResponse({'error': 'Accès non autorisé'}, status=403)
+
+    resultats = ResultatCandidat.objects.filter(
+        candidat=request.user
+    ).select_related(
+        'proces_verbal__bureau_vote__centre_vote__sous_prefecture__departement'
+    ).only(
+        'nombre_voix',
+        'proces_verbal__suffrages_exprimes', 'proces_verbal__verifie', 'proces_verbal__photo_pv',
+        'proces_verbal__bureau_vote__numero',
+        'proces_verbal__bureau_vote__centre_vote__nom',
+        'proces_verbal__bureau_vote__centre_vote__sous_prefecture__nom',
+        'proces_verbal__bureau_vote__centre_vote__sous_prefecture__departement__nom',
+    ).annotate(
+        pourcentage=_pourcentage_sql('nombre_voix', 'proces_verbal__suffrages_exprimes')
+    ).order_by(
+        'proces_verbal__bureau_vote__centre_vote__sous_prefecture__nom',
+        'proces_verbal__bureau_vote__centre_vote__nom',
+        'proces_verbal__bureau_vote__numero',
+        'id'
+    )
+
+    page = Paginator(resultats, BUREAUX_PAR_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'dashboard_candidat_bureaux.html', {'page': page})
 
 
 @login_required
@@ -368,104 +387,198 @@ def detail_bureau(request, bureau_id):
 # NOUVELLES VUES - DASHBOARD GÉNÉRAL
 # ========================================
 
+def _departement_suivi():
+    """Département de Danané, à défaut le premier département (None si aucun)"""
+    try:
+        return Departement.objects.get(nom__iexact='Danané')
+    except Departement.DoesNotExist:
+        return Departement.objects.first()
+
+
+def _projection_dashboard(matrice, departement, bureaux_saisis, bureaux_restants):
+    """Projection du résultat final, seulement pendant le dépouillement (None si elle échoue)"""
+    if not bureaux_saisis or not bureaux_restants:
+        return None
+    try:
+        projection = projeter_en_cache(matrice, departement.id)
+    except (ArithmeticError, ValueError):
+        # Données dégénérées (numpy.linalg.LinAlgError dérive de ValueError) : le
+        # tableau de bord reste servi, sans projection
+        logger.exception("Projection impossible pour le département %s", departement.id)
+        return None
+    for candidat in projection['candidats']:
+        candidat['get_full_name'] = f"{candidat['first_name']} {candidat['last_name']}".strip()
+    return projection
+
+
+# Sections du tableau de bord général rafraîchies séparément : champs de _donnees_dashboard
+# rendus par le fragment dashboard_general_<section>.html
+SECTIONS_DASHBOARD = {
+    'progression': ('total_bureaux', 'bureaux_saisis', 'bureaux_restants', 'taux_saisie'),
+    'classement': ('classement', 'total_suffrages_exprimes'),
+    'projection': ('projection',),
+    'participation': (
+        'participation_sp', 'total_inscrits', 'total_votants', 'total_nuls', 'total_blancs',
+        'total_suffrages_exprimes', 'taux_participation_global',
+    ),
+}
+
+
+def _empreinte(valeur):
+    """Empreinte courte d'une valeur sérialisable en JSON (ETag, version d'une section)"""
+    contenu = json.dumps(valeur, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha1(contenu.encode()).hexdigest()[:16]
+
+
+def _reponse_conditionnelle(request, empreinte, construire):
+    """
+    Réponse 304 si le client a déjà cette version (If-None-Match), sinon construire()
+
+    Le client garde la réponse mais la revalide à chaque chargement (no-cache).
+    """
+    etag = quote_etag(empreinte)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = construire()
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def _tableau_de_bord():
+    """Département suivi, chiffres du tableau de bord et indicateur de chiffres périmés"""
+    danane = _departement_suivi()
+    if not danane:
+        return None, None, False
+    # Un seul worker recalcule après une saisie, les autres servent les chiffres précédents
+    donnees, perimees = en_cache_partage(
+        'dashboard_general', [('departement', danane.id)], lambda: _donnees_dashboard(danane)
+    )
+    return danane, donnees, perimees
+
+
 @login_required
 def dashboard_general(request):
-    """Dashboard général avec tous les résultats du département de Danané"""
+    """
+    Coquille du tableau de bord général (Danané), sans aucun chiffre
+
+    Les sections sont chargées par api_dashboard et dashboard_fragment, puis
+    rafraîchies une à une quand leur empreinte change. La coquille ne dépend que
+    du gabarit et de l'utilisateur : un rechargement est revalidé en 304.
+    """
+    if not _departement_suivi():
+        messages.error(request, "Aucun département trouvé dans le système.")
+        return redirect('home')
 
-    # Filtrer sur le département de Danané
-    try:
-        danane = Departement.objects.get(nom__iexact='Danané')
-    except Departement.DoesNotExist:
-        # Si le département n'existe pas, prendre le premier ou tous
-        danane = Departement.objects.first()
-        if not danane:
-            messages.error(request, "Aucun département trouvé dans le système.")
-            return redirect('home')
+    context = {'rafraichissement': getattr(settings, 'DASHBOARD_RAFRAICHISSEMENT', 30)}
 
-    # Statistiques globales
-    total_bureaux = BureauVote.objects.filter(
-        centre_vote__sous_prefecture__departement=danane
-    ).count()
+    def construire():
+        return render(request, 'dashboard_general.html', context)
 
-    bureaux_saisis = ProcesVerbal.objects.filter(
-        bureau_vote__centre_vote__sous_prefecture__departement=danane
-    ).count()
+    if len(messages.get_messages(request)):
+        # Messages à afficher une seule fois : la coquille est rendue sans validation
+        return construire()
 
+    user = request.user
+    empreinte = _empreinte([
+        get_template('dashboard_general.html').template.source, context,
+        user.pk, user.get_full_name(), user.role, user.is_staff,
+    ])
+    return _reponse_conditionnelle(request, empreinte, construire)
+
+
+@login_required
+def api_dashboard(request):
+    """Empreinte de chaque section du tableau de bord général et données du graphique"""
+    danane, donnees, perimees = _tableau_de_bord()
+    if danane is None:
+        return JsonResponse({'error': 'Aucun département trouvé'}, status=404)
+
+    sections = dict(donnees['empreintes'])
+    if request.user.is_staff:
+        sections['anomalies'] = _empreinte(anomalies_ouvertes(danane.id))
+    data = {
+        'perimees': perimees,
+        'sections': sections,
+        'graphique': {
+            'libelles': [' '.join(candidat['get_full_name'].split()[:2]) for candidat in donnees['classement']],
+            'voix': [candidat['total_voix'] or 0 for candidat in donnees['classement']],
+        },
+    }
+    return _reponse_conditionnelle(request, _empreinte(data), lambda: JsonResponse(data))
+
+
+@login_required
+def dashboard_fragment(request, section):
+    """Fragment HTML d'une section du tableau de bord général"""
+    if section not in SECTIONS_DASHBOARD and not (section == 'anomalies' and request.user.is_staff):
+        raise Http404("Section inconnue")
+    danane, donnees, _ = _tableau_de_bord()
+    if danane is None:
+        raise Http404("Aucun département trouvé")
+
+    if section == 'anomalies':
+        context = {'anomalies': anomalies_ouvertes(danane.id)}
+        empreinte = _empreinte(context['anomalies'])
+    else:
+        context = {champ: donnees[champ] for champ in SECTIONS_DASHBOARD[section]}
+        empreinte = donnees['empreintes'][section]
+    return _reponse_conditionnelle(
+        request, empreinte, lambda: render(request, f'dashboard_general_{section}.html', context)
+    )
+
+
+def _donnees_dashboard(danane):
+    """Chiffres du tableau de bord général (hors éléments propres à l'utilisateur)"""
+    # Tous les chiffres proviennent de la matrice des résultats en mémoire
+    matrice = get_matrice(a_jour=True)
+    masque = matrice.masque(departement_id=danane.id)
+    totaux = matrice.totaux(masque)
+
+    # Statistiques globales
+    total_bureaux = totaux['bureaux']
+    bureaux_saisis = totaux['bureaux_saisis']
     bureaux_restants = total_bureaux - bureaux_saisis
     taux_saisie = (bureaux_saisis / total_bureaux * 100) if total_bureaux > 0 else 0
+    total_suffrages_exprimes = totaux['exprimes']
 
     # Classement des candidats
-    candidats = User.objects.filter(role='candidat').annotate(
-        total_voix=Sum('resultats_obtenus__nombre_voix', filter=Q(
-            resultats_obtenus__proces_verbal__bureau_vote__centre_vote__sous_prefecture__departement=danane
-        )),
-        nombre_bureaux=Count('resultats_obtenus', filter=Q(
-            resultats_obtenus__proces_verbal__bureau_vote__centre_vote__sous_prefecture__departement=danane
-        ))
-    ).order_by('-total_voix')
-
-    # Calculer le total des suffrages exprimés
-    total_suffrages_exprimes = ProcesVerbal.objects.filter(
-        bureau_vote__centre_vote__sous_prefecture__departement=danane
-    ).aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-
-    # Ajouter le pourcentage à chaque candidat
-    classement = []
-    for candidat in candidats:
-        classement.append({
-            'numero_candidat': candidat.numero_candidat,
-            'get_full_name': candidat.get_full_name(),
-            'parti_politique': candidat.parti_politique,
-            'total_voix': candidat.total_voix or 0,
-            'nombre_bureaux': candidat.nombre_bureaux or 0,
-            'pourcentage': (candidat.total_voix / total_suffrages_exprimes * 100) if total_suffrages_exprimes > 0 and candidat.total_voix else 0
-        })
+    classement = [
+        {
+            'numero_candidat': candidat['numero_candidat'],
+            'get_full_name': f"{candidat['first_name']} {candidat['last_name']}".strip(),
+            'parti_politique': candidat['parti_politique'],
+            'total_voix': candidat['total_voix'],
+            'nombre_bureaux': candidat['nombre_bureaux'],
+            'pourcentage': candidat['pourcentage'],
+        }
+        for candidat in matrice.classement(masque)
+    ]
 
     # Participation par sous-préfecture
+    cumul = matrice.cumul('sous_prefecture', masque)
+    rangs = {int(sp_id): i for i, sp_id in enumerate(cumul['ids'])}
     participation_sp = []
+    colonnes = ('inscrits', 'votants', 'nuls', 'blancs', 'exprimes')
     for sp in SousPrefecture.objects.filter(departement=danane):
-        bureaux_sp = BureauVote.objects.filter(centre_vote__sous_prefecture=sp)
-        pvs_sp = ProcesVerbal.objects.filter(bureau_vote__in=bureaux_sp)
-
-        total_inscrits = bureaux_sp.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0
-        total_votants = pvs_sp.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0
-        total_nuls = pvs_sp.aggregate(Sum('bulletins_nuls'))['bulletins_nuls__sum'] or 0
-        total_blancs = pvs_sp.aggregate(Sum('bulletins_blancs'))['bulletins_blancs__sum'] or 0
-        total_exprimes = pvs_sp.aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-
-        taux_participation = (total_votants / total_inscrits * 100) if total_inscrits > 0 else 0
+        i = rangs.get(sp.id)
+        if i is None:
+            # Sous-préfecture créée depuis le chargement de la matrice : aucun bureau
+            chiffres = dict.fromkeys(colonnes, 0)
+            taux_participation = 0
+        else:
+            chiffres = {colonne: int(cumul[colonne][i]) for colonne in colonnes}
+            taux_participation = round(float(cumul['taux_participation'][i]), 2)
 
         participation_sp.append({
             'id': sp.id,
             'nom': sp.nom,
-            'total_inscrits': total_inscrits,
-            'total_votants': total_votants,
-            'total_nuls': total_nuls,
-            'total_blancs': total_blancs,
-            'total_exprimes': total_exprimes,
-            'taux_participation': round(taux_participation, 2)
+            **{f'total_{colonne}': valeur for colonne, valeur in chiffres.items()},
+            'taux_participation': taux_participation
         })
 
-    # Totaux départementaux
-    total_inscrits = BureauVote.objects.filter(
-        centre_vote__sous_prefecture__departement=danane
-    ).aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0
-
-    total_votants = ProcesVerbal.objects.filter(
-        bureau_vote__centre_vote__sous_prefecture__departement=danane
-    ).aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0
-
-    total_nuls = ProcesVerbal.objects.filter(
-        bureau_vote__centre_vote__sous_prefecture__departement=danane
-    ).aggregate(Sum('bulletins_nuls'))['bulletins_nuls__sum'] or 0
-
-    total_blancs = ProcesVerbal.objects.filter(
-        bureau_vote__centre_vote__sous_prefecture__departement=danane
-    ).aggregate(Sum('bulletins_blancs'))['bulletins_blancs__sum'] or 0
-
-    taux_participation_global = (total_votants / total_inscrits * 100) if total_inscrits > 0 else 0
-
-    context = {
+    donnees = {
         'total_bureaux': total_bureaux,
         'bureaux_saisis': bureaux_saisis,
         'bureaux_restants': bureaux_restants,
@@ -473,14 +586,33 @@ def dashboard_general(request):
         'classement': classement,
         'total_suffrages_exprimes': total_suffrages_exprimes,
         'participation_sp': participation_sp,
-        'total_inscrits': total_inscrits,
-        'total_votants': total_votants,
-        'total_nuls': total_nuls,
-        'total_blancs': total_blancs,
-        'taux_participation_global': round(taux_participation_global, 2),
+        'total_inscrits': totaux['inscrits'],
+        'total_votants': totaux['votants'],
+        'total_nuls': totaux['nuls'],
+        'total_blancs': totaux['blancs'],
+        'taux_participation_global': round(totaux['taux_participation'], 2),
+        'projection': _projection_dashboard(matrice, danane, bureaux_saisis, bureaux_restants),
     }
+    donnees['empreintes'] = {
+        section: _empreinte({champ: donnees[champ] for champ in champs})
+        for section, champs in SECTIONS_DASHBOARD.items()
+    }
+    return donnees
 
-    return render(request, 'dashboard_general.html', context)
+
+@login_required
+def api_projection(request):
+    """API de la projection du résultat final (rafraîchie après chaque PV saisi)"""
+    danane = _departement_suivi()
+    if not danane:
+        return JsonResponse({'success': False, 'error': 'Aucun département'}, status=404)
+
+    matrice = get_matrice()
+    totaux = matrice.totaux(matrice.masque(departement_id=danane.id))
+    projection = _projection_dashboard(
+        matrice, danane, totaux['bureaux_saisis'], totaux['bureaux'] - totaux['bureaux_saisis']
+    )
+    return JsonResponse({'success': True, 'projection': projection})
 
 
 # ========================================
@@ -492,16 +624,32 @@ def export_resultats_excel(request):
     """Export Excel des résultats complets"""
     try:
         import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
     except ImportError:
         messages.error(request, "La bibliothèque openpyxl n'est pas installée.")
         return redirect('dashboard_general')
 
     # Filtrer sur Danané
-    try:
-        danane = Departement.objects.get(nom__iexact='Danané')
-    except Departement.DoesNotExist:
-        danane = Departement.objects.first()
+    danane = _departement_suivi()
+
+    # Fichier en cache tant qu'aucun résultat du département n'a changé
+    contenu = en_cache(
+        'export_resultats_excel', [('departement', danane.id if danane else 0)],
+        lambda: _classeur_resultats(danane)
+    )
+
+    response = HttpResponse(
+        contenu,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = 'attachment; filename=resultats_danane.xlsx'
+    return response
+
+
+def _classeur_resultats(danane):
+    """Classeur Excel des résultats du département, en octets"""
+    import openpyxl
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    from io import BytesIO
 
     # Créer le workbook
     wb = openpyxl.Workbook()
@@ -542,7 +690,7 @@ def export_resultats_excel(request):
     for pv in ProcesVerbal.objects.select_related(
             'bureau_vote__centre_vote__sous_prefecture'
     ).filter(
-        bureau_vote__centre_vote__sous_prefecture__departement=danane
+        departement=danane
     ).order_by(
         'bureau_vote__centre_vote__sous_prefecture__nom',
         'bureau_vote__centre_vote__nom',
@@ -587,400 +735,343 @@ def export_resultats_excel(request):
         adjusted_width = min(max_length + 2, 50)
         ws.column_dimensions[column_letter].width = adjusted_width
 
-    # Préparer la réponse
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=resultats_danane.xlsx'
-    wb.save(response)
-
-    return response
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
 
 
 @login_required
 def export_resultats_pdf(request):
-    """Export PDF des résultats - Version universelle avec ReportLab"""
+    """
+    Export PDF des résultats
+
+    Département suivi par défaut ; ?niveau=sous_prefecture&id=... ou
+    ?niveau=centre&id=... pour le rapport d'une sous-préfecture ou d'un centre.
+    """
+    moteur = moteur_pdf()
+    if moteur == 'reportlab':
+        # Vérifier que ReportLab est installé
+        try:
+            import reportlab
+        except ImportError:
+            messages.error(
+                request,
+                "La bibliothèque ReportLab n'est pas installée. "
+                "Installez-la avec : pip install reportlab"
+            )
+            return redirect('dashboard_general')
 
-    # Vérifier que ReportLab est installé
+    niveau = request.GET.get('niveau', 'departement')
+    if niveau not in NIVEAUX_RAPPORT:
+        messages.error(request, "Niveau de rapport inconnu.")
+        return redirect('dashboard_general')
+    if niveau == 'departement' and not request.GET.get('id'):
+        # Filtrer sur Danané
+        objet = _departement_suivi()
+    else:
+        try:
+            objet = objet_rapport(niveau, int(request.GET.get('id', '')))
+        except ValueError:
+            objet = None
+    if not objet:
+        messages.error(request, f"{NIVEAUX_RAPPORT[niveau][1]} introuvable.")
+        return redirect('dashboard_general')
+    if niveau != 'departement' and moteur != 'weasyprint':
+        messages.error(request, "Les rapports par sous-préfecture et par centre nécessitent WeasyPrint.")
+        return redirect('dashboard_general')
+
+    # Un seul worker génère le document après une saisie, les autres servent le précédent
     try:
-        from reportlab.lib.pagesizes import A4, letter
-        from reportlab.lib import colors
-        from reportlab.lib.units import cm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-    except ImportError:
-        messages.error(
-            request,
-            "La bibliothèque ReportLab n'est pas installée. "
-            "Installez-la avec : pip install reportlab"
+        contenu, perime = en_cache_partage(
+            'export_resultats_pdf', [(niveau, objet.id)], lambda: rapport_pdf(niveau, objet), moteur=moteur
         )
+    except Exception as e:
+        messages.error(request, f"Erreur lors de la génération du PDF : {str(e)}")
         return redirect('dashboard_general')
 
-    from io import BytesIO
-    from datetime import datetime
-
-    # Filtrer sur Danané
-    try:
-        danane = Departement.objects.get(nom__iexact='Danané')
-    except Departement.DoesNotExist:
-        danane = Departement.objects.first()
-        if not danane:
-            messages.error(request, "Aucun département trouvé.")
-            return redirect('dashboard_general')
+    # Préparer la réponse HTTP
+    response = HttpResponse(contenu, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="resultats_{objet.nom.lower().replace(" ", "_")}.pdf"'
+    if perime:
+        response['X-Donnees-Perimees'] = '1'
 
-    # Récupérer les données des candidats
-    candidats = User.objects.filter(role='candidat').annotate(
-        total_voix=Sum('resultats_obtenus__nombre_voix', filter=Q(
-            resultats_obtenus__proces_verbal__bureau_vote__centre_vote__sous_prefecture__departement=danane
-        )),
-        nombre_bureaux=Count('resultats_obtenus', filter=Q(
-            resultats_obtenus__proces_verbal__bureau_vote__centre_vote__sous_prefecture__departement=danane
-        ))
-    ).order_by('-total_voix')
-
-    # Calculer le total des suffrages exprimés
-    total_suffrages_exprimes = ProcesVerbal.objects.filter(
-        bureau_vote__centre_vote__sous_prefecture__departement=danane
-    ).aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-
-    # Créer le buffer pour le PDF
-    buffer = BytesIO()
+    return response
 
-    # Créer le document PDF
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=2*cm,
-        leftMargin=2*cm,
-        topMargin=2*cm,
-        bottomMargin=2*cm,
-        title=f"Résultats Électoraux - {danane.nom}",
-        author="Système de Gestion Électorale"
-    )
 
-    # Container pour les éléments du PDF
-    elements = []
+@login_required
+def export_photos_pv(request):
+    """
+    Archive ZIP des photos de PV avec manifeste, envoyée en flux (réservée au personnel)
+
+    Filtres : ?departement=<id>, ?sous_prefecture=<id>, ?verifie=1 ou 0.
+    """
+    if not request.user.is_staff:
+        messages.error(request, 'Accès non autorisé. Cet export est réservé au personnel.')
+        return redirect('home')
 
-    # Styles
-    styles = getSampleStyleSheet()
-
-    # Style pour le titre principal
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#FF8C00'),
-        spaceAfter=10,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
+    try:
+        departement = int(request.GET['departement']) if request.GET.get('departement') else None
+        sous_prefecture = int(request.GET['sous_prefecture']) if request.GET.get('sous_prefecture') else None
+    except ValueError:
+        messages.error(request, "Filtre de l'export des photos invalide.")
+        return redirect('dashboard_general')
+    verifie = {'1': True, '0': False}.get(request.GET.get('verifie'))
 
-    # Style pour le sous-titre
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#666666'),
-        spaceAfter=5,
-        alignment=TA_CENTER,
-        fontName='Helvetica'
+    response = StreamingHttpResponse(
+        flux_archive(selection(departement, sous_prefecture, verifie)), content_type='application/zip'
     )
+    response['Content-Disposition'] = 'attachment; filename="photos_pv.zip"'
+    return response
 
-    # Style pour les infos
-    info_style = ParagraphStyle(
-        'InfoStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#999999'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica'
-    )
 
-    # Style pour le footer
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.HexColor('#999999'),
-        alignment=TA_CENTER,
-        fontName='Helvetica'
+@login_required
+def api_flux_resultats(request):
+    """
+    Résultats par bureau en flux, pour les traitements automatiques
+
+    ?format=ndjson (défaut), csv ou npz ; ?departement=<id> (département
+    suivi par défaut) ou ?sous_prefecture=<id>.
+    """
+    format_sortie = request.GET.get('format', 'ndjson')
+    if format_sortie not in flux_resultats.FORMATS:
+        return JsonResponse(
+            {'success': False, 'error': f"Format inconnu (attendu : {', '.join(flux_resultats.FORMATS)})"},
+            status=400
+        )
+    try:
+        departement = int(request.GET['departement']) if request.GET.get('departement') else None
+        sous_prefecture = int(request.GET['sous_prefecture']) if request.GET.get('sous_prefecture') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Identifiant invalide'}, status=400)
+    if departement is None and sous_prefecture is None:
+        danane = _departement_suivi()
+        departement = danane.id if danane else None
+
+    response = StreamingHttpResponse(
+        flux_resultats.flux(format_sortie, flux_resultats.selection(departement, sous_prefecture)),
+        content_type=flux_resultats.FORMATS[format_sortie]
     )
+    response['Content-Disposition'] = f'attachment; filename="resultats_bureaux.{format_sortie}"'
+    return response
 
-    # Style pour les sections
-    section_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#4472C4'),
-        spaceAfter=15,
-        spaceBefore=20,
-        alignment=TA_LEFT,
-        fontName='Helvetica-Bold'
-    )
 
-    # ====== EN-TÊTE ======
-    elements.append(Paragraph("🗳️ RÉSULTATS ÉLECTORAUX", title_style))
-    elements.append(Paragraph(f"<b>Département de {danane.nom}</b>", subtitle_style))
-    elements.append(Paragraph("Élections Législatives 2025", subtitle_style))
-    elements.append(Paragraph(
-        f"Document généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}",
-        info_style
-    ))
-
-    # ====== SECTION CLASSEMENT ======
-    elements.append(Paragraph("📊 Classement des Candidats", section_style))
-    elements.append(Spacer(1, 0.5*cm))
-
-    # Préparer les données du tableau
-    data = [['Rang', 'N°', 'Candidat', 'Parti Politique', 'Voix', 'Pourcentage']]
-
-    for i, candidat in enumerate(candidats, 1):
-        # Médailles pour le top 3
-        if i == 1:
-            rang = '🥇'
-        elif i == 2:
-            rang = '🥈'
-        elif i == 3:
-            rang = '🥉'
-        else:
-            rang = str(i)
+@login_required
+def api_changements(request):
+    """
+    Changements de PV depuis un jeton de reprise (flux incrémental)
+
+    ?depuis=<jeton> (absent : tout l'historique), ?limite=<n>. La réponse
+    contient le jeton à repasser au prochain appel et termine=true quand le
+    client est à jour.
+    """
+    try:
+        position = changements.lire_jeton(request.GET.get('depuis'))
+    except changements.JetonInvalide as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    try:
+        limite = int(request.GET.get('limite') or changements.LIMITE_DEFAUT)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Limite invalide (entier attendu)'}, status=400)
+    limite = min(max(limite, 1), changements.LIMITE_MAX)
+
+    resultat, dernier, termine = changements.changements(position, limite)
+    return JsonResponse({
+        'success': True,
+        'changements': resultat,
+        'suivant': changements.jeton(dernier) if dernier else '',
+        'termine': termine,
+    })
 
-        numero = str(candidat.numero_candidat) if candidat.numero_candidat else str(i)
-        nom = candidat.get_full_name()
-        parti = candidat.parti_politique or "Indépendant"
-        voix = f"{candidat.total_voix or 0:,}".replace(',', ' ')
 
-        # Calculer le pourcentage
-        if total_suffrages_exprimes > 0 and candidat.total_voix:
-            pourcentage = f"{(candidat.total_voix / total_suffrages_exprimes * 100):.2f}%"
-        else:
-            pourcentage = "0.00%"
-
-        data.append([rang, numero, nom, parti, voix, pourcentage])
-
-    # Ligne de total
-    data.append([
-        '',
-        '',
-        '',
-        'TOTAL SUFFRAGES EXPRIMÉS',
-        f"{total_suffrages_exprimes:,}".replace(',', ' '),
-        '100.00%'
-    ])
+# Recherche dans le journal d'audit : nombre d'entrées par défaut et maximal
+LIMITE_AUDIT = 100
+LIMITE_AUDIT_MAX = 1000
 
-    # Définir les largeurs de colonnes
-    col_widths = [2*cm, 1.5*cm, 5*cm, 4.5*cm, 2.5*cm, 2.5*cm]
-
-    # Créer le tableau
-    table = Table(data, colWidths=col_widths, repeatRows=1)
-
-    # Style du tableau
-    table_style = TableStyle([
-        # En-tête
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-
-        # Corps du tableau
-        ('BACKGROUND', (0, 1), (-1, -2), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('ALIGN', (0, 1), (0, -1), 'CENTER'),  # Rang centré
-        ('ALIGN', (1, 1), (1, -1), 'CENTER'),  # N° centré
-        ('ALIGN', (2, 1), (2, -1), 'LEFT'),    # Nom à gauche
-        ('ALIGN', (3, 1), (3, -1), 'LEFT'),    # Parti à gauche
-        ('ALIGN', (4, 1), (-1, -1), 'RIGHT'),  # Voix et % à droite
-        ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -2), 10),
-        ('TOPPADDING', (0, 1), (-1, -2), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -2), 8),
-
-        # Bordures
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#4472C4')),
-
-        # Alternance de couleurs pour les lignes
-        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f9f9f9')]),
-
-        # Ligne de total
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e6e6e6')),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, -1), (-1, -1), 11),
-        ('TOPPADDING', (0, -1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
-        ('LINEABOVE', (0, -1), (-1, -1), 2, colors.HexColor('#4472C4')),
-    ])
 
-    table.setStyle(table_style)
-    elements.append(table)
+@login_required
+def api_audit(request):
+    """
+    Recherche dans le journal d'audit, table et segments archivés compris (réservé au staff)
+
+    ?modele=<ProcesVerbal...>, ?objet=<id>, ?action=<CREATE...>, ?utilisateur=<id>,
+    ?debut= / ?fin=<date ISO>, ?limite=<n> (100 par défaut). Entrées du plus
+    récent au plus ancien.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Accès non autorisé'}, status=403)
 
-    # Espacement
-    elements.append(Spacer(1, 1*cm))
+    try:
+        objet = int(request.GET['objet']) if request.GET.get('objet') else None
+        utilisateur = int(request.GET['utilisateur']) if request.GET.get('utilisateur') else None
+        limite = min(max(int(request.GET.get('limite') or LIMITE_AUDIT), 1), LIMITE_AUDIT_MAX)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Paramètre invalide (entier attendu)'}, status=400)
+
+    bornes = {}
+    for nom in ('debut', 'fin'):
+        if request.GET.get(nom):
+            date = parse_datetime(request.GET[nom])
+            if date is None:
+                return JsonResponse({'success': False, 'error': 'Date invalide (format ISO 8601 attendu)'}, status=400)
+            bornes[nom] = timezone.make_aware(date) if timezone.is_naive(date) else date
+
+    entrees = rechercher_audit(
+        model_name=request.GET.get('modele') or None, object_id=objet, action=request.GET.get('action') or None,
+        user_id=utilisateur, limite=limite, **bornes
+    )
+    return JsonResponse({'success': True, 'entrees': entrees})
 
-    # ====== STATISTIQUES SUPPLÉMENTAIRES ======
-    # Calculer statistiques
-    total_bureaux = BureauVote.objects.filter(
-        centre_vote__sous_prefecture__departement=danane
-    ).count()
 
-    bureaux_saisis = ProcesVerbal.objects.filter(
-        bureau_vote__centre_vote__sous_prefecture__departement=danane
-    ).count()
+@login_required
+def api_historique(request):
+    """
+    Résultats tels qu'ils étaient à une date : redirige vers l'instantané en vigueur
+
+    ?a=<date ISO> (maintenant par défaut), ?departement=<id> (département suivi
+    par défaut) ; ?bureaux=1 est transmis à l'instantané.
+    """
+    date = timezone.now()
+    if request.GET.get('a'):
+        date = parse_datetime(request.GET['a'])
+        if date is None:
+            return JsonResponse({'success': False, 'error': 'Date invalide (format ISO 8601 attendu)'}, status=400)
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+    try:
+        departement = (
+            Departement.objects.get(pk=int(request.GET['departement'])) if request.GET.get('departement')
+            else _departement_suivi()
+        )
+    except (ValueError, Departement.DoesNotExist):
+        departement = None
+    if departement is None:
+        return JsonResponse({'success': False, 'error': 'Département introuvable'}, status=404)
 
-    taux_saisie = (bureaux_saisis / total_bureaux * 100) if total_bureaux > 0 else 0
+    instantane = historique.au(departement, date)
+    if instantane is None:
+        return JsonResponse({'success': False, 'error': 'Aucun instantané à cette date'}, status=404)
+    url = reverse('api_historique_instantane', args=[instantane.identifiant])
+    if request.GET.get('bureaux'):
+        url += '?bureaux=1'
+    return redirect(url)
 
-    # Boîte d'informations
-    info_data = [
-        ['Statistiques de Saisie', ''],
-        ['Bureaux de vote (total)', str(total_bureaux)],
-        ['Procès-verbaux enregistrés', str(bureaux_saisis)],
-        ['Taux de saisie', f"{taux_saisie:.1f}%"],
-        ['', ''],
-        ['Total suffrages exprimés', f"{total_suffrages_exprimes:,}".replace(',', ' ')],
-    ]
 
-    info_table = Table(info_data, colWidths=[8*cm, 4*cm])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('SPAN', (0, 0), (-1, 0)),
-        ('TOPPADDING', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9f9f9')),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 1), (1, -1), 'RIGHT'),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-
-        # Ligne vide
-        ('BACKGROUND', (0, 4), (-1, 4), colors.white),
-        ('GRID', (0, 4), (-1, 4), 0, colors.white),
-
-        # Ligne total
-        ('BACKGROUND', (0, 5), (-1, 5), colors.HexColor('#e6e6e6')),
-        ('FONTNAME', (0, 5), (-1, 5), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 5), (-1, 5), 11),
-    ]))
-
-    elements.append(info_table)
-
-    # ====== FOOTER ======
-    elements.append(Spacer(1, 2*cm))
-    elements.append(Paragraph(
-        "─────────────────────────────────────────────────────────",
-        footer_style
-    ))
-    elements.append(Spacer(1, 0.3*cm))
-    elements.append(Paragraph(
-        f"© 2025 Gestion des Résultats Électoraux - Département de {danane.nom}",
-        footer_style
-    ))
-    elements.append(Paragraph(
-        "Document officiel généré automatiquement",
-        footer_style
-    ))
-
-    # Construire le PDF
-    try:
-        doc.build(elements)
-    except Exception as e:
-        messages.error(request, f"Erreur lors de la génération du PDF : {str(e)}")
-        return redirect('dashboard_general')
+@login_required
+def api_historique_instantane(request, identifiant):
+    """Instantané historique : contenu immuable, mis en cache sans limite par le navigateur"""
+    instantane = get_object_or_404(HistoriqueResultats, identifiant=identifiant)
+    response = JsonResponse({
+        'success': True,
+        **historique.serialiser(instantane, avec_bureaux=bool(request.GET.get('bureaux'))),
+    })
+    patch_cache_control(response, private=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
 
-    # Préparer la réponse HTTP
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="resultats_{danane.nom.lower().replace(" ", "_")}.pdf"'
 
-    return response
+@login_required
+def api_agregation(request):
+    """
+    Totaux par nœud de la hiérarchie, à n'importe quel niveau
+
+    ?noeud=<id> (absent : racine, au-dessus des départements), ?profondeur=<n>
+    (1 par défaut : les enfants du nœud). Chaque nœud renvoyé peut servir de
+    point de départ à l'appel suivant.
+    """
+    try:
+        noeud = NoeudHierarchie.objects.get(pk=int(request.GET['noeud'])) if request.GET.get('noeud') else None
+        profondeur = int(request.GET.get('profondeur') or 1)
+        noeuds = arbre.agreger(noeud, profondeur)
+    except NoeudHierarchie.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Nœud introuvable'}, status=404)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'noeud': {'id': noeud.id, 'niveau': noeud.niveau, 'objet_id': noeud.objet_id, 'nom': noeud.nom}
+        if noeud else None,
+        'profondeur': profondeur,
+        'noeuds': noeuds,
+    })
 
 
 # ========================================
 # API POUR LE MODAL DÉTAILS
 # ========================================
 
-@login_required
-def api_sous_prefecture_bureaux(request, sous_prefecture_id):
-    """API pour récupérer les détails des bureaux d'une sous-préfecture"""
+def _donnees_sous_prefecture(sous_prefecture):
+    """Détail des centres et bureaux d'une sous-préfecture (mis en cache par api_sous_prefecture_bureaux)"""
+    centres = CentreVote.objects.filter(
+        sous_prefecture=sous_prefecture
+    ).prefetch_related(
+        'bureaux',
+        'bureaux__proces_verbal__representant'
+    ).order_by('nom')
+
+    data = {
+        'id': sous_prefecture.id,
+        'nom': sous_prefecture.nom,
+        'departement': sous_prefecture.departement.nom,
+        'total_centres': len(centres),
+        'total_bureaux': 0,
+        'centres': []
+    }
 
-    try:
-        # Récupérer la sous-préfecture
-        sous_prefecture = get_object_or_404(SousPrefecture, id=sous_prefecture_id)
-
-        # Récupérer tous les centres de vote
-        centres = CentreVote.objects.filter(
-            sous_prefecture=sous_prefecture
-        ).prefetch_related(
-            'bureaux',
-            'bureaux__proces_verbal'
-        ).order_by('nom')
-
-        # Construire les données JSON
-        data = {
-            'id': sous_prefecture.id,
-            'nom': sous_prefecture.nom,
-            'departement': sous_prefecture.departement.nom,
-            'total_centres': centres.count(),
-            'total_bureaux': 0,
-            'centres': []
-        }
+    for centre in centres:
+        bureaux = centre.bureaux.all()
+        data['total_bureaux'] += len(bureaux)
 
-        for centre in centres:
-            bureaux = centre.bureaux.all()
-            data['total_bureaux'] += bureaux.count()
+        centre_data = {
+            'id': centre.id,
+            'nom': centre.nom,
+            'adresse': centre.adresse or '',
+            'bureaux': []
+        }
 
-            centre_data = {
-                'id': centre.id,
-                'nom': centre.nom,
-                'adresse': centre.adresse or '',
-                'bureaux': []
+        for bureau in bureaux:
+            bureau_data = {
+                'id': bureau.id,
+                'numero': bureau.numero,
+                'nombre_inscrits': bureau.nombre_inscrits,
+                'pv': None
             }
 
-            for bureau in bureaux:
-                bureau_data = {
-                    'id': bureau.id,
-                    'numero': bureau.numero,
-                    'nombre_inscrits': bureau.nombre_inscrits,
-                    'pv': None
+            # Vérifier si le bureau a un PV
+            try:
+                pv = bureau.proces_verbal
+                bureau_data['pv'] = {
+                    'id': pv.id,
+                    'nombre_votants': pv.nombre_votants,
+                    'bulletins_nuls': pv.bulletins_nuls,
+                    'bulletins_blancs': pv.bulletins_blancs,
+                    'suffrages_exprimes': pv.suffrages_exprimes,
+                    'verifie': pv.verifie,
+                    'photo_pv_url': pv.photo_pv.url if pv.photo_pv else None,
+                    'date_saisie': pv.date_saisie.strftime('%d/%m/%Y %H:%M') if pv.date_saisie else '',
+                    'representant': pv.representant.get_full_name() if pv.representant else ''
                 }
+            except ProcesVerbal.DoesNotExist:
+                pass
+            except AttributeError:
+                pass
+
+            centre_data['bureaux'].append(bureau_data)
 
-                # Vérifier si le bureau a un PV
-                try:
-                    pv = bureau.proces_verbal
-                    bureau_data['pv'] = {
-                        'id': pv.id,
-                        'nombre_votants': pv.nombre_votants,
-                        'bulletins_nuls': pv.bulletins_nuls,
-                        'bulletins_blancs': pv.bulletins_blancs,
-                        'suffrages_exprimes': pv.suffrages_exprimes,
-                        'verifie': pv.verifie,
-                        'photo_pv_url': pv.photo_pv.url if pv.photo_pv else None,
-                        'date_saisie': pv.date_saisie.strftime('%d/%m/%Y %H:%M') if pv.date_saisie else '',
-                        'representant': pv.representant.get_full_name() if pv.representant else ''
-                    }
-                except ProcesVerbal.DoesNotExist:
-                    pass
-                except AttributeError:
-                    pass
-
-                centre_data['bureaux'].append(bureau_data)
-
-            data['centres'].append(centre_data)
+        data['centres'].append(centre_data)
 
+    return data
+
+
+@login_required
+def api_sous_prefecture_bureaux(request, sous_prefecture_id):
+    """API pour récupérer les détails des bureaux d'une sous-préfecture (cache par version de la sous-préfecture)"""
+
+    try:
+        sous_prefecture = get_object_or_404(SousPrefecture.objects.select_related('departement'), id=sous_prefecture_id)
+        data = en_cache(
+            'api_sous_prefecture_bureaux', [('sous_prefecture', sous_prefecture.id)],
+            lambda: _donnees_sous_prefecture(sous_prefecture)
+        )
         return JsonResponse(data, safe=False)
 
     except SousPrefecture.DoesNotExist:
@@ -1021,23 +1112,17 @@ def ajouter_releve_horaire(request):
         nombre_votants = int(request.POST.get('nombre_votants', 0))
         observations = request.POST.get('observations', '').strip()
 
-        # Validation
-        if nombre_votants < 0:
-            return JsonResponse({'success': False, 'error': 'Le nombre de votants ne peut pas être négatif'})
-
-        if nombre_votants > request.user.bureau_vote.nombre_inscrits:
-            return JsonResponse({
-                'success': False,
-                'error': f'Le nombre de votants ne peut pas dépasser les inscrits ({request.user.bureau_vote.nombre_inscrits})'
-            })
-
-        # Créer le relevé
-        releve = RelevéHoraire.objects.create(
-            bureau_vote=request.user.bureau_vote,
-            representant=request.user,
-            nombre_votants=nombre_votants,
-            observations=observations
-        )
+        # Validation et création du relevé
+        try:
+            releve = enregistrer_releve(
+                request.user.bureau_vote,
+                request.user,
+                nombre_votants,
+                observations,
+                request=request
+            )
+        except ValidationError as e:
+            return JsonResponse({'success': False, 'error': ' '.join(e.messages)})
 
         return JsonResponse({
             'success': True,
@@ -1139,4 +1224,377 @@ def api_derniers_releves(request):
             'observations': releve.observations or ''
         })
 
-    return JsonResponse({'releves': data})
\ No newline at end of file
+    return JsonResponse({'releves': data})
+
+# ========================================
+# MODE HORS LIGNE (PWA) ET SYNCHRONISATION PAR LOTS
+# ========================================
+
+import base64
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.utils.dateparse import parse_datetime
+from .models import OperationSynchronisation
+
+# Nombre maximum d'opérations acceptées dans un même lot
+MAX_OPERATIONS_SYNC = 100
+
+
+def service_worker(request):
+    """Service worker du mode hors ligne, servi à la racine pour couvrir toutes les pages"""
+    response = render(request, 'sw.js', content_type='application/javascript')
+    response['Service-Worker-Allowed'] = '/'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def manifest_pwa(request):
+    """Manifeste de l'application installable"""
+    return render(request, 'manifest.webmanifest', content_type='application/manifest+json')
+
+
+def _lire_operations(request):
+    """Extrait la liste des opérations d'un envoi JSON ou multipart (avec photos)"""
+    if request.content_type == 'application/json':
+        payload = json.loads(request.body)
+    else:
+        payload = json.loads(request.POST.get('operations', ''))
+
+    operations = payload['operations'] if isinstance(payload, dict) else payload
+    if not isinstance(operations, list):
+        raise ValueError('operations doit être une liste')
+    return operations
+
+
+def _photo_operation(request, op_id, data):
+    """Photo du PV jointe en multipart (photo_<op_id>) ou encodée en data URL"""
+    photo = request.FILES.get(f'photo_{op_id}')
+    if photo:
+        return photo
+
+    data_url = data.get('photo')
+    if not data_url:
+        return None
+    if not isinstance(data_url, str):
+        raise ValidationError('Photo du PV illisible')
+
+    try:
+        entete, contenu = data_url.split(',', 1)
+        content_type = entete.split(':', 1)[1].split(';', 1)[0]
+        extension = content_type.split('/')[-1]
+        return SimpleUploadedFile(f'pv_{op_id}.{extension}', base64.b64decode(contenu), content_type=content_type)
+    except (ValueError, IndexError):
+        raise ValidationError('Photo du PV illisible')
+
+
+def _sync_releve(request, op_id, data):
+    """Applique un relevé horaire saisi hors ligne"""
+    try:
+        nombre_votants = int(data.get('nombre_votants'))
+    except (TypeError, ValueError):
+        raise ValidationError('Données invalides')
+
+    observations = data.get('observations') or ''
+    if not isinstance(observations, str):
+        raise ValidationError('Données invalides')
+
+    heure_releve = None
+    if data.get('heure'):
+        if not isinstance(data['heure'], str):
+            raise ValidationError('Heure du relevé invalide')
+        heure_releve = parse_datetime(data['heure'])
+        if heure_releve is not None and timezone.is_naive(heure_releve):
+            heure_releve = timezone.make_aware(heure_releve)
+
+    releve = enregistrer_releve(
+        request.user.bureau_vote,
+        request.user,
+        nombre_votants,
+        observations.strip(),
+        heure_releve,
+        request=request
+    )
+
+    return {
+        'releve': {
+            'id': releve.id,
+            'heure': timezone.localtime(releve.heure_releve).strftime('%H:%M'),
+            'nombre_votants': releve.nombre_votants,
+            'taux_participation': releve.get_taux_participation(),
+        }
+    }
+
+
+def _sync_proces_verbal(request, op_id, data):
+    """Applique un brouillon de PV saisi hors ligne avec les mêmes validations que saisie_resultat"""
+    bureau = request.user.bureau_vote
+    candidats = list(User.objects.filter(role='candidat').order_by('numero_candidat', 'first_name'))
+    pv_existant = ProcesVerbal.objects.filter(bureau_vote=bureau).first()
+
+    fichiers = {}
+    photo = _photo_operation(request, op_id, data)
+    if photo:
+        fichiers['photo_pv'] = photo
+
+    pv_form = ProcesVerbalForm(
+        {
+            champ: data.get(champ)
+            for champ in ('nombre_inscrits', 'nombre_votants', 'bulletins_nuls', 'bulletins_blancs', 'observations')
+        },
+        fichiers,
+        instance=pv_existant,
+        bureau_vote=bureau
+    )
+    if not pv_form.is_valid():
+        raise ValidationError([
+            f'{champ}: {erreur}' if champ != '__all__' else erreur
+            for champ, erreurs in pv_form.errors.items()
+            for erreur in erreurs
+        ])
+
+    # Voix indexées par identifiant de candidat ; un candidat absent a 0 voix
+    voix = data.get('voix') or {}
+    if not isinstance(voix, dict):
+        raise ValidationError('Voix invalides (objet attendu, par identifiant de candidat)')
+    voix_candidats = []
+    for candidat in candidats:
+        try:
+            nombre_voix = int(voix.get(str(candidat.id)) or 0)
+        except (TypeError, ValueError):
+            raise ValidationError(f'{candidat.get_full_name()} : nombre de voix invalide')
+        if nombre_voix < 0:
+            raise ValidationError(f'{candidat.get_full_name()} : le nombre de voix ne peut pas être négatif')
+        voix_candidats.append((candidat, nombre_voix))
+
+    cleaned = pv_form.cleaned_data
+    suffrages_exprimes = cleaned['nombre_votants'] - cleaned['bulletins_nuls'] - cleaned['bulletins_blancs']
+    total_voix = sum(nombre_voix for _, nombre_voix in voix_candidats)
+    if total_voix != suffrages_exprimes:
+        raise ValidationError(
+            f"La somme des voix ({total_voix}) doit être égale aux suffrages exprimés ({suffrages_exprimes})."
+        )
+
+    pv = enregistrer_proces_verbal(
+        bureau, request.user, pv_form, cleaned['nombre_inscrits'], voix_candidats, request=request
+    )
+
+    return {
+        'pv': {
+            'id': pv.id,
+            'nombre_votants': pv.nombre_votants,
+            'suffrages_exprimes': pv.suffrages_exprimes,
+        }
+    }
+
+
+SYNC_HANDLERS = {
+    'releve': _sync_releve,
+    'pv': _sync_proces_verbal,
+}
+
+
+def _resultat_operation(operation_sync, doublon=False):
+    return {
+        'op_id': operation_sync.op_id,
+        'statut': operation_sync.statut,
+        'doublon': doublon,
+        **operation_sync.reponse,
+    }
+
+
+def _appliquer_operation(request, operation, deja_traitees):
+    """
+    Applique une opération du lot dans sa propre transaction
+
+    L'opération et son résultat sont enregistrés dans la même transaction : un op_id
+    déjà reçu renvoie le résultat d'origine sans rien réappliquer. Les erreurs
+    inattendues ne sont pas mémorisées pour que le client puisse réessayer.
+    """
+    if not isinstance(operation, dict) or not operation.get('op_id'):
+        return {'op_id': None, 'statut': 'rejete', 'erreur': "Identifiant d'opération manquant"}
+
+    op_id = str(operation['op_id'])[:64]
+
+    existante = deja_traitees.get(op_id)
+    if existante:
+        if existante.utilisateur_id != request.user.id:
+            return {'op_id': op_id, 'statut': 'rejete', 'erreur': "Identifiant d'opération déjà utilisé"}
+        return _resultat_operation(existante, doublon=True)
+
+    handler = SYNC_HANDLERS.get(operation.get('type'))
+    if handler is None:
+        return {'op_id': op_id, 'statut': 'rejete', 'erreur': "Type d'opération inconnu"}
+
+    try:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    data = operation.get('data') or {}
+                    if not isinstance(data, dict):
+                        # Rejet mémorisé : le client ne renvoie pas indéfiniment une opération mal formée
+                        raise ValidationError('Données invalides (objet attendu)')
+                    reponse = handler(request, op_id, data)
+                statut = 'applique'
+            except ValidationError as e:
+                reponse = {'erreur': ' '.join(e.messages)}
+                statut = 'rejete'
+
+            operation_sync = OperationSynchronisation.objects.create(
+                op_id=op_id,
+                utilisateur=request.user,
+                type_operation=operation['type'],
+                statut=statut,
+                reponse=reponse
+            )
+    except IntegrityError:
+        # Même opération reçue en parallèle par une autre requête
+        existante = OperationSynchronisation.objects.filter(op_id=op_id, utilisateur=request.user).first()
+        if existante:
+            return _resultat_operation(existante, doublon=True)
+        return {'op_id': op_id, 'statut': 'erreur', 'erreur': 'Conflit, réessayez'}
+    except Exception:
+        # Détail dans le journal du serveur, jamais renvoyé au client hors ligne
+        logger.exception("Échec de l'opération hors ligne %s (%s)", op_id, operation.get('type'))
+        return {'op_id': op_id, 'statut': 'erreur', 'erreur': 'Erreur interne, réessayez plus tard'}
+
+    return _resultat_operation(operation_sync)
+
+
+@login_required
+@require_POST
+def api_synchronisation(request):
+    """
+    API de synchronisation des opérations mises en file d'attente hors ligne
+
+    Reçoit un lot {"operations": [{"op_id", "type": "releve"|"pv", "data"}]} en JSON,
+    ou en multipart avec le lot dans le champ "operations" et les photos des PV
+    dans les fichiers "photo_<op_id>". Retourne un résultat par opération.
+    """
+    if request.user.role != 'representant':
+        return JsonResponse({'success': False, 'error': 'Accès non autorisé'}, status=403)
+
+    if not request.user.bureau_vote:
+        return JsonResponse({'success': False, 'error': 'Aucun bureau affecté'}, status=400)
+
+    try:
+        operations = _lire_operations(request)
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Données invalides'}, status=400)
+
+    if len(operations) > MAX_OPERATIONS_SYNC:
+        return JsonResponse({
+            'success': False,
+            'error': f'Lot trop volumineux (maximum {MAX_OPERATIONS_SYNC} opérations)'
+        }, status=400)
+
+    # Opérations déjà reçues : une seule requête pour tout le lot
+    op_ids = [str(op['op_id'])[:64] for op in operations if isinstance(op, dict) and op.get('op_id')]
+    deja_traitees = {
+        operation_sync.op_id: operation_sync
+        for operation_sync in OperationSynchronisation.objects.filter(op_id__in=op_ids)
+    }
+
+    resultats = [_appliquer_operation(request, operation, deja_traitees) for operation in operations]
+
+    return JsonResponse({'success': True, 'resultats': resultats})
+
+
+# ========================================
+# VÉRIFICATION DES PROCÈS-VERBAUX (FILE PARTAGÉE)
+# ========================================
+
+from .verification import appliquer_decisions, liberer, reserver_lot, taille_lot_verification
+
+# Nombre de photos préchargées en avance par le navigateur
+PRECHARGEMENT_PHOTOS = 5
+
+DECISIONS_VERIFICATION = ('accepter', 'rejeter')
+
+
+@login_required
+def verification_pv(request):
+    """Page de vérification des PV : lots réservés, photos préchargées, décisions envoyées par lot"""
+    if not request.user.is_staff:
+        messages.error(request, 'Accès non autorisé. Cette page est réservée aux vérificateurs.')
+        return redirect('home')
+
+    return render(request, 'verification_pv.html', {
+        'taille_lot': taille_lot_verification(),
+        'prechargement': PRECHARGEMENT_PHOTOS,
+    })
+
+
+def _pv_verification_json(pv):
+    bureau = pv.bureau_vote
+    resultats = sorted(pv.resultats.all(), key=lambda r: (r.candidat.numero_candidat or 0, r.candidat_id))
+    total_voix = sum(resultat.nombre_voix for resultat in resultats)
+    return {
+        'id': pv.id,
+        'bureau': f"Bureau {bureau.numero}",
+        'centre': bureau.centre_vote.nom,
+        'sous_prefecture': bureau.centre_vote.sous_prefecture.nom,
+        'representant': pv.representant.get_full_name() if pv.representant else '',
+        'photo': pv.photo_pv.url if pv.photo_pv else '',
+        'inscrits': bureau.nombre_inscrits,
+        'votants': pv.nombre_votants,
+        'nuls': pv.bulletins_nuls,
+        'blancs': pv.bulletins_blancs,
+        'exprimes': pv.suffrages_exprimes,
+        'observations': pv.observations or '',
+        'resultats': [
+            {'candidat': resultat.candidat.get_full_name(), 'numero': resultat.candidat.numero_candidat,
+             'voix': resultat.nombre_voix}
+            for resultat in resultats
+        ],
+        'coherent': total_voix == pv.suffrages_exprimes and pv.nombre_votants <= bureau.nombre_inscrits,
+        'anomalies': [anomalie.message for anomalie in pv.anomalies.all() if not anomalie.resolue],
+        'date_saisie': pv.date_saisie.isoformat(),
+    }
+
+
+@login_required
+@require_POST
+def api_verification_lot(request):
+    """Réserve le prochain lot de PV pour le vérificateur connecté"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Accès non autorisé'}, status=403)
+
+    try:
+        taille = min(int(request.POST.get('taille') or taille_lot_verification()), 100)
+    except ValueError:
+        taille = taille_lot_verification()
+
+    pvs = reserver_lot(request.user, max(taille, 1))
+    return JsonResponse({'success': True, 'pvs': [_pv_verification_json(pv) for pv in pvs]})
+
+
+@login_required
+@require_POST
+def api_verification_decisions(request):
+    """
+    Applique un lot de décisions {"decisions": [{"pv_id", "decision": "accepter"|"rejeter", "motif"}]}
+
+    Les PV dont la réservation a expiré ou appartient à un autre vérificateur
+    sont renvoyés dans "refuses" sans être modifiés. Avec "liberer": true, les
+    PV encore réservés et non traités sont rendus à la file (fermeture de la page).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Accès non autorisé'}, status=403)
+
+    try:
+        payload = json.loads(request.body)
+        decisions = [
+            {'pv_id': int(d['pv_id']), 'decision': d['decision'], 'motif': str(d.get('motif') or '')[:1000]}
+            for d in payload['decisions']
+        ]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Données invalides'}, status=400)
+
+    if any(d['decision'] not in DECISIONS_VERIFICATION for d in decisions):
+        return JsonResponse({'success': False, 'error': 'Décision inconnue'}, status=400)
+
+    traites, refuses = appliquer_decisions(request.user, decisions, request=request)
+    liberes = liberer(request.user) if payload.get('liberer') else 0
+
+    return JsonResponse({'success': True, 'traites': traites, 'refuses': refuses, 'liberes': liberes})
+